@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""Scaling benchmarks for generate_kicad.py and generate_icons.py.
+
+Drives the real entry points with synthetic workloads and records wall
+time, peak RSS and output size per case:
+
+  kicad.schematic / kicad.pcb / kicad.project   9 … 5000 channels
+  icons.cpp                                     4 … 500 icons, 24 … 128 px
+  icons.c_array                                 4 … 500 icons, 24 … 128 px
+
+Each case runs in a fresh interpreter so peak RSS belongs to that case
+alone. Results are appended to a JSON-lines history; with a stored
+baseline, any case that got slower, bigger or hungrier by more than
+--threshold percent fails the run.
+
+Usage:
+  python3 scripts/bench_generators.py                   # full suite, compare to baseline
+  python3 scripts/bench_generators.py --quick           # small cases only
+  python3 scripts/bench_generators.py --save-baseline   # record the current numbers as baseline
+  python3 scripts/bench_generators.py --filter kicad.pcb --threshold 15
+
+The icon cases need generate_icons.py's dependencies (cairosvg, Pillow);
+without them they are reported as skipped.
+
+No external dependencies — uses only Python stdlib.
+"""
+
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+BENCH_DIR = SCRIPTS_DIR / ".bench"
+
+# Regressions on cases faster than this are judged with this much slack (s)
+TIME_FLOOR = 0.005
+
+CHANNEL_COUNTS = [9, 50, 500, 5000]
+ICON_COUNTS = [4, 50, 500]
+ICON_SIZES = [24, 48, 128]
+
+# ---------------------------------------------------------------------------
+# Workloads (run inside the case subprocess)
+# ---------------------------------------------------------------------------
+
+def _kicad_context(channels):
+    import generate_kicad as gk
+    chs = [{"num": i + 1, "gpio": gk.CHANNEL_GPIOS[i % len(gk.CHANNEL_GPIOS)], "name": f"Ch{i + 1}",
+            "gate_r": "100R", "pd_r": "10K"} for i in range(channels)]
+    return gk, lambda: gk.DesignContext(channels=chs, seed=0)
+
+def _kicad_case(func_name):
+    def setup(channels):
+        gk, make_ctx = _kicad_context(channels)
+        func = getattr(gk, func_name)
+        return lambda: func(make_ctx())
+    return setup
+
+def _icon_paths(count):
+    import generate_icons as gi
+    names = list(gi.MDI_PATHS)
+    return gi, {f"icon_{i}": gi.MDI_PATHS[names[i % len(names)]] for i in range(count)}
+
+def _icons_cpp(icons, size):
+    gi, paths = _icon_paths(icons - 1)  # generate_cpp appends the light bar
+    return lambda: gi.generate_cpp(size, False, paths)
+
+def _icons_c_array(icons, size):
+    import random
+    import generate_icons as gi
+    from PIL import Image
+    rng = random.Random(0)
+    images = [Image.frombytes("L", (size, size), bytes(rng.getrandbits(8) for _ in range(size * size)))
+              for _ in range(icons)]
+    return lambda: "\n".join(gi.alpha_to_c_array(img, f"icon_{i}_map") for i, img in enumerate(images))
+
+WORKLOADS = {
+    "kicad.schematic": _kicad_case("generate_schematic"),
+    "kicad.pcb": _kicad_case("generate_pcb"),
+    "kicad.project": _kicad_case("generate_project"),
+    "icons.cpp": _icons_cpp,
+    "icons.c_array": _icons_c_array,
+}
+
+def suite(quick=False):
+    """(workload, params) for every case, smallest first."""
+    channels = CHANNEL_COUNTS[:2] if quick else CHANNEL_COUNTS
+    icons = ICON_COUNTS[:2] if quick else ICON_COUNTS
+    sizes = ICON_SIZES[:2] if quick else ICON_SIZES
+    cases = []
+    for name in ("kicad.schematic", "kicad.pcb", "kicad.project"):
+        cases.extend((name, {"channels": n}) for n in channels)
+    for name in ("icons.cpp", "icons.c_array"):
+        cases.extend((name, {"icons": n, "size": s}) for n in icons for s in sizes)
+    return cases
+
+def case_id(name, params):
+    return f"{name}[{','.join(f'{k}={v}' for k, v in params.items())}]"
+
+def run_case(name, params, repeat):
+    """Run one case in this process; returns its measurements."""
+    sys.path.insert(0, str(SCRIPTS_DIR))
+    start = time.perf_counter()
+    func = WORKLOADS[name](**params)
+    setup_s = time.perf_counter() - start
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    times = []
+    out = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = func()
+        times.append(time.perf_counter() - start)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform.startswith("linux") else 1 / 1024
+    return {"time_s": min(times), "setup_s": setup_s, "peak_rss_kb": round(peak * scale),
+            "rss_growth_kb": round((peak - rss_before) * scale),
+            "output_bytes": len(out.encode("utf-8"))}
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+
+def _spawn(name, params, repeat, timeout):
+    cmd = [sys.executable, str(Path(__file__).resolve()), "--run-case", name,
+           "--params", json.dumps(params), "--repeat", str(repeat)]
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {"error": f"timed out after {timeout} s"}
+    if proc.returncode != 0:
+        lines = proc.stderr.strip().splitlines()
+        return {"error": lines[-1] if lines else f"exit status {proc.returncode}"}
+    return json.loads(proc.stdout)
+
+def compare(results, baseline, threshold):
+    """Regression messages for results worse than baseline by > threshold %."""
+    problems = []
+    limit = 1 + threshold / 100
+    for cid, res in results.items():
+        base = baseline.get(cid)
+        if not base or "error" in res or "error" in base:
+            continue
+        for metric in ("time_s", "peak_rss_kb", "output_bytes"):
+            old, new = base.get(metric), res.get(metric)
+            if not old or new is None:
+                continue
+            allowed = old * limit + (TIME_FLOOR if metric == "time_s" else 0)
+            if new > allowed:
+                problems.append(f"{cid}: {metric} {old:g} → {new:g} (+{(new / old - 1) * 100:.1f}%)")
+    return problems
+
+def _git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=SCRIPTS_DIR, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the KiCad and icon generators")
+    parser.add_argument("--quick", action="store_true", help="Only the small cases")
+    parser.add_argument("--filter", type=str, default=None, help="Only cases whose id contains this text")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the fastest counts (default: 3)")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed regression in percent (default: 10)")
+    parser.add_argument("--timeout", type=float, default=600, help="Per-case timeout in seconds (default: 600)")
+    parser.add_argument("--bench-dir", type=str, default=str(BENCH_DIR),
+                        help="History and baseline directory (default: scripts/.bench)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--run-case", type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--params", type=str, default="{}", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case(args.run_case, json.loads(args.params), args.repeat)))
+        return
+
+    bench_dir = Path(args.bench_dir)
+    baseline_path = bench_dir / "baseline.json"
+    baseline = json.loads(baseline_path.read_text())["results"] if baseline_path.exists() else {}
+
+    results = {}
+    print(f"{'case':<44} {'time':>10} {'peak RSS':>10} {'output':>12}")
+    for name, params in suite(args.quick):
+        cid = case_id(name, params)
+        if args.filter and args.filter not in cid:
+            continue
+        res = _spawn(name, params, args.repeat, args.timeout)
+        results[cid] = res
+        if "error" in res:
+            print(f"{cid:<44} skipped: {res['error'][:80]}")
+            continue
+        base = baseline.get(cid, {}).get("time_s")
+        delta = f"  ({(res['time_s'] / base - 1) * 100:+.1f}%)" if base else ""
+        print(f"{cid:<44} {res['time_s'] * 1000:8.1f}ms {res['peak_rss_kb'] / 1024:8.1f}MB "
+              f"{res['output_bytes']:>12,}{delta}")
+
+    record = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "git": _git_rev(),
+              "python": platform.python_version(), "machine": platform.machine(),
+              "platform": platform.platform(), "results": results}
+    bench_dir.mkdir(parents=True, exist_ok=True)
+    with (bench_dir / "history.jsonl").open("a") as f:
+        f.write(json.dumps(record) + "\n")
+
+    if args.save_baseline:
+        merged = {**baseline, **{k: v for k, v in results.items() if "error" not in v}}
+        baseline_path.write_text(json.dumps({**record, "results": merged}, indent=2) + "\n")
+        print(f"Baseline saved to {baseline_path}")
+        return
+
+    problems = compare(results, baseline, args.threshold)
+    if problems:
+        print(f"\n{len(problems)} regression(s) over {args.threshold:g}%:")
+        for p in problems:
+            print(f"  {p}")
+        sys.exit(1)
+    if baseline:
+        print(f"\nNo regressions over {args.threshold:g}%.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""Append-only capture files for ESP-NOW protocol sessions, with replay.
+
+A capture is a 64-byte header followed by fixed 48-byte records in
+timestamp order:
+
+  offset  size  field
+       0     8  t_us       int64, host time in microseconds since the epoch
+       8     1  direction  0 = controller -> receiver, 1 = receiver -> controller
+       9     1  length     payload bytes actually sent (<= 32)
+      10     6  mac        sender's MAC
+      16    32  payload    ProtoMessage, zero-padded
+
+Readers mmap the file, so opening is O(1) whatever its size; records and
+payloads are sliced out of the mapping without copying, and time-range
+queries binary-search the timestamps. A record cut short by a crash is
+ignored. Replay re-emits a time range over UDP at 1x-1000x speed, as bare
+payloads or wrapped in the espnow_emu.py envelope.
+
+Usage:
+  python3 scripts/capture.py info session.espcap
+  python3 scripts/capture.py dump session.espcap --from 10 --to-time 12.5
+  python3 scripts/capture.py replay session.espcap --speed 100 --to 127.0.0.1:47100 --envelope
+  python3 scripts/capture.py synth big.espcap --records 50000000      # test data
+
+Times given on the command line are seconds from the start of the capture.
+NumPy is used for the records() view when installed; everything else is
+Python stdlib.
+"""
+
+import argparse
+import bisect
+import mmap
+import os
+import socket
+import struct
+import sys
+import time
+from collections import namedtuple
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from protocol_codec import load_protocol
+
+MAGIC = b"ESPNCAP\x00"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sHHHH48x")   # magic, version, header size, record size, payload size
+RECORD = struct.Struct("<qBB6s32s")
+PAYLOAD_OFFSET = 16
+PAYLOAD_SIZE = 32
+TO_RECEIVER, TO_CONTROLLER = 0, 1
+DIRECTIONS = {TO_RECEIVER: "tx>rx", TO_CONTROLLER: "rx>tx"}
+
+# Envelope of espnow_emu.py: cell, dst MAC, src MAC
+ENVELOPE = struct.Struct("<I6s6s")
+BROADCAST = b"\xff" * 6
+
+Record = namedtuple("Record", "t_us direction length mac payload")
+
+# ---------------------------------------------------------------------------
+# Writing
+# ---------------------------------------------------------------------------
+
+class CaptureWriter:
+    """Appends records to a capture file, creating it if needed.
+
+    Timestamps must not go backwards; earlier ones are clamped so the file
+    stays sorted for binary search.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._fh = open(self.path, "ab")
+        self.last_t_us = None
+        if self._fh.tell() == 0:
+            self._fh.write(HEADER.pack(MAGIC, FORMAT_VERSION, HEADER.size, RECORD.size, PAYLOAD_SIZE))
+        else:
+            with Capture(self.path) as cap:
+                if len(cap):
+                    self.last_t_us = cap.t_us(len(cap) - 1)
+                # Drop a torn trailing record so new records stay aligned
+                self._fh.truncate(HEADER.size + len(cap) * RECORD.size)
+            self._fh.seek(0, os.SEEK_END)
+
+    def write(self, payload, direction=TO_RECEIVER, mac=bytes(6), t_us=None):
+        if len(payload) > PAYLOAD_SIZE:
+            raise ValueError(f"payload of {len(payload)} bytes exceeds {PAYLOAD_SIZE}")
+        if t_us is None:
+            t_us = time.time_ns() // 1000
+        if self.last_t_us is not None and t_us < self.last_t_us:
+            t_us = self.last_t_us
+        self.last_t_us = t_us
+        self._fh.write(RECORD.pack(t_us, direction, len(payload), bytes(mac), bytes(payload)))
+
+    def flush(self):
+        self._fh.flush()
+
+    def close(self):
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+class _Timestamps:
+    """Sequence view of the record timestamps, for bisect."""
+
+    __slots__ = ("_cap",)
+
+    def __init__(self, cap):
+        self._cap = cap
+
+    def __len__(self):
+        return len(self._cap)
+
+    def __getitem__(self, i):
+        return self._cap.t_us(i)
+
+class Capture:
+    """Read-only, memory-mapped view of a capture file."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as fh:
+            size = os.fstat(fh.fileno()).st_size
+            if size < HEADER.size:
+                raise ValueError(f"{path}: too short for a capture header")
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_size, record_size, payload_size = HEADER.unpack_from(self._mm)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path}: not a version {FORMAT_VERSION} capture")
+        if (header_size, record_size, payload_size) != (HEADER.size, RECORD.size, PAYLOAD_SIZE):
+            raise ValueError(f"{path}: unexpected record layout")
+        self._count = (size - HEADER.size) // RECORD.size
+        self._view = memoryview(self._mm)
+
+    def __len__(self):
+        return self._count
+
+    def t_us(self, i):
+        return struct.unpack_from("<q", self._mm, HEADER.size + i * RECORD.size)[0]
+
+    def __getitem__(self, i):
+        """Record i; its payload is a memoryview into the mapping."""
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        off = HEADER.size + i * RECORD.size
+        t_us, direction, length, mac = struct.unpack_from("<qBB6s", self._mm, off)
+        return Record(t_us, direction, length, mac, self._view[off + PAYLOAD_OFFSET:off + PAYLOAD_OFFSET + length])
+
+    def __iter__(self):
+        return (self[i] for i in range(self._count))
+
+    def index(self, t_us):
+        """First record at or after t_us (binary search)."""
+        return bisect.bisect_left(_Timestamps(self), t_us)
+
+    def time_range(self, start_us=None, end_us=None):
+        """(first, stop) record indexes for start_us <= t < end_us."""
+        lo = 0 if start_us is None else self.index(start_us)
+        hi = self._count if end_us is None else self.index(end_us)
+        return lo, max(lo, hi)
+
+    def raw(self, lo=0, hi=None):
+        """Zero-copy memoryview of the record bytes [lo, hi)."""
+        hi = self._count if hi is None else hi
+        return self._view[HEADER.size + lo * RECORD.size:HEADER.size + hi * RECORD.size]
+
+    def records(self, lo=0, hi=None):
+        """NumPy structured array over records [lo, hi), sharing the mapping."""
+        if np is None:
+            raise RuntimeError("records() needs NumPy (pip install numpy)")
+        dtype = np.dtype([("t_us", "<i8"), ("direction", "u1"), ("length", "u1"),
+                          ("mac", "u1", (6,)), ("payload", "u1", (PAYLOAD_SIZE,))])
+        return np.frombuffer(self.raw(lo, hi), dtype=dtype)
+
+    def close(self):
+        """Unmap the file, unless records or payload views still use it.
+
+        In that case the mapping goes away with the last of them.
+        """
+        try:
+            self._view.release()
+            self._mm.close()
+        except BufferError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# ---------------------------------------------------------------------------
+# Replay
+# ---------------------------------------------------------------------------
+
+def replay(cap, addr, speed=1.0, lo=0, hi=None, direction=None, envelope=False, cell=0):
+    """Re-send records [lo, hi) as UDP datagrams to addr, speed times faster.
+
+    With envelope, each payload is wrapped for espnow_emu.py as a broadcast
+    in cell from the recorded MAC. Returns (sent, seconds late at the end).
+    """
+    hi = len(cap) if hi is None else hi
+    if lo >= hi:
+        return 0, 0.0
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    base_us = cap.t_us(lo)
+    start = time.perf_counter()
+    sent = 0
+    lag = 0.0
+    for i in range(lo, hi):
+        rec = cap[i]
+        if direction is not None and rec.direction != direction:
+            continue
+        due = start + (rec.t_us - base_us) / 1e6 / speed
+        lag = time.perf_counter() - due
+        if lag < -0.001:
+            time.sleep(-lag)
+        data = ENVELOPE.pack(cell, BROADCAST, rec.mac) + rec.payload if envelope else rec.payload
+        sock.sendto(data, addr)
+        sent += 1
+    sock.close()
+    return sent, max(lag, 0.0)
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _mac_str(mac):
+    return ":".join(f"{b:02X}" for b in mac)
+
+def _bounds(cap, args):
+    if not len(cap):
+        return 0, 0
+    t0 = cap.t_us(0)
+    start = None if args.start is None else t0 + round(args.start * 1e6)
+    end = None if args.end is None else t0 + round(args.end * 1e6)
+    return cap.time_range(start, end)
+
+def cmd_info(cap, args):
+    n = len(cap)
+    print(f"{cap.path}: {n:,} records, {cap.path.stat().st_size / 1e6:,.1f} MB")
+    if n:
+        t0, t1 = cap.t_us(0), cap.t_us(n - 1)
+        print(f"  {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(t0 / 1e6))} + {(t1 - t0) / 1e6:.3f} s")
+    if n and np is not None:
+        recs = cap.records()
+        for d, name in DIRECTIONS.items():
+            print(f"  {name}: {int((recs['direction'] == d).sum()):,}")
+
+def cmd_dump(cap, args):
+    proto = load_protocol()
+    lo, hi = _bounds(cap, args)
+    t0 = cap.t_us(0) if len(cap) else 0
+    for i in range(lo, min(hi, lo + args.limit) if args.limit else hi):
+        rec = cap[i]
+        try:
+            msg = proto.decode(rec.payload)
+        except ValueError as e:
+            msg = f"<{e}: {bytes(rec.payload).hex()}>"
+        print(f"{(rec.t_us - t0) / 1e6:12.6f} {DIRECTIONS.get(rec.direction, '?')} {_mac_str(rec.mac)}  {msg}")
+
+def cmd_replay(cap, args):
+    host, _, port = args.to.rpartition(":")
+    lo, hi = _bounds(cap, args)
+    direction = {"tx": TO_RECEIVER, "rx": TO_CONTROLLER}.get(args.direction)
+    start = time.perf_counter()
+    sent, lag = replay(cap, (host or "127.0.0.1", int(port)), args.speed, lo, hi, direction,
+                       args.envelope, args.cell)
+    print(f"Replayed {sent:,} records in {time.perf_counter() - start:.2f} s at {args.speed:g}x "
+          f"(final lag {lag * 1000:.1f} ms)")
+
+def cmd_synth(args):
+    """Synthetic session: commands, ACKs and heartbeats from one vehicle.
+
+    One of each per HEARTBEAT_INTERVAL_MS, so heartbeat rates read as
+    nominal.
+    """
+    proto = load_protocol()
+    period_us = proto.defines["HEARTBEAT_INTERVAL_MS"] * 1000
+    tx_mac, rx_mac = bytes.fromhex("020000010000"), bytes.fromhex("020000000000")
+    t = time.time_ns() // 1000
+    state = 0
+    with CaptureWriter(args.path) as w:
+        for i in range(args.records // 3):
+            seq = i & 0xFFFF
+            bit = 1 << (i % 5)
+            state ^= bit
+            w.write(proto.encode("LightCommand", seq_num=seq, light_mask=bit, light_state=state & bit),
+                    TO_RECEIVER, tx_mac, t)
+            w.write(proto.encode("LightAck", seq_num=seq, light_state=state), TO_CONTROLLER, rx_mac, t + 11_000)
+            w.write(proto.encode("Heartbeat", seq_num=seq, light_state=state), TO_CONTROLLER, rx_mac, t + 500_000)
+            t += period_us
+    print(f"Wrote {args.records // 3 * 3:,} records to {args.path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and replay ESP-NOW capture files")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("info", "dump", "replay"):
+        p = sub.add_parser(name)
+        p.add_argument("path", help="Capture file")
+        if name != "info":
+            p.add_argument("--from", dest="start", type=float, default=None, help="Start, seconds into the capture")
+            p.add_argument("--to-time", dest="end", type=float, default=None, help="End, seconds into the capture")
+    sub.choices["dump"].add_argument("--limit", type=int, default=None, help="Print at most this many records")
+    rp = sub.choices["replay"]
+    rp.add_argument("--to", type=str, default="127.0.0.1:47100", help="UDP host:port (default: 127.0.0.1:47100)")
+    rp.add_argument("--speed", type=float, default=1.0, help="Replay speed factor, 1-1000 (default: 1)")
+    rp.add_argument("--direction", choices=("tx", "rx"), default=None, help="Only controller (tx) or receiver (rx) frames")
+    rp.add_argument("--envelope", action="store_true", help="Wrap payloads for espnow_emu.py")
+    rp.add_argument("--cell", type=int, default=0, help="Envelope cell (default: 0)")
+    sp = sub.add_parser("synth")
+    sp.add_argument("path", help="Capture file to append to")
+    sp.add_argument("--records", type=int, default=300_000, help="Records to write (default: 300000)")
+    args = parser.parse_args()
+
+    if args.command == "synth":
+        cmd_synth(args)
+        return
+    if args.command == "replay" and not 1 <= args.speed <= 1000:
+        parser.error("--speed must be between 1 and 1000")
+    with Capture(args.path) as cap:
+        {"info": cmd_info, "dump": cmd_dump, "replay": cmd_replay}[args.command](cap, args)
+
+if __name__ == "__main__":
+    main()
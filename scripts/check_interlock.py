@@ -0,0 +1,541 @@
+#!/usr/bin/env python3
+"""Exhaustive checker for the light interlock and command state model.
+
+Models the rules spread across the firmware and enumerates every sequence
+of events up to a given depth, from every one of the 2^5 receiver light
+masks:
+
+  ui.cpp          a touch toggles the button, then espnow_tx_toggle_light()
+                  flips that bit of desired_state (not of the button) and
+                  sends it. High beam is not clickable while low beam is
+                  unchecked; turning low beam off also unchecks high beam and
+                  sends LIGHT_HIGH_BEAM off, which overwrites the single
+                  pending_cmd. ui_set_light_state() mirrors every ACK and
+                  heartbeat and again forces high beam off without low beam.
+  espnow_tx.cpp   one pending_cmd, resent on timeout up to ACK_MAX_RETRIES
+                  times, then desired_state reverts to confirmed_state. Any
+                  ACK sets confirmed and desired state, but only an ACK with
+                  the pending seq clears the pending command; heartbeats set
+                  confirmed state only.
+  lights.cpp      lights_set() applies state per channel under mask; the
+                  receiver ACKs with the full resulting state.
+
+Frames in flight sit in one bounded FIFO per direction (--queue); a frame
+sent into a full queue is lost. The event alphabet per step is: touch each
+of the five buttons, deliver or drop the oldest command, deliver or drop the
+oldest ACK/heartbeat, an ACK timeout tick, a receiver heartbeat and the
+receiver failsafe (all lights off). Events whose precondition does not hold
+are no-ops, so every sequence of the alphabet is counted.
+
+Each step is applied to all states at once with NumPy. Sequences that reach
+the same state (after relabelling sequence numbers, which only matter for
+matching an ACK to the pending command) are merged and carried as a count,
+so the number of sequences checked grows as 32 * K^depth while the work
+grows only with the number of distinct states. Every reached state is checked for:
+
+  interlock        receiver has high beam on and low beam off
+  interlock-stuck  still so after delivering everything in flight (no loss,
+                   timeouts firing as needed) and one more heartbeat
+  diverged         after that drain, desired_state != confirmed_state
+  ui-stale         after that drain, the buttons do not show the receiver state
+
+Only states whose starting mask satisfied the interlock count towards
+the interlock findings. The shortest witness sequence per finding is printed.
+
+Usage:
+  python3 scripts/check_interlock.py --depth 7
+  python3 scripts/check_interlock.py --depth 6 --queue 3 --no-failsafe
+  python3 scripts/check_interlock.py --verify 3        # cross-check against the scalar model
+
+Dependencies: NumPy.
+"""
+
+import argparse
+import itertools
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from protocol_codec import load_protocol
+
+DEFINES = load_protocol().defines
+FOG = DEFINES["LIGHT_FOG"]
+LOW = DEFINES["LIGHT_LOW_BEAM"]
+HIGH = DEFINES["LIGHT_HIGH_BEAM"]
+BAR = DEFINES["LIGHT_BAR"]
+HAZARD = DEFINES["LIGHT_HAZARD"]
+LIGHT_ALL = DEFINES["LIGHT_ALL"]
+LIGHT_NAMES = {FOG: "FOG", LOW: "LOW_BEAM", HIGH: "HIGH_BEAM", BAR: "BAR", HAZARD: "HAZARD"}
+
+# rx -> tx frame kinds
+KIND_ACK, KIND_HEARTBEAT = 1, 2
+
+# ---------------------------------------------------------------------------
+# State layout: one uint8 row per state
+# ---------------------------------------------------------------------------
+
+UI, DESIRED, CONFIRMED, PENDING, PMASK, PSTATE, PSEQ, RETRIES, SEQ, RX, CQLEN, RQLEN = range(12)
+CQ = 12  # command queue: (mask, state, seq) per slot
+
+
+def layout(queue):
+    """Columns of the rx queue and the start flag, and the row width, for a queue depth.
+
+    The start flag records whether the sequence started with the interlock
+    satisfied; it is part of the state so such sequences are never merged
+    with ones that did not.
+    """
+    rq = CQ + 3 * queue
+    start_ok = rq + 3 * queue
+    return rq, start_ok, start_ok + 1
+
+
+def ui_view(state):
+    """Button states ui_set_light_state() shows for a light state."""
+    return np.where(state & LOW, state, state & (0xFF ^ HIGH))
+
+
+def interlock_broken(rx):
+    return ((rx & HIGH) != 0) & ((rx & LOW) == 0)
+
+
+FINDINGS = ("interlock", "interlock-stuck", "diverged", "ui-stale")
+
+
+class Model:
+    """The firmware rules as vectorized transitions over (N, width) uint8 rows.
+
+    Every transition takes the rows and a boolean mask of the rows it may
+    touch, and updates them in place (the rows may be a strided view).
+    """
+
+    def __init__(self, queue=2, max_retries=None, failsafe=True):
+        self.queue = queue
+        self.max_retries = DEFINES["ACK_MAX_RETRIES"] if max_retries is None else max_retries
+        self.rq, self.start_ok, self.width = layout(queue)
+        self.events = [(f"touch {LIGHT_NAMES[bit]}", lambda S, c, bit=bit: self.touch(S, c, bit))
+                       for bit in LIGHT_NAMES]
+        self.events += [
+            ("deliver cmd", self.deliver_cmd),
+            ("drop cmd", self.drop_cmd),
+            ("deliver ack/hb", self.deliver_rx),
+            ("drop ack/hb", self.drop_rx),
+            ("ack timeout", self.timeout),
+            ("rx heartbeat", self.heartbeat),
+        ]
+        if failsafe:
+            self.events.append(("rx failsafe", self.failsafe))
+
+    def initial(self):
+        """All 32 receiver masks with the controller in sync."""
+        S = np.zeros((LIGHT_ALL + 1, self.width), dtype=np.uint8)
+        masks = np.arange(LIGHT_ALL + 1, dtype=np.uint8)
+        S[:, RX] = S[:, DESIRED] = S[:, CONFIRMED] = masks
+        S[:, UI] = ui_view(masks)
+        S[:, self.start_ok] = ~interlock_broken(masks)
+        return self.canonical(S)
+
+    # --- queues -----------------------------------------------------------
+
+    def _push(self, S, cond, base, length, values):
+        n = S[:, length]
+        ok = cond & (n < self.queue)
+        for j in range(self.queue):
+            at = ok & (n == j)
+            for i, v in enumerate(values):
+                col = base + 3 * j + i
+                S[:, col] = np.where(at, v, S[:, col])
+        S[:, length] = n + ok
+
+    def _pop(self, S, cond, base, length):
+        head = [S[:, base + i].copy() for i in range(3)]
+        for j in range(self.queue - 1):
+            for i in range(3):
+                col = base + 3 * j + i
+                S[:, col] = np.where(cond, S[:, col + 3], S[:, col])
+        last = base + 3 * (self.queue - 1)
+        for i in range(3):
+            S[:, last + i] = np.where(cond, 0, S[:, last + i])
+        S[:, length] = S[:, length] - cond
+        return head
+
+    # --- controller -------------------------------------------------------
+
+    def send_state(self, S, cond, mask, state):
+        seq = S[:, SEQ] + cond
+        S[:, SEQ] = seq
+        S[:, PENDING] = np.where(cond, 1, S[:, PENDING])
+        S[:, PMASK] = np.where(cond, mask, S[:, PMASK])
+        S[:, PSTATE] = np.where(cond, state, S[:, PSTATE])
+        S[:, PSEQ] = np.where(cond, seq, S[:, PSEQ])
+        S[:, RETRIES] = np.where(cond, 0, S[:, RETRIES])
+        self._push(S, cond, CQ, CQLEN, (mask, state, seq))
+
+    def touch(self, S, cond, bit):
+        ui = S[:, UI]
+        if bit == HIGH:
+            cond = cond & ((ui & LOW) != 0)  # not clickable without low beam
+        ui = np.where(cond, ui ^ bit, ui)
+        checked = (ui & bit) != 0
+        desired = np.where(cond, S[:, DESIRED] ^ bit, S[:, DESIRED])
+        S[:, DESIRED] = desired
+        self.send_state(S, cond, bit, desired & bit)
+        if bit == LOW:
+            cascade = cond & ~checked & ((ui & HIGH) != 0)
+            ui = np.where(cascade, ui & (0xFF ^ HIGH), ui)
+            self.send_state(S, cascade, HIGH, 0)
+            ui = np.where(cond, ui_view(ui), ui)
+        S[:, UI] = ui
+
+    def timeout(self, S, cond=None):
+        pending = S[:, PENDING] != 0
+        if cond is not None:
+            pending &= cond
+        retry = pending & (S[:, RETRIES] < self.max_retries)
+        S[:, RETRIES] = S[:, RETRIES] + retry
+        self._push(S, retry, CQ, CQLEN, (S[:, PMASK], S[:, PSTATE], S[:, PSEQ]))
+        give_up = pending & ~retry
+        S[:, PENDING] = np.where(give_up, 0, S[:, PENDING])
+        S[:, DESIRED] = np.where(give_up, S[:, CONFIRMED], S[:, DESIRED])
+        S[:, UI] = np.where(give_up, ui_view(S[:, CONFIRMED]), S[:, UI])
+
+    def deliver_rx(self, S, cond=None):
+        has = S[:, RQLEN] > 0
+        if cond is not None:
+            has &= cond
+        kind, state, seq = self._pop(S, has, self.rq, RQLEN)
+        ack = has & (kind == KIND_ACK)
+        S[:, PENDING] = np.where(ack & (seq == S[:, PSEQ]), 0, S[:, PENDING])
+        S[:, CONFIRMED] = np.where(has, state, S[:, CONFIRMED])
+        S[:, DESIRED] = np.where(ack, state, S[:, DESIRED])
+        S[:, UI] = np.where(has, ui_view(state), S[:, UI])
+
+    def drop_rx(self, S, cond=None):
+        has = S[:, RQLEN] > 0
+        if cond is not None:
+            has &= cond
+        self._pop(S, has, self.rq, RQLEN)
+
+    # --- receiver ---------------------------------------------------------
+
+    def deliver_cmd(self, S, cond=None):
+        has = S[:, CQLEN] > 0
+        if cond is not None:
+            has &= cond
+        mask, state, seq = self._pop(S, has, CQ, CQLEN)
+        rx = np.where(has, (S[:, RX] & ~mask) | (state & mask), S[:, RX])
+        S[:, RX] = rx
+        self._push(S, has, self.rq, RQLEN, (KIND_ACK, rx, seq))
+
+    def drop_cmd(self, S, cond=None):
+        has = S[:, CQLEN] > 0
+        if cond is not None:
+            has &= cond
+        self._pop(S, has, CQ, CQLEN)
+
+    def heartbeat(self, S, cond=None):
+        cond = np.ones(len(S), dtype=bool) if cond is None else cond
+        self._push(S, cond, self.rq, RQLEN, (KIND_HEARTBEAT, S[:, RX], 0))
+
+    def failsafe(self, S, cond=None):
+        S[:, RX] = 0 if cond is None else np.where(cond, 0, S[:, RX])
+
+    # --- checks -----------------------------------------------------------
+
+    def drain(self, S):
+        for _ in range(8 * (self.queue + self.max_retries + 2)):
+            cmd = S[:, CQLEN] > 0
+            rx = ~cmd & (S[:, RQLEN] > 0)
+            tick = ~cmd & ~rx & (S[:, PENDING] != 0)
+            if not (cmd.any() or rx.any() or tick.any()):
+                return
+            self.deliver_cmd(S, cmd)
+            self.deliver_rx(S, rx)
+            self.timeout(S, tick)
+        raise RuntimeError("drain did not converge")
+
+    def settle(self, S):
+        """Deliver everything in flight without loss, firing timeouts as
+        needed, then let one more heartbeat through."""
+        S = S.copy()
+        self.drain(S)
+        self.heartbeat(S)
+        self.drain(S)
+        return S
+
+    def violations(self, S):
+        """Boolean arrays per finding for rows S."""
+        start_ok = S[:, self.start_ok] != 0
+        settled = self.settle(S)
+        return {
+            "interlock": start_ok & interlock_broken(S[:, RX]),
+            "interlock-stuck": start_ok & interlock_broken(settled[:, RX]),
+            "diverged": settled[:, DESIRED] != settled[:, CONFIRMED],
+            "ui-stale": settled[:, UI] != ui_view(settled[:, RX]),
+        }
+
+    def canonical(self, S):
+        """Relabel sequence numbers so equivalent states compare equal.
+
+        The only thing a seq is ever used for is an ACK matching the pending
+        command, and every new command gets a seq no frame in flight has. So
+        the pending seq becomes 1, the counter 1 (next send: 2), each queued
+        seq 1 if it matches the pending one and 0 otherwise; without a pending
+        command the pending fields and all seqs are irrelevant and zeroed.
+        """
+        pending = S[:, PENDING] != 0
+        pseq = S[:, PSEQ].copy()
+        for base in (CQ, self.rq):
+            for j in range(self.queue):
+                col = base + 3 * j + 2
+                S[:, col] = pending & (S[:, col] == pseq)
+        S[:, SEQ] = 1
+        S[:, PSEQ] = pending
+        for col in (PMASK, PSTATE, RETRIES):
+            S[:, col] = np.where(pending, S[:, col], 0)
+        return S
+
+    def step(self, S):
+        """Apply every event to every row: (N, width) -> (N * K, width)."""
+        K = len(self.events)
+        out = np.repeat(S[:, None, :], K, axis=1)
+        for k, (_, apply) in enumerate(self.events):
+            view = out[:, k, :]
+            apply(view, np.ones(len(S), dtype=bool))
+        return out.reshape(-1, self.width)
+
+
+# ---------------------------------------------------------------------------
+# Exhaustive search
+# ---------------------------------------------------------------------------
+
+def _merge(rows, counts, origin, width):
+    """Merge duplicate rows; returns (rows, summed counts, origin of first occurrence)."""
+    keys = np.ascontiguousarray(rows).view(np.dtype((np.void, width))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    merged = np.zeros(len(first), dtype=np.int64)
+    np.add.at(merged, inverse.ravel(), counts)
+    return rows[first], merged, origin[first]
+
+
+def search(model, depth, report=None, chunk_rows=4_000_000):
+    """Enumerate every event sequence up to depth from all 32 masks.
+
+    Returns (results, witnesses): one dict per depth (0..depth) with the
+    distinct states, the sequences and, per finding, the number of sequences
+    ending in a violating state; and per finding one shortest witness
+    (start mask, event names). Parents are expanded in chunks of at most
+    chunk_rows child rows to bound memory.
+    """
+    K = len(model.events)
+    S = model.initial()
+    start = S[:, RX].copy()
+    counts = np.ones(len(S), dtype=np.int64)
+    history = []  # per depth: (parent index, event index) for each state
+    results = []
+    witnesses = {}
+
+    def witness(d, i):
+        events = []
+        for parents, evs in reversed(history[:d]):
+            events.append(model.events[evs[i]][0])
+            i = parents[i]
+        return int(start[i]), events[::-1]
+
+    for d in range(depth + 1):
+        if d:
+            step = max(1, chunk_rows // K)
+            parts = []
+            for lo in range(0, len(S), step):
+                flat = model.canonical(model.step(S[lo:lo + step]))
+                origin = lo * K + np.arange(len(flat), dtype=np.int64)
+                parts.append(_merge(flat, np.repeat(counts[lo:lo + step], K), origin, model.width))
+            if len(parts) == 1:
+                S, counts, origin = parts[0]
+            else:
+                S, counts, origin = _merge(*(np.concatenate(p) for p in zip(*parts)), model.width)
+            history.append((origin // K, origin % K))
+        found = model.violations(S)
+        entry = {"depth": d, "states": len(S), "sequences": int(counts.sum())}
+        for name, mask in found.items():
+            entry[name] = int(counts[mask].sum())
+            if name not in witnesses and mask.any():
+                witnesses[name] = witness(d, int(np.flatnonzero(mask)[0]))
+        results.append(entry)
+        if report:
+            report(entry)
+    return results, witnesses
+
+
+# ---------------------------------------------------------------------------
+# Scalar reference model (for --verify)
+# ---------------------------------------------------------------------------
+
+class ScalarModel:
+    """The same rules written out line by line against the firmware, one state at a time."""
+
+    def __init__(self, model):
+        self.queue = model.queue
+        self.max_retries = model.max_retries
+        self.names = [name for name, _ in model.events]
+
+    def initial(self, mask):
+        return {"ui": int(ui_view(np.uint8(mask))), "desired": mask, "confirmed": mask,
+                "pending": None, "retries": 0, "seq": 0, "rx": mask, "cq": [], "rq": []}
+
+    def send(self, s, q, frame):
+        if len(s[q]) < self.queue:
+            s[q].append(frame)
+
+    def send_state(self, s, mask, state):
+        s["seq"] += 1
+        s["pending"] = (mask, state, s["seq"])
+        s["retries"] = 0
+        self.send(s, "cq", s["pending"])
+
+    def apply(self, s, name):
+        s = {k: (list(v) if isinstance(v, list) else v) for k, v in s.items()}
+        if name.startswith("touch "):
+            bit = next(b for b, n in LIGHT_NAMES.items() if n == name[6:])
+            if bit == HIGH and not s["ui"] & LOW:
+                return s
+            s["ui"] ^= bit
+            checked = bool(s["ui"] & bit)
+            s["desired"] ^= bit
+            self.send_state(s, bit, s["desired"] & bit)
+            if bit == LOW:
+                if not checked and s["ui"] & HIGH:
+                    s["ui"] &= ~HIGH
+                    self.send_state(s, HIGH, 0)
+                if not s["ui"] & LOW:
+                    s["ui"] &= ~HIGH
+        elif name == "deliver cmd" and s["cq"]:
+            mask, state, seq = s["cq"].pop(0)
+            s["rx"] = (s["rx"] & ~mask) | (state & mask)
+            self.send(s, "rq", (KIND_ACK, s["rx"], seq))
+        elif name == "drop cmd" and s["cq"]:
+            s["cq"].pop(0)
+        elif name == "deliver ack/hb" and s["rq"]:
+            kind, state, seq = s["rq"].pop(0)
+            if kind == KIND_ACK:
+                if s["pending"] and seq == s["pending"][2]:
+                    s["pending"] = None
+                s["desired"] = state
+            s["confirmed"] = state
+            s["ui"] = int(ui_view(np.uint8(state)))
+        elif name == "drop ack/hb" and s["rq"]:
+            s["rq"].pop(0)
+        elif name == "ack timeout" and s["pending"]:
+            if s["retries"] < self.max_retries:
+                s["retries"] += 1
+                self.send(s, "cq", s["pending"])
+            else:
+                s["pending"] = None
+                s["desired"] = s["confirmed"]
+                s["ui"] = int(ui_view(np.uint8(s["confirmed"])))
+        elif name == "rx heartbeat":
+            self.send(s, "rq", (KIND_HEARTBEAT, s["rx"], 0))
+        elif name == "rx failsafe":
+            s["rx"] = 0
+        return s
+
+    def drain(self, s):
+        while True:
+            if s["cq"]:
+                s = self.apply(s, "deliver cmd")
+            elif s["rq"]:
+                s = self.apply(s, "deliver ack/hb")
+            elif s["pending"]:
+                s = self.apply(s, "ack timeout")
+            else:
+                return s
+
+    def violations(self, s, start):
+        settled = self.drain(self.apply(self.drain(s), "rx heartbeat"))
+        start_ok = not (start & HIGH) or bool(start & LOW)
+        return {
+            "interlock": start_ok and bool(s["rx"] & HIGH) and not s["rx"] & LOW,
+            "interlock-stuck": start_ok and bool(settled["rx"] & HIGH) and not settled["rx"] & LOW,
+            "diverged": settled["desired"] != settled["confirmed"],
+            "ui-stale": settled["ui"] != int(ui_view(np.uint8(settled["rx"]))),
+        }
+
+
+def verify(model, depth):
+    """Compare per-depth violation counts with brute-force scalar enumeration."""
+    scalar = ScalarModel(model)
+    vector, _ = search(model, depth)
+    ok = True
+    for d in range(depth + 1):
+        totals = dict.fromkeys(FINDINGS, 0)
+        n = 0
+        for mask in range(LIGHT_ALL + 1):
+            for seq in itertools.product(scalar.names, repeat=d):
+                s = scalar.initial(mask)
+                for name in seq:
+                    s = scalar.apply(s, name)
+                n += 1
+                for name, hit in scalar.violations(s, mask).items():
+                    totals[name] += hit
+        want = vector[d]
+        same = n == want["sequences"] and all(totals[k] == want[k] for k in totals)
+        ok &= same
+        print(f"depth {d}: {n} sequences, scalar {totals}, vector "
+              f"{ {k: want[k] for k in totals} } {'OK' if same else 'MISMATCH'}")
+    return ok
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _mask_names(mask):
+    return "|".join(name for bit, name in LIGHT_NAMES.items() if mask & bit) or "off"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exhaustive light interlock / command state checker")
+    parser.add_argument("--depth", type=int, default=6, help="Events per sequence (default: 6)")
+    parser.add_argument("--queue", type=int, default=2, help="Frames in flight per direction (default: 2)")
+    parser.add_argument("--max-retries", type=int, default=None,
+                        help="Override ACK_MAX_RETRIES from protocol.h")
+    parser.add_argument("--no-failsafe", action="store_true", help="Leave the receiver failsafe out of the alphabet")
+    parser.add_argument("--verify", type=int, metavar="DEPTH", default=None,
+                        help="Cross-check against the scalar model up to DEPTH and exit")
+    args = parser.parse_args()
+
+    model = Model(args.queue, args.max_retries, failsafe=not args.no_failsafe)
+
+    if args.verify is not None:
+        sys.exit(0 if verify(model, args.verify) else 1)
+
+    K = len(model.events)
+    if (LIGHT_ALL + 1) * K ** args.depth >= 2 ** 63:
+        sys.exit(f"depth {args.depth} overflows 64-bit sequence counts")
+
+    print(f"{K} events, queue {args.queue}, ACK_MAX_RETRIES {model.max_retries}")
+    print(f"{'depth':>5} {'states':>8} {'sequences':>22}" + "".join(f" {name:>20}" for name in FINDINGS))
+    t0 = time.perf_counter()
+    results, witnesses = search(model, args.depth, report=lambda e: print(
+        f"{e['depth']:>5} {e['states']:>8} {e['sequences']:>22}"
+        + "".join(f" {e[name]:>20}" for name in FINDINGS)))
+    elapsed = time.perf_counter() - t0
+
+    total = sum(e["sequences"] for e in results)
+    print(f"{total} sequences in {elapsed:.2f} s ({total / elapsed:.3g} sequences/s)")
+    for name in FINDINGS:
+        if name in witnesses:
+            mask, events = witnesses[name]
+            print(f"\n{name}: shortest witness from {_mask_names(mask)}:")
+            for i, event in enumerate(events, 1):
+                print(f"  {i:>2}. {event}")
+        else:
+            print(f"\n{name}: none up to depth {args.depth}")
+    sys.exit(1 if witnesses else 0)
+
+
+if __name__ == "__main__":
+    main()
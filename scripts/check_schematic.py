@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""Connectivity / ERC check for a generated .kicad_sch.
+
+The schematic generators place wires, labels and symbols by coordinate
+arithmetic; this extracts the netlist they actually produce and reports:
+
+  dangling wire     a wire end that touches nothing else
+  unconnected pin   a symbol pin with no wire, label or pin on it (and no
+                    no-connect flag)
+  dangling label    a label that touches no wire or pin
+  net conflict      one net carrying several label / power names (a short)
+  lonely label      a local label name used only once, so it joins nothing
+
+Pin positions come from the (lib_symbols ...) block embedded in the file.
+Every connection point is snapped into a hashed point index, wire ends
+landing on another wire are found through a uniform segment grid, and the
+pieces are merged with union-find, so the check stays near-linear on
+schematics with thousands of symbols.
+
+Usage:
+  python3 scripts/check_schematic.py                          # hardware/led-driver-board.kicad_sch
+  python3 scripts/check_schematic.py path/to/board.kicad_sch --json
+  python3 scripts/check_schematic.py --generate               # check a freshly generated schematic
+
+Exits with status 1 when problems are found.
+
+No external dependencies — uses only Python stdlib.
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+from pathlib import Path
+
+from kicad_fplib import parse_sexpr
+
+HARDWARE_DIR = Path(__file__).resolve().parent.parent / "hardware"
+
+# Points closer than this (mm) are the same point; KiCad's grid is 1.27mm
+SNAP = 0.001
+
+# ---------------------------------------------------------------------------
+# Geometry helpers
+# ---------------------------------------------------------------------------
+
+def _key(x, y):
+    return (round(x / SNAP), round(y / SNAP))
+
+def _fields(node, name):
+    return [f for f in node if isinstance(f, list) and f and f[0] == name]
+
+def _field(node, name):
+    for f in node:
+        if isinstance(f, list) and f and f[0] == name:
+            return f
+    return None
+
+def _at(node):
+    at = _field(node, "at")
+    return float(at[1]), float(at[2]), float(at[3]) if len(at) > 3 else 0.0
+
+def _property(node, name):
+    for f in _fields(node, "property"):
+        if f[1] == name:
+            return f[2]
+    return None
+
+def _pin_transform(px, py, sx, sy, rot, mirror):
+    """Library pin point (Y up) → sheet coordinates (Y down).
+
+    Rotation is counter-clockwise on screen, then (mirror x) flips
+    vertically and (mirror y) horizontally, as KiCad applies them.
+    """
+    x, y = px, -py
+    r = rot % 360
+    quarter = {0: (1, 0), 90: (0, 1), 180: (-1, 0), 270: (0, -1)}
+    c, s = quarter.get(r) or (math.cos(math.radians(r)), math.sin(math.radians(r)))
+    x, y = x * c + y * s, -x * s + y * c
+    if mirror == "x":
+        y = -y
+    elif mirror == "y":
+        x = -x
+    return sx + x, sy + y
+
+# ---------------------------------------------------------------------------
+# Library symbols
+# ---------------------------------------------------------------------------
+
+def library_pins(lib_symbols):
+    """{lib_id: (is_power, [(unit, number, name, x, y), ...])} from (lib_symbols ...)."""
+    out = {}
+    for sym in _fields(lib_symbols, "symbol"):
+        lib_id = sym[1]
+        pins = []
+        for unit_sym in _fields(sym, "symbol"):
+            # Sub-symbol names end in _<unit>_<body style>; unit 0 is common
+            parts = unit_sym[1].rsplit("_", 2)
+            unit, style = (int(parts[1]), int(parts[2])) if len(parts) == 3 else (0, 1)
+            if style > 1:
+                continue
+            for pin in _fields(unit_sym, "pin"):
+                x, y, _ = _at(pin)
+                number = _field(pin, "number")
+                name = _field(pin, "name")
+                pins.append((unit, number[1] if number else "", name[1] if name else "", x, y))
+        out[lib_id] = (_field(sym, "power") is not None, pins)
+    return out
+
+# ---------------------------------------------------------------------------
+# Connectivity
+# ---------------------------------------------------------------------------
+
+class _UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, a):
+        parent = self.parent
+        root = parent.setdefault(a, a)
+        while root != parent[root]:
+            root = parent[root]
+        while parent[a] != root:
+            parent[a], a = root, parent[a]
+        return root
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[rb] = ra
+
+class _SegmentGrid:
+    """Uniform grid of wire segments for point-on-wire queries."""
+
+    def __init__(self, cell=2.54):
+        self.cell = cell
+        self.cells = {}
+
+    def insert(self, i, x0, y0, x1, y1):
+        c = self.cell
+        for gx in range(math.floor(min(x0, x1) / c), math.floor(max(x0, x1) / c) + 1):
+            for gy in range(math.floor(min(y0, y1) / c), math.floor(max(y0, y1) / c) + 1):
+                self.cells.setdefault((gx, gy), []).append(i)
+
+    def near(self, x, y):
+        return self.cells.get((math.floor(x / self.cell), math.floor(y / self.cell)), ())
+
+def _on_segment(x, y, x0, y0, x1, y1):
+    """True if (x, y) lies on the segment strictly between its ends."""
+    dx, dy = x1 - x0, y1 - y0
+    length2 = dx * dx + dy * dy
+    if length2 == 0:
+        return False
+    t = ((x - x0) * dx + (y - y0) * dy) / length2
+    if t <= 0 or t >= 1:
+        return False
+    return abs((x - x0) * dy - (y - y0) * dx) / math.sqrt(length2) < SNAP
+
+class Schematic:
+    """Connection items of one sheet, extracted from its S-expression."""
+
+    def __init__(self, text):
+        root = parse_sexpr(text)[0]
+        self.wires = []       # (x0, y0, x1, y1)
+        self.pins = []        # (ref, number, name, x, y, power net or None)
+        self.labels = []      # (name, kind, x, y)
+        self.junctions = []   # (x, y)
+        self.no_connects = set()
+
+        lib = _field(root, "lib_symbols")
+        libs = library_pins(lib) if lib else {}
+        for node in root[1:]:
+            if not isinstance(node, list) or not node:
+                continue
+            kind = node[0]
+            if kind == "wire":
+                (_, x0, y0), (_, x1, y1) = _fields(_field(node, "pts"), "xy")[:2]
+                self.wires.append((float(x0), float(y0), float(x1), float(y1)))
+            elif kind in ("label", "global_label", "hierarchical_label"):
+                x, y, _ = _at(node)
+                self.labels.append((node[1], kind, x, y))
+            elif kind == "junction":
+                x, y, _ = _at(node)
+                self.junctions.append((x, y))
+            elif kind == "no_connect":
+                x, y, _ = _at(node)
+                self.no_connects.add(_key(x, y))
+            elif kind == "symbol":
+                self._add_symbol(node, libs)
+
+    def _add_symbol(self, node, libs):
+        lib_name = _field(node, "lib_name") or _field(node, "lib_id")
+        is_power, pins = libs.get(lib_name[1], (False, []))
+        sx, sy, rot = _at(node)
+        mirror = _field(node, "mirror")
+        mirror = mirror[1] if mirror else None
+        unit = _field(node, "unit")
+        unit = int(unit[1]) if unit else 1
+        ref = _property(node, "Reference") or "?"
+        power_net = _property(node, "Value") if is_power else None
+        for pin_unit, number, name, px, py in pins:
+            if pin_unit not in (0, unit):
+                continue
+            x, y = _pin_transform(px, py, sx, sy, rot, mirror)
+            self.pins.append((ref, number, name, x, y, power_net))
+
+    def check(self):
+        """Run the connectivity check; returns a dict of findings."""
+        uf = _UnionFind()
+        # How many items sit on each snapped point, by kind
+        touches = {}
+
+        def touch(k, what):
+            touches.setdefault(k, []).append(what)
+            uf.find(k)
+
+        grid = _SegmentGrid()
+        for i, (x0, y0, x1, y1) in enumerate(self.wires):
+            a, b = _key(x0, y0), _key(x1, y1)
+            touch(a, ("wire", i))
+            touch(b, ("wire", i))
+            uf.union(a, b)
+            grid.insert(i, x0, y0, x1, y1)
+        for i, (_, _, _, x, y, _) in enumerate(self.pins):
+            touch(_key(x, y), ("pin", i))
+        for i, (_, _, x, y) in enumerate(self.labels):
+            touch(_key(x, y), ("label", i))
+        for x, y in self.junctions:
+            touch(_key(x, y), ("junction", 0))
+
+        # Points landing mid-wire join that wire (T connections, labels on wires)
+        mid_wire = set()
+        points = [(x0, y0) for x0, y0, _, _ in self.wires] + [(x1, y1) for _, _, x1, y1 in self.wires]
+        points += [(x, y) for _, _, _, x, y, _ in self.pins]
+        points += [(x, y) for _, _, x, y in self.labels] + self.junctions
+        for x, y in points:
+            for i in grid.near(x, y):
+                x0, y0, x1, y1 = self.wires[i]
+                if _on_segment(x, y, x0, y0, x1, y1):
+                    k = _key(x, y)
+                    uf.union(k, _key(x0, y0))
+                    mid_wire.add(k)
+
+        # Same-named labels and power symbols are one net
+        by_name = {}
+        for name, _, x, y in self.labels:
+            by_name.setdefault(name, []).append(_key(x, y))
+        for _, _, _, x, y, net in self.pins:
+            if net:
+                by_name.setdefault(net, []).append(_key(x, y))
+        # Remember which physical pieces each name had before the merge
+        pieces = {name: {uf.find(k) for k in keys} for name, keys in by_name.items()}
+        names_on_piece = {}
+        for name, roots in pieces.items():
+            for r in roots:
+                names_on_piece.setdefault(r, set()).add(name)
+        for keys in by_name.values():
+            for k in keys[1:]:
+                uf.union(keys[0], k)
+
+        report = {"dangling_wires": [], "unconnected_pins": [], "dangling_labels": [],
+                  "net_conflicts": [], "lonely_labels": [], "nets": 0}
+
+        for i, (x0, y0, x1, y1) in enumerate(self.wires):
+            for x, y in ((x0, y0), (x1, y1)):
+                k = _key(x, y)
+                if len(touches[k]) == 1 and k not in mid_wire:
+                    report["dangling_wires"].append({"at": [x, y], "wire": [x0, y0, x1, y1]})
+
+        for ref, number, name, x, y, net in self.pins:
+            k = _key(x, y)
+            if k in self.no_connects or k in mid_wire:
+                continue
+            if len(touches[k]) == 1:
+                report["unconnected_pins"].append({"ref": ref, "pin": number, "name": name, "at": [x, y],
+                                                   **({"net": net} if net else {})})
+
+        for name, kind, x, y in self.labels:
+            k = _key(x, y)
+            if len(touches[k]) == 1 and k not in mid_wire:
+                report["dangling_labels"].append({"label": name, "kind": kind, "at": [x, y]})
+
+        # A short shows up as one physical piece carrying two names
+        for root, names in names_on_piece.items():
+            if len(names) > 1:
+                x, y = root[0] * SNAP, root[1] * SNAP
+                report["net_conflicts"].append({"names": sorted(names), "near": [round(x, 3), round(y, 3)]})
+
+        # A local label only names a net; used once it connects to nothing
+        power_names = {net for *_, net in self.pins if net}
+        uses = {}
+        for name, kind, _, _ in self.labels:
+            if kind == "label":
+                uses[name] = uses.get(name, 0) + 1
+        for name, count in uses.items():
+            if count == 1 and name not in power_names:
+                report["lonely_labels"].append({"label": name})
+
+        report["nets"] = len({uf.find(k) for k in touches})
+        return report
+
+def problem_count(report):
+    return sum(len(v) for k, v in report.items() if isinstance(v, list))
+
+def format_report(report, name="schematic"):
+    lines = []
+    titles = (("net_conflicts", "Net conflicts (shorts)"), ("unconnected_pins", "Unconnected pins"),
+              ("dangling_wires", "Dangling wire ends"), ("dangling_labels", "Dangling labels"),
+              ("lonely_labels", "Labels used only once"))
+    for key, title in titles:
+        items = report[key]
+        if not items:
+            continue
+        lines.append(f"{title}: {len(items)}")
+        for item in items:
+            if key == "net_conflicts":
+                lines.append(f"  {' + '.join(item['names'])} near ({item['near'][0]:.2f}, {item['near'][1]:.2f})")
+            elif key == "unconnected_pins":
+                net = f" [{item['net']}]" if "net" in item else ""
+                lines.append(f"  {item['ref']} pin {item['pin']} ({item['name']}){net} at "
+                             f"({item['at'][0]:.2f}, {item['at'][1]:.2f})")
+            elif key == "dangling_wires":
+                lines.append(f"  wire end at ({item['at'][0]:.2f}, {item['at'][1]:.2f})")
+            elif key == "dangling_labels":
+                lines.append(f"  {item['label']} at ({item['at'][0]:.2f}, {item['at'][1]:.2f})")
+            else:
+                lines.append(f"  {item['label']}")
+    count = problem_count(report)
+    lines.append(f"{name}: {report['nets']} nets, {count} problem{'s' if count != 1 else ''}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Check connectivity of a KiCad schematic")
+    parser.add_argument("schematic", nargs="?", default=str(HARDWARE_DIR / "led-driver-board.kicad_sch"))
+    parser.add_argument("--generate", action="store_true",
+                        help="Check the schematic generate_kicad.py would write instead of a file")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    if args.generate:
+        from generate_kicad import generate_schematic
+        text, name = generate_schematic(), "generated schematic"
+    else:
+        text, name = Path(args.schematic).read_text(encoding="utf-8"), args.schematic
+
+    start = time.perf_counter()
+    sch = Schematic(text)
+    report = sch.check()
+    elapsed = time.perf_counter() - start
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report, name))
+        print(f"({len(sch.pins)} pins, {len(sch.wires)} wires, {len(sch.labels)} labels in {elapsed * 1000:.1f} ms)")
+    sys.exit(1 if problem_count(report) else 0)
+
+if __name__ == "__main__":
+    main()
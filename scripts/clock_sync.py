@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+"""Receiver clock offset, drift and one-way latency from ESP-NOW traffic.
+
+Receivers have no synchronized clock, but their traffic carries two clocks
+that host arrival times can be fitted against:
+
+  uptime   StateReport uptime_ms, the receiver's millis()
+  beat     Heartbeat seq_num × HEARTBEAT_INTERVAL_MS; its rate also
+           includes the main loop's overrun of the interval
+
+Drift is reported from the uptime fit when a receiver sends StateReports
+and from the heartbeat fit otherwise (the current firmware and
+espnow_emu.py only send heartbeats); each row names the clock it used.
+Heartbeat drift carries the loop overrun every receiver adds to the
+interval, so heartbeat-clock anomalies are judged against the fleet's
+median heartbeat drift rather than zero. With fewer than
+MIN_MEDIAN_FLEET heartbeat-fitted receivers the median would be the
+outlier itself, so the nominal rate (0 ppm) is used instead, and loop
+overrun then counts towards the drift. Boot time needs the uptime clock.
+
+Each clock gets an NTP-style estimator: arrivals are split into blocks of
+--block samples, only the fastest arrival of each block (least queueing) is
+kept, and a least-squares line through the last --window block minima
+gives offset and rate (drift). The one-way latency floor is half the
+minimum LightCommand -> LightAck round trip seen at the capture point;
+commands are matched to ACKs by the emulator envelope's dst MAC, by the
+pairing exchange, or, with a single controller in the traffic, by seq
+alone. Without round trips --latency-ms is assumed.
+
+Everything is incremental: each message costs O(1) (a block commit refits
+--window points), per-receiver state is a few small fixed-size windows,
+and every receiver->controller message can be annotated with its corrected
+send time (host clock) and estimated receiver uptime as it is processed.
+A receiver reboot (uptime going backwards, heartbeat seq restarting)
+resets its estimators.
+
+Usage:
+  python3 scripts/clock_sync.py --capture session.espcap --annotate annotated.csv
+  python3 scripts/clock_sync.py --listen 127.0.0.1:47300 --interval 10 --snapshot clocks.json &
+  python3 scripts/espnow_emu.py --vehicles 1000 --tap 127.0.0.1:47300
+  python3 scripts/clock_sync.py --bench 5000         # synthetic fleet with known drift
+
+No external dependencies — uses only Python stdlib.
+"""
+
+import argparse
+import asyncio
+import csv
+import math
+import random
+import sys
+import time
+from collections import deque
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from fleet_telemetry import listen, mac_str, write_snapshot
+from protocol_codec import load_protocol
+
+PROTO = load_protocol()
+D = PROTO.defines
+VERSION = D["PROTOCOL_VERSION"]
+HEARTBEAT_S = D["HEARTBEAT_INTERVAL_MS"] / 1000
+# Heartbeat seq steps beyond this are taken as a restart, not missed frames
+SEQ_WINDOW = 1024
+# Fewest fitted receivers whose median drift is a baseline one outlier cannot move
+MIN_MEDIAN_FLEET = 3
+
+HEARTBEAT, STATE_REPORT, LIGHT_ACK, LIGHT_COMMAND, PAIR_REQUEST, PAIR_RESPONSE = (
+    PROTO[name] for name in ("Heartbeat", "StateReport", "LightAck", "LightCommand",
+                             "PairRequest", "PairResponse"))
+
+ANNOTATE_FIELDS = ("t", "mac", "msg", "seq", "uptime_ms", "est_uptime_s", "sent_at", "delay_ms")
+
+# ---------------------------------------------------------------------------
+# Estimators
+# ---------------------------------------------------------------------------
+
+class ClockFit:
+    """Min-filtered sliding-window line through (remote clock, host arrival).
+
+    Fits y = t - x = a + b·x on the lowest-y sample of each block, so a is
+    the offset plus the latency floor and b the rate error (drift). All
+    values are kept relative to the first sample so the sums stay exact in
+    float64 whatever the epoch.
+    """
+
+    __slots__ = ("block", "points", "x0", "y0", "count", "best_x", "best_y", "a", "b", "samples")
+
+    def __init__(self, block, window):
+        self.block = block
+        self.points = deque(maxlen=window)
+        self.reset()
+
+    def reset(self):
+        self.points.clear()
+        self.x0 = self.y0 = None
+        self.count = 0
+        self.best_x = self.best_y = math.inf
+        self.a = None
+        self.b = 0.0
+        self.samples = 0
+
+    def add(self, x, t):
+        if self.x0 is None:
+            self.x0, self.y0 = x, t - x
+        dx = x - self.x0
+        dy = t - x - self.y0
+        self.samples += 1
+        if dy < self.best_y:
+            self.best_x, self.best_y = dx, dy
+        if len(self.points) < 2 and (self.a is None or dy < self.a):
+            self.a = dy                     # until there is a line: offset = fastest arrival
+        self.count += 1
+        if self.count == self.block:
+            self._commit()
+
+    def _commit(self):
+        self.points.append((self.best_x, self.best_y))
+        self.count = 0
+        self.best_x = self.best_y = math.inf
+        n = len(self.points)
+        if n < 2:
+            return
+        mx = sum(p[0] for p in self.points) / n
+        my = sum(p[1] for p in self.points) / n
+        sxx = sum((p[0] - mx) ** 2 for p in self.points)
+        if sxx > 0:
+            self.b = sum((p[0] - mx) * (p[1] - my) for p in self.points) / sxx
+            self.a = my - self.b * mx
+
+    @property
+    def ready(self):
+        return self.a is not None
+
+    @property
+    def fitted(self):
+        return len(self.points) >= 2
+
+    def host_time(self, x):
+        """Host arrival time of a fastest (latency-floor) message sent at remote time x."""
+        return x + self.y0 + self.a + self.b * (x - self.x0)
+
+    def remote_time(self, t):
+        """Remote clock reading at which a fastest message would arrive at host time t."""
+        return (t - self.y0 - self.a + self.b * self.x0) / (1 + self.b)
+
+
+class MinWindow:
+    """Minimum over the last window blocks of samples, O(1) amortized."""
+
+    __slots__ = ("block", "mins", "count", "current", "value")
+
+    def __init__(self, block, window):
+        self.block = block
+        self.mins = deque(maxlen=window)
+        self.count = 0
+        self.current = math.inf
+        self.value = math.inf
+
+    def add(self, v):
+        self.current = min(self.current, v)
+        self.value = min(self.value, v)
+        self.count += 1
+        if self.count == self.block:
+            self.mins.append(self.current)
+            self.count = 0
+            self.current = math.inf
+            self.value = min(self.mins)
+
+# ---------------------------------------------------------------------------
+# Per-receiver state
+# ---------------------------------------------------------------------------
+
+class Peer:
+    __slots__ = ("uptime", "beat", "rtt", "seq", "beat_x", "last_uptime", "controller",
+                 "heartbeats", "reports", "acks", "reboots", "last_seen")
+
+    def __init__(self, block, window):
+        self.uptime = ClockFit(block, window)
+        self.beat = ClockFit(block, window)
+        # Round trips are rarer than heartbeats; filter them in smaller blocks
+        self.rtt = MinWindow(max(1, block // 4), window)
+        self.seq = None
+        self.beat_x = 0
+        self.last_uptime = None
+        self.controller = None
+        self.heartbeats = self.reports = self.acks = self.reboots = 0
+        self.last_seen = 0.0
+
+    def reboot(self):
+        self.reboots += 1
+        self.uptime.reset()
+        self.beat.reset()
+        self.seq = None
+        self.beat_x = 0
+        self.last_uptime = None
+
+
+class ClockSync:
+    """Per-receiver clock estimators fed one frame at a time."""
+
+    def __init__(self, block=16, window=32, latency_s=0.0, annotate=None):
+        self.block = block
+        self.window = window
+        self.latency_s = latency_s
+        self.annotate = annotate
+        self.peers = {}
+        self.commands = {}                  # controller MAC -> (seq, first send time)
+        self.pairing = {}                   # PairRequest seq -> controller MAC
+        self.frames = 0
+
+    def peer(self, mac):
+        p = self.peers.get(mac)
+        if p is None:
+            p = self.peers[mac] = Peer(self.block, self.window)
+        return p
+
+    def latency(self, p):
+        """(one-way latency floor in s, source)."""
+        if p.rtt.value < math.inf:
+            return p.rtt.value / 2, "rtt"
+        return self.latency_s, "assumed"
+
+    # -- message handlers ---------------------------------------------------
+
+    def heartbeat(self, mac, t, seq):
+        p = self.peer(mac)
+        p.heartbeats += 1
+        p.last_seen = t
+        if p.seq is not None:
+            step = (seq - p.seq) & 0xFFFF
+            if step == 0:
+                return None                 # duplicate
+            if step > SEQ_WINDOW:
+                p.reboot()
+            else:
+                p.beat_x += step
+        p.seq = seq
+        p.beat.add(p.beat_x * HEARTBEAT_S, t)
+        return self._corrected(p, t, p.beat, p.beat_x * HEARTBEAT_S)
+
+    def state_report(self, mac, t, uptime_ms):
+        p = self.peer(mac)
+        p.reports += 1
+        p.last_seen = t
+        if p.last_uptime is not None and uptime_ms < p.last_uptime:
+            p.reboot()
+        p.last_uptime = uptime_ms
+        p.uptime.add(uptime_ms / 1000, t)
+        return self._corrected(p, t, p.uptime, uptime_ms / 1000)
+
+    def command(self, mac, t, seq):
+        pending = self.commands.get(mac)
+        if pending is None or pending[0] != seq:
+            self.commands[mac] = (seq, t)   # retries keep the first send time
+
+    def ack(self, mac, t, seq, dst=None):
+        p = self.peer(mac)
+        p.acks += 1
+        p.last_seen = t
+        if dst is not None:
+            p.controller = bytes(dst)
+        controller = p.controller
+        if controller is None and len(self.commands) == 1:
+            controller = next(iter(self.commands))
+        pending = self.commands.get(controller)
+        if pending is not None and pending[0] == seq:
+            del self.commands[controller]
+            p.rtt.add(t - pending[1])
+
+    def pair_request(self, mac, seq):
+        self.pairing[seq] = bytes(mac)
+
+    def pair_response(self, mac, seq, dst=None):
+        controller = dst if dst is not None else self.pairing.pop(seq, None)
+        if controller is not None:
+            self.peer(mac).controller = bytes(controller)
+
+    def _corrected(self, p, t, fit, x):
+        """(sent_at, est_uptime_s) for a message with remote clock reading x."""
+        latency, _ = self.latency(p)
+        sent_at = fit.host_time(x) - latency
+        uptime = p.uptime.remote_time(sent_at + latency) if p.uptime.ready else None
+        return sent_at, uptime
+
+    def feed(self, t, src, payload, dst=None):
+        """Dispatch one frame on its msg_type."""
+        self.frames += 1
+        if len(payload) < HEARTBEAT.size or payload[0] != VERSION:
+            return
+        msg_type = payload[1]
+        if msg_type == HEARTBEAT.msg_type:
+            _, _, seq, _ = HEARTBEAT.struct.unpack_from(payload)
+            self._note(t, src, "heartbeat", seq, None, self.heartbeat(src, t, seq))
+        elif msg_type == STATE_REPORT.msg_type and len(payload) >= STATE_REPORT.size:
+            _, _, seq, _, uptime = STATE_REPORT.struct.unpack_from(payload)
+            self._note(t, src, "state_report", seq, uptime, self.state_report(src, t, uptime))
+        elif msg_type == LIGHT_COMMAND.msg_type and len(payload) >= LIGHT_COMMAND.size:
+            self.command(src, t, LIGHT_COMMAND.struct.unpack_from(payload)[2])
+        elif msg_type == LIGHT_ACK.msg_type and len(payload) >= LIGHT_ACK.size:
+            self.ack(src, t, LIGHT_ACK.struct.unpack_from(payload)[2], dst)
+        elif msg_type == PAIR_REQUEST.msg_type and len(payload) >= PAIR_REQUEST.size:
+            self.pair_request(src, PAIR_REQUEST.struct.unpack_from(payload)[2])
+        elif msg_type == PAIR_RESPONSE.msg_type and len(payload) >= PAIR_RESPONSE.size:
+            self.pair_response(src, PAIR_RESPONSE.struct.unpack_from(payload)[2], dst)
+
+    def _note(self, t, mac, msg, seq, uptime_ms, corrected):
+        if self.annotate is None or corrected is None:
+            return
+        sent_at, uptime = corrected
+        self.annotate((f"{t:.6f}", mac_str(mac), msg, seq, "" if uptime_ms is None else uptime_ms,
+                       "" if uptime is None else f"{uptime:.4f}", f"{sent_at:.6f}",
+                       f"{(t - sent_at) * 1000:.3f}"))
+
+    # -- snapshots ----------------------------------------------------------
+
+    @staticmethod
+    def drift_clock(p):
+        """(fit, clock name) used for p's drift: uptime if fitted, else heartbeat."""
+        if p.uptime.fitted:
+            return p.uptime, "uptime"
+        if p.beat.fitted:
+            return p.beat, "heartbeat"
+        return None, None
+
+    def receiver(self, mac, p):
+        latency, source = self.latency(p)
+        fit, clock = self.drift_clock(p)
+        row = {
+            "mac": mac_str(mac),
+            "heartbeats": p.heartbeats, "reports": p.reports, "acks": p.acks, "reboots": p.reboots,
+            "latency_ms": round(latency * 1000, 3), "latency_source": source,
+            "rtt_min_ms": round(p.rtt.value * 1000, 3) if p.rtt.value < math.inf else None,
+            "beat_period_ms": round(D["HEARTBEAT_INTERVAL_MS"] * (1 + p.beat.b), 3) if p.beat.fitted else None,
+            "clock": clock,
+            "drift_ppm": round(fit.b * 1e6, 2) if fit else None,
+            "boot_time": round(p.uptime.host_time(0.0) - latency, 6) if p.uptime.ready else None,
+        }
+        return row
+
+    def snapshot(self, now=None, rows="anomalies", max_drift_ppm=100.0):
+        """Fleet summary plus per-receiver rows ("all", "anomalies" or "none").
+
+        Drift statistics are kept per clock. Anomalies are receivers that
+        rebooted or that drift by more than max_drift_ppm: from zero on the
+        uptime clock, from the fleet median on the heartbeat clock (or from
+        zero while fewer than MIN_MEDIAN_FLEET receivers are fitted on it).
+        """
+        now = time.time() if now is None else now
+        drifts = {"uptime": [], "heartbeat": []}
+        for p in self.peers.values():
+            fit, clock = self.drift_clock(p)
+            if fit:
+                drifts[clock].append(fit.b * 1e6)
+        clocks = {}
+        baseline = {"uptime": 0.0}
+        for clock, values in drifts.items():
+            if not values:
+                continue
+            values.sort()
+            median = values[len(values) // 2]
+            baseline.setdefault(clock, median if len(values) >= MIN_MEDIAN_FLEET else 0.0)
+            clocks[clock] = {"fitted": len(values), "drift_ppm_median": round(median, 2),
+                             "drift_ppm_range": [round(values[0], 2), round(values[-1], 2)],
+                             "drift_ppm_baseline": round(baseline[clock], 2)}
+        out = {
+            "time": now, "receivers": len(self.peers), "frames": self.frames,
+            "fitted": sum(len(v) for v in drifts.values()),
+            "clocks": clocks,
+        }
+
+        def anomalous(p):
+            if p.reboots:
+                return True
+            fit, clock = self.drift_clock(p)
+            return fit is not None and abs(fit.b * 1e6 - baseline[clock]) > max_drift_ppm
+
+        if rows == "all":
+            picked = self.peers.items()
+        elif rows == "anomalies":
+            picked = [(mac, p) for mac, p in self.peers.items() if anomalous(p)]
+        else:
+            picked = ()
+        out["rows"] = [self.receiver(mac, p) for mac, p in picked]
+        return out
+
+# ---------------------------------------------------------------------------
+# Sources
+# ---------------------------------------------------------------------------
+
+def ingest_capture(sync, path):
+    """Feed every frame of a capture file, both directions."""
+    from capture import Capture, PAYLOAD_SIZE, RECORD
+    with Capture(path) as cap:
+        feed = sync.feed
+        for t_us, _direction, length, mac, payload in RECORD.iter_unpack(cap.raw()):
+            feed(t_us / 1e6, mac, payload[:length] if length < PAYLOAD_SIZE else payload)
+        return cap[len(cap) - 1].t_us / 1e6 if len(cap) else None
+
+def bench(receivers, rounds=400, seed=1):
+    """Synthetic fleet with known drift, boot time and latency; prints estimate errors."""
+    rng = random.Random(seed)
+    sync = ClockSync()
+    ctrl = [bytes((0x40, 0, 0, 0)) + i.to_bytes(2, "big") for i in range(receivers)]
+    macs = [bytes((0x24, 0, 0, 0)) + i.to_bytes(2, "big") for i in range(receivers)]
+    t0 = 1.7e9
+    drift = [rng.uniform(-40e-6, 40e-6) for _ in range(receivers)]
+    boot = [t0 - rng.uniform(10, 1000) for _ in range(receivers)]
+    base = [rng.uniform(0.001, 0.004) for _ in range(receivers)]
+    for i in range(receivers):
+        sync.feed(t0, ctrl[i], PAIR_REQUEST.encode(seq_num=1, controller_mac=ctrl[i]))
+        sync.feed(t0 + 0.003, macs[i], PAIR_RESPONSE.encode(seq_num=1, receiver_mac=macs[i]), dst=ctrl[i])
+
+    def delay(i):
+        return base[i] + rng.expovariate(1 / 0.003)
+
+    events = []
+    for i in range(receivers):
+        up0 = t0 - boot[i]
+        for k in range(1, rounds + 1):
+            uptime = up0 + k * HEARTBEAT_S
+            sent = boot[i] + uptime * (1 + drift[i])
+            events.append((sent + delay(i), i, HEARTBEAT.encode(seq_num=k, light_state=3)))
+            if k % 5 == 0:
+                events.append((sent + 0.5 + delay(i), i, STATE_REPORT.encode(
+                    seq_num=k, light_state=3, uptime_ms=int((uptime + 0.5 / (1 + drift[i])) * 1000))))
+            if k % 3 == 0:
+                cmd_t = sent + 1.0
+                events.append((cmd_t, -1 - i, LIGHT_COMMAND.encode(seq_num=k, light_mask=1, light_state=1)))
+                events.append((cmd_t + delay(i) + delay(i), i, LIGHT_ACK.encode(seq_num=k, light_state=3)))
+    events.sort(key=lambda e: e[0])
+    feed = sync.feed
+    start = time.perf_counter()
+    for t, i, payload in events:
+        if i < 0:
+            feed(t, ctrl[-1 - i], payload, macs[-1 - i])
+        else:
+            feed(t, macs[i], payload, ctrl[i])
+    elapsed = time.perf_counter() - start
+
+    drift_err = sorted(abs(sync.peers[m].uptime.b - drift[i]) * 1e6 for i, m in enumerate(macs))
+    beat_err = sorted(abs(sync.peers[m].beat.b - drift[i]) * 1e6 for i, m in enumerate(macs))
+    lat_err = sorted(abs(sync.latency(sync.peers[m])[0] - base[i]) * 1000 for i, m in enumerate(macs))
+    boot_err = sorted(abs(sync.peers[m].uptime.host_time(0.0) - sync.latency(sync.peers[m])[0] - boot[i]) * 1000
+                      for i, m in enumerate(macs))
+    print(f"{len(events):,} messages from {receivers:,} receivers in {elapsed:.2f} s "
+          f"→ {len(events) / elapsed / 1e3:,.0f} k messages/s")
+    for name, errs, unit in (("drift", drift_err, "ppm"), ("heartbeat drift", beat_err, "ppm"),
+                             ("latency floor", lat_err, "ms"), ("boot time", boot_err, "ms")):
+        print(f"{name:<15} error median {errs[len(errs) // 2]:.3f} {unit}, p99 {errs[int(len(errs) * 0.99)]:.3f} {unit}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate receiver clock offset, drift and latency")
+    parser.add_argument("--capture", type=str, nargs="*", default=[], help="Capture files to ingest")
+    parser.add_argument("--listen", type=str, default=None, metavar="HOST:PORT",
+                        help="Receive frames mirrored by espnow_emu.py --tap")
+    parser.add_argument("--annotate", type=str, default=None,
+                        help="Write one CSV row per receiver message with its corrected send time")
+    parser.add_argument("--block", type=int, default=16, help="Samples per min-filter block (default: 16)")
+    parser.add_argument("--window", type=int, default=32, help="Block minima per regression window (default: 32)")
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="One-way latency to assume until round trips are seen (default: 0)")
+    parser.add_argument("--interval", type=float, default=10.0, help="Seconds between snapshots when listening")
+    parser.add_argument("--snapshot", type=str, default=None, help="Write snapshots to this file (default: stdout)")
+    parser.add_argument("--rows", choices=("all", "anomalies", "none"), default="all",
+                        help="Per-receiver rows in snapshots (default: all)")
+    parser.add_argument("--bench", type=int, default=None, metavar="N", help="Run a synthetic fleet of N receivers")
+    args = parser.parse_args()
+
+    if args.bench:
+        bench(args.bench)
+        return
+    if not args.capture and not args.listen:
+        parser.error("give --capture files and/or --listen")
+    if args.block < 1 or args.window < 2:
+        parser.error("--block must be >= 1 and --window >= 2")
+
+    out = open(args.annotate, "w", newline="") if args.annotate else None
+    writer = None
+    if out:
+        writer = csv.writer(out)
+        writer.writerow(ANNOTATE_FIELDS)
+    sync = ClockSync(args.block, args.window, args.latency_ms / 1000, writer.writerow if writer else None)
+    try:
+        end = None
+        for path in args.capture:
+            end = ingest_capture(sync, path)
+        if args.listen:
+            host, _, port = args.listen.rpartition(":")
+            try:
+                asyncio.run(listen(sync, (host or "127.0.0.1", int(port)), args.interval, args.snapshot, args.rows))
+            except KeyboardInterrupt:
+                pass
+    finally:
+        if out:
+            out.close()
+    write_snapshot(sync.snapshot(now=None if args.listen else end, rows=args.rows), args.snapshot)
+
+if __name__ == "__main__":
+    main()
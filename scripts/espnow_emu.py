@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""asyncio UDP stand-in for ESP-NOW, for load-testing the light protocol.
+
+Runs thousands of virtual vehicles, each a controller (espnow_tx.cpp) and
+a receiver (espnow_rx.cpp + lights.cpp + the failsafe in
+main_receiver.cpp), on a plain Linux box. Each side's radios share one
+UDP socket; every datagram carries a small envelope in front of the
+ESP-NOW payload:
+
+  cell (u32) | dst MAC (6) | src MAC (6) | payload
+
+A cell is one vehicle's radio neighbourhood: broadcasts (pairing) reach
+only the nodes in the same cell. Payloads are the packed protocol.h
+structs, encoded and decoded with protocol_codec.
+
+Each receiver boots in pairing mode (BOOT button held); its controller
+pairs by broadcast, then toggles random lights as a Poisson process.
+The run reports per-command RTT (first send to matching ACK) and ACK
+loss.
+
+Usage:
+  python3 scripts/espnow_emu.py --vehicles 2000 --duration 30 --rate 2
+  python3 scripts/espnow_emu.py --vehicles 500 --loss 0.05
+  python3 scripts/espnow_emu.py --role rx --vehicles 5000 &      # receivers in one process
+  python3 scripts/espnow_emu.py --role tx --vehicles 5000        # controllers in another
+  python3 scripts/espnow_emu.py --tap 127.0.0.1:47300             # mirror frames to a sniffer
+
+Uses uvloop when it is installed (pip install uvloop); otherwise only
+Python stdlib.
+"""
+
+import argparse
+import asyncio
+import random
+import socket
+import struct
+import sys
+import time
+from pathlib import Path
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from espnow_sim import percentiles
+from protocol_codec import load_protocol
+
+PROTO = load_protocol()
+D = PROTO.defines
+LIGHT_BITS = (D["LIGHT_FOG"], D["LIGHT_LOW_BEAM"], D["LIGHT_HIGH_BEAM"], D["LIGHT_BAR"], D["LIGHT_HAZARD"])
+BROADCAST = b"\xff" * 6
+ENVELOPE = struct.Struct("<I6s6s")
+
+# Firmware delays (s): receiver status-LED blink before the ACK, controller
+# pairing retry (the firmware waits for another button press)
+RX_BLINK_S = 0.010
+PAIR_RETRY_S = 1.0
+
+SOCKET_BUFFER = 8 << 20
+
+HEADER = PROTO.header
+HEADER_SIZE = HEADER.size
+LIGHT_COMMAND, LIGHT_ACK, HEARTBEAT, STATE_REPORT, PAIR_REQUEST, PAIR_RESPONSE = (
+    PROTO[name] for name in ("LightCommand", "LightAck", "Heartbeat", "StateReport", "PairRequest", "PairResponse"))
+
+def node_mac(role, index):
+    """Locally administered MAC: 02:00:00:<role>:<index>."""
+    return bytes((0x02, 0x00, 0x00, role)) + index.to_bytes(2, "big")
+
+# ---------------------------------------------------------------------------
+# Radio
+# ---------------------------------------------------------------------------
+
+class Radio(asyncio.DatagramProtocol):
+    """One UDP socket carrying the ESP-NOW traffic of many nodes."""
+
+    def __init__(self, peer_addr, loss=0.0, seed=0, tap=None):
+        self.peer_addr = peer_addr
+        self.tap = tap
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self.transport = None
+        self.nodes = {}   # (cell, mac) -> node
+        self.cells = {}   # cell -> [node], for broadcasts
+        self.sent = self.received = self.dropped = 0
+        self.muted = False
+
+    def attach(self, node):
+        self.nodes[node.cell, node.mac] = node
+        self.cells.setdefault(node.cell, []).append(node)
+
+    def connection_made(self, transport):
+        self.transport = transport
+        # Thousands of nodes burst far beyond the default socket buffers;
+        # the kernel caps these at net.core.[rw]mem_max
+        sock = transport.get_extra_info("socket")
+        for opt in (socket.SO_RCVBUF, socket.SO_SNDBUF):
+            sock.setsockopt(socket.SOL_SOCKET, opt, SOCKET_BUFFER)
+
+    def connection_lost(self, exc):
+        self.transport = None
+
+    def send(self, cell, dst, src, payload):
+        """esp_now_send(); frames are lost with probability loss."""
+        if self.transport is None or self.muted:
+            return
+        self.sent += 1
+        if self.loss and self.rng.random() < self.loss:
+            self.dropped += 1
+            return
+        data = ENVELOPE.pack(cell, dst, src) + payload
+        self.transport.sendto(data, self.peer_addr)
+        if self.tap:
+            self.transport.sendto(data, self.tap)
+
+    def datagram_received(self, data, addr):
+        self.received += 1
+        cell, dst, src = ENVELOPE.unpack_from(data)
+        payload = memoryview(data)[ENVELOPE.size:]
+        if dst == BROADCAST:
+            for node in self.cells.get(cell, ()):
+                node.on_data_recv(src, payload)
+        else:
+            node = self.nodes.get((cell, dst))
+            if node is not None:
+                node.on_data_recv(src, payload)
+
+# ---------------------------------------------------------------------------
+# Receiver (espnow_rx.cpp, lights.cpp, main_receiver.cpp)
+# ---------------------------------------------------------------------------
+
+class VirtualReceiver:
+    def __init__(self, radio, cell, mac, loop, timing):
+        self.radio, self.cell, self.mac, self.loop = radio, cell, mac, loop
+        self.timing = timing
+        self.seq_num = 0
+        self.controller_mac = None
+        self.paired = False
+        self.pairing_mode = True
+        self.levels = [0] * len(LIGHT_BITS)
+        self.last_cmd_time = loop.time()
+        self.failsafe_triggered = False
+        self.failsafes = 0
+        self._failsafe_timer = None
+        radio.attach(self)
+
+    # lights.cpp
+    def lights_set(self, mask, state):
+        for i, bit in enumerate(LIGHT_BITS):
+            if mask & bit:
+                self.levels[i] = 255 if state & bit else 0
+
+    def lights_get_state(self):
+        state = 0
+        for i, bit in enumerate(LIGHT_BITS):
+            if self.levels[i]:
+                state |= bit
+        return state
+
+    def on_data_recv(self, src, data):
+        if len(data) < HEADER_SIZE:
+            return
+        version, msg_type, _ = HEADER.unpack_from(data)
+        if version != D["PROTOCOL_VERSION"]:
+            return
+        if msg_type == LIGHT_COMMAND.msg_type:
+            if len(data) < LIGHT_COMMAND.size:
+                return
+            if self.paired and src != self.controller_mac:
+                return
+            cmd = LIGHT_COMMAND.decode(data)
+            self.last_cmd_time = self.loop.time()
+            self.lights_set(cmd.light_mask, cmd.light_state)
+            self.failsafe_triggered = False
+            self._arm_failsafe()
+            # on_light_command() blinks the status LED before the ACK goes out
+            self.loop.call_later(RX_BLINK_S, self._send_ack, src, cmd.seq_num)
+        elif msg_type == PAIR_REQUEST.msg_type:
+            if not self.pairing_mode or len(data) < PAIR_REQUEST.size:
+                return
+            req = PAIR_REQUEST.decode(data)
+            self.controller_mac = req.controller_mac
+            self.radio.send(self.cell, self.controller_mac, self.mac,
+                            PAIR_RESPONSE.encode(seq_num=req.seq_num, receiver_mac=self.mac))
+            self.paired = True
+            self.pairing_mode = False
+            self.loop.call_later(self.timing["HEARTBEAT_INTERVAL_MS"] / 1000, self._heartbeat)
+
+    def _send_ack(self, dest, seq):
+        self.radio.send(self.cell, dest, self.mac, LIGHT_ACK.encode(
+            seq_num=seq, light_state=self.lights_get_state(), status=D["ACK_OK"]))
+
+    def _heartbeat(self):
+        self.seq_num = (self.seq_num + 1) & 0xFFFF
+        self.radio.send(self.cell, self.controller_mac, self.mac,
+                        HEARTBEAT.encode(seq_num=self.seq_num, light_state=self.lights_get_state()))
+        self.loop.call_later(self.timing["HEARTBEAT_INTERVAL_MS"] / 1000, self._heartbeat)
+
+    def _arm_failsafe(self):
+        if self._failsafe_timer is not None:
+            self._failsafe_timer.cancel()
+        self._failsafe_timer = self.loop.call_at(
+            self.last_cmd_time + self.timing["FAILSAFE_TIMEOUT_MS"] / 1000, self._failsafe)
+
+    def _failsafe(self):
+        self._failsafe_timer = None
+        if not self.failsafe_triggered and self.lights_get_state():
+            self.levels = [0] * len(LIGHT_BITS)
+            self.failsafe_triggered = True
+            self.failsafes += 1
+
+# ---------------------------------------------------------------------------
+# Controller (espnow_tx.cpp)
+# ---------------------------------------------------------------------------
+
+class Stats:
+    def __init__(self):
+        self.commands = self.acked = self.retries = self.gave_up = 0
+        self.superseded = self.stale_acks = self.disconnects = 0
+        self.rtt = []
+
+class VirtualController:
+    def __init__(self, radio, cell, mac, loop, timing, stats):
+        self.radio, self.cell, self.mac, self.loop = radio, cell, mac, loop
+        self.timing, self.stats = timing, stats
+        self.seq_num = 0
+        self.peer_mac = None
+        self.paired = asyncio.Event()
+        self.cmd_pending = False
+        self.pending_cmd = None
+        self.pending_seq = None
+        self.cmd_first_sent = 0.0
+        self.cmd_retries = 0
+        self.desired_state = self.confirmed_state = 0
+        self.last_heartbeat_time = loop.time()
+        self.connected = False
+        self._retry_timer = None
+        radio.attach(self)
+
+    def start_pairing(self):
+        if self.paired.is_set():
+            return
+        self.seq_num = (self.seq_num + 1) & 0xFFFF
+        self.radio.send(self.cell, BROADCAST, self.mac,
+                        PAIR_REQUEST.encode(seq_num=self.seq_num, controller_mac=self.mac))
+        self.loop.call_later(PAIR_RETRY_S, self.start_pairing)
+
+    def on_data_recv(self, src, data):
+        if len(data) < HEADER_SIZE:
+            return
+        version, msg_type, seq = HEADER.unpack_from(data)
+        if version != D["PROTOCOL_VERSION"]:
+            return
+        if msg_type == LIGHT_ACK.msg_type:
+            if len(data) < LIGHT_ACK.size:
+                return
+            ack = LIGHT_ACK.decode(data)
+            if ack.seq_num == self.pending_seq:
+                if self.cmd_pending:
+                    self.stats.acked += 1
+                    self.stats.rtt.append(self.loop.time() - self.cmd_first_sent)
+                    self._retry_timer.cancel()
+                self.cmd_pending = False
+            else:
+                self.stats.stale_acks += 1
+            self.confirmed_state = self.desired_state = ack.light_state
+            self._alive()
+        elif msg_type in (HEARTBEAT.msg_type, STATE_REPORT.msg_type):
+            codec = PROTO.by_type[msg_type]
+            if len(data) < codec.size:
+                return
+            self.confirmed_state = codec.decode(data).light_state
+            if msg_type == STATE_REPORT.msg_type:
+                self.desired_state = self.confirmed_state
+            self._alive()
+        elif msg_type == PAIR_RESPONSE.msg_type:
+            if len(data) < PAIR_RESPONSE.size:
+                return
+            self.peer_mac = PAIR_RESPONSE.decode(data).receiver_mac
+            self.paired.set()
+            self._alive()
+
+    def _alive(self):
+        self.last_heartbeat_time = self.loop.time()
+        self.connected = True
+
+    def toggle_light(self, bit):
+        self.desired_state ^= bit
+        self.send_state(bit, self.desired_state & bit)
+
+    def send_state(self, mask, state):
+        if self.peer_mac is None:
+            return
+        if self.cmd_pending:
+            self.stats.superseded += 1
+            self._retry_timer.cancel()
+        self.seq_num = (self.seq_num + 1) & 0xFFFF
+        self.pending_seq = self.seq_num
+        self.pending_cmd = LIGHT_COMMAND.encode(seq_num=self.seq_num, light_mask=mask, light_state=state)
+        self.cmd_pending = True
+        self.cmd_retries = 0
+        self.cmd_first_sent = self.loop.time()
+        self.stats.commands += 1
+        self.radio.send(self.cell, self.peer_mac, self.mac, self.pending_cmd)
+        self._retry_timer = self.loop.call_later(self.timing["ACK_TIMEOUT_MS"] / 1000, self._retry)
+
+    def _retry(self):
+        # espnow_tx_update(): resend, or give up and revert
+        if self.cmd_retries < self.timing["ACK_MAX_RETRIES"]:
+            self.cmd_retries += 1
+            self.stats.retries += 1
+            self.radio.send(self.cell, self.peer_mac, self.mac, self.pending_cmd)
+            self._retry_timer = self.loop.call_later(self.timing["ACK_TIMEOUT_MS"] / 1000, self._retry)
+        else:
+            self.cmd_pending = False
+            self.stats.gave_up += 1
+            self.desired_state = self.confirmed_state
+
+    def check_link(self):
+        now = self.loop.time()
+        if self.connected and now - self.last_heartbeat_time >= self.timing["HEARTBEAT_TIMEOUT_MS"] / 1000:
+            self.connected = False
+            self.stats.disconnects += 1
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+
+async def drive(ctrl, rate, rng, stop):
+    """Pair, then toggle random lights as a Poisson process until stop."""
+    # Vehicles power up over a second rather than all on the same tick
+    await asyncio.sleep(rng.uniform(0, PAIR_RETRY_S))
+    ctrl.start_pairing()
+    await ctrl.paired.wait()
+    while not stop.is_set():
+        await asyncio.sleep(rng.expovariate(rate))
+        ctrl.toggle_light(rng.choice(LIGHT_BITS))
+        ctrl.check_link()
+
+async def run(args):
+    loop = asyncio.get_running_loop()
+    timing = {name: D[name] for name in ("ACK_TIMEOUT_MS", "ACK_MAX_RETRIES", "HEARTBEAT_INTERVAL_MS",
+                                         "HEARTBEAT_TIMEOUT_MS", "FAILSAFE_TIMEOUT_MS")}
+    rx_addr, tx_addr = (args.host, args.rx_port), (args.host, args.tx_port)
+    tap = None
+    if args.tap:
+        host, _, port = args.tap.rpartition(":")
+        tap = (host or args.host, int(port))
+    radios, receivers, controllers = [], [], []
+    stats = Stats()
+
+    if args.role in ("rx", "both"):
+        transport, rx_radio = await loop.create_datagram_endpoint(
+            lambda: Radio(tx_addr, args.loss, args.seed, tap), local_addr=rx_addr)
+        radios.append(("rx", transport, rx_radio))
+        receivers = [VirtualReceiver(rx_radio, i, node_mac(0, i), loop, timing) for i in range(args.vehicles)]
+    if args.role in ("tx", "both"):
+        transport, tx_radio = await loop.create_datagram_endpoint(
+            lambda: Radio(rx_addr, args.loss, args.seed + 1, tap), local_addr=tx_addr)
+        radios.append(("tx", transport, tx_radio))
+        controllers = [VirtualController(tx_radio, i, node_mac(1, i), loop, timing, stats)
+                       for i in range(args.vehicles)]
+
+    stop = asyncio.Event()
+    rng = random.Random(args.seed)
+    tasks = [asyncio.create_task(drive(c, args.rate, random.Random(rng.random()), stop)) for c in controllers]
+    start = time.perf_counter()
+    await asyncio.sleep(args.duration)
+    stop.set()
+    # Let in-flight commands finish their retries before counting
+    await asyncio.sleep(timing["ACK_TIMEOUT_MS"] * (timing["ACK_MAX_RETRIES"] + 1) / 1000 + 0.05)
+    elapsed = time.perf_counter() - start
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    # Stop sending and let frames still in flight arrive, so the counts
+    # below only differ by what the kernel dropped
+    for _, _, radio in radios:
+        radio.muted = True
+    received = None
+    for _ in range(20):
+        now = sum(radio.received for _, _, radio in radios)
+        if now == received:
+            break
+        received = now
+        await asyncio.sleep(0.05)
+    for _, transport, _ in radios:
+        transport.close()
+
+    print(f"{args.vehicles} vehicles, {elapsed:.1f} s, {type(loop).__module__.split('.')[0]} event loop")
+    for name, _, radio in radios:
+        print(f"  {name} radio: {radio.sent:,} sent ({radio.dropped:,} dropped), {radio.received:,} received "
+              f"→ {(radio.sent + radio.received) / elapsed:,.0f} frames/s")
+    if len(radios) == 2:
+        (_, _, rx), (_, _, tx) = radios
+        lost = (tx.sent - tx.dropped - rx.received) + (rx.sent - rx.dropped - tx.received)
+        if lost:
+            print(f"  {lost:,} datagrams dropped by the kernel: the emulator is saturated, not the protocol")
+    if controllers:
+        paired = sum(c.paired.is_set() for c in controllers)
+        attempts = stats.acked + stats.retries + stats.gave_up
+        rtt = {k: v and v * 1000 for k, v in percentiles(stats.rtt).items()}
+        print(f"  paired {paired}/{len(controllers)}; {stats.commands:,} commands "
+              f"({stats.commands / elapsed:,.0f}/s), {stats.superseded:,} superseded, {stats.stale_acks:,} stale ACKs")
+        print(f"  ACK loss {(stats.retries + stats.gave_up) / max(attempts, 1) * 100:.2f}% of attempts; "
+              f"{stats.retries:,} retries, {stats.gave_up:,} gave up, {stats.disconnects:,} disconnects")
+        print("  RTT ms  " + "  ".join(f"{k} {'-' if v is None else f'{v:.1f}'}" for k, v in rtt.items()))
+    if receivers:
+        print(f"  receivers paired {sum(r.paired for r in receivers)}/{len(receivers)}, "
+              f"{sum(r.failsafes for r in receivers)} failsafe trips")
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulate ESP-NOW vehicles over local UDP")
+    parser.add_argument("--vehicles", type=int, default=1000, help="Controller/receiver pairs (default: 1000)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load (default: 10)")
+    parser.add_argument("--rate", type=float, default=1.0, help="Toggles per second per vehicle (default: 1)")
+    parser.add_argument("--loss", type=float, default=0.0, help="Frame loss probability at each sender")
+    parser.add_argument("--role", choices=("both", "rx", "tx"), default="both",
+                        help="Run receivers, controllers or both in this process (default: both)")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="UDP address (default: 127.0.0.1)")
+    parser.add_argument("--rx-port", type=int, default=47100, help="Receivers' UDP port (default: 47100)")
+    parser.add_argument("--tx-port", type=int, default=47101, help="Controllers' UDP port (default: 47101)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    parser.add_argument("--tap", type=str, default=None, metavar="HOST:PORT",
+                        help="Mirror every frame that survives --loss to this UDP address "
+                             "(e.g. fleet_telemetry.py), whether or not its peer receives it")
+    parser.add_argument("--no-uvloop", action="store_true", help="Use the stock asyncio event loop")
+    args = parser.parse_args()
+
+    if uvloop is not None and not args.no_uvloop:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
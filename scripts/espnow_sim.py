@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""Discrete-event simulator of the ESP-NOW command/ACK/heartbeat protocol.
+
+Models both ends as the firmware implements them:
+
+  controller (espnow_tx.cpp)  one pending LightCommand, overwritten by each
+                              new toggle; resent from espnow_tx_update() once
+                              ACK_TIMEOUT_MS has passed, up to ACK_MAX_RETRIES
+                              times, then desired_state reverts to
+                              confirmed_state. Any ACK (matching seq or not)
+                              and any StateReport also reset desired_state.
+                              HEARTBEAT_TIMEOUT_MS without traffic drops the
+                              connection.
+  receiver (espnow_rx.cpp,    applies mask/state, blocks its receive callback
+  main_receiver.cpp)          for the 10 ms status-LED blink, then ACKs with
+                              the full light state; heartbeats every
+                              HEARTBEAT_INTERVAL_MS; lights off after
+                              FAILSAFE_TIMEOUT_MS without a command.
+
+Timeouts are only checked from the main loops (5 ms controller, 10 ms
+receiver), so retries, heartbeats and the failsafe fire on loop ticks.
+Touches are handled by lv_timer_handler() on controller ticks too.
+
+Each direction of the link has its own loss model (independent loss plus
+optional Gilbert-Elliott bursts) and latency distribution. Timing
+constants default to the values in lib/protocol/protocol.h.
+
+Usage:
+  python3 scripts/espnow_sim.py --hours 10 --loss 0.05
+  python3 scripts/espnow_sim.py --loss 0.02 --burst 0.01,0.3 --latency lognorm:2,0.5
+  python3 scripts/espnow_sim.py --set ACK_TIMEOUT_MS=50,100,200,400 --set ACK_MAX_RETRIES=1,3,5 --jobs 8
+
+Latency specs (milliseconds): fixed:X, uniform:A,B, exp:MEAN, lognorm:MEDIAN,SIGMA
+(each optionally +MIN, e.g. exp:3+1).
+
+No external dependencies — uses only Python stdlib.
+"""
+
+import argparse
+import heapq
+import itertools
+import json
+import math
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from protocol_codec import load_protocol
+
+TIMING_NAMES = ("ACK_TIMEOUT_MS", "ACK_MAX_RETRIES", "HEARTBEAT_INTERVAL_MS",
+                "HEARTBEAT_TIMEOUT_MS", "FAILSAFE_TIMEOUT_MS")
+
+LIGHT_BITS = (0x01, 0x02, 0x04, 0x08, 0x10)
+LIGHT_ALL = 0x1F
+
+# Firmware loop periods and the receiver's blocking status-LED blink (ms)
+TX_LOOP_MS = 5
+RX_LOOP_MS = 10
+RX_CALLBACK_MS = 10
+
+# Frame kinds in flight; ACKs and heartbeats are handled alike by the controller
+FRAME_COMMAND, FRAME_ACK, FRAME_HEARTBEAT = range(3)
+
+def protocol_timing():
+    defines = load_protocol().defines
+    return {name: defines[name] for name in TIMING_NAMES}
+
+# ---------------------------------------------------------------------------
+# Link model
+# ---------------------------------------------------------------------------
+
+def parse_latency(spec):
+    """Latency spec -> (kind, params, floor); see module docstring."""
+    spec, _, floor = spec.partition("+")
+    kind, _, args = spec.partition(":")
+    params = tuple(float(v) for v in args.split(",")) if args else ()
+    arity = {"fixed": 1, "uniform": 2, "exp": 1, "lognorm": 2}
+    if arity.get(kind) != len(params):
+        raise ValueError(f"bad latency spec {spec!r}")
+    return kind, params, float(floor or 0)
+
+class Link:
+    """One direction of the radio link: loss, burst loss and latency."""
+
+    def __init__(self, rng, loss=0.0, burst=None, burst_loss=1.0, latency="fixed:1"):
+        self.sent = self.lost = 0
+        self.transmit = self._transmitter(rng, loss, burst, burst_loss, parse_latency(latency))
+
+    def _transmitter(self, rng, loss, burst, burst_loss, latency):
+        """transmit(now) -> arrival time, or None if the frame is lost.
+
+        Built as a closure specialised to the configuration; it runs for
+        every frame.
+        """
+        rnd = rng.random
+        kind, params, floor = latency
+        if kind == "fixed":
+            value = params[0] + floor
+            sample = None
+        elif kind == "uniform":
+            a, b = params
+            sample = lambda: floor + rng.uniform(a, b)
+        elif kind == "exp":
+            rate = 1 / params[0]
+            sample = lambda: floor + rng.expovariate(rate)
+        else:
+            mu, sigma, exp, gauss = math.log(params[0]), params[1], math.exp, rng.gauss
+            sample = lambda: floor + exp(gauss(mu, sigma))
+        p_enter, p_leave = burst or (0.0, 1.0)
+        in_burst = False
+
+        def transmit(now):
+            nonlocal in_burst
+            self.sent += 1
+            if p_enter:
+                if in_burst:
+                    if rnd() < p_leave:
+                        in_burst = False
+                elif rnd() < p_enter:
+                    in_burst = True
+                p = burst_loss if in_burst else loss
+            else:
+                p = loss
+            if p and rnd() < p:
+                self.lost += 1
+                return None
+            return now + (value if sample is None else sample())
+        return transmit
+
+# ---------------------------------------------------------------------------
+# Simulation
+# ---------------------------------------------------------------------------
+
+def _tick(t, period):
+    """First main-loop tick at or after t."""
+    return math.ceil(t / period - 1e-9) * period
+
+def percentiles(values, points=(50, 90, 99, 99.9)):
+    if not values:
+        return {f"p{p:g}": None for p in points} | {"max": None}
+    values = sorted(values)
+    n = len(values)
+    out = {f"p{p:g}": values[min(n - 1, int(p / 100 * n))] for p in points}
+    out["max"] = values[-1]
+    return out
+
+def simulate(duration_ms, timing=None, touch_interval_ms=1000.0, tx_link=None, rx_link=None, seed=0):
+    """Run one simulation; returns a dict of counters and latency lists.
+
+    tx_link/rx_link are Link keyword dicts for controller->receiver and
+    receiver->controller. Touches are a Poisson process toggling a random
+    light.
+    """
+    timing = {**protocol_timing(), **(timing or {})}
+    ack_timeout = timing["ACK_TIMEOUT_MS"]
+    max_retries = timing["ACK_MAX_RETRIES"]
+    hb_interval = timing["HEARTBEAT_INTERVAL_MS"]
+    hb_timeout = timing["HEARTBEAT_TIMEOUT_MS"]
+    failsafe_timeout = timing["FAILSAFE_TIMEOUT_MS"]
+
+    rng = random.Random(seed)
+    down = Link(random.Random(rng.random()), **(tx_link or {}))
+    up = Link(random.Random(rng.random()), **(rx_link or {}))
+    down_tx, up_tx = down.transmit, up.transmit
+    touch_rate = 1 / touch_interval_ms
+    # Touch, retry and heartbeat events all fall on loop ticks, so these
+    # delays keep the next one on a tick too
+    retry_delay = _tick(ack_timeout, TX_LOOP_MS)
+    hb_delay = _tick(hb_interval, RX_LOOP_MS)
+
+    # Controller state
+    seq_num = 0
+    cmd_pending = False
+    pending_seq = pending_mask = pending_state = 0
+    cmd_retries = 0
+    desired = confirmed = 0
+    last_hb_time = 0.0
+    connected = True
+    # Receiver state
+    lights = 0
+    last_cmd_time = 0.0
+    failsafe_triggered = False
+    rx_busy_until = 0.0
+
+    touch_time = {}      # seq -> touch time, until first applied
+    confirm_pending = {} # seq -> touch time, until ACKed
+    light_latency, confirm_latency = [], []
+    commands = retries = reverts = superseded = stale_acks = disconnects = failsafes = 0
+
+    # Frames in flight live in the heap as (arrival, kind, a, b, c). The
+    # firmware's timers are singletons, so they stay in plain variables and
+    # a cancelled retry costs nothing.
+    heap = []
+    push, pop = heapq.heappush, heapq.heappop
+    inf = math.inf
+    touch_due = _tick(rng.expovariate(touch_rate), TX_LOOP_MS)
+    retry_due = inf
+    hb_due = _tick(hb_interval, RX_LOOP_MS)
+    failsafe_due = _tick(failsafe_timeout, RX_LOOP_MS)
+    link_due = _tick(hb_timeout, TX_LOOP_MS)
+    timer_due = min(touch_due, hb_due, failsafe_due, link_due)
+    events = 0
+
+    while True:
+        if heap and heap[0][0] <= timer_due:
+            # Receive callbacks run before the main loop on the same ms
+            now, kind, a, b, c = pop(heap)
+            if now > duration_ms:
+                break
+            events += 1
+            if kind == FRAME_COMMAND:
+                # LightCommand at the receiver: a=seq, b=mask, c=state
+                start = now if now > rx_busy_until else rx_busy_until
+                last_cmd_time = start
+                lights = (lights & ~b) | (c & b & LIGHT_ALL)
+                failsafe_triggered = False
+                t0 = touch_time.pop(a, None)
+                if t0 is not None:
+                    light_latency.append(start - t0)
+                rx_busy_until = start + RX_CALLBACK_MS
+                arrival = up_tx(rx_busy_until)
+                if arrival is not None:
+                    push(heap, (arrival, FRAME_ACK, a, 0, lights))
+                continue
+            if kind == FRAME_ACK:
+                # seq_num is uint16_t on the wire; kept unbounded here so it
+                # can key the latency bookkeeping
+                if not (a ^ pending_seq) & 0xFFFF:
+                    if cmd_pending:
+                        cmd_pending = False
+                        retry_due = inf
+                    t0 = confirm_pending.pop(a, None)
+                    if t0 is not None:
+                        confirm_latency.append(now - t0)
+                else:
+                    stale_acks += 1
+                desired = c
+            confirmed = c
+            last_hb_time = now
+            connected = True
+            continue
+
+        now = timer_due
+        if now > duration_ms:
+            break
+        if now == touch_due:
+            # lv_timer_handler() runs before espnow_tx_update() in loop()
+            events += 1
+            bit = LIGHT_BITS[int(rng.random() * len(LIGHT_BITS))]
+            desired ^= bit
+            if cmd_pending:
+                superseded += 1
+                confirm_pending.pop(pending_seq, None)
+            seq_num += 1
+            pending_seq, pending_mask, pending_state = seq_num, bit, desired & bit
+            cmd_pending = True
+            cmd_retries = 0
+            commands += 1
+            touch_time[seq_num] = confirm_pending[seq_num] = now
+            arrival = down_tx(now)
+            if arrival is not None:
+                push(heap, (arrival, FRAME_COMMAND, seq_num, bit, pending_state))
+            retry_due = now + retry_delay
+            touch_due = _tick(now + rng.expovariate(touch_rate), TX_LOOP_MS)
+        elif now == retry_due:
+            events += 1
+            if cmd_retries < max_retries:
+                cmd_retries += 1
+                retries += 1
+                arrival = down_tx(now)
+                if arrival is not None:
+                    push(heap, (arrival, FRAME_COMMAND, pending_seq, pending_mask, pending_state))
+                retry_due = now + retry_delay
+            else:
+                cmd_pending = False
+                retry_due = inf
+                desired = confirmed
+                reverts += 1
+                confirm_pending.pop(pending_seq, None)
+        elif now == hb_due:
+            events += 1
+            arrival = up_tx(now)
+            if arrival is not None:
+                push(heap, (arrival, FRAME_HEARTBEAT, 0, 0, lights))
+            hb_due = now + hb_delay
+        elif now == failsafe_due:
+            events += 1
+            due = last_cmd_time + failsafe_timeout
+            if now >= due:
+                if not failsafe_triggered and lights:
+                    lights = 0
+                    failsafe_triggered = True
+                    failsafes += 1
+                due = now + failsafe_timeout
+            failsafe_due = _tick(due, RX_LOOP_MS)
+        elif now == link_due:
+            events += 1
+            due = last_hb_time + hb_timeout
+            if now >= due:
+                if connected:
+                    connected = False
+                    disconnects += 1
+                due = now + hb_timeout
+            link_due = _tick(due, TX_LOOP_MS)
+        # else: the timer that was due got cancelled
+        timer_due = min(touch_due, retry_due, hb_due, failsafe_due, link_due)
+
+    # Touches never applied (every attempt lost, or superseded before delivery)
+    return {
+        "events": events, "commands": commands, "retries": retries, "reverts": reverts,
+        "superseded": superseded, "stale_acks": stale_acks, "disconnects": disconnects,
+        "failsafes": failsafes, "never_applied": len(touch_time),
+        "frames_down": down.sent, "lost_down": down.lost, "frames_up": up.sent, "lost_up": up.lost,
+        "light_latency": light_latency, "confirm_latency": confirm_latency,
+    }
+
+def summarize(result):
+    """Counters plus latency percentiles and rates, JSON-friendly."""
+    out = {k: v for k, v in result.items() if not isinstance(v, list)}
+    commands = max(result["commands"], 1)
+    out["revert_rate"] = result["reverts"] / commands
+    out["never_applied_rate"] = result["never_applied"] / commands
+    out["light_latency_ms"] = percentiles(result["light_latency"])
+    out["confirm_latency_ms"] = percentiles(result["confirm_latency"])
+    return out
+
+def run_point(params):
+    """Process-pool entry point: params -> (params, summary, CPU seconds)."""
+    start = time.process_time()
+    result = simulate(**params)
+    elapsed = time.process_time() - start
+    return params, summarize(result), elapsed
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _fmt_ms(value):
+    return "-" if value is None else f"{value:.0f}" if value >= 100 else f"{value:.1f}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate the ESP-NOW light protocol")
+    parser.add_argument("--hours", type=float, default=1.0, help="Simulated time per run (default: 1)")
+    parser.add_argument("--touch-interval", type=float, default=1000.0, help="Mean ms between touches (default: 1000)")
+    parser.add_argument("--loss", type=float, default=0.0, help="Independent frame loss probability, both directions")
+    parser.add_argument("--burst", type=str, default=None, metavar="P_ENTER,P_LEAVE",
+                        help="Gilbert-Elliott burst loss: per-frame probabilities of entering and leaving a burst")
+    parser.add_argument("--burst-loss", type=float, default=1.0, help="Loss probability inside a burst (default: 1)")
+    parser.add_argument("--latency", type=str, default="fixed:1", help="One-way latency spec (default: fixed:1)")
+    parser.add_argument("--up-loss", type=float, default=None, help="Override --loss for receiver -> controller")
+    parser.add_argument("--up-latency", type=str, default=None, help="Override --latency for receiver -> controller")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=V1,V2,...",
+                        help=f"Sweep a timing constant ({', '.join(TIMING_NAMES)}); repeatable")
+    parser.add_argument("--seeds", type=int, default=1, help="Runs per sweep point with different seeds (default: 1)")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes for sweeps (default: CPU count)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    try:
+        burst = tuple(float(v) for v in args.burst.split(",")) if args.burst else None
+        if burst is not None and len(burst) != 2:
+            raise ValueError("--burst takes P_ENTER,P_LEAVE")
+        parse_latency(args.latency)
+        if args.up_latency:
+            parse_latency(args.up_latency)
+        axes = []
+        for item in args.set:
+            name, _, values = item.partition("=")
+            if name not in TIMING_NAMES:
+                raise ValueError(f"unknown timing constant {name!r}")
+            axes.append([(name, int(v)) for v in values.split(",")])
+    except ValueError as e:
+        parser.error(str(e))
+
+    down = {"loss": args.loss, "burst": burst, "burst_loss": args.burst_loss, "latency": args.latency}
+    up = {**down, "loss": args.loss if args.up_loss is None else args.up_loss,
+          "latency": args.up_latency or args.latency}
+    points = [{"duration_ms": args.hours * 3_600_000, "timing": dict(combo), "touch_interval_ms": args.touch_interval,
+               "tx_link": down, "rx_link": up, "seed": seed}
+              for combo in itertools.product(*axes) for seed in range(args.seeds)]
+
+    start = time.perf_counter()
+    if len(points) == 1:
+        results = [run_point(points[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            results = list(pool.map(run_point, points))
+    wall = time.perf_counter() - start
+
+    if args.json:
+        print(json.dumps([{"timing": p["timing"], "seed": p["seed"], **s} for p, s, _ in results], indent=2))
+        return
+
+    events = sum(s["events"] for _, s, _ in results)
+    cpu = sum(t for _, _, t in results)
+    print(f"{'timing':<40} {'cmds':>7} {'revert%':>8} {'lost%':>6}  light p50/p99/max   confirm p50/p99/max")
+    for params, s, _ in results:
+        label = " ".join(f"{k}={v}" for k, v in params["timing"].items()) or "protocol.h"
+        if args.seeds > 1:
+            label += f" #{params['seed']}"
+        ll, cl = s["light_latency_ms"], s["confirm_latency_ms"]
+        print(f"{label:<40} {s['commands']:>7} {s['revert_rate'] * 100:>7.2f}% {s['never_applied_rate'] * 100:>5.2f}%  "
+              f"{_fmt_ms(ll['p50']):>5}/{_fmt_ms(ll['p99']):>5}/{_fmt_ms(ll['max']):>6}   "
+              f"{_fmt_ms(cl['p50']):>5}/{_fmt_ms(cl['p99']):>5}/{_fmt_ms(cl['max']):>6}")
+    sim_hours = args.hours * len(results)
+    print(f"\n{events:,} events, {sim_hours:g} simulated h in {wall:.2f} s wall "
+          f"({events / cpu / 1e6:.2f} M events/s, {sim_hours / cpu:.0f} simulated h/s per process)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""Export Gerber RS-274X and Excellon drill files for the LED Driver Board.
+
+Plots fabrication outputs straight from the generate_kicad.py board model,
+without KiCad:
+
+  <project>-F_Cu.gbr, -B_Cu.gbr            copper (B.Cu carries the GND pour)
+  <project>-F_Mask.gbr, -B_Mask.gbr        solder mask openings
+  <project>-F_Paste.gbr                    SMD paste
+  <project>-F_Silkscreen.gbr               reference designators
+  <project>-Edge_Cuts.gbr                  board outline
+  <project>-PTH.drl, -NPTH.drl             Excellon drill files
+
+Usage:
+  python3 scripts/export_gerber.py                          # default board → hardware/gerber
+  python3 scripts/export_gerber.py --channels 12 --mosfet AOD4184A
+  python3 scripts/export_gerber.py --variants hardware/variants.toml
+
+No external dependencies — uses only Python stdlib.
+"""
+
+import argparse
+import math
+import os
+import time
+from pathlib import Path
+
+from generate_kicad import (
+    CHANNELS, CONNECTORS, HARDWARE_DIR, MOSFET_PARTS, DesignContext, build_board,
+    load_variants, make_channels, variant_context, zone_fill,
+)
+from kicad_fplib import FootprintLibrary
+from zone_fill import rounded_rect_polygon
+
+GENERATOR = "led_driver_generator,export_gerber"
+
+EDGE_WIDTH = 0.15       # Edge.Cuts stroke, as drawn by generate_pcb
+SILK_TEXT_SIZE = 1.0    # reference text height, as in render_footprint
+SILK_TEXT_WIDTH = 0.15
+SILK_REF_OFFSET = (0, -2.5)
+
+# ---------------------------------------------------------------------------
+# Gerber writer
+# ---------------------------------------------------------------------------
+
+def _c(v):
+    """mm → integer coordinate for the 4.6 format."""
+    return round(v * 1_000_000)
+
+class GerberWriter:
+    """Streams one Gerber X2 layer to an open text file.
+
+    Apertures are aggregated: each distinct (shape, size, function) gets a
+    single D-code, defined just before its first use, so the layer never
+    has to be held in memory. Board Y points down and Gerber Y points up,
+    so Y is negated on output.
+    """
+
+    def __init__(self, fh, file_function, polarity="Positive"):
+        self.fh = fh
+        self.apertures = {}
+        self.current = None
+        fh.write(f"%TF.GenerationSoftware,{GENERATOR}*%\n"
+                 "%TF.SameCoordinates,Original*%\n"
+                 f"%TF.FileFunction,{file_function}*%\n"
+                 f"%TF.FilePolarity,{polarity}*%\n"
+                 "%FSLAX46Y46*%\n"
+                 "G04 Gerber Fmt 4.6, Leading zero omitted, Abs format (unit mm)*\n"
+                 "%MOMM*%\n"
+                 "%LPD*%\n"
+                 "G01*\n"
+                 "G75*\n")
+
+    def aperture(self, shape, sx, sy=None, function=None):
+        """D-code for a circle (C) or rectangle (R) aperture, defining it if new."""
+        key = (shape, round(sx, 6), round(sy if sy is not None else sx, 6), function)
+        dcode = self.apertures.get(key)
+        if dcode is None:
+            dcode = 10 + len(self.apertures)
+            self.apertures[key] = dcode
+            params = f"{sx:.6f}" if shape == "C" else f"{sx:.6f}X{sy:.6f}"
+            if function:
+                self.fh.write(f"%TA.AperFunction,{function}*%\n"
+                              f"%ADD{dcode}{shape},{params}*%\n"
+                              "%TD*%\n")
+            else:
+                self.fh.write(f"%ADD{dcode}{shape},{params}*%\n")
+        return dcode
+
+    def _select(self, dcode):
+        if dcode != self.current:
+            self.fh.write(f"D{dcode}*\n")
+            self.current = dcode
+
+    def flash(self, dcode, x, y):
+        self._select(dcode)
+        self.fh.write(f"X{_c(x)}Y{_c(-y)}D03*\n")
+
+    def polyline(self, dcode, points):
+        self._select(dcode)
+        (x, y), rest = points[0], points[1:]
+        out = [f"X{_c(x)}Y{_c(-y)}D02*\n"]
+        out.extend(f"X{_c(x)}Y{_c(-y)}D01*\n" for x, y in rest)
+        self.fh.write("".join(out))
+
+    def region(self, points, function=None):
+        """Filled contour (G36/G37); the outline is closed automatically."""
+        if function:
+            self.fh.write(f"%TA.AperFunction,{function}*%\n")
+        (x, y), rest = points[0], points[1:]
+        out = ["G36*\n", f"X{_c(x)}Y{_c(-y)}D02*\n"]
+        out.extend(f"X{_c(px)}Y{_c(-py)}D01*\n" for px, py in rest)
+        out.append(f"X{_c(x)}Y{_c(-y)}D01*\nG37*\n")
+        self.fh.write("".join(out))
+        if function:
+            self.fh.write("%TD*%\n")
+
+    def close(self):
+        self.fh.write("M02*\n")
+
+# ---------------------------------------------------------------------------
+# Stroke font for silkscreen text
+# ---------------------------------------------------------------------------
+
+# Glyphs on a 4 x 6 grid (Y up): strokes separated by "|", points as "xy"
+STROKE_FONT = {
+    "0": "00 40 46 06 00|00 46", "1": "15 26 20|10 30", "2": "05 16 36 45 44 00 40",
+    "3": "05 16 36 45 44 33 13|33 42 41 30 10 01", "4": "30 36 02 42",
+    "5": "46 06 03 33 42 41 30 00", "6": "45 36 16 05 01 10 30 41 42 33 03",
+    "7": "06 46 10", "8": "13 04 05 16 36 45 44 33 13 02 01 10 30 41 42 33",
+    "9": "01 10 30 41 45 36 16 05 04 13 43",
+    "A": "00 04 26 44 40|03 43", "B": "00 06 36 45 44 33 03|33 42 41 30 00",
+    "C": "45 36 16 05 01 10 30 41", "D": "00 06 26 44 42 20 00", "E": "40 00 06 46|03 33",
+    "F": "00 06 46|03 33", "G": "45 36 16 05 01 10 30 41 43 23", "H": "00 06|40 46|03 43",
+    "I": "10 30|16 36|20 26", "J": "26 46|36 31 20 10 01 02", "K": "00 06|46 02|13 40",
+    "L": "06 00 40", "M": "00 06 23 46 40", "N": "00 06 40 46", "O": "01 05 16 36 45 41 30 10 01",
+    "P": "00 06 36 45 44 33 03", "Q": "01 05 16 36 45 41 30 10 01|22 40",
+    "R": "00 06 36 45 44 33 03|23 40", "S": "45 36 16 05 04 13 33 42 41 30 10 01",
+    "T": "06 46|20 26", "U": "06 01 10 30 41 46", "V": "06 20 46", "W": "06 00 23 40 46",
+    "X": "00 46|06 40", "Y": "06 23 46|23 20", "Z": "06 46 00 40",
+    "-": "03 43", "+": "03 43|21 25", "_": "00 40", "/": "00 46", ".": "10 20 21 11 10", " ": "",
+}
+
+def text_strokes(text, x, y, size):
+    """Polylines (board coordinates) for centered text of cap height `size`."""
+    scale = size / 6
+    width = (len(text) * 6 - 2) * scale
+    x0, y0 = x - width / 2, y + size / 2
+    strokes = []
+    for i, ch in enumerate(text.upper()):
+        glyph = STROKE_FONT.get(ch, "00 40 46 06 00")
+        ox = x0 + i * 6 * scale
+        for stroke in filter(None, glyph.split("|")):
+            strokes.append([(ox + int(p[0]) * scale, y0 - int(p[1]) * scale) for p in stroke.split()])
+    return strokes
+
+# ---------------------------------------------------------------------------
+# Layer plotting
+# ---------------------------------------------------------------------------
+
+def _pad_layers(pad):
+    names = set(pad.layers.replace('"', "").split())
+    for wild, sides in (("*.Cu", ("F.Cu", "B.Cu")), ("*.Mask", ("F.Mask", "B.Mask")),
+                        ("*.Paste", ("F.Paste", "B.Paste"))):
+        if wild in names:
+            names.update(sides)
+    return names
+
+def _plot_pad(gbr, pad, fp, x, y, function):
+    rot = (fp.rot + pad.rot) % 360
+    if pad.shape == "circle":
+        gbr.flash(gbr.aperture("C", pad.size_x, function=function), x, y)
+    elif pad.shape in ("roundrect", "oval"):
+        # Rounded corners are drawn as regions rather than aperture macros
+        short = min(pad.size_x, pad.size_y)
+        r = short / 2 if pad.shape == "oval" else short * (pad.rratio or 0.25)
+        gbr.region(rounded_rect_polygon(x, y, pad.size_x - 2 * r, pad.size_y - 2 * r, rot, r), function)
+    elif rot in (0, 90, 180, 270):
+        sx, sy = (pad.size_y, pad.size_x) if rot in (90, 270) else (pad.size_x, pad.size_y)
+        gbr.flash(gbr.aperture("R", sx, sy, function=function), x, y)
+    else:
+        gbr.region(rounded_rect_polygon(x, y, pad.size_x, pad.size_y, rot), function)
+
+LAYERS = [
+    # (layer, file suffix, X2 file function, polarity)
+    ("F.Cu", "F_Cu", "Copper,L1,Top", "Positive"),
+    ("B.Cu", "B_Cu", "Copper,L2,Bot", "Positive"),
+    ("F.Mask", "F_Mask", "Soldermask,Top", "Negative"),
+    ("B.Mask", "B_Mask", "Soldermask,Bot", "Negative"),
+    ("F.Paste", "F_Paste", "Paste,Top", "Positive"),
+    ("F.SilkS", "F_Silkscreen", "Legend,Top", "Positive"),
+    ("Edge.Cuts", "Edge_Cuts", "Profile,NP", "Positive"),
+]
+
+def plot_layer(gbr, board, layer, fill=None):
+    """Draw one board layer into a GerberWriter."""
+    if layer == "Edge.Cuts":
+        x0, y0 = board.origin_x, board.origin_y
+        x1, y1 = x0 + board.width, y0 + board.height
+        d = gbr.aperture("C", EDGE_WIDTH, function="Profile")
+        gbr.polyline(d, [(x0, y0), (x1, y0), (x1, y1), (x0, y1), (x0, y0)])
+        return
+    if layer == "F.SilkS":
+        d = gbr.aperture("C", SILK_TEXT_WIDTH)
+        for fp in board.footprints:
+            c, s = math.cos(math.radians(fp.rot)), math.sin(math.radians(fp.rot))
+            lx, ly = SILK_REF_OFFSET
+            tx, ty = fp.x + lx * c + ly * s, fp.y - lx * s + ly * c
+            for stroke in text_strokes(fp.ref, tx, ty, SILK_TEXT_SIZE):
+                gbr.polyline(d, stroke)
+        return
+
+    copper = layer.endswith(".Cu")
+    if layer == "B.Cu" and fill:
+        for poly in fill:
+            gbr.region(poly, "Conductor")
+    for fp, pad, x, y in board.pad_table().rows():
+        if layer not in _pad_layers(pad):
+            continue
+        function = None
+        if copper:
+            function = "SMDPad,CuDef" if pad.pad_type == "smd" else "ComponentPad"
+        _plot_pad(gbr, pad, fp, x, y, function)
+
+# ---------------------------------------------------------------------------
+# Excellon writer
+# ---------------------------------------------------------------------------
+
+def write_excellon(fh, holes, plated=True):
+    """Stream an Excellon drill file for (diameter, x0, y0, x1, y1) holes.
+
+    Tools are aggregated by diameter and declared in the header, then hits
+    are written tool by tool. A hole whose ends differ is a slot, routed
+    from one end to the other with G85.
+    """
+    kind = "PTH" if plated else "NPTH"
+    tools = sorted({round(d, 3) for d, *_ in holes})
+    fh.write("M48\n"
+             f"; DRILL file {{{GENERATOR}}}\n"
+             "; FORMAT={-:-/ absolute / metric / decimal}\n"
+             f"; #@! TF.FileFunction,{'Plated' if plated else 'NonPlated'},1,2,{kind}\n"
+             "FMAT,2\n"
+             "METRIC\n")
+    for i, d in enumerate(tools, 1):
+        fh.write(f"T{i}C{d:.3f}\n")
+    fh.write("%\nG90\nG05\n")
+    by_tool = {d: [] for d in tools}
+    for d, x0, y0, x1, y1 in holes:
+        hit = f"X{x0:.4f}Y{-y0:.4f}"
+        if (x0, y0) != (x1, y1):
+            hit += f"G85X{x1:.4f}Y{-y1:.4f}"
+        by_tool[round(d, 3)].append(hit + "\n")
+    for i, d in enumerate(tools, 1):
+        fh.write(f"T{i}\n")
+        fh.write("".join(by_tool[d]))
+    fh.write("M30\n")
+
+def board_holes(board):
+    """(diameter, x0, y0, x1, y1) of plated and non-plated holes.
+
+    Round holes have both ends at the pad centre; an oval drill becomes a
+    slot of its smaller dimension along its longer axis.
+    """
+    plated, npth = [], []
+    for fp, pad, x, y in board.pad_table().rows():
+        if not pad.drill:
+            continue
+        if isinstance(pad.drill, tuple):
+            w, h = pad.drill
+            d, half = min(w, h), abs(w - h) / 2
+            # Slot axis in pad-local x for a wide drill, y for a tall one,
+            # turned by the absolute pad angle (KiCad CCW, y down)
+            a = math.radians(fp.rot + pad.rot + (0 if w >= h else 90))
+            ux, uy = half * math.cos(a), -half * math.sin(a)
+            hole = (d, x - ux, y - uy, x + ux, y + uy)
+        else:
+            hole = (pad.drill, x, y, x, y)
+        (npth if pad.pad_type == "np_thru_hole" else plated).append(hole)
+    return plated, npth
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+def export_board(board, out_dir, project):
+    """Write every Gerber layer and drill file for a board; returns the paths."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    fill = zone_fill(board)
+    paths = []
+    for layer, suffix, function, polarity in LAYERS:
+        path = out_dir / f"{project}-{suffix}.gbr"
+        with path.open("w", newline="\n") as fh:
+            gbr = GerberWriter(fh, function, polarity)
+            plot_layer(gbr, board, layer, fill)
+            gbr.close()
+        paths.append(path)
+    plated, npth = board_holes(board)
+    for holes, is_plated, kind in ((plated, True, "PTH"), (npth, False, "NPTH")):
+        if not holes and not is_plated:
+            continue
+        path = out_dir / f"{project}-{kind}.drl"
+        with path.open("w", newline="\n") as fh:
+            write_excellon(fh, holes, is_plated)
+        paths.append(path)
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description="Export Gerber and Excellon files for the LED driver board")
+    parser.add_argument("--channels", type=int, default=len(CHANNELS), help="Channel count (default: 9)")
+    parser.add_argument("--mosfet", choices=sorted(MOSFET_PARTS), default="AO3400A")
+    parser.add_argument("--connector", choices=sorted(CONNECTORS), default="JST_XH")
+    parser.add_argument("--variants", type=str, default=None,
+                        help="Variant matrix (.toml or .json); exports every variant")
+    parser.add_argument("--out-dir", type=str, default=None, help="Output directory (default: hardware/gerber)")
+    parser.add_argument("--fp-lib", type=str, default=os.environ.get("KICAD8_FOOTPRINT_DIR"),
+                        help="KiCad footprint library directory for exact pad geometry")
+    args = parser.parse_args()
+
+    out_root = Path(args.out_dir) if args.out_dir else HARDWARE_DIR / "gerber"
+    fp_lib = FootprintLibrary(args.fp_lib) if args.fp_lib else None
+    if args.variants:
+        jobs = [(variant_context(v), out_root / v["name"]) for v in load_variants(args.variants)]
+    else:
+        channels = CHANNELS if args.channels == len(CHANNELS) else make_channels(args.channels)
+        ctx = DesignContext(channels=channels, mosfet=args.mosfet, connector=args.connector)
+        jobs = [(ctx, out_root)]
+
+    for ctx, out_dir in jobs:
+        ctx.fp_lib = fp_lib
+        start = time.perf_counter()
+        paths = export_board(build_board(ctx), out_dir, ctx.project)
+        print(f"{ctx.project}: {len(paths)} files in {out_dir} ({(time.perf_counter() - start) * 1000:.1f} ms)")
+        for path in paths:
+            print(f"  {path.name}")
+    if fp_lib is not None:
+        fp_lib.save()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""Fleet health aggregator for receiver Heartbeat and StateReport traffic.
+
+Keeps one row per receiver MAC in column arrays (array.array, so 10k
+receivers cost a few hundred KB) and updates it in O(1) per frame:
+
+  reboots      heartbeat seq_num restarting (it is reset at boot) or
+               StateReport uptime_ms going backwards
+  gaps         silence longer than HEARTBEAT_TIMEOUT_MS, and heartbeats
+               missed according to seq_num
+  divergence   heartbeat light_state differing from the state the receiver
+               last ACKed (or was commanded) on two heartbeats in a row,
+               e.g. after a failsafe or brown-out
+
+Frames come from a capture file (capture.py), or live from the loopback
+emulator's --tap mirror over UDP. Snapshots are JSON.
+
+Usage:
+  python3 scripts/fleet_telemetry.py --capture session.espcap
+  python3 scripts/fleet_telemetry.py --listen 127.0.0.1:47300 --interval 5 --snapshot fleet.json &
+  python3 scripts/espnow_emu.py --vehicles 10000 --tap 127.0.0.1:47300
+  python3 scripts/fleet_telemetry.py --bench 10000
+
+No external dependencies — uses only Python stdlib.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import struct
+import sys
+import time
+from array import array
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from protocol_codec import load_protocol
+
+PROTO = load_protocol()
+D = PROTO.defines
+VERSION = D["PROTOCOL_VERSION"]
+GAP_S = D["HEARTBEAT_TIMEOUT_MS"] / 1000
+HEARTBEAT_S = D["HEARTBEAT_INTERVAL_MS"] / 1000
+
+# Envelope of espnow_emu.py: cell, dst MAC, src MAC
+ENVELOPE = struct.Struct("<I6s6s")
+# Heartbeat seq steps beyond this are taken as a restart, not missed frames
+SEQ_WINDOW = 1024
+UNKNOWN = 0xFF
+
+# Per-row flags
+HAS_SEQ, HAS_UPTIME, DIVERGED = 1, 2, 4
+
+HEARTBEAT, STATE_REPORT, LIGHT_ACK, LIGHT_COMMAND = (
+    PROTO[name] for name in ("Heartbeat", "StateReport", "LightAck", "LightCommand"))
+
+def mac_str(mac):
+    return ":".join(f"{b:02X}" for b in mac)
+
+# ---------------------------------------------------------------------------
+# Table
+# ---------------------------------------------------------------------------
+
+class FleetTable:
+    """Column-oriented per-receiver state, rows keyed by MAC."""
+
+    COLUMNS = {
+        "first_seen": "d", "last_seen": "d", "boot_time": "d", "last_reboot": "d", "diverged_since": "d",
+        "max_gap": "f", "uptime_ms": "I", "heartbeats": "I", "reports": "I", "acks": "I", "commands": "I",
+        "reboots": "I", "gaps": "I", "missed": "I", "divergences": "I", "seq": "H",
+        "state": "B", "expected": "B", "flags": "B",
+    }
+
+    def __init__(self):
+        self.index = {}
+        self.macs = []
+        for name, code in self.COLUMNS.items():
+            setattr(self, name, array(code))
+        self._columns = [getattr(self, name) for name in self.COLUMNS]
+        self.frames = 0
+
+    def __len__(self):
+        return len(self.macs)
+
+    def row(self, mac, t):
+        i = self.index.get(mac)
+        if i is None:
+            i = self.index[mac] = len(self.macs)
+            self.macs.append(bytes(mac))
+            for col in self._columns:
+                col.append(0)
+            self.first_seen[i] = self.last_seen[i] = t
+            self.state[i] = self.expected[i] = UNKNOWN
+        return i
+
+    def _heard(self, i, t):
+        gap = t - self.last_seen[i]
+        if gap > self.max_gap[i]:
+            self.max_gap[i] = gap
+        if gap > GAP_S:
+            self.gaps[i] += 1
+        self.last_seen[i] = t
+
+    def _reboot(self, i, t):
+        # A heartbeat seq restart and an uptime drop may report the same boot
+        if t - self.last_reboot[i] > 2 * HEARTBEAT_S or not self.reboots[i]:
+            self.reboots[i] += 1
+            self.last_reboot[i] = t
+        self.expected[i] = UNKNOWN
+        self.flags[i] &= ~DIVERGED
+        self.diverged_since[i] = 0.0
+
+    def _observe_state(self, i, t, state):
+        self.state[i] = state
+        expected = self.expected[i]
+        if expected == UNKNOWN or expected == state:
+            self.diverged_since[i] = 0.0
+            self.flags[i] &= ~DIVERGED
+        elif not self.diverged_since[i]:
+            self.diverged_since[i] = t          # could still be a frame in flight
+        elif not self.flags[i] & DIVERGED:
+            self.flags[i] |= DIVERGED
+            self.divergences[i] += 1
+
+    def heartbeat(self, mac, t, seq, state):
+        i = self.row(mac, t)
+        self.heartbeats[i] += 1
+        self._heard(i, t)
+        if self.flags[i] & HAS_SEQ:
+            step = (seq - self.seq[i]) & 0xFFFF
+            if step > SEQ_WINDOW:
+                self._reboot(i, t)
+            elif step > 1:
+                self.missed[i] += step - 1
+        self.flags[i] |= HAS_SEQ
+        self.seq[i] = seq
+        self._observe_state(i, t, state)
+
+    def state_report(self, mac, t, state, uptime_ms):
+        i = self.row(mac, t)
+        self.reports[i] += 1
+        self._heard(i, t)
+        if self.flags[i] & HAS_UPTIME and uptime_ms < self.uptime_ms[i]:
+            self._reboot(i, t)
+        self.flags[i] |= HAS_UPTIME
+        self.uptime_ms[i] = uptime_ms
+        self.boot_time[i] = t - uptime_ms / 1000
+        self.expected[i] = state
+        self._observe_state(i, t, state)
+
+    def ack(self, mac, t, state):
+        i = self.row(mac, t)
+        self.acks[i] += 1
+        self._heard(i, t)
+        self.expected[i] = state
+        self._observe_state(i, t, state)
+
+    def command(self, mac, t, mask, state):
+        """A LightCommand addressed to mac (only known from emulator envelopes)."""
+        i = self.row(mac, t)
+        self.commands[i] += 1
+        expected = self.expected[i]
+        if expected != UNKNOWN:
+            self.expected[i] = (expected & ~mask | state & mask) & 0xFF
+
+    def feed(self, t, src, payload, dst=None):
+        """Dispatch one frame on its msg_type."""
+        self.frames += 1
+        if len(payload) < HEARTBEAT.size or payload[0] != VERSION:
+            return
+        msg_type = payload[1]
+        if msg_type == HEARTBEAT.msg_type:
+            _, _, seq, state = HEARTBEAT.struct.unpack_from(payload)
+            self.heartbeat(src, t, seq, state)
+        elif msg_type == LIGHT_ACK.msg_type and len(payload) >= LIGHT_ACK.size:
+            self.ack(src, t, LIGHT_ACK.struct.unpack_from(payload)[3])
+        elif msg_type == STATE_REPORT.msg_type and len(payload) >= STATE_REPORT.size:
+            _, _, _, state, uptime = STATE_REPORT.struct.unpack_from(payload)
+            self.state_report(src, t, state, uptime)
+        elif msg_type == LIGHT_COMMAND.msg_type and dst is not None and len(payload) >= LIGHT_COMMAND.size:
+            _, _, _, mask, state = LIGHT_COMMAND.struct.unpack_from(payload)
+            self.command(dst, t, mask, state)
+
+    # -- snapshots ----------------------------------------------------------
+
+    def receiver(self, i, now):
+        return {
+            "mac": mac_str(self.macs[i]),
+            "silent_s": round(now - self.last_seen[i], 1),
+            "state": None if self.state[i] == UNKNOWN else self.state[i],
+            "expected": None if self.expected[i] == UNKNOWN else self.expected[i],
+            "diverged": bool(self.flags[i] & DIVERGED),
+            "uptime_s": round(self.uptime_ms[i] / 1000 + now - self.last_seen[i], 1)
+                        if self.flags[i] & HAS_UPTIME else None,
+            "heartbeats": self.heartbeats[i], "reports": self.reports[i], "acks": self.acks[i],
+            "reboots": self.reboots[i], "gaps": self.gaps[i], "missed_heartbeats": self.missed[i],
+            "max_gap_s": round(self.max_gap[i], 2), "divergences": self.divergences[i],
+        }
+
+    def snapshot(self, now=None, rows="anomalies"):
+        """Fleet summary plus per-receiver rows ("all", "anomalies" or "none")."""
+        now = time.time() if now is None else now
+        n = len(self.macs)
+        silent = [i for i in range(n) if now - self.last_seen[i] > GAP_S]
+        diverged = [i for i in range(n) if self.flags[i] & DIVERGED]
+        out = {
+            "time": now, "receivers": n, "frames": self.frames,
+            "silent": len(silent), "diverged": len(diverged),
+            "reboots": sum(self.reboots), "gaps": sum(self.gaps), "missed_heartbeats": sum(self.missed),
+        }
+        if rows == "all":
+            picked = range(n)
+        elif rows == "anomalies":
+            picked = sorted(set(silent) | set(diverged) | {i for i in range(n) if self.reboots[i] or self.gaps[i]})
+        else:
+            picked = ()
+        out["rows"] = [self.receiver(i, now) for i in picked]
+        return out
+
+# ---------------------------------------------------------------------------
+# Sources
+# ---------------------------------------------------------------------------
+
+def ingest_capture(table, path):
+    """Feed every frame of a capture file, both directions.
+
+    Captures record no destination MAC, so feed() drops controller
+    LightCommands (they only add to the frame count) and a receiver's
+    expected state stays unknown; only receiver messages update the table.
+    """
+    from capture import Capture, PAYLOAD_SIZE, RECORD
+    with Capture(path) as cap:
+        feed = table.feed
+        for t_us, _direction, length, mac, payload in RECORD.iter_unpack(cap.raw()):
+            feed(t_us / 1e6, mac, payload[:length] if length < PAYLOAD_SIZE else payload)
+        return cap[len(cap) - 1].t_us / 1e6 if len(cap) else None
+
+class TapListener(asyncio.DatagramProtocol):
+    """Receives the emulator's mirrored frames."""
+
+    def __init__(self, table):
+        self.table = table
+
+    def datagram_received(self, data, addr):
+        _, dst, src = ENVELOPE.unpack_from(data)
+        self.table.feed(time.time(), src, data[ENVELOPE.size:], dst)
+
+def write_snapshot(snapshot, path):
+    text = json.dumps(snapshot, indent=2)
+    if path in (None, "-"):
+        print(text, flush=True)
+        return
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text + "\n")
+    os.replace(tmp, path)
+
+async def listen(table, addr, interval, snapshot_path, rows):
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(lambda: TapListener(table), local_addr=addr)
+    transport.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 << 20)
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            write_snapshot(table.snapshot(rows=rows), snapshot_path)
+    finally:
+        transport.close()
+
+def bench(receivers, rounds=20):
+    """Heartbeats from N receivers, with a few reboots and failsafes mixed in."""
+    table = FleetTable()
+    macs = [bytes((2, 0, 0, 0)) + i.to_bytes(2, "big") for i in range(receivers)]
+    beats = [HEARTBEAT.encode(seq_num=r + 1, light_state=0x03) for r in range(rounds)]
+    dark = [HEARTBEAT.encode(seq_num=r + 1, light_state=0) for r in range(rounds)]
+    rebooted = HEARTBEAT.encode(seq_num=1, light_state=0)
+    ack = LIGHT_ACK.encode(seq_num=1, light_state=0x03)
+    t = time.time()
+    for mac in macs:
+        table.feed(t, mac, ack)
+    start = time.perf_counter()
+    for r in range(rounds):
+        payload = beats[r]
+        t += HEARTBEAT_S
+        for i, mac in enumerate(macs):
+            # Half-way through, every 997th receiver reboots and every
+            # 499th fails safe (lights off, same boot)
+            late = r >= rounds // 2
+            table.feed(t, mac, rebooted if late and i % 997 == 0 else dark[r] if late and i % 499 == 0 else payload)
+    elapsed = time.perf_counter() - start
+    snap = table.snapshot(t, rows="none")
+    print(f"{receivers * rounds:,} updates from {receivers:,} receivers in {elapsed:.2f} s "
+          f"→ {receivers * rounds / elapsed / 1e3:,.0f} k updates/s")
+    print(f"reboots {snap['reboots']}, missed {snap['missed_heartbeats']}, diverged {snap['diverged']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate receiver heartbeats into fleet health")
+    parser.add_argument("--capture", type=str, nargs="*", default=[], help="Capture files to ingest")
+    parser.add_argument("--listen", type=str, default=None, metavar="HOST:PORT",
+                        help="Receive frames mirrored by espnow_emu.py --tap")
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between snapshots when listening")
+    parser.add_argument("--snapshot", type=str, default=None, help="Write snapshots to this file (default: stdout)")
+    parser.add_argument("--rows", choices=("all", "anomalies", "none"), default="anomalies",
+                        help="Per-receiver rows in snapshots (default: anomalies)")
+    parser.add_argument("--bench", type=int, default=None, metavar="N", help="Time updates from N synthetic receivers")
+    args = parser.parse_args()
+
+    if args.bench:
+        bench(args.bench)
+        return
+    if not args.capture and not args.listen:
+        parser.error("give --capture files and/or --listen")
+    table = FleetTable()
+    end = None
+    for path in args.capture:
+        end = ingest_capture(table, path)
+    if args.listen:
+        host, _, port = args.listen.rpartition(":")
+        try:
+            asyncio.run(listen(table, (host or "127.0.0.1", int(port)), args.interval, args.snapshot, args.rows))
+        except KeyboardInterrupt:
+            pass
+    write_snapshot(table.snapshot(now=None if args.listen else end, rows=args.rows), args.snapshot)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,503 @@
+#!/usr/bin/env python3
+"""Flash / RAM attribution for the PlatformIO firmware builds.
+
+Reads firmware.elf (ELF32 or ELF64, little-endian) and, when present, the
+GNU ld firmware.map next to it, and reports:
+
+  - flash image and static RAM per region, from the allocated sections
+  - flash and RAM per source module: project sources by path, libraries by
+    archive (--members splits archives into their object files)
+  - the generated icon arrays (*_map symbols) and their descriptors
+  - the LVGL heap (LV_MEM_SIZE) and the draw buffer, which is heap-allocated
+    and therefore not in the ELF, from lv_conf.h / display.h
+  - the largest symbols, or with --diff, per-module and per-symbol deltas
+    between two builds
+
+A section counts as RAM when it is writable or placed in IRAM/DRAM/RTC
+memory, and as flash when it has contents in the image (so .data and IRAM
+code count in both). NOLOAD placeholders that only reserve address space
+(*dummy*, *noload* NOBITS sections) count as neither. Both files are
+memory-mapped, and the section table, symbol table and map index are only
+parsed when a report needs them.
+
+Modules come from the map's input sections; without a map, local symbols are
+attributed to the source file named by the preceding STT_FILE symbol and
+globals go to "?".
+
+Usage:
+  python3 scripts/fw_size.py                                  # .pio/build/controller/firmware.elf
+  python3 scripts/fw_size.py --env receiver --top 30
+  python3 scripts/fw_size.py build-old/firmware.elf --diff .pio/build/controller/firmware.elf
+  python3 scripts/fw_size.py --json > size.json
+
+No external dependencies — uses only Python stdlib.
+"""
+
+import argparse
+import bisect
+import json
+import mmap
+import re
+import struct
+import sys
+from collections import defaultdict, namedtuple
+from functools import cached_property
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BUILD_DIR = REPO_ROOT / ".pio" / "build"
+
+SHT_SYMTAB = 2
+SHT_NOBITS = 8
+SHF_WRITE = 0x1
+SHF_ALLOC = 0x2
+STT_OBJECT, STT_FUNC, STT_SECTION, STT_FILE = 1, 2, 3, 4
+SHN_LORESERVE = 0xFF00
+
+RAM_SECTION = re.compile(r"iram|dram|rtc|\.data|\.bss|noinit", re.I)
+# NOLOAD sections the ESP-IDF linker scripts use only to reserve address
+# space (.flash_rodata_dummy, .dram0.dummy, .flash.rodata_noload): writable
+# NOBITS like .bss, but they occupy neither flash nor RAM
+PLACEHOLDER_SECTION = re.compile(r"dummy|noload", re.I)
+
+Section = namedtuple("Section", "index name type flags addr size flash ram")
+Symbol = namedtuple("Symbol", "name addr size kind section file")
+
+# ---------------------------------------------------------------------------
+# ELF
+# ---------------------------------------------------------------------------
+
+class Elf:
+    """Memory-mapped ELF reader; tables are parsed on first use."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:4] != b"\x7fELF":
+            raise ValueError(f"{path}: not an ELF file")
+        if self.data[5] != 1:
+            raise ValueError(f"{path}: only little-endian ELF is supported")
+        self.is64 = self.data[4] == 2
+        if self.is64:
+            (self._shoff,) = struct.unpack_from("<Q", self.data, 0x28)
+            self._shentsize, self._shnum, self._shstrndx = struct.unpack_from(
+                "<HHH", self.data, 0x3A)
+        else:
+            (self._shoff,) = struct.unpack_from("<I", self.data, 0x20)
+            self._shentsize, self._shnum, self._shstrndx = struct.unpack_from(
+                "<HHH", self.data, 0x2E)
+
+    def close(self):
+        self.data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _cstr(self, offset):
+        end = self.data.find(b"\0", offset)
+        return self.data[offset:end].decode("utf-8", "replace")
+
+    @cached_property
+    def _raw_sections(self):
+        fmt = "<IIQQQQIIQQ" if self.is64 else "<IIIIIIIIII"
+        size = struct.calcsize(fmt)
+        return [struct.unpack_from(fmt, self.data, self._shoff + i * self._shentsize)
+                for i in range(self._shnum)] if size <= self._shentsize else []
+
+    @cached_property
+    def sections(self):
+        """All sections, with flash/RAM classification for allocated ones."""
+        names_off = self._raw_sections[self._shstrndx][4]
+        out = []
+        for i, (name, typ, flags, addr, offset, size, *_rest) in enumerate(self._raw_sections):
+            name = self._cstr(names_off + name)
+            placeholder = typ == SHT_NOBITS and PLACEHOLDER_SECTION.search(name)
+            alloc = bool(flags & SHF_ALLOC) and not placeholder
+            flash = alloc and typ != SHT_NOBITS and size > 0
+            ram = alloc and bool(flags & SHF_WRITE or RAM_SECTION.search(name))
+            out.append(Section(i, name, typ, flags, addr, size, flash, ram))
+        return out
+
+    @cached_property
+    def alloc_sections(self):
+        """Allocated, non-empty sections sorted by address."""
+        return sorted((s for s in self.sections if s.flags & SHF_ALLOC and s.size), key=lambda s: s.addr)
+
+    def section_at(self, addr):
+        secs = self.alloc_sections
+        starts = self._alloc_starts
+        i = bisect.bisect_right(starts, addr) - 1
+        if i >= 0 and addr < secs[i].addr + secs[i].size:
+            return secs[i]
+        return None
+
+    @cached_property
+    def _alloc_starts(self):
+        return [s.addr for s in self.alloc_sections]
+
+    @cached_property
+    def symbols(self):
+        """Sized OBJECT/FUNC symbols in allocated sections.
+
+        file is the name of the last STT_FILE symbol before a local symbol
+        (None for globals), which is how the ELF itself groups statics.
+        """
+        symtab = next((s for s in self._raw_sections if s[1] == SHT_SYMTAB), None)
+        if symtab is None:
+            return []
+        _, _, _, _, offset, size, link, _, _, entsize = symtab
+        strtab_off = self._raw_sections[link][4]
+        if self.is64:
+            fmt = "<IBBHQQ"
+        else:
+            fmt = "<IIIBBH"
+        sections = self.sections
+        out = []
+        current_file = None
+        for entry in struct.iter_unpack(fmt, self.data[offset:offset + size - size % entsize]):
+            if self.is64:
+                name, info, _, shndx, value, sym_size = entry
+            else:
+                name, value, sym_size, info, _, shndx = entry
+            kind = info & 0xF
+            local = (info >> 4) == 0
+            if kind == STT_FILE:
+                current_file = self._cstr(strtab_off + name)
+                continue
+            if kind not in (STT_OBJECT, STT_FUNC) or not sym_size or not 0 < shndx < SHN_LORESERVE:
+                continue
+            section = sections[shndx]
+            if not section.flags & SHF_ALLOC:
+                continue
+            out.append(Symbol(self._cstr(strtab_off + name), value, sym_size,
+                              "func" if kind == STT_FUNC else "object", section,
+                              current_file if local else None))
+        return out
+
+    def totals(self):
+        flash = sum(s.size for s in self.sections if s.flash)
+        ram = sum(s.size for s in self.sections if s.ram)
+        return flash, ram
+
+# ---------------------------------------------------------------------------
+# GNU ld map
+# ---------------------------------------------------------------------------
+
+# " .rodata.fog_map" then address, size and object, either on the same line
+# or (for long section names) on the next one
+_INPUT_SECTION = re.compile(
+    rb"^ (\.[^\s]+|COMMON)[ \t]*(?:\n[ \t]+)?[ \t]*0x([0-9a-fA-F]+)[ \t]+0x([0-9a-fA-F]+)[ \t]+([^\n]+)$",
+    re.M,
+)
+_ARCHIVE_MEMBER = re.compile(r"^(.*?)([^/\\]+\.a)\((.+)\)$")
+
+
+_SIMPLE_MANGLED = re.compile(r"^_ZL?(\d+)(.+)$")
+
+
+def display_name(name):
+    """Strip the C++ mangling from plain file-scope names (_ZL7fog_map -> fog_map)."""
+    m = _SIMPLE_MANGLED.match(name)
+    if m and len(m.group(2)) == int(m.group(1)):
+        return m.group(2)
+    return name
+
+
+def object_module(obj, members=False):
+    """Module key for a map object path: a source path, or an archive name."""
+    obj = obj.strip().replace("\\", "/")
+    m = _ARCHIVE_MEMBER.match(obj)
+    if m:
+        return f"{m.group(2)}({m.group(3)})" if members else m.group(2)
+    if "/.pio/build/" in obj or obj.startswith(".pio/build/"):
+        obj = obj.split(".pio/build/", 1)[1].split("/", 1)[-1]
+    if obj.endswith(".o"):
+        obj = obj[:-2]
+    if obj.endswith(".obj"):
+        obj = obj[:-4]
+    return obj
+
+
+class MapFile:
+    """Input sections of a GNU ld map, indexed by address on first use."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            empty = self.path.stat().st_size == 0
+            self.data = b"" if empty else mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    @cached_property
+    def input_sections(self):
+        """(addr, size, section name, object) for every sized input section, by address."""
+        start = self.data.find(b"Linker script and memory map")
+        if start < 0:
+            start = 0
+        end = self.data.find(b"\nCross Reference Table", start)
+        body = self.data[start:end if end > 0 else len(self.data)]
+        out = []
+        for m in _INPUT_SECTION.finditer(body):
+            size = int(m.group(3), 16)
+            obj = m.group(4).decode("utf-8", "replace").strip()
+            if not size or obj.startswith("0x") or not obj:
+                continue
+            out.append((int(m.group(2), 16), size, m.group(1).decode(), obj))
+        out.sort()
+        return out
+
+    @cached_property
+    def _starts(self):
+        return [s[0] for s in self.input_sections]
+
+    def object_at(self, addr):
+        i = bisect.bisect_right(self._starts, addr) - 1
+        if i >= 0:
+            start, size, _, obj = self.input_sections[i]
+            if addr < start + size:
+                return obj
+        return None
+
+# ---------------------------------------------------------------------------
+# Attribution
+# ---------------------------------------------------------------------------
+
+class Build:
+    """One firmware build: ELF plus optional map."""
+
+    def __init__(self, elf_path, map_path=None, members=False):
+        self.elf = Elf(elf_path)
+        if map_path is None:
+            candidate = Path(elf_path).with_suffix(".map")
+            map_path = candidate if candidate.exists() else None
+        self.map = MapFile(map_path) if map_path else None
+        self.members = members
+
+    def close(self):
+        self.elf.close()
+        if self.map:
+            self.map.close()
+
+    @cached_property
+    def mapped(self):
+        """True when the map has input sections to attribute from."""
+        return bool(self.map and self.map.input_sections)
+
+    def module_of(self, symbol):
+        if self.mapped:
+            obj = self.map.object_at(symbol.addr)
+            if obj:
+                return object_module(obj, self.members)
+        return symbol.file or "?"
+
+    @cached_property
+    def modules(self):
+        """module -> [flash, ram] bytes."""
+        out = defaultdict(lambda: [0, 0])
+        if self.mapped:
+            for addr, size, _, obj in self.map.input_sections:
+                section = self.elf.section_at(addr)
+                if section is None:
+                    continue
+                row = out[object_module(obj, self.members)]
+                row[0] += size if section.flash else 0
+                row[1] += size if section.ram else 0
+        else:
+            for sym in self.elf.symbols:
+                row = out[self.module_of(sym)]
+                row[0] += sym.size if sym.section.flash else 0
+                row[1] += sym.size if sym.section.ram else 0
+        return dict(out)
+
+    @cached_property
+    def symbol_sizes(self):
+        """name -> (size, module); same-named statics are summed."""
+        out = {}
+        for sym in self.elf.symbols:
+            size, _ = out.get(sym.name, (0, None))
+            out[sym.name] = (size + sym.size, self.module_of(sym))
+        return out
+
+    def icon_maps(self):
+        """Generated icon arrays (*_map) and LVGL descriptors (icon_*)."""
+        return sorted((s for s in self.elf.symbols
+                       if s.kind == "object" and (display_name(s.name).endswith("_map")
+                                                  or display_name(s.name).startswith("icon_"))),
+                      key=lambda s: display_name(s.name))
+
+    def summary(self):
+        flash, ram = self.elf.totals()
+        return {
+            "elf": str(self.elf.path),
+            "map": str(self.map.path) if self.map else None,
+            "flash": flash,
+            "ram": ram,
+            "sections": [{"name": s.name, "addr": s.addr, "size": s.size, "flash": s.flash, "ram": s.ram}
+                         for s in self.elf.alloc_sections],
+            "modules": {name: {"flash": f, "ram": r} for name, (f, r) in sorted(self.modules.items())},
+            "icons": [{"name": display_name(s.name), "size": s.size, "section": s.section.name}
+                      for s in self.icon_maps()],
+        }
+
+# ---------------------------------------------------------------------------
+# Source-configured RAM that is not in the ELF
+# ---------------------------------------------------------------------------
+
+def _define(path, name):
+    try:
+        text = path.read_text(encoding="utf-8")
+    except OSError:
+        return None
+    m = re.search(rf"#define\s+{name}\s+\(?([0-9]+)U?\s*(?:\*\s*([0-9]+)U?)?\)?", text)
+    if not m:
+        return None
+    return int(m.group(1)) * int(m.group(2) or 1)
+
+
+def configured_ram():
+    """LVGL heap and draw buffer sizes as configured in the sources."""
+    lv_conf = REPO_ROOT / "include" / "lv_conf.h"
+    mem = _define(lv_conf, "LV_MEM_SIZE")
+    depth = _define(lv_conf, "LV_COLOR_DEPTH")
+    width = _define(REPO_ROOT / "src" / "controller" / "display.h", "DISP_WIDTH")
+    draw_lines = None
+    try:
+        m = re.search(r"buf_size\s*=\s*DISP_WIDTH\s*\*\s*(\d+)",
+                      (REPO_ROOT / "src" / "controller" / "display.cpp").read_text(encoding="utf-8"))
+        draw_lines = int(m.group(1)) if m else None
+    except OSError:
+        pass
+    out = {}
+    if mem:
+        out["LV_MEM_SIZE"] = mem
+    if width and draw_lines and depth:
+        out["draw buffer (heap)"] = width * draw_lines * depth // 8
+    return out
+
+# ---------------------------------------------------------------------------
+# Reports
+# ---------------------------------------------------------------------------
+
+def print_report(build, top):
+    elf = build.elf
+    flash, ram = elf.totals()
+    print(f"{elf.path}  ({'map ' + str(build.map.path) if build.mapped else 'no map: modules from STT_FILE'})")
+    print(f"flash image {flash:>10,} B    static RAM {ram:>9,} B")
+
+    print(f"\n{'section':<28} {'address':>10} {'size':>10}  region")
+    for s in elf.alloc_sections:
+        region = "+".join(r for r, on in (("flash", s.flash), ("RAM", s.ram)) if on) or "-"
+        print(f"{s.name:<28} {s.addr:>#10x} {s.size:>10,}  {region}")
+
+    print(f"\n{'module':<48} {'flash':>10} {'RAM':>9}")
+    rows = sorted(build.modules.items(), key=lambda kv: -(kv[1][0] + kv[1][1]))
+    for name, (f, r) in rows[:top]:
+        print(f"{name[-48:]:<48} {f:>10,} {r:>9,}")
+    if len(rows) > top:
+        rest_f = sum(f for _, (f, _) in rows[top:])
+        rest_r = sum(r for _, (_, r) in rows[top:])
+        print(f"{f'({len(rows) - top} more)':<48} {rest_f:>10,} {rest_r:>9,}")
+
+    icons = build.icon_maps()
+    if icons:
+        maps = [s for s in icons if display_name(s.name).endswith("_map")]
+        print(f"\ngenerated icons: {sum(s.size for s in maps):,} B in {len(maps)} *_map arrays, "
+              f"{sum(s.size for s in icons if s not in maps):,} B of descriptors")
+        for s in icons:
+            print(f"  {display_name(s.name):<32} {s.size:>7,}  {s.section.name}  {build.module_of(s)}")
+
+    heap = [s for s in elf.symbols if s.name == "work_mem_int"]
+    config = configured_ram()
+    if heap or config:
+        print()
+        for s in heap:
+            print(f"LVGL heap work_mem_int: {s.size:,} B in {s.section.name}")
+        for name, size in config.items():
+            print(f"{name}: {size:,} B per the sources")
+
+    print(f"\n{'largest symbols':<48} {'size':>10}  section")
+    for s in sorted(elf.symbols, key=lambda s: -s.size)[:top]:
+        print(f"{display_name(s.name)[:48]:<48} {s.size:>10,}  {s.section.name}")
+
+
+def print_diff(old, new, top):
+    of, orr = old.elf.totals()
+    nf, nr = new.elf.totals()
+    print(f"old {old.elf.path}\nnew {new.elf.path}")
+    print(f"flash {of:>10,} -> {nf:>10,}  ({nf - of:+,})")
+    print(f"RAM   {orr:>10,} -> {nr:>10,}  ({nr - orr:+,})")
+
+    names = set(old.modules) | set(new.modules)
+    deltas = []
+    for name in names:
+        a = old.modules.get(name, (0, 0))
+        b = new.modules.get(name, (0, 0))
+        if a != b:
+            deltas.append((name, b[0] - a[0], b[1] - a[1]))
+    deltas.sort(key=lambda d: -(abs(d[1]) + abs(d[2])))
+    print(f"\n{'module':<48} {'flash':>9} {'RAM':>8}")
+    for name, df, dr in deltas[:top]:
+        print(f"{name[-48:]:<48} {df:>+9,} {dr:>+8,}")
+    if not deltas:
+        print("(no module changes)")
+
+    changes = []
+    for name in set(old.symbol_sizes) | set(new.symbol_sizes):
+        a, old_module = old.symbol_sizes.get(name, (0, None))
+        b, new_module = new.symbol_sizes.get(name, (0, None))
+        if a != b:
+            changes.append((display_name(name), new_module or old_module, a, b))
+    changes.sort(key=lambda c: -abs(c[3] - c[2]))
+    print(f"\n{'symbol':<40} {'module':<32} {'old':>8} {'new':>8} {'delta':>8}")
+    for name, module, a, b in changes[:top]:
+        print(f"{name[:40]:<40} {module[-32:]:<32} {a:>8,} {b:>8,} {b - a:>+8,}")
+    if not changes:
+        print("(no symbol changes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flash/RAM attribution for firmware ELF + map files")
+    parser.add_argument("elf", nargs="?", default=None,
+                        help="ELF to analyze (default: .pio/build/<env>/firmware.elf)")
+    parser.add_argument("--env", default="controller", help="PlatformIO environment (default: controller)")
+    parser.add_argument("--map", default=None, help="Linker map (default: firmware.map next to the ELF)")
+    parser.add_argument("--diff", metavar="NEW_ELF", default=None,
+                        help="Compare against a second build (its map is found the same way)")
+    parser.add_argument("--members", action="store_true", help="Attribute to archive members, not whole archives")
+    parser.add_argument("--top", type=int, default=20, help="Rows per table (default: 20)")
+    parser.add_argument("--json", action="store_true", help="Print the attribution as JSON")
+    args = parser.parse_args()
+
+    elf_path = Path(args.elf) if args.elf else BUILD_DIR / args.env / "firmware.elf"
+    if not elf_path.exists():
+        sys.exit(f"{elf_path} not found; build with 'pio run -e {args.env}' first")
+
+    build = Build(elf_path, args.map, args.members)
+    try:
+        if args.diff:
+            other = Build(args.diff, None, args.members)
+            try:
+                if args.json:
+                    print(json.dumps({"old": build.summary(), "new": other.summary()}, indent=2))
+                else:
+                    print_diff(build, other, args.top)
+            finally:
+                other.close()
+        elif args.json:
+            print(json.dumps(build.summary(), indent=2))
+        else:
+            print_report(build, args.top)
+    finally:
+        build.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,17 +5,78 @@ Usage:
     source scripts/.venv/bin/activate
     python3 scripts/generate_icons.py --size 48 --flip --output src/controller/ui_icons.cpp
 
+When --output already exists the run is a merge: the existing arrays and
+descriptors are parsed back into alpha planes, icons whose source (path data,
+size, flip, drawing code) is unchanged are carried over byte-for-byte, and
+icons the generator does not know about (hand-added ones such as hazard and
+settings) are kept as-is. Each generated array's comment ends in its source
+digest ("[src 1a2b...]"), so an icon whose tag matches is not even rasterized,
+on any checkout; an untagged icon is rendered and compared byte-for-byte.
+Pass --force to re-render every generated icon or --no-merge to overwrite the
+file from scratch.
+
+    python3 scripts/generate_icons.py --tiled 8 --from src/controller/ui_icons.cpp --output /tmp/ui_icons_tiled.cpp
+    python3 scripts/generate_icons.py --tile-report --from src/controller/ui_icons.cpp
+
+--tiled splits every icon into TILE x TILE blocks, stores each distinct block
+(including the all-zero one) once and gives each icon a tile-index table; the
+maps are expanded into RAM at boot by ui_icons_untile(), declared in the .h
+written next to --output, which firmware must call before drawing any icon.
+The expanded maps cost their full raw A8 size in .bss. --tile-report prints
+the flash and RAM cost of that layout against raw A8 for a family of
+vehicle-light icons (--report-icons, default 50) at several sizes and tile
+sizes.
+
+    python3 scripts/generate_icons.py --rle --from src/controller/ui_icons.cpp --output /tmp/ui_icons_rle.cpp
+    python3 scripts/generate_icons.py --rle-report --rle-bench --rle-check --from src/controller/ui_icons.cpp
+
+--rle writes each icon as a run/literal stream with a per-row offset table
+plus icon_rle_decode(), which expands any band of rows straight into a draw
+buffer; the format is described above rle_encode_row(). Output is always
+round-tripped through the Python reference decoder before it is written.
+
+    python3 scripts/generate_icons.py --anim --flip --output /tmp/ui_icons_anim.cpp
+    python3 scripts/generate_icons.py --anim-report
+
+--anim renders each ANIMATIONS entry (MDI path variants or parameterized
+Pillow shapes) and stores frame 0 as a keyframe plus, for every frame, only
+the rectangles that changed since the previous one. icon_anim_step() applies
+one frame to a RAM map and returns those rectangles for invalidation.
+
+    python3 scripts/generate_icons.py --tune --from src/controller/ui_icons.cpp --min-ssim 0.98 --budget 8192
+    python3 scripts/generate_icons.py --tune --from src/controller/ui_icons.cpp --output /tmp/ui_icons_tuned.cpp
+
+--tune searches alpha depth (A1/A2/A4/A8), dithering (none, 4x4 Bayer,
+Floyd-Steinberg), symmetric transparent-margin trimming and optionally a
+smaller render size per icon, one worker process per icon. Every candidate
+is decoded the way LVGL would draw it and scored by SSIM against the 8-bit
+master; the smallest one at or above --min-ssim wins. The choices are kept
+in scripts/icon_plan.json, keyed by a digest of each master plane and the
+search settings, so later runs only search icons that changed and the
+emitted file is reproducible from the plan alone.
+
 Dependencies (install in venv):
-    pip install cairosvg Pillow
+    pip install cairosvg Pillow numpy
+
+cairosvg is only imported when an MDI icon actually has to be rasterized.
 """
 
 import argparse
+import hashlib
+import inspect
 import io
+import json
+import os
+import re
+import sys
 import textwrap
+from typing import NamedTuple
 
-import cairosvg
+import numpy as np
 from PIL import Image, ImageDraw
 
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
 # MDI SVG path data (viewBox 0 0 24 24, Apache 2.0 license)
 # Source: https://pictogrammers.com/library/mdi/
 MDI_PATHS = {
@@ -63,6 +124,8 @@ def svg_path_to_alpha(path_d: str, size: int, flip_h: bool = False) -> Image.Ima
         f'<path d="{path_d}" fill="white"/>'
         f"</svg>"
     )
+    import cairosvg
+
     png_data = cairosvg.svg2png(bytestring=svg.encode(), output_width=size, output_height=size)
     img = Image.open(io.BytesIO(png_data)).convert("RGBA")
 
@@ -168,16 +231,74 @@ def alpha_to_c_array(img: Image.Image, name: str) -> str:
     return f"static const uint8_t {name}[{size} * {size}] = {{\n{array_str}\n}};"
 
 
-def generate_cpp(size: int, flip: bool) -> str:
-    """Generate the full ui_icons.cpp content."""
-    icons = {}
+ICON_COMMENTS = {
+    "fog": "Fog lamp icon (mdi:car-light-fog)",
+    "low_beam": "Low beam icon (mdi:car-light-dimmed)",
+    "high_beam": "High beam icon (mdi:car-light-high)",
+    "light_bar": "Light bar icon (custom drawn)",
+}
+
+
+def icon_descriptor(key: str, size: int, height: int | None = None, bpp: int = 8) -> str:
+    """C source for the lv_img_dsc_t pointing at {key}_map.
 
-    # Rasterize MDI icons
-    for name, path_d in MDI_PATHS.items():
-        icons[name] = svg_path_to_alpha(path_d, size, flip_h=flip)
+    size is the width (and height unless given); bpp selects the
+    LV_IMG_CF_ALPHA_{bpp}BIT format, whose rows are padded to whole bytes.
+    """
+    h = size if height is None else height
+    if bpp == 8:
+        data_size = f"{size} * {h}"
+    else:
+        data_size = f"{(size * bpp + 7) // 8} * {h}"
+    return textwrap.dedent(f"""\
+        const lv_img_dsc_t icon_{key} = {{
+            .header = {{
+                .cf = LV_IMG_CF_ALPHA_{bpp}BIT,
+                .always_zero = 0,
+                .reserved = 0,
+                .w = {size},
+                .h = {h},
+            }},
+            .data_size = {data_size},
+            .data = {key}_map,
+        }};""")
+
+
+def icon_sources(size: int, flip: bool, paths: dict[str, str] | None = None) -> dict:
+    """Map icon name -> (digest, render) for every icon the generator owns.
+
+    The digest covers everything that affects the rendered pixels, so an
+    icon whose digest matches the tag in the file does not need to be
+    rasterized.
+    """
+    if paths is None:
+        paths = MDI_PATHS
+
+    def digest(kind, data):
+        return hashlib.sha256(f"{kind}\0{size}\0{int(flip)}\0{data}".encode()).hexdigest()
+
+    sources = {}
+    for name, path_d in paths.items():
+        sources[name] = (digest("svg", path_d),
+                         lambda path_d=path_d: svg_path_to_alpha(path_d, size, flip_h=flip))
+    sources["light_bar"] = (digest("pillow", inspect.getsource(draw_light_bar)),
+                            lambda: draw_light_bar(size, flip_h=flip))
+    return sources
+
+
+def source_tag(digest: str) -> str:
+    """Suffix of a generated array's comment recording its source digest."""
+    return f" [src {digest[:16]}]"
 
-    # Custom light bar
-    icons["light_bar"] = draw_light_bar(size, flip_h=flip)
+
+def generate_cpp(size: int, flip: bool, paths: dict[str, str] | None = None) -> str:
+    """Generate the full ui_icons.cpp content.
+
+    paths maps icon names to MDI path data (default: MDI_PATHS); the custom
+    light bar is always appended.
+    """
+    sources = icon_sources(size, flip, paths)
+    icons = {name: render() for name, (_, render) in sources.items()}
 
     # Build C source
     parts = [
@@ -190,12 +311,8 @@ def generate_cpp(size: int, flip: bool) -> str:
         "",
     ]
 
-    icon_names = [
-        ("fog", "fog_map", "Fog lamp icon (mdi:car-light-fog)"),
-        ("low_beam", "low_beam_map", "Low beam icon (mdi:car-light-dimmed)"),
-        ("high_beam", "high_beam_map", "High beam icon (mdi:car-light-high)"),
-        ("light_bar", "light_bar_map", "Light bar icon (custom drawn)"),
-    ]
+    icon_names = [(key, f"{key}_map", ICON_COMMENTS.get(key, f"{key} icon") + source_tag(sources[key][0]))
+                  for key in icons]
 
     for key, array_name, comment in icon_names:
         parts.append(f"// {comment}")
@@ -203,47 +320,1309 @@ def generate_cpp(size: int, flip: bool) -> str:
         parts.append("")
 
     # LVGL image descriptors
-    descriptors = [
-        ("icon_fog", "fog_map"),
-        ("icon_low_beam", "low_beam_map"),
-        ("icon_high_beam", "high_beam_map"),
-        ("icon_light_bar", "light_bar_map"),
+    parts.append("// LVGL image descriptors")
+    for key in icons:
+        parts.append(icon_descriptor(key, size))
+        parts.append("")
+
+    return "\n".join(parts)
+
+
+# ---------------------------------------------------------------------------
+# Importing an existing ui_icons.cpp
+# ---------------------------------------------------------------------------
+
+ARRAY_RE = re.compile(
+    r"^(?:// (?P<comment>[^\n]*)\n)?"
+    r"static const uint8_t (?P<name>\w+)\[(?P<w>\d+) \* (?P<h>\d+)\] = \{\n"
+    r"(?P<body>[^}]*)\};",
+    re.M,
+)
+SOURCE_TAG_RE = re.compile(r" \[src (?P<digest>[0-9a-f]{16})\]$")
+DESCRIPTOR_RE = re.compile(
+    r"^const lv_img_dsc_t (?P<name>\w+) = \{\n.*?^    \.data = (?P<data>\w+),\n\};",
+    re.M | re.S,
+)
+
+
+class ImportedIcon(NamedTuple):
+    name: str                            # key, e.g. "hazard" for hazard_map / icon_hazard
+    comment: str | None                  # without the source tag
+    source: str | None                   # source digest prefix from the tag
+    plane: np.ndarray                    # (h, w) uint8 alpha
+    array_span: tuple[int, int]          # comment + array definition
+    descriptor_span: tuple[int, int] | None
+
+
+class IconsCpp:
+    """An existing ui_icons.cpp parsed into alpha planes.
+
+    Everything outside the recognized array and descriptor blocks is kept
+    verbatim, so render() with no replacements reproduces the input exactly.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        descriptors = {}
+        for m in DESCRIPTOR_RE.finditer(text):
+            descriptors[m.group("data")] = m.span()
+
+        self.icons: dict[str, ImportedIcon] = {}
+        for m in ARRAY_RE.finditer(text):
+            array_name = m.group("name")
+            name = array_name.removesuffix("_map")
+            w, h = int(m.group("w")), int(m.group("h"))
+            plane = np.fromstring(m.group("body").rstrip().rstrip(","), dtype=np.uint8, sep=",")
+            if plane.size != w * h:
+                line = text.count("\n", 0, m.start()) + 1
+                raise ValueError(f"line {line}: {array_name} has {plane.size} values, "
+                                 f"expected {w} * {h}")
+            comment, source = m.group("comment"), None
+            tag = SOURCE_TAG_RE.search(comment or "")
+            if tag:
+                comment, source = comment[:tag.start()], tag.group("digest")
+            self.icons[name] = ImportedIcon(name, comment, source, plane.reshape(h, w),
+                                            m.span(), descriptors.get(array_name))
+
+    @classmethod
+    def read(cls, path: str) -> "IconsCpp":
+        with open(path) as f:
+            return cls(f.read())
+
+    def render(self, replacements: dict[str, tuple[str, str]]) -> str:
+        """Return the file with icons replaced by (array, descriptor) source.
+
+        Replaced icons keep their position; icons that are not in the file yet
+        are appended at the end as array + descriptor pairs, the same layout
+        the hand-added icons use.
+        """
+        edits = []
+        appended = []
+        for name, (array, descriptor) in replacements.items():
+            icon = self.icons.get(name)
+            if icon is None:
+                appended.append(f"\n{array}\n\n{descriptor}\n")
+                continue
+            edits.append((*icon.array_span, array))
+            if icon.descriptor_span is not None:
+                edits.append((*icon.descriptor_span, descriptor))
+            else:
+                appended.append(f"\n{descriptor}\n")
+
+        out = []
+        pos = 0
+        for start, end, new in sorted(edits):
+            out.append(self.text[pos:start])
+            out.append(new)
+            pos = end
+        out.append(self.text[pos:])
+        return "".join(out) + "".join(appended)
+
+
+def merge_cpp(existing: IconsCpp, size: int, flip: bool, paths: dict[str, str] | None = None,
+              force: bool = False):
+    """Regenerate the generator's icons into an existing file.
+
+    An icon whose source tag matches its current digest is carried over
+    without rendering. Any other icon is rendered and compared with the
+    file's pixels: identical ones only get their tag rewritten, different
+    ones are replaced. Returns (text, rendered) where rendered lists the
+    icons whose pixels actually changed.
+    """
+    replacements = {}
+    rendered = []
+    for name, (digest, render) in icon_sources(size, flip, paths).items():
+        old = existing.icons.get(name)
+        fits = old is not None and old.plane.shape == (size, size)
+        if fits and not force and old.source == digest[:16]:
+            continue
+        img = render()
+        same = fits and old.descriptor_span is not None and np.array_equal(np.asarray(img), old.plane)
+        if same and old.source == digest[:16]:
+            continue
+        comment = ICON_COMMENTS.get(name, f"{name} icon") + source_tag(digest)
+        replacements[name] = (f"// {comment}\n" + alpha_to_c_array(img, f"{name}_map"),
+                              icon_descriptor(name, size))
+        if not same:
+            rendered.append(name)
+    return existing.render(replacements), rendered
+
+
+# ---------------------------------------------------------------------------
+# Tiled output (shared tiles across icons)
+# ---------------------------------------------------------------------------
+
+def tile_planes(planes: dict[str, np.ndarray], tile: int):
+    """Split alpha planes into tile x tile blocks and store each distinct block once.
+
+    Returns (pool, indices): pool is a (n, tile * tile) uint8 array whose
+    entry 0 is always the all-zero tile, indices maps icon name to its
+    row-major tile-index grid. Planes whose size is not a multiple of tile
+    are zero-padded on the right/bottom.
+    """
+    seen = {bytes(tile * tile): 0}
+    pool = [np.zeros(tile * tile, dtype=np.uint8)]
+    indices = {}
+    for name, plane in planes.items():
+        h, w = plane.shape
+        rows, cols = -(-h // tile), -(-w // tile)
+        padded = np.zeros((rows * tile, cols * tile), dtype=np.uint8)
+        padded[:h, :w] = plane
+        blocks = padded.reshape(rows, tile, cols, tile).swapaxes(1, 2).reshape(-1, tile * tile)
+        grid = np.empty(len(blocks), dtype=np.uint32)
+        for i, block in enumerate(blocks):
+            key = block.tobytes()
+            idx = seen.get(key)
+            if idx is None:
+                idx = seen[key] = len(pool)
+                pool.append(block)
+            grid[i] = idx
+        indices[name] = grid.reshape(rows, cols)
+    return np.array(pool), indices
+
+
+def tiled_flash(planes: dict[str, np.ndarray], tile: int) -> dict:
+    """Flash cost of the tiled layout against raw A8 for the same planes.
+
+    ram is the .bss the expanded maps take at run time: the raw A8 size,
+    which the raw layout keeps in flash instead.
+    """
+    pool, indices = tile_planes(planes, tile)
+    index_bytes = 1 if len(pool) <= 256 else 2
+    raw = sum(plane.size for plane in planes.values())
+    pool_bytes = pool.size
+    index_total = sum(grid.size for grid in indices.values()) * index_bytes
+    return {
+        "icons": len(planes),
+        "raw": raw,
+        "tiles": len(pool),
+        "pool": pool_bytes,
+        "index": index_total,
+        "tiled": pool_bytes + index_total,
+        "ram": raw,
+    }
+
+
+def generate_tiled_cpp(planes: dict[str, np.ndarray], tile: int, header: str) -> tuple[str, str]:
+    """Generate (cpp, h) sources that keep only the tile pool in flash.
+
+    The icons are expanded into RAM maps (their raw A8 size in .bss) by
+    ui_icons_untile(), which the header declares next to the descriptors
+    and which must be called before LVGL draws any icon; the descriptors
+    point at those RAM maps, so ui.cpp needs no other change.
+    """
+    for name, plane in planes.items():
+        h, w = plane.shape
+        if w != h:
+            raise ValueError(f"{name}: tiled icons must be square, got {w}x{h}")
+
+    ram = sum(plane.size for plane in planes.values())
+    h_parts = [
+        "#pragma once",
+        "",
+        "#include <lvgl.h>",
+        "",
+        "// Alpha icons stored as shared tiles, expanded into LVGL alpha maps (A8) in RAM",
+        f"// ({ram} bytes of .bss) by ui_icons_untile(). Call it once before drawing any icon:",
+        "// until then every icon renders blank.",
+        "",
+    ]
+    h_parts += [f"extern const lv_img_dsc_t icon_{name};" for name in planes]
+    h_parts += ["", "void ui_icons_untile(void);", ""]
+
+    pool, indices = tile_planes(planes, tile)
+    index_type = "uint8_t" if len(pool) <= 256 else "uint16_t"
+
+    parts = [
+        f'#include "{header}"',
+        "",
+        "#include <string.h>",
+        "",
+        f"// Icons stored as a shared pool of {tile}x{tile} alpha tiles plus per-icon tile",
+        "// index tables; ui_icons_untile() expands them into LVGL alpha maps (LV_IMG_CF_ALPHA_8BIT)",
+        "// MDI icons: Apache 2.0 license, https://pictogrammers.com/library/mdi/",
+        "",
+        f"#define ICON_TILE {tile}",
+        "",
+        f"static const uint8_t icon_tile_pool[{len(pool)}][ICON_TILE * ICON_TILE] = {{",
     ]
+    for block in pool:
+        parts.append("    {" + ",".join(f"{p:>3}" for p in block) + "},")
+    parts.append("};")
+    parts.append("")
+
+    for name, grid in indices.items():
+        rows, cols = grid.shape
+        parts.append(f"static const {index_type} {name}_tiles[{rows} * {cols}] = {{")
+        for row in grid:
+            parts.append("    " + ",".join(f"{i:>3}" for i in row) + ",")
+        parts.append("};")
+        parts.append("")
+
+    for name, plane in planes.items():
+        h, w = plane.shape
+        parts.append(f"static uint8_t {name}_map[{w} * {h}];")
+    parts.append("")
+
+    parts.append(textwrap.dedent(f"""\
+        static void untile(uint8_t *dst, const {index_type} *index, int w, int h)
+        {{
+            const int cols = (w + ICON_TILE - 1) / ICON_TILE;
+            for (int y = 0; y < h; y++) {{
+                for (int x = 0; x < w; x += ICON_TILE) {{
+                    const uint8_t *src = icon_tile_pool[index[(y / ICON_TILE) * cols + x / ICON_TILE]];
+                    const int n = w - x < ICON_TILE ? w - x : ICON_TILE;
+                    memcpy(dst + y * w + x, src + (y % ICON_TILE) * ICON_TILE, n);
+                }}
+            }}
+        }}
+        """))
+    parts.append("void ui_icons_untile(void)")
+    parts.append("{")
+    for name, plane in planes.items():
+        h, w = plane.shape
+        parts.append(f"    untile({name}_map, {name}_tiles, {w}, {h});")
+    parts.append("}")
+    parts.append("")
 
     parts.append("// LVGL image descriptors")
-    for dsc_name, data_name in descriptors:
+    for name, plane in planes.items():
+        parts.append(icon_descriptor(name, plane.shape[0]))
+        parts.append("")
+
+    return "\n".join(parts), "\n".join(h_parts)
+
+
+def icon_family(count: int, size: int, flip: bool) -> dict[str, np.ndarray]:
+    """Render count vehicle-light icons for the tiling report.
+
+    Beyond the generator's own icons, variants reuse the shared headlamp
+    body with a random mix of the beam subpaths from MDI_PATHS, which is how
+    a real lamp icon family differs from icon to icon.
+    """
+    import random
+
+    planes = {name: np.asarray(render())
+              for name, (_, render) in icon_sources(size, flip).items()}
+    subpaths = {name: re.findall(r"M[^M]*", path_d) for name, path_d in MDI_PATHS.items()}
+    body = "".join(subpaths["fog"][:2])
+    beams = sorted({s for parts in subpaths.values() for s in parts[2:]})
+    rng = random.Random(0)
+    while len(planes) < count:
+        path_d = body + "".join(rng.sample(beams, rng.randint(1, 3)))
+        plane = np.asarray(svg_path_to_alpha(path_d, size, flip_h=rng.random() < 0.5))
+        planes[f"variant_{len(planes)}"] = plane
+    return dict(list(planes.items())[:count])
+
+
+def tile_report(count: int, sizes: list[int], tiles: list[int], flip: bool,
+                extra: dict[str, np.ndarray] | None = None):
+    """Print raw A8 versus tiled flash, and the tiled layout's .bss, for an
+    icon family at several sizes.
+
+    extra holds planes imported from an existing file (e.g. hand-added
+    icons); they are resampled to each size with Pillow.
+    """
+    print(f"{'size':>5} {'tile':>5} {'icons':>6} {'raw A8':>9} {'tiles':>6} "
+          f"{'pool':>8} {'index':>7} {'tiled':>8} {'saved':>7} {'RAM':>8}")
+    for size in sizes:
+        planes = icon_family(count - len(extra or {}), size, flip)
+        for name, plane in (extra or {}).items():
+            img = Image.fromarray(plane)
+            if img.size != (size, size):
+                img = img.resize((size, size), Image.LANCZOS)
+            planes[name] = np.asarray(img)
+        for tile in tiles:
+            r = tiled_flash(planes, tile)
+            saved = 1 - r["tiled"] / r["raw"]
+            print(f"{size:>5} {tile:>5} {r['icons']:>6} {r['raw']:>9} {r['tiles']:>6} "
+                  f"{r['pool']:>8} {r['index']:>7} {r['tiled']:>8} {saved:>7.1%} {r['ram']:>8}")
+
+
+# ---------------------------------------------------------------------------
+# RLE alpha streams
+# ---------------------------------------------------------------------------
+#
+# Each row is encoded on its own, so a band of rows can be decoded without
+# touching the rest of the icon. A row is a sequence of control bytes, the
+# top two bits selecting the op and the low six holding count - 1:
+#
+#   00nnnnnn            count pixels of 0x00
+#   01nnnnnn            count pixels of 0xFF
+#   10nnnnnn  v         count pixels of v
+#   11nnnnnn  v0 .. vn  count literal pixels
+#
+# rows[y] is the byte offset of row y in the stream; rows[h] is its length.
+
+RLE_ZERO = 0x00
+RLE_FULL = 0x40
+RLE_RUN = 0x80
+RLE_LITERAL = 0xC0
+RLE_MAX = 64
+
+RUN_RE = re.compile(rb"(.)\1*", re.S)
+
+
+def rle_encode_row(row: bytes, out: bytearray):
+    """Append the RLE encoding of one row of alpha values to out."""
+    literal = bytearray()
+
+    def flush():
+        for i in range(0, len(literal), RLE_MAX):
+            chunk = literal[i:i + RLE_MAX]
+            out.append(RLE_LITERAL | (len(chunk) - 1))
+            out.extend(chunk)
+        literal.clear()
+
+    for m in RUN_RE.finditer(row):
+        v = row[m.start()]
+        n = m.end() - m.start()
+        if v in (0x00, 0xFF):
+            if n == 1 and literal:
+                literal.append(v)
+                continue
+            op = RLE_ZERO if v == 0x00 else RLE_FULL
+        elif n >= 3:
+            op = RLE_RUN
+        else:
+            literal += row[m.start():m.end()]
+            continue
+        flush()
+        while n:
+            k = min(n, RLE_MAX)
+            out.append(op | (k - 1))
+            if op == RLE_RUN:
+                out.append(v)
+            n -= k
+    flush()
+
+
+def rle_encode(plane: np.ndarray) -> tuple[bytes, list[int]]:
+    """Encode an alpha plane; returns (stream, row offsets incl. the end)."""
+    out = bytearray()
+    rows = []
+    for row in np.ascontiguousarray(plane, dtype=np.uint8):
+        rows.append(len(out))
+        rle_encode_row(row.tobytes(), out)
+    rows.append(len(out))
+    return bytes(out), rows
+
+
+def rle_decode_rows(data: bytes, rows: list[int], w: int, y0: int, y1: int,
+                    dst: bytearray | None = None, stride: int | None = None,
+                    offset: int = 0) -> bytearray:
+    """Reference decoder: expand rows y0..y1-1 into dst.
+
+    Row y0 lands at dst[offset:offset + w], each following row stride bytes
+    further on, so an icon can be drawn straight into a band of a larger
+    buffer (e.g. the 320x40 LVGL draw buffer). Mirrors icon_rle_decode() in
+    the generated C.
+    """
+    if stride is None:
+        stride = w
+    if dst is None:
+        dst = bytearray(offset + (y1 - y0) * stride)
+    p = rows[y0]
+    for y in range(y0, y1):
+        pos = offset + (y - y0) * stride
+        end = pos + w
+        while pos < end:
+            c = data[p]
+            n = (c & 0x3F) + 1
+            op = c & 0xC0
+            p += 1
+            if op == RLE_ZERO:
+                dst[pos:pos + n] = bytes(n)
+            elif op == RLE_FULL:
+                dst[pos:pos + n] = b"\xff" * n
+            elif op == RLE_RUN:
+                dst[pos:pos + n] = data[p:p + 1] * n
+                p += 1
+            else:
+                dst[pos:pos + n] = data[p:p + n]
+                p += n
+            pos += n
+        if pos != end:
+            raise ValueError(f"row {y} decodes to {pos - end + w} pixels, expected {w}")
+    return dst
+
+
+def rle_decode(data: bytes, rows: list[int], w: int, h: int) -> np.ndarray:
+    """Decode a whole icon back into an (h, w) plane."""
+    return np.frombuffer(rle_decode_rows(data, rows, w, 0, h), dtype=np.uint8).reshape(h, w)
+
+
+def rle_check(planes: dict[str, np.ndarray], band: int = 40, width: int = 320) -> list[str]:
+    """Round-trip every plane, whole and band by band; returns failure messages.
+
+    The band pass places the icon at an odd offset in a width x band buffer
+    and decodes only the rows that fall inside each band, like a display
+    flush would.
+    """
+    errors = []
+    for name, plane in planes.items():
+        h, w = plane.shape
+        data, rows = rle_encode(plane)
+        if not np.array_equal(rle_decode(data, rows, w, h), plane):
+            errors.append(f"{name}: full decode differs")
+            continue
+        top, left = 17, width - w - 3
+        screen = np.zeros((top + h + band, width), dtype=np.uint8)
+        screen[top:top + h, left:left + w] = plane
+        for y_band in range(0, screen.shape[0], band):
+            buf = bytearray(band * width)
+            y0 = max(top, y_band) - top
+            y1 = min(top + h, y_band + band) - top
+            if y0 < y1:
+                rle_decode_rows(data, rows, w, y0, y1, buf, width,
+                                (top + y0 - y_band) * width + left)
+            got = np.frombuffer(buf, dtype=np.uint8).reshape(band, width)
+            want = screen[y_band:y_band + band]
+            if not np.array_equal(got[:len(want)], want):
+                errors.append(f"{name}: band at y={y_band} differs")
+                break
+    return errors
+
+
+def rle_report(planes: dict[str, np.ndarray]):
+    """Print per-icon and total compression against raw A8."""
+    print(f"{'icon':<16} {'raw A8':>7} {'stream':>7} {'index':>6} {'total':>7} {'ratio':>6}")
+    raw_total = rle_total = 0
+    for name, plane in planes.items():
+        data, rows = rle_encode(plane)
+        total = len(data) + 2 * len(rows)
+        raw_total += plane.size
+        rle_total += total
+        print(f"{name:<16} {plane.size:>7} {len(data):>7} {2 * len(rows):>6} {total:>7} "
+              f"{plane.size / total:>5.2f}x")
+    print(f"{'all':<16} {raw_total:>7} {'':>7} {'':>6} {rle_total:>7} {raw_total / rle_total:>5.2f}x")
+
+
+def rle_bench(planes: dict[str, np.ndarray], seconds: float = 1.0):
+    """Print encode, full-decode and band-decode throughput in raw pixel MB/s."""
+    import time
+
+    encoded = {name: rle_encode(plane) for name, plane in planes.items()}
+    pixels = sum(plane.size for plane in planes.values())
+    band = bytearray(320 * 40)
+
+    def run(label, fn, per_pass):
+        passes = 0
+        start = time.perf_counter()
+        while True:
+            fn()
+            passes += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= seconds:
+                break
+        print(f"{label:<24} {passes * per_pass / elapsed / 1e6:8.2f} MB/s  "
+              f"({elapsed / passes * 1e6:.0f} us per pass)")
+
+    def encode():
+        for plane in planes.values():
+            rle_encode(plane)
+
+    def decode():
+        for plane, (data, rows) in zip(planes.values(), encoded.values()):
+            h, w = plane.shape
+            rle_decode_rows(data, rows, w, 0, h)
+
+    band_pixels = 0
+    for plane in planes.values():
+        band_pixels += min(plane.shape[0], 40) * plane.shape[1]
+
+    def decode_band():
+        for plane, (data, rows) in zip(planes.values(), encoded.values()):
+            h, w = plane.shape
+            rle_decode_rows(data, rows, w, 0, min(h, 40), band, 320, 0)
+
+    run("encode", encode, pixels)
+    run("decode (whole icon)", decode, pixels)
+    run("decode (40-row band)", decode_band, band_pixels)
+
+
+def generate_rle_cpp(planes: dict[str, np.ndarray], header: str) -> tuple[str, str]:
+    """Generate (cpp, h) sources holding the icons as RLE streams.
+
+    icon_rle_decode(icon, y0, y1, dst, stride) expands rows y0..y1-1 into
+    dst, advancing stride bytes per row, so a draw callback can fill just
+    the rows of the current band.
+    """
+    h_parts = [
+        "#pragma once",
+        "",
+        "#include <stdint.h>",
+        "",
+        "// Alpha icons as row-indexed RLE streams, see generate_icons.py for the format",
+        "",
+        "typedef struct {",
+        "    uint16_t w;",
+        "    uint16_t h;",
+        "    const uint16_t *rows;  // h + 1 byte offsets into data",
+        "    const uint8_t *data;",
+        "} icon_rle_t;",
+        "",
+    ]
+    h_parts += [f"extern const icon_rle_t icon_{name}_rle;" for name in planes]
+    h_parts += [
+        "",
+        "void icon_rle_decode(const icon_rle_t *icon, int y0, int y1, uint8_t *dst, int stride);",
+        "",
+    ]
+
+    parts = [
+        f'#include "{header}"',
+        "",
+        "#include <string.h>",
+        "",
+        "// MDI icons: Apache 2.0 license, https://pictogrammers.com/library/mdi/",
+        "",
+    ]
+    for name, plane in planes.items():
+        h, w = plane.shape
+        data, rows = rle_encode(plane)
+        if rows[-1] > 0xFFFF:
+            raise ValueError(f"{name}: RLE stream of {rows[-1]} bytes does not fit uint16 row offsets")
+        comment = ICON_COMMENTS.get(name, f"{name} icon")
+        parts.append(f"// {comment}: {w * h} -> {len(data) + 2 * len(rows)} bytes")
+        parts.append(f"static const uint16_t {name}_rows[{h} + 1] = {{")
+        for i in range(0, len(rows), 16):
+            parts.append("    " + ",".join(f"{r:>5}" for r in rows[i:i + 16]) + ",")
+        parts.append("};")
+        parts.append(f"static const uint8_t {name}_rle[{len(data)}] = {{")
+        for y in range(h):
+            row = data[rows[y]:rows[y + 1]]
+            parts.append("    " + ",".join(f"{p:>3}" for p in row) + ",")
+        parts.append("};")
+        parts.append(f"const icon_rle_t icon_{name}_rle = {{ {w}, {h}, {name}_rows, {name}_rle }};")
+        parts.append("")
+
+    parts.append(textwrap.dedent("""\
+        void icon_rle_decode(const icon_rle_t *icon, int y0, int y1, uint8_t *dst, int stride)
+        {
+            const uint8_t *p = icon->data + icon->rows[y0];
+            for (int y = y0; y < y1; y++, dst += stride) {
+                uint8_t *out = dst;
+                uint8_t *end = dst + icon->w;
+                while (out < end) {
+                    const uint8_t c = *p++;
+                    const int n = (c & 0x3F) + 1;
+                    switch (c & 0xC0) {
+                    case 0x00: memset(out, 0x00, n); break;
+                    case 0x40: memset(out, 0xFF, n); break;
+                    case 0x80: memset(out, *p++, n); break;
+                    default:   memcpy(out, p, n); p += n; break;
+                    }
+                    out += n;
+                }
+            }
+        }
+        """))
+    return "\n".join(parts), "\n".join(h_parts)
+
+
+# ---------------------------------------------------------------------------
+# Animations (keyframe + delta rectangles)
+# ---------------------------------------------------------------------------
+
+def draw_hazard_frame(size: int, flip_h: bool = False, level: int = 255) -> Image.Image:
+    """Hazard triangle whose exclamation mark is drawn at alpha level."""
+    img = Image.new("L", (size, size), 0)
+    draw = ImageDraw.Draw(img)
+    s = size / 48.0
+
+    outline = [(24 * s, 4 * s), (45 * s, 42 * s), (3 * s, 42 * s)]
+    draw.polygon(outline, fill=255)
+    inner = [(24 * s, 12 * s), (38 * s, 38 * s), (10 * s, 38 * s)]
+    draw.polygon(inner, fill=0)
+
+    if level:
+        draw.rectangle([int(22 * s), int(18 * s), int(26 * s), int(30 * s)], fill=level)
+        draw.rectangle([int(22 * s), int(32 * s), int(26 * s), int(35 * s)], fill=level)
+
+    if flip_h:
+        img = img.transpose(Image.FLIP_LEFT_RIGHT)
+    return img
+
+
+def draw_link_frame(size: int, flip_h: bool = False, bars: int = 4) -> Image.Image:
+    """Four signal bars with the first `bars` lit and the rest dimmed."""
+    img = Image.new("L", (size, size), 0)
+    draw = ImageDraw.Draw(img)
+    s = size / 48.0
+
+    bar_w = int(7 * s)
+    gap = int(4 * s)
+    left = (size - (4 * bar_w + 3 * gap)) // 2
+    bottom = int(42 * s)
+    for i in range(4):
+        x = left + i * (bar_w + gap)
+        top = bottom - int((10 + 9 * i) * s)
+        draw.rectangle([x, top, x + bar_w - 1, bottom], fill=255 if i < bars else 60)
+
+    if flip_h:
+        img = img.transpose(Image.FLIP_LEFT_RIGHT)
+    return img
+
+
+# name -> (frame period in ms, frame sources). A frame source is either MDI
+# path data or a callable (size, flip_h) -> Image for parameterized shapes.
+ANIMATIONS = {
+    "hazard_blink": (125, [
+        lambda size, flip_h, level=level: draw_hazard_frame(size, flip_h, level)
+        for level in (255, 255, 160, 0, 0, 160)
+    ]),
+    "link_search": (250, [
+        lambda size, flip_h, bars=bars: draw_link_frame(size, flip_h, bars)
+        for bars in (0, 1, 2, 3, 4)
+    ]),
+}
+
+
+def render_frames(frames: list, size: int, flip: bool) -> list[np.ndarray]:
+    planes = []
+    for frame in frames:
+        if isinstance(frame, str):
+            img = svg_path_to_alpha(frame, size, flip_h=flip)
+        else:
+            img = frame(size, flip)
+        planes.append(np.asarray(img, dtype=np.uint8))
+    return planes
+
+
+def changed_rects(prev: np.ndarray, cur: np.ndarray, cell: int = 8) -> list[tuple[int, int, int, int]]:
+    """Rectangles (x, y, w, h) covering every pixel that differs.
+
+    Differences are first marked on a cell x cell grid; dirty cells are
+    merged into horizontal spans and spans with the same columns on
+    consecutive grid rows are merged vertically. Each rectangle is then
+    shrunk to the bounding box of the pixels that actually changed in it.
+    """
+    diff = prev != cur
+    h, w = diff.shape
+    rows, cols = -(-h // cell), -(-w // cell)
+    padded = np.zeros((rows * cell, cols * cell), dtype=bool)
+    padded[:h, :w] = diff
+    dirty = padded.reshape(rows, cell, cols, cell).any(axis=(1, 3))
+
+    spans = []      # [c0, c1, r0, r1) in grid units
+    open_spans = {}
+    for r in range(rows):
+        row = np.concatenate(([False], dirty[r], [False]))
+        edges = np.flatnonzero(row[1:] != row[:-1])
+        current = {}
+        for c0, c1 in zip(edges[::2], edges[1::2]):
+            span = open_spans.pop((c0, c1), None)
+            if span is None:
+                span = [c0, c1, r, r + 1]
+                spans.append(span)
+            else:
+                span[3] = r + 1
+            current[(c0, c1)] = span
+        open_spans = current
+
+    rects = []
+    for c0, c1, r0, r1 in spans:
+        y0, x0 = r0 * cell, c0 * cell
+        block = diff[y0:r1 * cell, x0:c1 * cell]
+        ys = np.flatnonzero(block.any(axis=1))
+        xs = np.flatnonzero(block.any(axis=0))
+        rects.append((x0 + int(xs[0]), y0 + int(ys[0]),
+                      int(xs[-1] - xs[0]) + 1, int(ys[-1] - ys[0]) + 1))
+    return rects
+
+
+def encode_animation(planes: list[np.ndarray], cell: int = 8):
+    """Delta-encode a looping frame sequence.
+
+    Returns (keyframe, deltas) where keyframe is frame 0 and deltas[i] lists
+    (x, y, w, h, pixels) rectangles that turn frame i - 1 into frame i;
+    deltas[0] closes the loop from the last frame back to the first.
+    """
+    deltas = []
+    for i, cur in enumerate(planes):
+        prev = planes[i - 1]
+        deltas.append([(x, y, w, h, cur[y:y + h, x:x + w].tobytes())
+                       for x, y, w, h in changed_rects(prev, cur, cell)])
+    return planes[0], deltas
+
+
+def apply_delta(plane: np.ndarray, delta: list):
+    """Reference playback step: write one frame's rectangles into plane in place."""
+    for x, y, w, h, pixels in delta:
+        plane[y:y + h, x:x + w] = np.frombuffer(pixels, dtype=np.uint8).reshape(h, w)
+
+
+def anim_check(planes: list[np.ndarray], cell: int = 8) -> bool:
+    """Play two full loops from the keyframe and compare every frame."""
+    keyframe, deltas = encode_animation(planes, cell)
+    canvas = keyframe.copy()
+    for step in range(1, 2 * len(planes) + 1):
+        i = step % len(planes)
+        apply_delta(canvas, deltas[i])
+        if not np.array_equal(canvas, planes[i]):
+            return False
+    return True
+
+
+def anim_report(size: int, flip: bool, cell: int = 8):
+    """Print flash and per-frame update bytes against storing full frames."""
+    print(f"{'animation':<14} {'frames':>6} {'full A8':>8} {'key+delta':>10} {'ratio':>6}  "
+          f"changed bytes per frame")
+    for name, (_, frames) in ANIMATIONS.items():
+        planes = render_frames(frames, size, flip)
+        keyframe, deltas = encode_animation(planes, cell)
+        full = sum(plane.size for plane in planes)
+        per_frame = [sum(len(r[4]) for r in delta) for delta in deltas]
+        encoded = keyframe.size + sum(per_frame) + 6 * sum(len(d) for d in deltas) + 2 * (len(deltas) + 1)
+        print(f"{name:<14} {len(planes):>6} {full:>8} {encoded:>10} {full / encoded:>5.2f}x  "
+              f"{per_frame}")
+
+
+def generate_anim_cpp(size: int, flip: bool, header: str, cell: int = 8) -> tuple[str, str]:
+    """Generate (cpp, h) sources for every entry in ANIMATIONS.
+
+    Playback keeps one A8 map in RAM per animation: copy the keyframe in
+    once, then on each tick advance the frame index and call
+    icon_anim_step(), which writes only that frame's rectangles (and can
+    hand them to lv_obj_invalidate_area()).
+    """
+    if size > 0xFF:
+        raise ValueError(f"--size {size} does not fit the uint8 rectangle fields (max 255)")
+    h_parts = [
+        "#pragma once",
+        "",
+        "#include <stdint.h>",
+        "",
+        "// Animated alpha icons: one keyframe plus per-frame changed rectangles",
+        "",
+        "typedef struct {",
+        "    uint8_t x, y, w, h;",
+        "    uint16_t offset;  // into icon_anim_t.pixels",
+        "} icon_anim_rect_t;",
+        "",
+        "typedef struct {",
+        "    uint16_t w;",
+        "    uint16_t h;",
+        "    uint16_t frame_ms;",
+        "    uint16_t frame_count;",
+        "    const uint8_t *keyframe;          // frame 0, w * h bytes",
+        "    const uint16_t *frame_rects;      // frame_count + 1 indices into rects",
+        "    const icon_anim_rect_t *rects;    // frame i turns frame i - 1 into i; frame 0 loops",
+        "    const uint8_t *pixels;",
+        "} icon_anim_t;",
+        "",
+    ]
+    parts = [
+        f'#include "{header}"',
+        "",
+        "#include <string.h>",
+        "",
+    ]
+    for name, (frame_ms, frames) in ANIMATIONS.items():
+        planes = render_frames(frames, size, flip)
+        if not anim_check(planes, cell):
+            raise ValueError(f"{name}: delta playback does not reproduce the frames")
+        keyframe, deltas = encode_animation(planes, cell)
+        h, w = keyframe.shape
+
+        pixels = bytearray()
+        rects = []
+        frame_rects = [0]
+        for delta in deltas:
+            for x, y, rw, rh, data in delta:
+                rects.append((x, y, rw, rh, len(pixels)))
+                pixels += data
+            frame_rects.append(len(rects))
+        if len(pixels) > 0xFFFF:
+            raise ValueError(f"{name}: {len(pixels)} delta bytes do not fit uint16 offsets")
+
+        h_parts.append(f"extern const icon_anim_t icon_{name};")
+        parts.append(f"// {name}: {len(planes)} frames, {frame_ms} ms each")
+        parts.append(alpha_to_c_array(Image.fromarray(keyframe), f"{name}_key"))
+        parts.append(f"static const uint16_t {name}_frame_rects[{len(frame_rects)}] = {{")
+        parts.append("    " + ",".join(f"{i:>3}" for i in frame_rects) + ",")
+        parts.append("};")
+        parts.append(f"static const icon_anim_rect_t {name}_rects[{max(len(rects), 1)}] = {{")
+        for x, y, rw, rh, offset in rects or [(0, 0, 0, 0, 0)]:
+            parts.append(f"    {{ {x:>2}, {y:>2}, {rw:>2}, {rh:>2}, {offset:>5} }},")
+        parts.append("};")
+        parts.append(f"static const uint8_t {name}_pixels[{max(len(pixels), 1)}] = {{")
+        for i in range(0, max(len(pixels), 1), w):
+            parts.append("    " + ",".join(f"{p:>3}" for p in (pixels[i:i + w] or b"\0")) + ",")
+        parts.append("};")
         parts.append(textwrap.dedent(f"""\
-            const lv_img_dsc_t {dsc_name} = {{
-                .header = {{
-                    .cf = LV_IMG_CF_ALPHA_8BIT,
-                    .always_zero = 0,
-                    .reserved = 0,
-                    .w = {size},
-                    .h = {size},
-                }},
-                .data_size = {size} * {size},
-                .data = {data_name},
+            const icon_anim_t icon_{name} = {{
+                .w = {w},
+                .h = {h},
+                .frame_ms = {frame_ms},
+                .frame_count = {len(planes)},
+                .keyframe = {name}_key,
+                .frame_rects = {name}_frame_rects,
+                .rects = {name}_rects,
+                .pixels = {name}_pixels,
             }};"""))
         parts.append("")
 
+    h_parts += [
+        "",
+        "// Write frame `frame` (reached from frame - 1, or from the last frame",
+        "// when frame is 0) into map, a w * h A8 buffer with the given stride.",
+        "// Returns the number of rectangles written; *rects points at them.",
+        "int icon_anim_step(const icon_anim_t *anim, int frame, uint8_t *map, int stride,",
+        "                   const icon_anim_rect_t **rects);",
+        "",
+    ]
+    parts.append(textwrap.dedent("""\
+        int icon_anim_step(const icon_anim_t *anim, int frame, uint8_t *map, int stride,
+                           const icon_anim_rect_t **rects)
+        {
+            const int first = anim->frame_rects[frame];
+            const int count = anim->frame_rects[frame + 1] - first;
+            for (int i = 0; i < count; i++) {
+                const icon_anim_rect_t *r = &anim->rects[first + i];
+                const uint8_t *src = anim->pixels + r->offset;
+                for (int y = 0; y < r->h; y++) {
+                    memcpy(map + (r->y + y) * stride + r->x, src, r->w);
+                    src += r->w;
+                }
+            }
+            if (rects) {
+                *rects = &anim->rects[first];
+            }
+            return count;
+        }
+        """))
+    return "\n".join(parts), "\n".join(h_parts)
+
+
+# ---------------------------------------------------------------------------
+# Auto-tuning format, dithering, trim and size per icon
+# ---------------------------------------------------------------------------
+
+PLAN_PATH = os.path.join(SCRIPT_DIR, "icon_plan.json")
+PLAN_VERSION = 1
+
+BAYER4 = np.array([[0, 8, 2, 10],
+                   [12, 4, 14, 6],
+                   [3, 11, 1, 9],
+                   [15, 7, 13, 5]], dtype=np.float64) / 16.0 - 0.5
+
+
+def ssim(a: np.ndarray, b: np.ndarray, win: int = 7) -> float:
+    """Mean structural similarity of two uint8 planes (uniform win x win window)."""
+    a = a.astype(np.float64)
+    b = b.astype(np.float64)
+    c1 = (0.01 * 255) ** 2
+    c2 = (0.03 * 255) ** 2
+
+    def box(x):
+        s = np.pad(x, ((1, 0), (1, 0))).cumsum(0).cumsum(1)
+        return (s[win:, win:] - s[:-win, win:] - s[win:, :-win] + s[:-win, :-win]) / (win * win)
+
+    n = win * win
+    mu_a, mu_b = box(a), box(b)
+    var_a = (box(a * a) - mu_a * mu_a) * n / (n - 1)
+    var_b = (box(b * b) - mu_b * mu_b) * n / (n - 1)
+    cov = (box(a * b) - mu_a * mu_b) * n / (n - 1)
+    s = ((2 * mu_a * mu_b + c1) * (2 * cov + c2)) / ((mu_a ** 2 + mu_b ** 2 + c1) * (var_a + var_b + c2))
+    return float(s.mean())
+
+
+def quantize(plane: np.ndarray, bpp: int, dither: str) -> np.ndarray:
+    """Quantize to 2**bpp alpha levels; returns level indices (uint8)."""
+    levels = (1 << bpp) - 1
+    if bpp == 8:
+        return plane.copy()
+    x = plane.astype(np.float64) * levels / 255.0
+    if dither == "bayer":
+        h, w = plane.shape
+        x = x + np.tile(BAYER4, (-(-h // 4), -(-w // 4)))[:h, :w]
+    elif dither == "fs":
+        h, w = plane.shape
+        out = np.empty((h, w), dtype=np.uint8)
+        for y in range(h):
+            for xx in range(w):
+                v = x[y, xx]
+                q = min(max(int(v + 0.5), 0), levels)
+                out[y, xx] = q
+                e = v - q
+                if xx + 1 < w:
+                    x[y, xx + 1] += e * 7 / 16
+                if y + 1 < h:
+                    if xx > 0:
+                        x[y + 1, xx - 1] += e * 3 / 16
+                    x[y + 1, xx] += e * 5 / 16
+                    if xx + 1 < w:
+                        x[y + 1, xx + 1] += e * 1 / 16
+        return out
+    return np.clip(np.floor(x + 0.5), 0, levels).astype(np.uint8)
+
+
+def dequantize(levels: np.ndarray, bpp: int) -> np.ndarray:
+    """Alpha values LVGL draws for level indices (0..2**bpp - 1)."""
+    if bpp == 8:
+        return levels
+    return (levels.astype(np.uint16) * 255 // ((1 << bpp) - 1)).astype(np.uint8)
+
+
+def pack_levels(levels: np.ndarray, bpp: int) -> bytes:
+    """Pack level indices MSB first with byte-aligned rows (LVGL ALPHA_nBIT)."""
+    if bpp == 8:
+        return levels.tobytes()
+    h, w = levels.shape
+    per_byte = 8 // bpp
+    stride = -(-w // per_byte)
+    padded = np.zeros((h, stride * per_byte), dtype=np.uint8)
+    padded[:, :w] = levels
+    shifts = np.arange(per_byte - 1, -1, -1, dtype=np.uint8) * bpp
+    groups = padded.reshape(h, stride, per_byte) << shifts
+    return np.bitwise_or.reduce(groups, axis=2).astype(np.uint8).tobytes()
+
+
+def symmetric_trim(plane: np.ndarray) -> tuple[int, int]:
+    """Largest (top/bottom, left/right) margins that are fully transparent.
+
+    Margins are taken equally from both sides so a trimmed icon centered in
+    its widget lands on exactly the same pixels as the untrimmed one.
+    """
+    h, w = plane.shape
+    rows = np.flatnonzero(plane.any(axis=1))
+    cols = np.flatnonzero(plane.any(axis=0))
+    if not len(rows):
+        return (h - 1) // 2, (w - 1) // 2
+    return int(min(rows[0], h - 1 - rows[-1])), int(min(cols[0], w - 1 - cols[-1]))
+
+
+def plane_digest(plane: np.ndarray) -> str:
+    return hashlib.sha256(f"{plane.shape}".encode() + plane.tobytes()).hexdigest()
+
+
+def candidate_plane(master: np.ndarray, size: int, bpp: int, dither: str, trim: bool):
+    """Encode master one way; returns (packed bytes, decoded plane at master size, (w, h))."""
+    mh, mw = master.shape
+    if size != mw:
+        img = Image.fromarray(master).resize((size, size * mh // mw), Image.LANCZOS)
+        plane = np.asarray(img)
+    else:
+        plane = master
+    ty, tx = symmetric_trim(plane) if trim else (0, 0)
+    h, w = plane.shape
+    body = plane[ty:h - ty, tx:w - tx]
+    levels = quantize(body, bpp, dither)
+    shown = np.zeros_like(plane)
+    shown[ty:h - ty, tx:w - tx] = dequantize(levels, bpp)
+    if size != mw:
+        # LVGL zooms the smaller image back up; bilinear is its antialiased path
+        shown = np.asarray(Image.fromarray(shown).resize((mw, mh), Image.BILINEAR))
+    return pack_levels(levels, bpp), shown, body.shape[::-1]
+
+
+def tune_icon(job):
+    """Search every candidate for one icon; returns (name, plan entry)."""
+    name, master, settings = job
+    best = None
+    for size in sorted({master.shape[1], *settings["sizes"]}, reverse=True):
+        for bpp in settings["bpp"]:
+            for dither in (["none"] if bpp == 8 else settings["dither"]):
+                data, shown, (w, h) = candidate_plane(master, size, bpp, dither, settings["trim"])
+                score = ssim(master, shown)
+                max_err = int(np.abs(master.astype(np.int16) - shown).max())
+                if score < settings["min_ssim"]:
+                    continue
+                key = (len(data), -score, -bpp, dither, -size)
+                if best is None or key < best[0]:
+                    best = (key, {"size": size, "bpp": bpp, "dither": dither, "w": w, "h": h,
+                                  "bytes": len(data), "ssim": round(score, 5), "max_err": max_err})
+    if best is None:
+        # Nothing meets the floor: fall back to the lossless A8 master
+        data, shown, (w, h) = candidate_plane(master, master.shape[1], 8, "none", settings["trim"])
+        best = (None, {"size": master.shape[1], "bpp": 8, "dither": "none", "w": w, "h": h,
+                       "bytes": len(data), "ssim": 1.0, "max_err": 0})
+    entry = best[1]
+    entry["master"] = master.shape[1]
+    entry["source"] = plane_digest(master)
+    return name, entry
+
+
+def load_plan(path: str) -> dict:
+    try:
+        with open(path) as f:
+            plan = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return plan if plan.get("version") == PLAN_VERSION else {}
+
+
+def save_plan(path: str, plan: dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(plan, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+def tune(masters: dict[str, np.ndarray], settings: dict, plan: dict | None = None,
+         jobs: int | None = None) -> tuple[dict, list[str]]:
+    """Return (plan, searched) reusing entries of plan whose source and settings match."""
+    from concurrent.futures import ProcessPoolExecutor
+
+    old = plan if plan and plan.get("settings") == settings else {}
+    icons = {}
+    todo = []
+    for name, master in masters.items():
+        entry = old.get("icons", {}).get(name)
+        if entry is not None and entry.get("source") == plane_digest(master):
+            icons[name] = entry
+        else:
+            todo.append((name, master, settings))
+    if len(todo) > 1 and jobs != 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(tune_icon, todo))
+    else:
+        results = [tune_icon(job) for job in todo]
+    icons.update(results)
+    return ({"version": PLAN_VERSION, "settings": settings,
+             "icons": {name: icons[name] for name in masters}},
+            [name for name, _, _ in todo])
+
+
+def generate_planned_cpp(masters: dict[str, np.ndarray], plan: dict) -> str:
+    """Generate ui_icons.cpp with every icon encoded as its plan entry says."""
+    settings = plan["settings"]
+    parts = [
+        '#include "ui_icons.h"',
+        "",
+        "// Alpha map icons encoded per scripts/icon_plan.json (generate_icons.py --tune)",
+        "// Icons can be recolored via lv_obj_set_style_img_recolor()",
+        "// MDI icons: Apache 2.0 license, https://pictogrammers.com/library/mdi/",
+        "",
+    ]
+    descriptors = []
+    zooms = []
+    for name, master in masters.items():
+        e = plan["icons"][name]
+        data, _, (w, h) = candidate_plane(master, e["size"], e["bpp"], e["dither"], settings["trim"])
+        stride = len(data) // h
+        comment = ICON_COMMENTS.get(name, f"{name} icon")
+        parts.append(f"// {comment}: A{e['bpp']} {w}x{h}, dither {e['dither']}, SSIM {e['ssim']}")
+        parts.append(f"static const uint8_t {name}_map[{len(data)}] = {{")
+        for y in range(h):
+            parts.append("    " + ",".join(f"{p:>3}" for p in data[y * stride:(y + 1) * stride]) + ",")
+        parts.append("};")
+        parts.append("")
+        descriptors.append(icon_descriptor(name, w, h, e["bpp"]))
+        if e["size"] != master.shape[1]:
+            zooms.append(f"// icon_{name}: lv_img_set_zoom(img, {round(256 * master.shape[1] / e['size'])})")
+
+    parts.append("// LVGL image descriptors")
+    parts.extend(zooms)
+    for descriptor in descriptors:
+        parts.append(descriptor)
+        parts.append("")
     return "\n".join(parts)
 
 
+def print_plan(plan: dict, searched: list[str], budget: int | None):
+    raw = 0
+    total = 0
+    print(f"{'icon':<16} {'fmt':>4} {'size':>5} {'w x h':>7} {'dither':>6} {'bytes':>6} "
+          f"{'SSIM':>7} {'maxerr':>6}")
+    for name, e in plan["icons"].items():
+        mark = "*" if name in searched else " "
+        print(f"{name:<15}{mark} {'A' + str(e['bpp']):>4} {e['size']:>5} {e['w']:>3}x{e['h']:<3} "
+              f"{e['dither']:>6} {e['bytes']:>6} {e['ssim']:>7.4f} {e['max_err']:>6}")
+        total += e["bytes"]
+        raw += e["master"] ** 2
+    print(f"total {total} bytes (untrimmed A8: {raw}); * = searched this run")
+    if budget is not None:
+        verdict = "within" if total <= budget else "OVER"
+        print(f"flash budget {budget} bytes: {verdict}")
+
+
 def main():
     parser = argparse.ArgumentParser(description="Generate LVGL icon arrays from MDI SVG paths")
     parser.add_argument("--size", type=int, default=48, help="Icon size in pixels (default: 48)")
     parser.add_argument("--flip", action="store_true", help="Flip icons horizontally")
     parser.add_argument("--output", type=str, default=None, help="Output file path (default: stdout)")
+    parser.add_argument("--no-merge", action="store_true",
+                        help="Overwrite --output from scratch, dropping icons the generator does not know")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-render every generated icon, ignoring the source tags")
+    parser.add_argument("--tiled", type=int, metavar="TILE", default=None,
+                        help="Write the shared-tile layout with TILE x TILE tiles instead of raw A8 maps")
+    parser.add_argument("--from", dest="source", metavar="CPP", default=None,
+                        help="Take icon planes from an existing A8 ui_icons.cpp (for --tiled, --rle, --tune and the reports)")
+    parser.add_argument("--tile-report", action="store_true",
+                        help="Print raw A8 versus tiled flash for an icon family and exit")
+    parser.add_argument("--report-icons", type=int, default=50, help="Icons in the report family (default: 50)")
+    parser.add_argument("--report-sizes", default="24,32,48,64", help="Icon sizes for the report")
+    parser.add_argument("--report-tiles", default="4,8,16", help="Tile sizes for the report")
+    parser.add_argument("--rle", action="store_true",
+                        help="Write row-indexed RLE streams (and a matching .h next to --output)")
+    parser.add_argument("--rle-report", action="store_true", help="Print RLE compression per icon and exit")
+    parser.add_argument("--rle-bench", action="store_true", help="Print RLE encode/decode throughput and exit")
+    parser.add_argument("--rle-check", action="store_true",
+                        help="Round-trip every icon through the reference RLE decoder and exit")
+    parser.add_argument("--anim", action="store_true",
+                        help="Write the ANIMATIONS as keyframe + delta rectangles (and a .h next to --output)")
+    parser.add_argument("--anim-report", action="store_true",
+                        help="Print animation flash and per-frame update bytes and exit")
+    parser.add_argument("--tune", action="store_true",
+                        help="Pick bpp/dither/trim/size per icon against the A8 master and write --plan")
+    parser.add_argument("--plan", default=PLAN_PATH, help="Per-icon plan file (default: scripts/icon_plan.json)")
+    parser.add_argument("--min-ssim", type=float, default=0.98, help="Quality floor for --tune (default: 0.98)")
+    parser.add_argument("--budget", type=int, default=None, help="Total icon flash budget in bytes for --tune")
+    parser.add_argument("--tune-bpp", default="1,2,4,8", help="Alpha depths to try (default: 1,2,4,8)")
+    parser.add_argument("--tune-dither", default="none,bayer,fs", help="Dithering to try below 8 bpp")
+    parser.add_argument("--tune-sizes", default="",
+                        help="Extra render sizes to try, shown zoomed back up (default: native only)")
+    parser.add_argument("--no-trim", action="store_true", help="Do not trim transparent margins")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes for --tune (default: CPU count)")
     args = parser.parse_args()
 
-    cpp = generate_cpp(args.size, args.flip)
+    if args.anim_report:
+        anim_report(args.size, args.flip)
+        return
+
+    if args.anim:
+        if args.output:
+            header_path = os.path.splitext(args.output)[0] + ".h"
+            cpp, header = generate_anim_cpp(args.size, args.flip, os.path.basename(header_path))
+            with open(args.output, "w") as f:
+                f.write(cpp)
+            with open(header_path, "w") as f:
+                f.write(header)
+            print(f"Written to {args.output} and {header_path}")
+        else:
+            cpp, header = generate_anim_cpp(args.size, args.flip, "ui_icons_anim.h")
+            print(header)
+            print(cpp)
+        return
 
-    if args.output:
-        with open(args.output, "w") as f:
-            f.write(cpp)
-        print(f"Written to {args.output} ({args.size}x{args.size}, flip={args.flip})")
+    imported = IconsCpp.read(args.source) if args.source else None
+
+    if args.tile_report:
+        extra = None
+        if imported is not None:
+            owned = icon_sources(args.size, args.flip)
+            extra = {name: icon.plane for name, icon in imported.icons.items() if name not in owned}
+        tile_report(args.report_icons, [int(v) for v in args.report_sizes.split(",")],
+                    [int(v) for v in args.report_tiles.split(",")], args.flip, extra)
+        return
+
+    if imported is not None:
+        planes = {name: icon.plane for name, icon in imported.icons.items()}
     else:
-        print(cpp)
+        planes = None  # rendered on demand, needs cairosvg
+
+    def current_planes():
+        if planes is not None:
+            return planes
+        return {name: np.asarray(render())
+                for name, (_, render) in icon_sources(args.size, args.flip).items()}
+
+    if args.rle_report or args.rle_bench or args.rle_check:
+        icons = current_planes()
+        if args.rle_report:
+            rle_report(icons)
+        if args.rle_bench:
+            rle_bench(icons)
+        if args.rle_check:
+            errors = rle_check(icons)
+            for error in errors:
+                print(f"FAIL {error}")
+            if errors:
+                sys.exit(1)
+            print(f"RLE round-trip OK for {len(icons)} icons (whole and 40-row bands)")
+        return
+
+    if args.rle:
+        icons = current_planes()
+        errors = rle_check(icons)
+        if errors:
+            sys.exit("RLE round-trip failed: " + "; ".join(errors))
+        if args.output:
+            header_path = os.path.splitext(args.output)[0] + ".h"
+            cpp, header = generate_rle_cpp(icons, os.path.basename(header_path))
+            with open(args.output, "w") as f:
+                f.write(cpp)
+            with open(header_path, "w") as f:
+                f.write(header)
+            print(f"Written to {args.output} and {header_path}")
+        else:
+            cpp, header = generate_rle_cpp(icons, "ui_icons_rle.h")
+            print(header)
+            print(cpp)
+        return
+
+    if args.tune:
+        settings = {
+            "min_ssim": args.min_ssim,
+            "bpp": [int(v) for v in args.tune_bpp.split(",")],
+            "dither": args.tune_dither.split(","),
+            "sizes": [int(v) for v in args.tune_sizes.split(",") if v],
+            "trim": not args.no_trim,
+        }
+        masters = current_planes()
+        plan, searched = tune(masters, settings, load_plan(args.plan), args.jobs)
+        save_plan(args.plan, plan)
+        print_plan(plan, searched, args.budget)
+        total = sum(e["bytes"] for e in plan["icons"].values())
+        if args.budget is not None and total > args.budget:
+            sys.exit(f"plan needs {total} bytes, over the {args.budget} byte budget; "
+                     f"lower --min-ssim or drop icons")
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write(generate_planned_cpp(masters, plan))
+            print(f"Written to {args.output} (plan {args.plan})")
+        return
+
+    if args.tiled:
+        planes = current_planes()
+        r = tiled_flash(planes, args.tiled)
+        summary = (f"{r['tiles']} unique tiles, {r['tiled']} bytes flash vs {r['raw']} raw A8, "
+                   f"plus {r['ram']} bytes .bss for the expanded maps")
+        if args.output:
+            header_path = os.path.splitext(args.output)[0] + ".h"
+            cpp, header = generate_tiled_cpp(planes, args.tiled, os.path.basename(header_path))
+            with open(args.output, "w") as f:
+                f.write(cpp)
+            with open(header_path, "w") as f:
+                f.write(header)
+            print(f"Written to {args.output} and {header_path} ({summary})")
+        else:
+            cpp, header = generate_tiled_cpp(planes, args.tiled, "ui_icons.h")
+            print(header)
+            print(cpp)
+            print(f"// {summary}")
+        return
+
+    if not args.output:
+        print(generate_cpp(args.size, args.flip))
+        return
+
+    if args.no_merge or not os.path.exists(args.output):
+        cpp = generate_cpp(args.size, args.flip)
+        summary = "generated from scratch"
+    else:
+        existing = IconsCpp.read(args.output)
+        cpp, rendered = merge_cpp(existing, args.size, args.flip, force=args.force)
+        kept = [name for name in existing.icons if name not in rendered]
+        for name in kept:
+            h, w = existing.icons[name].plane.shape
+            if (w, h) != (args.size, args.size):
+                print(f"warning: kept icon {name} is {w}x{h}, not {args.size}x{args.size}",
+                      file=sys.stderr)
+        summary = (f"re-rendered: {', '.join(rendered) or 'none'}; "
+                   f"carried over: {', '.join(kept) or 'none'}")
+        if cpp == existing.text:
+            print(f"{args.output} is up to date ({summary})")
+            return
+
+    with open(args.output, "w") as f:
+        f.write(cpp)
+    print(f"Written to {args.output} ({args.size}x{args.size}, flip={args.flip}; {summary})")
 
 
 if __name__ == "__main__":
@@ -5,14 +5,32 @@ Produces:
   hardware/led-driver-board.kicad_pro  — project file
   hardware/led-driver-board.kicad_sch  — schematic
   hardware/led-driver-board.kicad_pcb  — PCB with placed footprints (unrouted)
+                                         and a filled GND pour on B.Cu
+
+With --variants, builds every board variant of a TOML/JSON matrix (see
+hardware/variants.toml) into its own directory instead. With --fp-lib (or
+KICAD8_FOOTPRINT_DIR set), pad geometry comes from the KiCad footprint
+library through kicad_fplib.py instead of the inline pad tables. With
+--panel RxC, writes an R-row by C-column production panel of the board
+(rails, fiducials, mouse-bite tabs) to hardware/panel/.
 
 No external dependencies — uses only Python stdlib.
 """
 
+import argparse
 import json
+import math
+import os
+import random
+import time
 import uuid
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+from kicad_fplib import FootprintLibrary
+from zone_fill import GridIndex, pad_clearance_polygon, subtract, thermal_relief_polygons
+
 # ---------------------------------------------------------------------------
 # Constants
 # ---------------------------------------------------------------------------
@@ -31,31 +49,70 @@ CHANNELS = [
     {"num": 9, "gpio": 26, "name": "Spare 2",    "gate_r": "100", "pd_r": "10K"},
 ]
 
-# Reference counters
-_ref_counters = {}
-
-def _next_ref(prefix):
-    _ref_counters.setdefault(prefix, 0)
-    _ref_counters[prefix] += 1
-    return f"{prefix}{_ref_counters[prefix]}"
-
-def gen_uuid():
-    return str(uuid.uuid4())
+# Output-capable ESP32 GPIOs, in the order extra channels claim them
+CHANNEL_GPIOS = [16, 17, 18, 19, 21, 22, 23, 25, 26, 27, 32, 33, 4, 5, 13, 14]
+
+# Low-side MOSFETs: footprint, symbol pin order and pads (num, rel_x, rel_y, size_x, size_y)
+MOSFET_PARTS = {
+    "AO3400A": {
+        "footprint": "Package_TO_SOT_SMD:SOT-23", "pinout": "GSD",
+        "pads": [("1", -1.1, 0.95, 0.6, 0.7), ("2", 1.1, 0.95, 0.6, 0.7), ("3", 1.1, -0.95, 0.6, 0.7)],
+    },
+    "IRLML6344": {
+        "footprint": "Package_TO_SOT_SMD:SOT-23", "pinout": "GSD",
+        "pads": [("1", -1.1, 0.95, 0.6, 0.7), ("2", 1.1, 0.95, 0.6, 0.7), ("3", 1.1, -0.95, 0.6, 0.7)],
+    },
+    "AOD4184A": {
+        "footprint": "Package_TO_SOT_SMD:TO-252-2", "pinout": "GDS",
+        "pads": [("1", -4.2, -2.28, 2.2, 1.2), ("2", 2.1, 0, 6.4, 5.8), ("3", -4.2, 2.28, 2.2, 1.2)],
+    },
+}
+
+# 2-pin output connector families (pin 1 = +BATT, pin 2 = drain)
+CONNECTORS = {
+    "JST_XH": {
+        "footprint": "Connector_JST:JST_XH_B2B-XH-A_1x02_P2.50mm_Vertical",
+        "pitch": 2.5, "pad": 1.7, "drill": 1.0,
+    },
+    "JST_PH": {
+        "footprint": "Connector_JST:JST_PH_B2B-PH-K_1x02_P2.00mm_Vertical",
+        "pitch": 2.0, "pad": 1.2, "drill": 0.8,
+    },
+    "TERMINAL_5.08": {
+        "footprint": "TerminalBlock:TerminalBlock_bornier-2_P5.08mm",
+        "pitch": 5.08, "pad": 2.6, "drill": 1.3,
+    },
+}
+
+def make_channels(count):
+    """First `count` channels: the named ones from CHANNELS, then spares."""
+    if not 1 <= count <= len(CHANNEL_GPIOS):
+        raise ValueError(f"channel count must be 1..{len(CHANNEL_GPIOS)}, got {count}")
+    channels = [dict(ch) for ch in CHANNELS[:count]]
+    spare = sum(ch["name"].startswith("Spare") for ch in channels)
+    for num in range(len(channels) + 1, count + 1):
+        spare += 1
+        channels.append({"num": num, "gpio": CHANNEL_GPIOS[num - 1], "name": f"Spare {spare}",
+                         "gate_r": "100", "pd_r": "10K"})
+    return channels
 
 # ---------------------------------------------------------------------------
 # Net management
 # ---------------------------------------------------------------------------
 
 class NetManager:
-    def __init__(self):
-        self.nets = {"": 0, "GND": 1, "+BATT": 2, "+5V": 3}
-        self._counter = 4
-        # Pre-register all channel nets
-        for ch in CHANNELS:
-            self.get(f"GPIO_{ch['gpio']}")
-            self.get(f"GATE_{ch['num']}")
-            self.get(f"DRAIN_{ch['num']}")
-        self.get("STATUS_LED")
+    def __init__(self, channels=CHANNELS, prefixes=("",)):
+        self.nets = {"": 0}
+        self._counter = 1
+        # Pre-register all nets, once per board instance when panelized
+        for prefix in prefixes:
+            for name in ("GND", "+BATT", "+5V"):
+                self.get(prefix + name)
+            for ch in channels:
+                self.get(f"{prefix}GPIO_{ch['gpio']}")
+                self.get(f"{prefix}GATE_{ch['num']}")
+                self.get(f"{prefix}DRAIN_{ch['num']}")
+            self.get(f"{prefix}STATUS_LED")
 
     def get(self, name):
         if name not in self.nets:
@@ -63,7 +120,46 @@ class NetManager:
             self._counter += 1
         return self.nets[name]
 
-NET_MGR = NetManager()
+# ---------------------------------------------------------------------------
+# Design context
+# ---------------------------------------------------------------------------
+
+class DesignContext:
+    """All mutable state of one generator run.
+
+    Every generator function takes the context explicitly, so separate
+    designs never share reference counters or nets and can be built side
+    by side in threads or processes. Passing a seed makes the UUIDs, and
+    with them the whole output, reproducible.
+    """
+
+    def __init__(self, channels=CHANNELS, mosfet="AO3400A", connector="JST_XH",
+                 board_size=None, project="led-driver-board", seed=None, fp_lib=None):
+        if mosfet not in MOSFET_PARTS:
+            raise ValueError(f"unknown MOSFET part {mosfet!r}")
+        if connector not in CONNECTORS:
+            raise ValueError(f"unknown connector family {connector!r}")
+        self.channels = channels
+        self.mosfet = mosfet
+        self.connector = connector
+        self.board_size = board_size
+        self.project = project
+        # Pre-rendered lib_symbols block, shared between variants when set
+        self.lib_symbols = None
+        # kicad_fplib.FootprintLibrary supplying exact pad geometry, if any
+        self.fp_lib = fp_lib
+        self.nets = NetManager(channels)
+        self._ref_counters = {}
+        self._rng = random.Random(seed) if seed is not None else None
+
+    def next_ref(self, prefix):
+        self._ref_counters[prefix] = self._ref_counters.get(prefix, 0) + 1
+        return f"{prefix}{self._ref_counters[prefix]}"
+
+    def uuid(self):
+        if self._rng is None:
+            return str(uuid.uuid4())
+        return str(uuid.UUID(int=self._rng.getrandbits(128), version=4))
 
 # ---------------------------------------------------------------------------
 # KiCad S-expression helpers
@@ -100,14 +196,17 @@ def lib_symbol_resistor():
       )
     )"""
 
-def lib_symbol_nmos():
-    return """    (symbol "Device:Q_NMOS_GSD" (pin_names (offset 0.254)) (in_bom yes) (on_board yes)
+def lib_symbol_nmos(pinout="GSD"):
+    """N-MOSFET symbol; pinout gives the G/S/D order of pad numbers 1-3."""
+    name = f"Q_NMOS_{pinout}"
+    g, s, d = (str(pinout.index(pin) + 1) for pin in "GSD")
+    return f"""    (symbol "Device:{name}" (pin_names (offset 0.254)) (in_bom yes) (on_board yes)
       (property "Reference" "Q" (at 5.08 1.905 0) (effects (font (size 1.27 1.27)) (justify left)))
-      (property "Value" "Q_NMOS_GSD" (at 5.08 0 0) (effects (font (size 1.27 1.27)) (justify left)))
+      (property "Value" "{name}" (at 5.08 0 0) (effects (font (size 1.27 1.27)) (justify left)))
       (property "Footprint" "" (at 5.08 -1.905 0) (effects (font (size 1.27 1.27)) hide))
       (property "Datasheet" "~" (at 0 0 0) (effects (font (size 1.27 1.27)) hide))
       (property "ki_keywords" "transistor NMOS N-MOS N-MOSFET" (at 0 0 0) (effects (font (size 1.27 1.27)) hide))
-      (symbol "Q_NMOS_GSD_0_1"
+      (symbol "{name}_0_1"
         (polyline (pts (xy 0.254 0) (xy -2.54 0)) (stroke (width 0) (type default)) (fill (type none)))
         (polyline (pts (xy 0.254 1.905) (xy 0.254 -1.905)) (stroke (width 0.254) (type default)) (fill (type none)))
         (polyline (pts (xy 0.762 -1.27) (xy 0.762 -2.286)) (stroke (width 0.254) (type default)) (fill (type none)))
@@ -119,10 +218,10 @@ def lib_symbol_nmos():
         (polyline (pts (xy 1.016 0) (xy 2.032 0.381) (xy 2.032 -0.381) (xy 1.016 0)) (stroke (width 0) (type default)) (fill (type outline)))
         (circle (center 1.651 0) (radius 2.794) (stroke (width 0.254) (type default)) (fill (type none)))
       )
-      (symbol "Q_NMOS_GSD_1_1"
-        (pin input line (at -5.08 0 0) (length 2.54) (name "G" (effects (font (size 1.27 1.27)))) (number "1" (effects (font (size 1.27 1.27)))))
-        (pin passive line (at 2.54 -5.08 90) (length 2.54) (name "S" (effects (font (size 1.27 1.27)))) (number "2" (effects (font (size 1.27 1.27)))))
-        (pin passive line (at 2.54 5.08 270) (length 2.54) (name "D" (effects (font (size 1.27 1.27)))) (number "3" (effects (font (size 1.27 1.27)))))
+      (symbol "{name}_1_1"
+        (pin input line (at -5.08 0 0) (length 2.54) (name "G" (effects (font (size 1.27 1.27)))) (number "{g}" (effects (font (size 1.27 1.27)))))
+        (pin passive line (at 2.54 -5.08 90) (length 2.54) (name "S" (effects (font (size 1.27 1.27)))) (number "{s}" (effects (font (size 1.27 1.27)))))
+        (pin passive line (at 2.54 5.08 270) (length 2.54) (name "D" (effects (font (size 1.27 1.27)))) (number "{d}" (effects (font (size 1.27 1.27)))))
       )
     )"""
 
@@ -274,14 +373,29 @@ def lib_symbol_power_batt():
       )
     )"""
 
+def lib_symbols_block(mosfet_pinout="GSD"):
+    """Render the embedded lib_symbols section (identical for every channel count)."""
+    return "\n".join([
+        lib_symbol_resistor(),
+        lib_symbol_nmos(mosfet_pinout),
+        lib_symbol_capacitor(),
+        lib_symbol_led(),
+        lib_symbol_conn_01x02(),
+        lib_symbol_conn_01x04(),
+        lib_symbol_conn_01x15_socket(),
+        lib_symbol_power_gnd(),
+        lib_symbol_power_5v(),
+        lib_symbol_power_batt(),
+    ])
+
 # ---------------------------------------------------------------------------
 # Schematic symbol instances
 # ---------------------------------------------------------------------------
 
-def sch_gnd(x, y):
+def sch_gnd(ctx, x, y):
     """Place a GND power symbol."""
-    ref = _next_ref("#PWR")
-    uid = gen_uuid()
+    ref = ctx.next_ref("#PWR")
+    uid = ctx.uuid()
     return f"""    (symbol (lib_id "power:GND") (at {x:.2f} {y:.2f} 0)
       (unit 1)
       (in_bom yes)
@@ -292,16 +406,16 @@ def sch_gnd(x, y):
       (property "Footprint" "" (at 0 0 0) (effects (font (size 1.27 1.27)) hide))
       (property "Datasheet" "" (at 0 0 0) (effects (font (size 1.27 1.27)) hide))
       (instances
-        (project "led-driver-board"
+        (project "{ctx.project}"
           (path "/" (reference "{ref}") (unit 1))
         )
       )
     )"""
 
-def sch_power(x, y, symbol, net_name):
+def sch_power(ctx, x, y, symbol, net_name):
     """Place a power symbol (+5V, +BATT)."""
-    ref = _next_ref("#PWR")
-    uid = gen_uuid()
+    ref = ctx.next_ref("#PWR")
+    uid = ctx.uuid()
     return f"""    (symbol (lib_id "power:{symbol}") (at {x:.2f} {y:.2f} 0)
       (unit 1)
       (in_bom yes)
@@ -312,38 +426,38 @@ def sch_power(x, y, symbol, net_name):
       (property "Footprint" "" (at 0 0 0) (effects (font (size 1.27 1.27)) hide))
       (property "Datasheet" "" (at 0 0 0) (effects (font (size 1.27 1.27)) hide))
       (instances
-        (project "led-driver-board"
+        (project "{ctx.project}"
           (path "/" (reference "{ref}") (unit 1))
         )
       )
     )"""
 
-def sch_net_label(x, y, name, rot=0):
+def sch_net_label(ctx, x, y, name, rot=0):
     """Place a net label."""
-    uid = gen_uuid()
+    uid = ctx.uuid()
     at_str = f"(at {x:.2f} {y:.2f} {rot})"
     return f"""    (label "{name}" {at_str} (effects (font (size 1.27 1.27)))
       (uuid "{uid}")
     )"""
 
-def sch_wire(x1, y1, x2, y2):
+def sch_wire(ctx, x1, y1, x2, y2):
     """Place a wire segment."""
     return f"""    (wire (pts (xy {x1:.2f} {y1:.2f}) (xy {x2:.2f} {y2:.2f}))
       (stroke (width 0) (type default))
-      (uuid "{gen_uuid()}")
+      (uuid "{ctx.uuid()}")
     )"""
 
-def sch_text(x, y, text):
+def sch_text(ctx, x, y, text):
     """Place a text annotation."""
     return f"""    (text "{text}" (at {x:.2f} {y:.2f} 0) (effects (font (size 2.54 2.54)))
-      (uuid "{gen_uuid()}")
+      (uuid "{ctx.uuid()}")
     )"""
 
 # ---------------------------------------------------------------------------
 # Schematic generation — channel block
 # ---------------------------------------------------------------------------
 
-def generate_channel(ch, x, y):
+def generate_channel(ctx, ch, x, y):
     """Generate one MOSFET channel block at (x, y).
 
     Layout (top to bottom):
@@ -363,25 +477,25 @@ def generate_channel(ch, x, y):
     name = ch["name"]
 
     # Net label: GPIO_xx at top
-    parts.append(sch_net_label(x, y, f"GPIO_{gpio}"))
+    parts.append(sch_net_label(ctx, x, y, f"GPIO_{gpio}"))
 
     # Wire from label down to gate resistor
-    wires.append(sch_wire(x, y, x, y + 2.54))
+    wires.append(sch_wire(ctx, x, y, x, y + 2.54))
 
     # R_gate (vertical, pin1=top, pin2=bottom)
-    r_gate_ref = _next_ref("R")
+    r_gate_ref = ctx.next_ref("R")
     r_gate_y = y + 2.54 + 3.81  # center of resistor
     parts.append(f"""    (symbol (lib_id "Device:R") (at {x:.2f} {r_gate_y:.2f} 0)
       (unit 1)
       (in_bom yes)
       (on_board yes)
-      (uuid "{gen_uuid()}")
+      (uuid "{ctx.uuid()}")
       (property "Reference" "{r_gate_ref}" (at 2.54 0 0) (effects (font (size 1.27 1.27))))
-      (property "Value" "100" (at -2.54 0 0) (effects (font (size 1.27 1.27))))
+      (property "Value" "{ch['gate_r']}" (at -2.54 0 0) (effects (font (size 1.27 1.27))))
       (property "Footprint" "Resistor_SMD:R_0603_1608Metric" (at -1.778 0 90) (effects (font (size 1.27 1.27)) hide))
       (property "Datasheet" "~" (at 0 0 0) (effects (font (size 1.27 1.27)) hide))
       (instances
-        (project "led-driver-board"
+        (project "{ctx.project}"
           (path "/" (reference "{r_gate_ref}") (unit 1))
         )
       )
@@ -394,82 +508,83 @@ def generate_channel(ch, x, y):
     mosfet_cx = x + 10.16
     mosfet_cy = junc_y
     # Wire from junction right to MOSFET gate pin
-    wires.append(sch_wire(x, junc_y, mosfet_cx - 5.08, junc_y))
+    wires.append(sch_wire(ctx, x, junc_y, mosfet_cx - 5.08, junc_y))
 
     # MOSFET
-    q_ref = _next_ref("Q")
-    parts.append(f"""    (symbol (lib_id "Device:Q_NMOS_GSD") (at {mosfet_cx:.2f} {mosfet_cy:.2f} 0)
+    q_ref = ctx.next_ref("Q")
+    mosfet = MOSFET_PARTS[ctx.mosfet]
+    parts.append(f"""    (symbol (lib_id "Device:Q_NMOS_{mosfet['pinout']}") (at {mosfet_cx:.2f} {mosfet_cy:.2f} 0)
       (unit 1)
       (in_bom yes)
       (on_board yes)
-      (uuid "{gen_uuid()}")
+      (uuid "{ctx.uuid()}")
       (property "Reference" "{q_ref}" (at 5.08 1.905 0) (effects (font (size 1.27 1.27)) (justify left)))
-      (property "Value" "AO3400A" (at 5.08 0 0) (effects (font (size 1.27 1.27)) (justify left)))
-      (property "Footprint" "Package_TO_SOT_SMD:SOT-23" (at 5.08 -1.905 0) (effects (font (size 1.27 1.27)) hide))
+      (property "Value" "{ctx.mosfet}" (at 5.08 0 0) (effects (font (size 1.27 1.27)) (justify left)))
+      (property "Footprint" "{mosfet['footprint']}" (at 5.08 -1.905 0) (effects (font (size 1.27 1.27)) hide))
       (property "Datasheet" "~" (at 0 0 0) (effects (font (size 1.27 1.27)) hide))
       (instances
-        (project "led-driver-board"
+        (project "{ctx.project}"
           (path "/" (reference "{q_ref}") (unit 1))
         )
       )
     )""")
 
     # R_pulldown (10K) from junction down to GND
-    r_pd_ref = _next_ref("R")
+    r_pd_ref = ctx.next_ref("R")
     r_pd_y = junc_y + 7.62
     parts.append(f"""    (symbol (lib_id "Device:R") (at {x:.2f} {r_pd_y:.2f} 0)
       (unit 1)
       (in_bom yes)
       (on_board yes)
-      (uuid "{gen_uuid()}")
+      (uuid "{ctx.uuid()}")
       (property "Reference" "{r_pd_ref}" (at 2.54 0 0) (effects (font (size 1.27 1.27))))
-      (property "Value" "10K" (at -2.54 0 0) (effects (font (size 1.27 1.27))))
+      (property "Value" "{ch['pd_r']}" (at -2.54 0 0) (effects (font (size 1.27 1.27))))
       (property "Footprint" "Resistor_SMD:R_0603_1608Metric" (at -1.778 0 90) (effects (font (size 1.27 1.27)) hide))
       (property "Datasheet" "~" (at 0 0 0) (effects (font (size 1.27 1.27)) hide))
       (instances
-        (project "led-driver-board"
+        (project "{ctx.project}"
           (path "/" (reference "{r_pd_ref}") (unit 1))
         )
       )
     )""")
     # Wire from junction down to R_pulldown top
-    wires.append(sch_wire(x, junc_y, x, r_pd_y - 3.81))
+    wires.append(sch_wire(ctx, x, junc_y, x, r_pd_y - 3.81))
 
     # GND below pulldown
     gnd_y = r_pd_y + 3.81 + 2.54
-    parts.append(sch_gnd(x, gnd_y))
-    wires.append(sch_wire(x, r_pd_y + 3.81, x, gnd_y))
+    parts.append(sch_gnd(ctx, x, gnd_y))
+    wires.append(sch_wire(ctx, x, r_pd_y + 3.81, x, gnd_y))
 
     # MOSFET Source (pin 2) goes to GND: source at mosfet_cx + 2.54, mosfet_cy + 5.08 (down)
     # Actually Q_NMOS_GSD pin 2 (Source) is at +2.54, -5.08 from center
     src_x = mosfet_cx + 2.54
     src_y = mosfet_cy + 5.08
     gnd2_y = src_y + 2.54
-    parts.append(sch_gnd(src_x, gnd2_y))
-    wires.append(sch_wire(src_x, src_y, src_x, gnd2_y))
+    parts.append(sch_gnd(ctx, src_x, gnd2_y))
+    wires.append(sch_wire(ctx, src_x, src_y, src_x, gnd2_y))
 
     # MOSFET Drain (pin 3) goes up: at mosfet_cx + 2.54, mosfet_cy - 5.08
     drain_x = mosfet_cx + 2.54
     drain_y = mosfet_cy - 5.08
 
     # Net label for drain
-    parts.append(sch_net_label(drain_x, drain_y, f"DRAIN_{ch_num}", 90))
+    parts.append(sch_net_label(ctx, drain_x, drain_y, f"DRAIN_{ch_num}", 90))
 
     # Output connector (JST-XH 2-pin) — placed to the right of drain
     conn_x = drain_x + 10.16
     conn_y = drain_y - 2.54
-    j_ref = _next_ref("J")
+    j_ref = ctx.next_ref("J")
     parts.append(f"""    (symbol (lib_id "Connector:Conn_01x02_Pin") (at {conn_x:.2f} {conn_y:.2f} 180)
       (unit 1)
       (in_bom yes)
       (on_board yes)
-      (uuid "{gen_uuid()}")
+      (uuid "{ctx.uuid()}")
       (property "Reference" "{j_ref}" (at 0 2.54 0) (effects (font (size 1.27 1.27))))
       (property "Value" "Ch{ch_num} {name}" (at 0 -5.08 0) (effects (font (size 1.27 1.27))))
-      (property "Footprint" "Connector_JST:JST_XH_B2B-XH-A_1x02_P2.50mm_Vertical" (at 0 0 0) (effects (font (size 1.27 1.27)) hide))
+      (property "Footprint" "{CONNECTORS[ctx.connector]['footprint']}" (at 0 0 0) (effects (font (size 1.27 1.27)) hide))
       (property "Datasheet" "~" (at 0 0 0) (effects (font (size 1.27 1.27)) hide))
       (instances
-        (project "led-driver-board"
+        (project "{ctx.project}"
           (path "/" (reference "{j_ref}") (unit 1))
         )
       )
@@ -478,13 +593,13 @@ def generate_channel(ch, x, y):
     # Connector pin 1 (+BATT) — at conn_x - 3.81, conn_y (mirrored)
     # With 180 rotation, pin 1 is at conn_x - 3.81, conn_y and pin 2 at conn_x - 3.81, conn_y + 2.54
     batt_x = conn_x - 3.81
-    parts.append(sch_power(batt_x, conn_y - 2.54, "+BATT", "+BATT"))
-    wires.append(sch_wire(batt_x, conn_y - 2.54, batt_x, conn_y))
+    parts.append(sch_power(ctx, batt_x, conn_y - 2.54, "+BATT", "+BATT"))
+    wires.append(sch_wire(ctx, batt_x, conn_y - 2.54, batt_x, conn_y))
 
     # Connector pin 2 (drain net) — wire from DRAIN label to connector
     drain_label_x = conn_x - 3.81
     drain_label_y = conn_y + 2.54
-    parts.append(sch_net_label(drain_label_x, drain_label_y, f"DRAIN_{ch_num}", 90))
+    parts.append(sch_net_label(ctx, drain_label_x, drain_label_y, f"DRAIN_{ch_num}", 90))
 
     return "\n".join(parts), "\n".join(wires)
 
@@ -492,27 +607,27 @@ def generate_channel(ch, x, y):
 # Schematic generation — power section
 # ---------------------------------------------------------------------------
 
-def generate_power_section(x, y):
+def generate_power_section(ctx, x, y):
     """Screw terminal → MP1584EN module → caps → power nets."""
     parts = []
     wires = []
 
     # Title text
-    parts.append(sch_text(x, y - 5.08, "Power Supply"))
+    parts.append(sch_text(ctx, x, y - 5.08, "Power Supply"))
 
     # Screw terminal J1 (2-pin)
-    j_ref = _next_ref("J")
+    j_ref = ctx.next_ref("J")
     parts.append(f"""    (symbol (lib_id "Connector:Conn_01x02_Pin") (at {x:.2f} {y:.2f} 180)
       (unit 1)
       (in_bom yes)
       (on_board yes)
-      (uuid "{gen_uuid()}")
+      (uuid "{ctx.uuid()}")
       (property "Reference" "{j_ref}" (at 0 2.54 0) (effects (font (size 1.27 1.27))))
       (property "Value" "Battery" (at 0 -5.08 0) (effects (font (size 1.27 1.27))))
       (property "Footprint" "TerminalBlock:TerminalBlock_bornier-2_P5.08mm" (at 0 0 0) (effects (font (size 1.27 1.27)) hide))
       (property "Datasheet" "~" (at 0 0 0) (effects (font (size 1.27 1.27)) hide))
       (instances
-        (project "led-driver-board"
+        (project "{ctx.project}"
           (path "/" (reference "{j_ref}") (unit 1))
         )
       )
@@ -520,29 +635,29 @@ def generate_power_section(x, y):
 
     # Pin 1 = Battery+ → +BATT power symbol
     batt_pin_x = x - 3.81
-    parts.append(sch_power(batt_pin_x, y - 2.54, "+BATT", "+BATT"))
-    wires.append(sch_wire(batt_pin_x, y - 2.54, batt_pin_x, y))
+    parts.append(sch_power(ctx, batt_pin_x, y - 2.54, "+BATT", "+BATT"))
+    wires.append(sch_wire(ctx, batt_pin_x, y - 2.54, batt_pin_x, y))
 
     # Pin 2 = GND
     gnd_pin_y = y + 2.54
-    parts.append(sch_gnd(batt_pin_x, gnd_pin_y + 2.54))
-    wires.append(sch_wire(batt_pin_x, gnd_pin_y, batt_pin_x, gnd_pin_y + 2.54))
+    parts.append(sch_gnd(ctx, batt_pin_x, gnd_pin_y + 2.54))
+    wires.append(sch_wire(ctx, batt_pin_x, gnd_pin_y, batt_pin_x, gnd_pin_y + 2.54))
 
     # MP1584EN module (4-pin connector: IN+, IN-, OUT+, OUT-)
     mp_x = x + 25.4
     mp_y = y
-    mp_ref = _next_ref("J")
+    mp_ref = ctx.next_ref("J")
     parts.append(f"""    (symbol (lib_id "Connector:Conn_01x04_Pin") (at {mp_x:.2f} {mp_y:.2f} 180)
       (unit 1)
       (in_bom yes)
       (on_board yes)
-      (uuid "{gen_uuid()}")
+      (uuid "{ctx.uuid()}")
       (property "Reference" "{mp_ref}" (at 0 5.08 0) (effects (font (size 1.27 1.27))))
       (property "Value" "MP1584EN" (at 0 -10.16 0) (effects (font (size 1.27 1.27))))
       (property "Footprint" "Connector_PinHeader_2.54mm:PinHeader_1x04_P2.54mm_Vertical" (at 0 0 0) (effects (font (size 1.27 1.27)) hide))
       (property "Datasheet" "~" (at 0 0 0) (effects (font (size 1.27 1.27)) hide))
       (instances
-        (project "led-driver-board"
+        (project "{ctx.project}"
           (path "/" (reference "{mp_ref}") (unit 1))
         )
       )
@@ -551,69 +666,69 @@ def generate_power_section(x, y):
     # MP1584EN pins (180 rotation):
     # Pin 1 (IN+) at mp_x - 3.81, mp_y - 2.54 → +BATT
     mp_pin_x = mp_x - 3.81
-    parts.append(sch_power(mp_pin_x, mp_y - 2.54 - 2.54, "+BATT", "+BATT"))
-    wires.append(sch_wire(mp_pin_x, mp_y - 2.54 - 2.54, mp_pin_x, mp_y - 2.54))
+    parts.append(sch_power(ctx, mp_pin_x, mp_y - 2.54 - 2.54, "+BATT", "+BATT"))
+    wires.append(sch_wire(ctx, mp_pin_x, mp_y - 2.54 - 2.54, mp_pin_x, mp_y - 2.54))
     # Pin 2 (IN-) at mp_pin_x, mp_y → GND
     # With 180 rotation: pin1 at y+2.54, pin2 at y, pin3 at y-2.54, pin4 at y-5.08
     # Let me recalculate for the 4-pin connector with 180 rotation:
     # Original pins: pin1 at +2.54, pin2 at 0, pin3 at -2.54, pin4 at -5.08
     # With 180 rotation the y-offsets flip: pin1 at -2.54, pin2 at 0, pin3 at +2.54, pin4 at +5.08
     # And x offset: pins are at x-3.81 (flipped from x+3.81)
-    parts.append(sch_gnd(mp_pin_x, mp_y + 2.54))
-    wires.append(sch_wire(mp_pin_x, mp_y, mp_pin_x, mp_y + 2.54))
+    parts.append(sch_gnd(ctx, mp_pin_x, mp_y + 2.54))
+    wires.append(sch_wire(ctx, mp_pin_x, mp_y, mp_pin_x, mp_y + 2.54))
 
     # Pin 3 (OUT+) → +5V
-    parts.append(sch_power(mp_pin_x, mp_y + 2.54 - 7.62, "+5V", "+5V"))
-    wires.append(sch_wire(mp_pin_x, mp_y + 2.54 - 7.62, mp_pin_x, mp_y + 2.54 - 5.08))
+    parts.append(sch_power(ctx, mp_pin_x, mp_y + 2.54 - 7.62, "+5V", "+5V"))
+    wires.append(sch_wire(ctx, mp_pin_x, mp_y + 2.54 - 7.62, mp_pin_x, mp_y + 2.54 - 5.08))
     # Pin 4 (OUT-) → GND
-    parts.append(sch_gnd(mp_pin_x, mp_y + 5.08 + 2.54))
-    wires.append(sch_wire(mp_pin_x, mp_y + 5.08, mp_pin_x, mp_y + 5.08 + 2.54))
+    parts.append(sch_gnd(ctx, mp_pin_x, mp_y + 5.08 + 2.54))
+    wires.append(sch_wire(ctx, mp_pin_x, mp_y + 5.08, mp_pin_x, mp_y + 5.08 + 2.54))
 
     # Input cap C1 (22uF) between +BATT and GND, near MP1584EN input
     cap_x = mp_x + 12.7
-    c1_ref = _next_ref("C")
+    c1_ref = ctx.next_ref("C")
     parts.append(f"""    (symbol (lib_id "Device:C") (at {cap_x:.2f} {mp_y:.2f} 0)
       (unit 1)
       (in_bom yes)
       (on_board yes)
-      (uuid "{gen_uuid()}")
+      (uuid "{ctx.uuid()}")
       (property "Reference" "{c1_ref}" (at 2.54 0 0) (effects (font (size 1.27 1.27))))
       (property "Value" "22uF" (at -2.54 0 0) (effects (font (size 1.27 1.27))))
       (property "Footprint" "Capacitor_SMD:C_0805_2012Metric" (at 0.9652 -3.81 0) (effects (font (size 1.27 1.27)) hide))
       (property "Datasheet" "~" (at 0 0 0) (effects (font (size 1.27 1.27)) hide))
       (instances
-        (project "led-driver-board"
+        (project "{ctx.project}"
           (path "/" (reference "{c1_ref}") (unit 1))
         )
       )
     )""")
-    parts.append(sch_power(cap_x, mp_y - 3.81 - 2.54, "+BATT", "+BATT"))
-    wires.append(sch_wire(cap_x, mp_y - 3.81, cap_x, mp_y - 3.81 - 2.54))
-    parts.append(sch_gnd(cap_x, mp_y + 3.81 + 2.54))
-    wires.append(sch_wire(cap_x, mp_y + 3.81, cap_x, mp_y + 3.81 + 2.54))
+    parts.append(sch_power(ctx, cap_x, mp_y - 3.81 - 2.54, "+BATT", "+BATT"))
+    wires.append(sch_wire(ctx, cap_x, mp_y - 3.81, cap_x, mp_y - 3.81 - 2.54))
+    parts.append(sch_gnd(ctx, cap_x, mp_y + 3.81 + 2.54))
+    wires.append(sch_wire(ctx, cap_x, mp_y + 3.81, cap_x, mp_y + 3.81 + 2.54))
 
     # Output cap C2 (22uF) between +5V and GND
     cap2_x = cap_x + 10.16
-    c2_ref = _next_ref("C")
+    c2_ref = ctx.next_ref("C")
     parts.append(f"""    (symbol (lib_id "Device:C") (at {cap2_x:.2f} {mp_y:.2f} 0)
       (unit 1)
       (in_bom yes)
       (on_board yes)
-      (uuid "{gen_uuid()}")
+      (uuid "{ctx.uuid()}")
       (property "Reference" "{c2_ref}" (at 2.54 0 0) (effects (font (size 1.27 1.27))))
       (property "Value" "22uF" (at -2.54 0 0) (effects (font (size 1.27 1.27))))
       (property "Footprint" "Capacitor_SMD:C_0805_2012Metric" (at 0.9652 -3.81 0) (effects (font (size 1.27 1.27)) hide))
       (property "Datasheet" "~" (at 0 0 0) (effects (font (size 1.27 1.27)) hide))
       (instances
-        (project "led-driver-board"
+        (project "{ctx.project}"
           (path "/" (reference "{c2_ref}") (unit 1))
         )
       )
     )""")
-    parts.append(sch_power(cap2_x, mp_y - 3.81 - 2.54, "+5V", "+5V"))
-    wires.append(sch_wire(cap2_x, mp_y - 3.81, cap2_x, mp_y - 3.81 - 2.54))
-    parts.append(sch_gnd(cap2_x, mp_y + 3.81 + 2.54))
-    wires.append(sch_wire(cap2_x, mp_y + 3.81, cap2_x, mp_y + 3.81 + 2.54))
+    parts.append(sch_power(ctx, cap2_x, mp_y - 3.81 - 2.54, "+5V", "+5V"))
+    wires.append(sch_wire(ctx, cap2_x, mp_y - 3.81, cap2_x, mp_y - 3.81 - 2.54))
+    parts.append(sch_gnd(ctx, cap2_x, mp_y + 3.81 + 2.54))
+    wires.append(sch_wire(ctx, cap2_x, mp_y + 3.81, cap2_x, mp_y + 3.81 + 2.54))
 
     return "\n".join(parts), "\n".join(wires)
 
@@ -621,45 +736,45 @@ def generate_power_section(x, y):
 # Schematic generation — ESP32 headers
 # ---------------------------------------------------------------------------
 
-def generate_esp32_headers(x, y):
+def generate_esp32_headers(ctx, x, y):
     """Two 1x15 pin sockets representing ESP32 dev board."""
     parts = []
     wires = []
 
-    parts.append(sch_text(x + 5.08, y - 22.86, "ESP32 Dev Board"))
+    parts.append(sch_text(ctx, x + 5.08, y - 22.86, "ESP32 Dev Board"))
 
     # Left header
-    j_left_ref = _next_ref("J")
+    j_left_ref = ctx.next_ref("J")
     parts.append(f"""    (symbol (lib_id "Connector:Conn_01x15_Socket") (at {x:.2f} {y:.2f} 0)
       (unit 1)
       (in_bom yes)
       (on_board yes)
-      (uuid "{gen_uuid()}")
+      (uuid "{ctx.uuid()}")
       (property "Reference" "{j_left_ref}" (at -2.54 0 0) (effects (font (size 1.27 1.27))))
       (property "Value" "ESP32_Left" (at -2.54 -38.1 0) (effects (font (size 1.27 1.27))))
       (property "Footprint" "Connector_PinSocket_2.54mm:PinSocket_1x15_P2.54mm_Vertical" (at 0 0 0) (effects (font (size 1.27 1.27)) hide))
       (property "Datasheet" "~" (at 0 0 0) (effects (font (size 1.27 1.27)) hide))
       (instances
-        (project "led-driver-board"
+        (project "{ctx.project}"
           (path "/" (reference "{j_left_ref}") (unit 1))
         )
       )
     )""")
 
     # Right header — 25.4mm to the right
-    j_right_ref = _next_ref("J")
+    j_right_ref = ctx.next_ref("J")
     right_x = x + 25.4
     parts.append(f"""    (symbol (lib_id "Connector:Conn_01x15_Socket") (at {right_x:.2f} {y:.2f} 180)
       (unit 1)
       (in_bom yes)
       (on_board yes)
-      (uuid "{gen_uuid()}")
+      (uuid "{ctx.uuid()}")
       (property "Reference" "{j_right_ref}" (at 2.54 0 0) (effects (font (size 1.27 1.27))))
       (property "Value" "ESP32_Right" (at 2.54 -38.1 0) (effects (font (size 1.27 1.27))))
       (property "Footprint" "Connector_PinSocket_2.54mm:PinSocket_1x15_P2.54mm_Vertical" (at 0 0 0) (effects (font (size 1.27 1.27)) hide))
       (property "Datasheet" "~" (at 0 0 0) (effects (font (size 1.27 1.27)) hide))
       (instances
-        (project "led-driver-board"
+        (project "{ctx.project}"
           (path "/" (reference "{j_right_ref}") (unit 1))
         )
       )
@@ -675,22 +790,25 @@ def generate_esp32_headers(x, y):
     # Left header labels (pin 1 = top = pin at y + 17.78)
     left_labels = [
         ("3V3", None), ("EN", None), ("GPIO36", None), ("GPIO39", None),
-        ("GPIO34", None), ("GPIO35", None), ("GPIO32", None), ("GPIO33", None),
-        ("GPIO25", "GPIO_25"), ("GPIO26", "GPIO_26"), ("GPIO27", None),
-        ("GPIO14", None), ("GPIO12", None), ("GND_L", "GND_LABEL"),
-        ("GPIO13", None),
+        ("GPIO34", None), ("GPIO35", None), ("GPIO32", "GPIO_32"), ("GPIO33", "GPIO_33"),
+        ("GPIO25", "GPIO_25"), ("GPIO26", "GPIO_26"), ("GPIO27", "GPIO_27"),
+        ("GPIO14", "GPIO_14"), ("GPIO12", None), ("GND_L", "GND_LABEL"),
+        ("GPIO13", "GPIO_13"),
     ]
 
+    # Only GPIOs driven by a channel or the status LED get a net label
+    used = {f"GPIO_{ch['gpio']}" for ch in ctx.channels} | {"GPIO_2"}
+
     # Add net labels for GPIO pins that we use
     for i, (label, net) in enumerate(left_labels):
         pin_y = y + 17.78 - i * 2.54
         pin_x = x + 3.81
-        if net and net.startswith("GPIO_"):
-            parts.append(sch_net_label(pin_x + 2.54, pin_y, net))
-            wires.append(sch_wire(pin_x, pin_y, pin_x + 2.54, pin_y))
+        if net in used:
+            parts.append(sch_net_label(ctx, pin_x + 2.54, pin_y, net))
+            wires.append(sch_wire(ctx, pin_x, pin_y, pin_x + 2.54, pin_y))
         elif label == "GND_L":
-            parts.append(sch_gnd(pin_x + 5.08, pin_y))
-            wires.append(sch_wire(pin_x, pin_y, pin_x + 5.08, pin_y))
+            parts.append(sch_gnd(ctx, pin_x + 5.08, pin_y))
+            wires.append(sch_wire(ctx, pin_x, pin_y, pin_x + 5.08, pin_y))
 
     # Right header labels (180 rotation - pin 1 at bottom)
     # With 180 rotation on the 15-pin socket: pin layout is flipped
@@ -701,8 +819,8 @@ def generate_esp32_headers(x, y):
         ("TX", None), ("RX", None),
         ("GPIO21", "GPIO_21"), ("NC", None),
         ("GPIO19", "GPIO_19"), ("GPIO18", "GPIO_18"),
-        ("GPIO5", None), ("GPIO17", "GPIO_17"),
-        ("GPIO16", "GPIO_16"), ("GPIO4", None),
+        ("GPIO5", "GPIO_5"), ("GPIO17", "GPIO_17"),
+        ("GPIO16", "GPIO_16"), ("GPIO4", "GPIO_4"),
         ("GPIO2", "GPIO_2"),
     ]
 
@@ -712,15 +830,15 @@ def generate_esp32_headers(x, y):
         pin_y = y - 17.78 + i * 2.54
         pin_x = right_x - 3.81
         if net == "+5V":
-            parts.append(sch_power(pin_x - 5.08, pin_y - 2.54, "+5V", "+5V"))
-            wires.append(sch_wire(pin_x, pin_y, pin_x - 5.08, pin_y))
-            wires.append(sch_wire(pin_x - 5.08, pin_y - 2.54, pin_x - 5.08, pin_y))
+            parts.append(sch_power(ctx, pin_x - 5.08, pin_y - 2.54, "+5V", "+5V"))
+            wires.append(sch_wire(ctx, pin_x, pin_y, pin_x - 5.08, pin_y))
+            wires.append(sch_wire(ctx, pin_x - 5.08, pin_y - 2.54, pin_x - 5.08, pin_y))
         elif net == "GND_LABEL":
-            parts.append(sch_gnd(pin_x - 5.08, pin_y))
-            wires.append(sch_wire(pin_x, pin_y, pin_x - 5.08, pin_y))
-        elif net and net.startswith("GPIO_"):
-            parts.append(sch_net_label(pin_x - 2.54, pin_y, net, 180))
-            wires.append(sch_wire(pin_x, pin_y, pin_x - 2.54, pin_y))
+            parts.append(sch_gnd(ctx, pin_x - 5.08, pin_y))
+            wires.append(sch_wire(ctx, pin_x, pin_y, pin_x - 5.08, pin_y))
+        elif net in used:
+            parts.append(sch_net_label(ctx, pin_x - 2.54, pin_y, net, 180))
+            wires.append(sch_wire(ctx, pin_x, pin_y, pin_x - 2.54, pin_y))
 
     # GPIO2 net label for status LED
     # Already handled by GPIO_2 label on GPIO2 pin
@@ -731,33 +849,33 @@ def generate_esp32_headers(x, y):
 # Schematic generation — status LED
 # ---------------------------------------------------------------------------
 
-def generate_status_led(x, y):
+def generate_status_led(ctx, x, y):
     """GPIO2 → 1K resistor → LED → GND."""
     parts = []
     wires = []
 
-    parts.append(sch_text(x, y - 5.08, "Status LED"))
+    parts.append(sch_text(ctx, x, y - 5.08, "Status LED"))
 
     # GPIO_2 net label
-    parts.append(sch_net_label(x, y, "GPIO_2"))
+    parts.append(sch_net_label(ctx, x, y, "GPIO_2"))
 
     # Wire down to resistor
-    wires.append(sch_wire(x, y, x, y + 2.54))
+    wires.append(sch_wire(ctx, x, y, x, y + 2.54))
 
     # 1K resistor
-    r_ref = _next_ref("R")
+    r_ref = ctx.next_ref("R")
     r_y = y + 2.54 + 3.81
     parts.append(f"""    (symbol (lib_id "Device:R") (at {x:.2f} {r_y:.2f} 0)
       (unit 1)
       (in_bom yes)
       (on_board yes)
-      (uuid "{gen_uuid()}")
+      (uuid "{ctx.uuid()}")
       (property "Reference" "{r_ref}" (at 2.54 0 0) (effects (font (size 1.27 1.27))))
       (property "Value" "1K" (at -2.54 0 0) (effects (font (size 1.27 1.27))))
       (property "Footprint" "Resistor_SMD:R_0603_1608Metric" (at -1.778 0 90) (effects (font (size 1.27 1.27)) hide))
       (property "Datasheet" "~" (at 0 0 0) (effects (font (size 1.27 1.27)) hide))
       (instances
-        (project "led-driver-board"
+        (project "{ctx.project}"
           (path "/" (reference "{r_ref}") (unit 1))
         )
       )
@@ -767,18 +885,18 @@ def generate_status_led(x, y):
     led_y = r_y + 3.81 + 3.81
 
     # LED (horizontal, rotated 90 to be vertical: anode at top, cathode at bottom)
-    d_ref = _next_ref("D")
+    d_ref = ctx.next_ref("D")
     parts.append(f"""    (symbol (lib_id "Device:LED") (at {x:.2f} {led_y:.2f} 90)
       (unit 1)
       (in_bom yes)
       (on_board yes)
-      (uuid "{gen_uuid()}")
+      (uuid "{ctx.uuid()}")
       (property "Reference" "{d_ref}" (at 2.54 0 0) (effects (font (size 1.27 1.27))))
       (property "Value" "Green" (at -2.54 0 0) (effects (font (size 1.27 1.27))))
       (property "Footprint" "LED_SMD:LED_0805_2012Metric" (at 0 0 0) (effects (font (size 1.27 1.27)) hide))
       (property "Datasheet" "~" (at 0 0 0) (effects (font (size 1.27 1.27)) hide))
       (instances
-        (project "led-driver-board"
+        (project "{ctx.project}"
           (path "/" (reference "{d_ref}") (unit 1))
         )
       )
@@ -786,8 +904,8 @@ def generate_status_led(x, y):
 
     # GND below LED
     gnd_y = led_y + 3.81 + 2.54
-    parts.append(sch_gnd(x, gnd_y))
-    wires.append(sch_wire(x, led_y + 3.81, x, gnd_y))
+    parts.append(sch_gnd(ctx, x, gnd_y))
+    wires.append(sch_wire(ctx, x, led_y + 3.81, x, gnd_y))
 
     return "\n".join(parts), "\n".join(wires)
 
@@ -795,56 +913,60 @@ def generate_status_led(x, y):
 # Full schematic assembly
 # ---------------------------------------------------------------------------
 
-def generate_schematic():
+# Landscape sheet sizes in mm, smallest first
+SHEETS = (("A3", 420.0, 297.0), ("A2", 594.0, 420.0), ("A1", 841.0, 594.0))
+SHEET_BORDER = 10.0             # drawing frame inside the paper edge
+CHANNEL_EXTENT = (26.0, 30.0)   # one channel's symbols right of / below its origin
+
+def channel_origin(i):
+    """Schematic origin of channel i: rows of five below the power section."""
+    return 25.4 + (i % 5) * 50.8, 114.3 + (i // 5) * 86.36
+
+def schematic_paper(ctx):
+    """Paper clause for the smallest sheet whose drawing frame holds every
+    channel; a User sheet sized to fit once the largest standard one is full.
+    """
+    n = len(ctx.channels)
+    right = channel_origin(min(n, 5) - 1)[0] + CHANNEL_EXTENT[0]
+    bottom = channel_origin(n - 1)[1] + CHANNEL_EXTENT[1]
+    for name, width, height in SHEETS:
+        if right <= width - SHEET_BORDER and bottom <= height - SHEET_BORDER:
+            return f'"{name}"'
+    width = max(SHEETS[-1][1], right + SHEET_BORDER)
+    height = math.ceil(bottom + SHEET_BORDER)
+    return f'"User" {width:g} {height:g}'
+
+def generate_schematic(ctx=None):
     """Assemble the complete .kicad_sch file."""
+    if ctx is None:
+        ctx = DesignContext()
     all_parts = []
     all_wires = []
 
     # Power section at top-left
-    p, w = generate_power_section(30.48, 40.64)
+    p, w = generate_power_section(ctx, 30.48, 40.64)
     all_parts.append(p)
     all_wires.append(w)
 
     # ESP32 headers in top-center
-    p, w = generate_esp32_headers(127.0, 40.64)
+    p, w = generate_esp32_headers(ctx, 127.0, 40.64)
     all_parts.append(p)
     all_wires.append(w)
 
     # Status LED near ESP32
-    p, w = generate_status_led(180.34, 40.64)
+    p, w = generate_status_led(ctx, 180.34, 40.64)
     all_parts.append(p)
     all_wires.append(w)
 
-    # Channels in two rows
-    # Row 1: channels 1-5
-    for i, ch in enumerate(CHANNELS[:5]):
-        cx = 25.4 + i * 50.8
-        cy = 114.3
-        p, w = generate_channel(ch, cx, cy)
+    # Channels in rows of five
+    paper = schematic_paper(ctx)
+    for i, ch in enumerate(ctx.channels):
+        cx, cy = channel_origin(i)
+        p, w = generate_channel(ctx, ch, cx, cy)
         all_parts.append(p)
         all_wires.append(w)
 
-    # Row 2: channels 6-9
-    for i, ch in enumerate(CHANNELS[5:]):
-        cx = 25.4 + i * 50.8
-        cy = 200.66
-        p, w = generate_channel(ch, cx, cy)
-        all_parts.append(p)
-        all_wires.append(w)
-
-    # Build lib_symbols
-    lib_symbols = "\n".join([
-        lib_symbol_resistor(),
-        lib_symbol_nmos(),
-        lib_symbol_capacitor(),
-        lib_symbol_led(),
-        lib_symbol_conn_01x02(),
-        lib_symbol_conn_01x04(),
-        lib_symbol_conn_01x15_socket(),
-        lib_symbol_power_gnd(),
-        lib_symbol_power_5v(),
-        lib_symbol_power_batt(),
-    ])
+    lib_symbols = ctx.lib_symbols or lib_symbols_block(MOSFET_PARTS[ctx.mosfet]["pinout"])
 
     parts_str = "\n".join(all_parts)
     wires_str = "\n".join(all_wires)
@@ -853,8 +975,8 @@ def generate_schematic():
   (version {SCH_VERSION})
   (generator "{GENERATOR}")
   (generator_version "8.0")
-  (uuid "{gen_uuid()}")
-  (paper "A3")
+  (uuid "{ctx.uuid()}")
+  (paper {paper})
   (lib_symbols
 {lib_symbols}
   )
@@ -871,38 +993,159 @@ def generate_schematic():
 # PCB generation
 # ---------------------------------------------------------------------------
 
-def pcb_footprint(ref, footprint_lib, x, y, rot=0, value="", pads=None, layer="F.Cu"):
-    """Generate a footprint placement on the PCB.
+class Pad:
+    """A single footprint pad in footprint-local coordinates.
 
-    pads: list of (pad_num, net_name, rel_x, rel_y, shape, size_x, size_y, pad_type, layers[, drill])
+    drill is a diameter, or (width, height) for an oval drill.
     """
-    uid = gen_uuid()
-    rot_str = f" {rot}" if rot else ""
+
+    __slots__ = ("num", "net", "x", "y", "shape", "size_x", "size_y",
+                 "pad_type", "layers", "drill", "rot", "rratio", "mask_margin")
+
+    def __init__(self, num, net, x, y, shape, size_x, size_y, pad_type, layers, drill=None,
+                 rot=0, rratio=None, mask_margin=None):
+        self.num = num
+        self.net = net
+        self.x = x
+        self.y = y
+        self.shape = shape
+        self.size_x = size_x
+        self.size_y = size_y
+        self.pad_type = pad_type
+        self.layers = layers
+        self.drill = drill
+        self.rot = rot
+        self.rratio = rratio
+        self.mask_margin = mask_margin
+
+
+class Footprint:
+    """A placed footprint: position, rotation (degrees, KiCad CCW) and its pads."""
+
+    __slots__ = ("ref", "lib", "x", "y", "rot", "value", "pads", "layer")
+
+    def __init__(self, ref, lib, x, y, rot=0, value="", pads=None, layer="F.Cu"):
+        self.ref = ref
+        self.lib = lib
+        self.x = x
+        self.y = y
+        self.rot = rot
+        self.value = value
+        self.pads = pads or []
+        self.layer = layer
+
+
+class PadTable:
+    """Column store of every pad on a board, in absolute board coordinates.
+
+    Built once per board so DRC, routing and export all share the same
+    geometry. Row i describes ``pads[i]``, which belongs to
+    ``footprints[fp_index[i]]``.
+    """
+
+    def __init__(self, footprints):
+        self.footprints = footprints
+        self.pads = []
+        self.fp_index = array("l")
+        rel_x = array("d")
+        rel_y = array("d")
+        for i, fp in enumerate(footprints):
+            for pad in fp.pads:
+                self.pads.append(pad)
+                self.fp_index.append(i)
+                rel_x.append(pad.x)
+                rel_y.append(pad.y)
+        self.x, self.y = _transform_pads(footprints, self.fp_index, rel_x, rel_y)
+
+    def __len__(self):
+        return len(self.pads)
+
+    def rows(self):
+        """Yield (footprint, pad, abs_x, abs_y) for every pad."""
+        fps = self.footprints
+        for pad, i, x, y in zip(self.pads, self.fp_index, self.x, self.y):
+            yield fps[i], pad, x, y
+
+
+def _rotation(rot):
+    """cos/sin of a KiCad rotation, exact for multiples of 90 degrees."""
+    quarter = {0: (1.0, 0.0), 90: (0.0, 1.0), 180: (-1.0, 0.0), 270: (0.0, -1.0)}
+    r = rot % 360
+    if r in quarter:
+        return quarter[r]
+    a = math.radians(r)
+    return math.cos(a), math.sin(a)
+
+
+def _transform_pads(footprints, fp_index, rel_x, rel_y):
+    """Rotate and translate all footprint-local pad positions in one pass.
+
+    KiCad rotates counter-clockwise on screen with the Y axis pointing
+    down, so a local point (x, y) lands at
+    (fx + x*cos + y*sin, fy - x*sin + y*cos).
+    """
+    per_fp = [(fp.x, fp.y) + _rotation(fp.rot) for fp in footprints]
+    xf = [per_fp[i] for i in fp_index]
+    abs_x = array("d", [fx + x * c + y * s for (fx, _, c, s), x, y in zip(xf, rel_x, rel_y)])
+    abs_y = array("d", [fy - x * s + y * c for (_, fy, c, s), x, y in zip(xf, rel_x, rel_y)])
+    return abs_x, abs_y
+
+
+def pcb_footprint(ref, footprint_lib, x, y, rot=0, value="", pads=None, layer="F.Cu", library=None):
+    """Place a footprint on the PCB.
+
+    pads:    list of Pad records in footprint-local coordinates
+    library: optional kicad_fplib.FootprintLibrary; when it has the
+             footprint, its pad geometry replaces `pads`, keeping their
+             nets by pad number
+    """
+    lib_pads = library.pads(footprint_lib) if library is not None else None
+    if lib_pads is not None:
+        nets = {p.num: p.net for p in pads or ()}
+        pads = [Pad(num, nets.get(num, ""), px, py, shape, sx, sy, pad_type, layers, drill, prot, rratio)
+                for num, pad_type, shape, px, py, sx, sy, prot, drill, layers, rratio in lib_pads]
+    return Footprint(ref, footprint_lib, x, y, rot, value, pads, layer)
+
+def render_footprint(ctx, fp, dx=0.0, dy=0.0, net_prefix="", ref=None):
+    """Format a placed footprint as a KiCad S-expression.
+
+    dx/dy shift the footprint, net_prefix namespaces its nets and ref
+    replaces its reference, so one Footprint can be rendered as every
+    instance of a panel.
+    """
+    rot_str = f" {fp.rot}" if fp.rot else ""
     pad_strs = []
-    if pads:
-        for p in pads:
-            pad_num, net_name, px, py, shape, sx, sy, pad_type, pad_layers = p[:9]
-            drill = p[9] if len(p) > 9 else None
-            net_id = NET_MGR.get(net_name) if net_name else 0
-            net_section = f'(net {net_id} "{net_name}")'
-            if pad_type == "thru_hole" and drill:
-                drill_str = f" (drill {drill:.1f})"
+    for p in fp.pads:
+        net = net_prefix + p.net if p.net else ""
+        net_id = ctx.nets.get(net) if net else 0
+        net_section = f'(net {net_id} "{net}")'
+        if p.pad_type in ("thru_hole", "np_thru_hole") and p.drill:
+            if isinstance(p.drill, tuple):
+                drill_str = f" (drill oval {p.drill[0]:g} {p.drill[1]:g})"
             else:
-                drill_str = ""
-            pad_strs.append(
-                f'    (pad "{pad_num}" {pad_type} {shape} (at {px:.3f} {py:.3f}) '
-                f'(size {sx:.3f} {sy:.3f}){drill_str} '
-                f'(layers {pad_layers}) {net_section})'
-            )
+                drill_str = f" (drill {p.drill:g})"
+        else:
+            drill_str = ""
+        rratio_str = f" (roundrect_rratio {p.rratio:g})" if p.shape == "roundrect" and p.rratio else ""
+        if p.mask_margin is not None:
+            rratio_str += f" (solder_mask_margin {p.mask_margin:g})"
+        # Pad orientation in the file is absolute, so it follows the footprint
+        angle = (fp.rot + p.rot) % 360
+        pad_rot = f" {angle:g}" if angle else ""
+        pad_strs.append(
+            f'    (pad "{p.num}" {p.pad_type} {p.shape} (at {p.x:g} {p.y:g}{pad_rot}) '
+            f'(size {p.size_x:g} {p.size_y:g}){drill_str} '
+            f'(layers {p.layers}){rratio_str} {net_section})'
+        )
     pads_block = "\n".join(pad_strs)
 
-    return f"""  (footprint "{footprint_lib}"
-    (layer "{layer}")
-    (uuid "{uid}")
-    (at {x:.2f} {y:.2f}{rot_str})
-    (property "Reference" "{ref}" (at 0 -2.5 0) (layer "F.SilkS") (uuid "{gen_uuid()}")
+    return f"""  (footprint "{fp.lib}"
+    (layer "{fp.layer}")
+    (uuid "{ctx.uuid()}")
+    (at {fp.x + dx:.2f} {fp.y + dy:.2f}{rot_str})
+    (property "Reference" "{ref or fp.ref}" (at 0 -2.5 0) (layer "F.SilkS") (uuid "{ctx.uuid()}")
       (effects (font (size 1 1) (thickness 0.15))))
-    (property "Value" "{value}" (at 0 2.5 0) (layer "F.Fab") (uuid "{gen_uuid()}")
+    (property "Value" "{fp.value}" (at 0 2.5 0) (layer "F.Fab") (uuid "{ctx.uuid()}")
       (effects (font (size 1 1) (thickness 0.15))))
 {pads_block}
   )"""
@@ -911,39 +1154,121 @@ def pcb_smd_pads(pad_defs):
     """Generate SMD pad entries.
     pad_defs: list of (num, net, rx, ry, sx, sy)
     """
-    pads = []
-    for num, net, rx, ry, sx, sy in pad_defs:
-        pads.append((num, net, rx, ry, "rect", sx, sy, "smd", '"F.Cu" "F.Paste" "F.Mask"'))
-    return pads
+    return [Pad(num, net, rx, ry, "rect", sx, sy, "smd", '"F.Cu" "F.Paste" "F.Mask"')
+            for num, net, rx, ry, sx, sy in pad_defs]
 
 def pcb_thru_pads(pad_defs, drill=1.0):
     """Generate through-hole pad entries.
     pad_defs: list of (num, net, rx, ry, sx, sy)
     """
-    pads = []
-    for num, net, rx, ry, sx, sy in pad_defs:
-        pads.append((num, net, rx, ry, "circle", sx, sy, "thru_hole", '"*.Cu" "*.Mask"', drill))
-    return pads
-
-def generate_pcb():
-    """Generate the .kicad_pcb file with board outline + placed footprints."""
-    # Board dimensions: 60mm x 55mm (fits ESP32 pin sockets + MOSFET channels)
-    board_w = 60.0
-    board_h = 55.0
-    origin_x = 100.0
-    origin_y = 80.0
-
+    return [Pad(num, net, rx, ry, "circle", sx, sy, "thru_hole", '"*.Cu" "*.Mask"', drill)
+            for num, net, rx, ry, sx, sy in pad_defs]
+
+class Board:
+    """Placed PCB content: outline rectangle plus footprints."""
+
+    __slots__ = ("origin_x", "origin_y", "width", "height", "footprints", "_pad_table")
+
+    def __init__(self, origin_x, origin_y, width, height, footprints):
+        self.origin_x = origin_x
+        self.origin_y = origin_y
+        self.width = width
+        self.height = height
+        self.footprints = footprints
+        self._pad_table = None
+
+    def pad_table(self):
+        """Absolute pad geometry, computed on first use and then shared."""
+        if self._pad_table is None:
+            self._pad_table = PadTable(self.footprints)
+        return self._pad_table
+
+CHANNEL_ROW_PITCH = 20.0
+PLACEMENT_CLEARANCE = 0.2   # pad to pad, matches min_clearance in the project rules
+COURTYARD_MARGIN = 0.25     # courtyard drawn this far around a footprint's pads
+EDGE_MARGIN = 1.0           # channel parts to board edge
+PLACEMENT_CELL = 5.0        # grid cell of the clearance check, about one footprint
+
+def pad_boxes(footprints):
+    """Absolute (x0, y0, x1, y1, footprint index) of every pad's copper.
+
+    Pads at multiples of 90 degrees get their exact box; other angles the
+    box of the pad's circumscribed circle.
+    """
+    table = PadTable(footprints)
+    boxes = []
+    for pad, i, x, y in zip(table.pads, table.fp_index, table.x, table.y):
+        angle = (footprints[i].rot + pad.rot) % 180
+        if angle == 0:
+            hx, hy = pad.size_x / 2, pad.size_y / 2
+        elif angle == 90:
+            hx, hy = pad.size_y / 2, pad.size_x / 2
+        else:
+            hx = hy = math.hypot(pad.size_x, pad.size_y) / 2
+        boxes.append((x - hx, y - hy, x + hx, y + hy, i))
+    return boxes
+
+def _extent(boxes):
+    return (min(b[0] for b in boxes), min(b[1] for b in boxes),
+            max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+def check_placement(board):
+    """Placement errors of a board: pads closer than PLACEMENT_CLEARANCE,
+    overlapping pad-derived courtyards, and pads off or too near the edge.
+
+    Returns a list of messages; empty when the placement is clean.
+    """
+    fps = board.footprints
+    boxes = pad_boxes(fps)
+    errors = []
+
+    def sweep(items, margin, report):
+        # Only boxes sharing a grid cell once grown by margin can be that close
+        index = GridIndex(PLACEMENT_CELL)
+        for k, (x0, y0, x1, y1, _) in enumerate(items):
+            index.insert(k, x0, y0, x1 + margin, y1 + margin)
+        for group in index.groups():
+            for n, k in enumerate(group):
+                a = items[k]
+                for b in (items[j] for j in group[n + 1:]):
+                    if (a[4] != b[4] and b[0] < a[2] + margin and a[0] < b[2] + margin
+                            and b[1] < a[3] + margin and a[1] < b[3] + margin):
+                        report(a[4], b[4])
+
+    close = set()
+    sweep(boxes, PLACEMENT_CLEARANCE, lambda i, j: close.add((min(i, j), max(i, j))))
+    errors.extend(f"{fps[i].ref} and {fps[j].ref}: pads closer than {PLACEMENT_CLEARANCE}mm"
+                  for i, j in sorted(close))
+
+    per_fp = {}
+    for box in boxes:
+        per_fp.setdefault(box[4], []).append(box)
+    m = COURTYARD_MARGIN
+    courtyards = [(x0 - m, y0 - m, x1 + m, y1 + m, i)
+                  for i, (x0, y0, x1, y1) in ((i, _extent(b)) for i, b in per_fp.items())]
+    overlap = set()
+    sweep(courtyards, 0.0, lambda i, j: overlap.add((min(i, j), max(i, j))))
+    errors.extend(f"{fps[i].ref} and {fps[j].ref}: courtyards overlap"
+                  for i, j in sorted(overlap - close))
+
+    e = ZONE_EDGE_CLEARANCE
+    x_min, y_min = board.origin_x + e, board.origin_y + e
+    x_max, y_max = board.origin_x + board.width - e, board.origin_y + board.height - e
+    off = sorted({i for x0, y0, x1, y1, i in boxes if x0 < x_min or y0 < y_min or x1 > x_max or y1 > y_max})
+    errors.extend(f"{fps[i].ref}: pads within {e}mm of the board edge" for i in off)
+    return errors
+
+def fixed_footprints(ctx, origin_x, origin_y):
+    """Power input, regulator, ESP32 sockets and status LED: everything above the channels."""
+    n_ch = len(ctx.channels)
     footprints = []
 
-    # -- Board outline --
-    edge_cuts = f"""  (gr_rect (start {origin_x:.2f} {origin_y:.2f}) (end {origin_x + board_w:.2f} {origin_y + board_h:.2f})
-    (stroke (width 0.15) (type default)) (layer "Edge.Cuts") (uuid "{gen_uuid()}"))"""
-
     # -- Screw terminal J1 (top-left) --
     j1_x = origin_x + 5.08
     j1_y = origin_y + 5.08
     footprints.append(pcb_footprint("J1", "TerminalBlock:TerminalBlock_bornier-2_P5.08mm",
                                      j1_x, j1_y, value="Battery",
+                                     library=ctx.fp_lib,
                                      pads=pcb_thru_pads([
                                          ("1", "+BATT", 0, 0, 1.7, 1.7),
                                          ("2", "GND", 5.08, 0, 1.7, 1.7),
@@ -952,8 +1277,9 @@ def generate_pcb():
     # -- MP1584EN module (4-pin header, top center) --
     mp_x = origin_x + 20.0
     mp_y = origin_y + 5.08
-    footprints.append(pcb_footprint("J11", "Connector_PinHeader_2.54mm:PinHeader_1x04_P2.54mm_Vertical",
+    footprints.append(pcb_footprint(f"J{n_ch + 2}", "Connector_PinHeader_2.54mm:PinHeader_1x04_P2.54mm_Vertical",
                                      mp_x, mp_y, value="MP1584EN",
+                                     library=ctx.fp_lib,
                                      pads=pcb_thru_pads([
                                          ("1", "+BATT", 0, 0, 1.7, 1.7),
                                          ("2", "GND", 2.54, 0, 1.7, 1.7),
@@ -966,6 +1292,7 @@ def generate_pcb():
     c1_y = origin_y + 5.08
     footprints.append(pcb_footprint("C1", "Capacitor_SMD:C_0805_2012Metric",
                                      c1_x, c1_y, value="22uF",
+                                     library=ctx.fp_lib,
                                      pads=pcb_smd_pads([
                                          ("1", "+BATT", -1.0, 0, 1.0, 1.25),
                                          ("2", "GND", 1.0, 0, 1.0, 1.25),
@@ -976,6 +1303,7 @@ def generate_pcb():
     c2_y = origin_y + 5.08
     footprints.append(pcb_footprint("C2", "Capacitor_SMD:C_0805_2012Metric",
                                      c2_x, c2_y, value="22uF",
+                                     library=ctx.fp_lib,
                                      pads=pcb_smd_pads([
                                          ("1", "+5V", -1.0, 0, 1.0, 1.25),
                                          ("2", "GND", 1.0, 0, 1.0, 1.25),
@@ -990,110 +1318,261 @@ def generate_pcb():
     left_pads = []
     for i in range(15):
         left_pads.append((str(i + 1), "", 0, i * 2.54, 1.7, 1.7))
-    footprints.append(pcb_footprint("J12", "Connector_PinSocket_2.54mm:PinSocket_1x15_P2.54mm_Vertical",
+    footprints.append(pcb_footprint(f"J{n_ch + 3}", "Connector_PinSocket_2.54mm:PinSocket_1x15_P2.54mm_Vertical",
                                      esp_left_x, esp_y, value="ESP32_Left",
+                                     library=ctx.fp_lib,
                                      pads=pcb_thru_pads(left_pads)))
 
     right_pads = []
     for i in range(15):
         right_pads.append((str(i + 1), "", 0, i * 2.54, 1.7, 1.7))
-    footprints.append(pcb_footprint("J13", "Connector_PinSocket_2.54mm:PinSocket_1x15_P2.54mm_Vertical",
+    footprints.append(pcb_footprint(f"J{n_ch + 4}", "Connector_PinSocket_2.54mm:PinSocket_1x15_P2.54mm_Vertical",
                                      esp_right_x, esp_y, value="ESP32_Right",
+                                     library=ctx.fp_lib,
                                      pads=pcb_thru_pads(right_pads)))
 
     # -- Status LED + resistor (near ESP32) --
     led_x = origin_x + 50.0
     led_y = origin_y + 15.0
-    footprints.append(pcb_footprint("R19", "Resistor_SMD:R_0603_1608Metric",
+    footprints.append(pcb_footprint(f"R{n_ch * 2 + 1}", "Resistor_SMD:R_0603_1608Metric",
                                      led_x, led_y, value="1K",
+                                     library=ctx.fp_lib,
                                      pads=pcb_smd_pads([
                                          ("1", "GPIO_2", -0.8, 0, 0.9, 0.95),
                                          ("2", "STATUS_LED", 0.8, 0, 0.9, 0.95),
                                      ])))
     footprints.append(pcb_footprint("D1", "LED_SMD:LED_0805_2012Metric",
                                      led_x + 4.0, led_y, value="Green",
+                                     library=ctx.fp_lib,
                                      pads=pcb_smd_pads([
                                          ("1", "STATUS_LED", -1.0, 0, 1.0, 1.25),
                                          ("2", "GND", 1.0, 0, 1.0, 1.25),
                                      ])))
+    return footprints
 
-    # -- 9 MOSFET channels --
-    # MOSFETs in a row near bottom, JST connectors below them
-    mosfet_y = origin_y + board_h - 15.0
-    jst_y = origin_y + board_h - 5.0
-    channel_spacing = 6.0
-    ch_start_x = origin_x + 3.0
-
-    for i, ch in enumerate(CHANNELS):
-        ch_x = ch_start_x + i * channel_spacing
-        ch_num = ch["num"]
-        gpio = ch["gpio"]
-
-        # Gate resistor (100R)
-        r_gate_ref = f"R{i * 2 + 1}"
-        footprints.append(pcb_footprint(
-            r_gate_ref, "Resistor_SMD:R_0603_1608Metric",
-            ch_x, mosfet_y - 5.0, 90, value="100",
-            pads=pcb_smd_pads([
-                ("1", f"GPIO_{gpio}", 0, -0.8, 0.9, 0.95),
-                ("2", f"GATE_{ch_num}", 0, 0.8, 0.9, 0.95),
-            ])))
-
-        # Pulldown resistor (10K)
-        r_pd_ref = f"R{i * 2 + 2}"
-        footprints.append(pcb_footprint(
-            r_pd_ref, "Resistor_SMD:R_0603_1608Metric",
-            ch_x + 2.0, mosfet_y - 5.0, 90, value="10K",
-            pads=pcb_smd_pads([
-                ("1", f"GATE_{ch_num}", 0, -0.8, 0.9, 0.95),
-                ("2", "GND", 0, 0.8, 0.9, 0.95),
-            ])))
-
-        # MOSFET (SOT-23: pin1=Gate, pin2=Source, pin3=Drain)
-        q_ref = f"Q{ch_num}"
-        footprints.append(pcb_footprint(
-            q_ref, "Package_TO_SOT_SMD:SOT-23",
-            ch_x + 1.0, mosfet_y, 0, value="AO3400A",
-            pads=pcb_smd_pads([
-                ("1", f"GATE_{ch_num}", -1.1, 0.95, 0.6, 0.7),
-                ("2", "GND", 1.1, 0.95, 0.6, 0.7),
-                ("3", f"DRAIN_{ch_num}", 1.1, -0.95, 0.6, 0.7),
-            ])))
-
-        # JST-XH 2-pin output connector
-        j_ref = f"J{ch_num + 1}"  # J2-J10
-        footprints.append(pcb_footprint(
-            j_ref, "Connector_JST:JST_XH_B2B-XH-A_1x02_P2.50mm_Vertical",
-            ch_x + 0.5, jst_y, 0, value=f"Ch{ch_num}",
-            pads=pcb_thru_pads([
-                ("1", "+BATT", 0, 0, 1.7, 1.7),
-                ("2", f"DRAIN_{ch_num}", 2.5, 0, 1.7, 1.7),
-            ])))
+def channel_footprints(ctx, i, ch, ch_x, mosfet_y):
+    """Gate resistor, pulldown, MOSFET and output connector of channel i."""
+    mosfet = MOSFET_PARTS[ctx.mosfet]
+    conn = CONNECTORS[ctx.connector]
+    jst_y = mosfet_y + 10.0
+    ch_num = ch["num"]
+    gpio = ch["gpio"]
+    footprints = []
 
-    # -- Net declarations --
-    net_lines = []
-    for name, nid in sorted(NET_MGR.nets.items(), key=lambda x: x[1]):
-        net_lines.append(f'  (net {nid} "{name}")')
-    nets_block = "\n".join(net_lines)
+    # Gate resistor (100R), turned upright like the library footprint
+    footprints.append(pcb_footprint(
+        f"R{i * 2 + 1}", "Resistor_SMD:R_0603_1608Metric",
+        ch_x, mosfet_y - 5.0, 90, value=ch["gate_r"],
+        library=ctx.fp_lib,
+        pads=pcb_smd_pads([
+            ("1", f"GPIO_{gpio}", -0.8, 0, 0.9, 0.95),
+            ("2", f"GATE_{ch_num}", 0.8, 0, 0.9, 0.95),
+        ])))
+
+    # Pulldown resistor (10K)
+    footprints.append(pcb_footprint(
+        f"R{i * 2 + 2}", "Resistor_SMD:R_0603_1608Metric",
+        ch_x + 2.0, mosfet_y - 5.0, 90, value=ch["pd_r"],
+        library=ctx.fp_lib,
+        pads=pcb_smd_pads([
+            ("1", f"GATE_{ch_num}", -0.8, 0, 0.9, 0.95),
+            ("2", "GND", 0.8, 0, 0.9, 0.95),
+        ])))
+
+    # MOSFET, pad numbers mapped to gate/source/drain by the part's pinout
+    pin_nets = {"G": f"GATE_{ch_num}", "S": "GND", "D": f"DRAIN_{ch_num}"}
+    pad_nets = {str(n + 1): pin_nets[pin] for n, pin in enumerate(mosfet["pinout"])}
+    footprints.append(pcb_footprint(
+        f"Q{ch_num}", mosfet["footprint"],
+        ch_x + 1.0, mosfet_y, 0, value=ctx.mosfet,
+        library=ctx.fp_lib,
+        pads=pcb_smd_pads([
+            (num, pad_nets[num], px, py, sx, sy)
+            for num, px, py, sx, sy in mosfet["pads"]
+        ])))
+
+    # 2-pin output connector
+    footprints.append(pcb_footprint(
+        f"J{ch_num + 1}", conn["footprint"],  # J2-J10 on the 9-channel board
+        ch_x + 0.5, jst_y, 0, value=f"Ch{ch_num}",
+        library=ctx.fp_lib,
+        pads=pcb_thru_pads([
+            ("1", "+BATT", 0, 0, conn["pad"], conn["pad"]),
+            ("2", f"DRAIN_{ch_num}", conn["pitch"], 0, conn["pad"], conn["pad"]),
+        ], drill=conn["drill"])))
+    return footprints
+
+class ChannelLayout:
+    """Board size and channel grid: rows of channels below the fixed parts."""
+
+    __slots__ = ("board_w", "board_h", "per_row", "spacing", "start_x", "first_row_y")
+
+    def __init__(self, board_w, board_h, per_row, spacing, start_x, first_row_y):
+        self.board_w = board_w
+        self.board_h = board_h
+        self.per_row = per_row
+        self.spacing = spacing
+        self.start_x = start_x
+        self.first_row_y = first_row_y
+
+def channel_layout(ctx):
+    """Board size and channel grid for the context's parts.
+
+    Channels sit in rows of CHANNEL_ROW_PITCH below the ESP32 sockets and
+    status LED, so they never share board area with them. Channel spacing
+    and margins come from the pads of one channel, courtyards included;
+    the default 60mm wide board takes nine JST-XH channels per row.
+    """
+    fixed = _extent(pad_boxes(fixed_footprints(ctx, 0.0, 0.0)))
+    x0, y0, x1, y1 = _extent(pad_boxes(channel_footprints(ctx, 0, ctx.channels[0], 0.0, 0.0)))
+    m = COURTYARD_MARGIN
+    conn = CONNECTORS[ctx.connector]
+    mosfet_w = max(abs(x) + sx / 2 for _, x, _, sx, _ in MOSFET_PARTS[ctx.mosfet]["pads"]) * 2
+    spacing = max(6.0, conn["pitch"] + 3.5, mosfet_w + 1.0, x1 - x0 + 2 * m)
+    start_x = max(3.0, EDGE_MARGIN - x0)
+    board_w, board_h = ctx.board_size or (60.0, None)
+
+    usable = board_w - EDGE_MARGIN - x1 - start_x
+    per_row = int(usable // spacing) + 1 if usable >= 0 else 0
+    if per_row < 1:
+        raise ValueError(f"board width {board_w}mm is too narrow for one {ctx.mosfet}/{ctx.connector} channel")
+    rows = -(-len(ctx.channels) // per_row)
+    first_row_y = fixed[3] + 2 * m - (y0 - m)
+    min_h = math.ceil(first_row_y + (rows - 1) * CHANNEL_ROW_PITCH + y1 + EDGE_MARGIN)
+    if board_h is None:
+        board_h = float(min_h)
+    elif board_h < min_h:
+        raise ValueError(f"{len(ctx.channels)} {ctx.mosfet}/{ctx.connector} channels need a board "
+                         f"at least {min_h}mm tall")
+    return ChannelLayout(board_w, board_h, per_row, spacing, start_x, first_row_y)
+
+def build_board(ctx):
+    """Place every footprint of the LED driver board.
+
+    Raises ValueError when check_placement() finds overlapping parts.
+    """
+    layout = channel_layout(ctx)
+    origin_x = 100.0
+    origin_y = 80.0
 
-    # -- Ground zone on B.Cu --
-    zone_uid = gen_uuid()
-    gnd_id = NET_MGR.get("GND")
-    zone = f"""  (zone (net {gnd_id}) (net_name "GND") (layer "B.Cu") (uuid "{zone_uid}")
+    footprints = fixed_footprints(ctx, origin_x, origin_y)
+
+    # -- MOSFET channels --
+    # Rows of gate/pulldown resistors, MOSFET and output connector below the ESP32
+    for i, ch in enumerate(ctx.channels):
+        ch_x = origin_x + layout.start_x + (i % layout.per_row) * layout.spacing
+        mosfet_y = origin_y + layout.first_row_y + (i // layout.per_row) * CHANNEL_ROW_PITCH
+        footprints.extend(channel_footprints(ctx, i, ch, ch_x, mosfet_y))
+
+    board = Board(origin_x, origin_y, layout.board_w, layout.board_h, footprints)
+    errors = check_placement(board)
+    if errors:
+        shown = "; ".join(errors[:5]) + (f"; and {len(errors) - 5} more" if len(errors) > 5 else "")
+        raise ValueError(f"placement check failed: {shown}")
+    return board
+
+# ---------------------------------------------------------------------------
+# PCB generation — zone fill
+# ---------------------------------------------------------------------------
+
+ZONE_CLEARANCE = 0.3        # zone to foreign pads, matches (connect_pads (clearance))
+ZONE_EDGE_CLEARANCE = 0.3   # matches min_copper_edge_clearance in the project rules
+HOLE_CLEARANCE = 0.25       # matches min_hole_clearance in the project rules
+THERMAL_GAP = 0.5
+THERMAL_BRIDGE_WIDTH = 0.5
+
+def zone_fill(board, net="GND", layer="B.Cu", holes=()):
+    """Filled polygons of a copper pour covering the whole board on one layer.
+
+    Pads of other nets on the layer are cleared by ZONE_CLEARANCE, pads of
+    the zone's net get thermal reliefs, and islands that reach none of the
+    zone's pads are dropped, as KiCad's own fill would. holes are extra
+    (diameter, x, y) drills, such as panel mouse bites, cleared by
+    HOLE_CLEARANCE. Returns a list of point lists in board coordinates.
+    """
+    e = ZONE_EDGE_CLEARANCE
+    outline = [(board.origin_x + e, board.origin_y + e),
+               (board.origin_x + board.width - e, board.origin_y + e),
+               (board.origin_x + board.width - e, board.origin_y + board.height - e),
+               (board.origin_x + e, board.origin_y + board.height - e)]
+    obstacles = []
+    anchors = []
+    for fp, pad, x, y in board.pad_table().rows():
+        if '"*.Cu"' not in pad.layers and f'"{layer}"' not in pad.layers:
+            continue
+        if pad.net == net:
+            obstacles.extend(thermal_relief_polygons(
+                pad.shape, x, y, pad.size_x, pad.size_y, fp.rot + pad.rot, THERMAL_GAP, THERMAL_BRIDGE_WIDTH))
+            anchors.append((x, y))
+        else:
+            obstacles.append(pad_clearance_polygon(
+                pad.shape, x, y, pad.size_x, pad.size_y, fp.rot + pad.rot, ZONE_CLEARANCE))
+    for d, x, y in holes:
+        obstacles.append(pad_clearance_polygon("circle", x, y, d, d, 0, HOLE_CLEARANCE))
+    return subtract(outline, obstacles, keep_points=anchors)
+
+def render_filled_polygons(polygons, layer="B.Cu", dx=0.0, dy=0.0):
+    """Format zone fill polygons, shifted by dx/dy, as (filled_polygon ...) blocks."""
+    blocks = []
+    for poly in polygons:
+        rows = []
+        for i in range(0, len(poly), 5):
+            rows.append("        " + " ".join(f"(xy {x + dx:.4f} {y + dy:.4f})" for x, y in poly[i:i + 5]))
+        pts = "\n".join(rows)
+        blocks.append(f"""    (filled_polygon
+      (layer "{layer}")
+      (pts
+{pts}
+      )
+    )""")
+    return "\n".join(blocks)
+
+def render_gnd_zone(ctx, x, y, w, h, fill, dx=0.0, dy=0.0, net_prefix=""):
+    """The B.Cu GND pour over a w x h board at (x, y), with its filled polygons."""
+    net = net_prefix + "GND"
+    x, y = x + dx, y + dy
+    return f"""  (zone (net {ctx.nets.get(net)}) (net_name "{net}") (layer "B.Cu") (uuid "{ctx.uuid()}")
     (hatch edge 0.5)
     (connect_pads (clearance 0.3))
     (min_thickness 0.25)
     (filled_areas_thickness no)
     (fill yes (thermal_gap 0.5) (thermal_bridge_width 0.5))
     (polygon (pts
-      (xy {origin_x:.2f} {origin_y:.2f})
-      (xy {origin_x + board_w:.2f} {origin_y:.2f})
-      (xy {origin_x + board_w:.2f} {origin_y + board_h:.2f})
-      (xy {origin_x:.2f} {origin_y + board_h:.2f})
+      (xy {x:.2f} {y:.2f})
+      (xy {x + w:.2f} {y:.2f})
+      (xy {x + w:.2f} {y + h:.2f})
+      (xy {x:.2f} {y + h:.2f})
     ))
+{render_filled_polygons(fill, dx=dx, dy=dy)}
   )"""
 
-    footprints_block = "\n".join(footprints)
+def generate_pcb(ctx=None, board=None):
+    """Generate the .kicad_pcb file with board outline + placed footprints."""
+    if ctx is None:
+        ctx = DesignContext()
+    if board is None:
+        board = build_board(ctx)
+    origin_x, origin_y = board.origin_x, board.origin_y
+    board_w, board_h = board.width, board.height
+
+    # -- Board outline --
+    edge_cuts = f"""  (gr_rect (start {origin_x:.2f} {origin_y:.2f}) (end {origin_x + board_w:.2f} {origin_y + board_h:.2f})
+    (stroke (width 0.15) (type default)) (layer "Edge.Cuts") (uuid "{ctx.uuid()}"))"""
+
+    footprints_block = "\n".join(render_footprint(ctx, fp) for fp in board.footprints)
+
+    # -- Ground zone on B.Cu --
+    zone = render_gnd_zone(ctx, origin_x, origin_y, board_w, board_h, zone_fill(board))
+
+    return pcb_document(ctx, "\n".join((edge_cuts, footprints_block, zone)))
+
+def pcb_document(ctx, items):
+    """Wrap board items in the .kicad_pcb header, layer stack and net list."""
+    # -- Net declarations --
+    net_lines = []
+    for name, nid in sorted(ctx.nets.nets.items(), key=lambda x: x[1]):
+        net_lines.append(f'  (net {nid} "{name}")')
+    nets_block = "\n".join(net_lines)
 
     pcb = f"""(kicad_pcb
   (version {PCB_VERSION})
@@ -1169,19 +1648,227 @@ def generate_pcb():
     )
   )
 {nets_block}
-{edge_cuts}
-{footprints_block}
-{zone}
+{items}
 )
 """
     return pcb
 
+# ---------------------------------------------------------------------------
+# PCB generation — panelization
+# ---------------------------------------------------------------------------
+
+PANEL_RAIL = 5.0            # top and bottom rail width
+PANEL_GAP = 2.0             # routed slot between boards and rails
+TAB_WIDTH = 3.0
+TAB_SPACING = 30.0          # roughly one tab per this much board edge
+MOUSE_BITE_DRILL = 0.5
+MOUSE_BITE_PITCH = 0.75
+MOUSE_BITE_OFFSET = 0.25    # hole centres sit this far inside the edge
+FIDUCIAL_PAD = 1.0
+FIDUCIAL_MASK_MARGIN = 0.5
+FIDUCIAL_INSET = 5.0
+
+def instance_prefix(k):
+    """Net name prefix of panel instance k."""
+    return f"Board_{k}-"
+
+def instance_ref(ref, k):
+    """Reference designator of a board footprint in panel instance k."""
+    return f"{ref}_{k}"
+
+class Panel:
+    """A rows x cols panel of one Board, plus rails, tabs and fiducials.
+
+    The board is placed once; instance k is the same footprints shifted by
+    offsets[k], sharing their pad records. material holds the rectangles
+    (boards, rails, tabs) whose union is the panel outline, extras the
+    panel-only footprints (fiducials, mouse bites).
+    """
+
+    __slots__ = ("board", "rows", "cols", "offsets", "material", "extras")
+
+    def __init__(self, board, rows, cols, offsets, material, extras):
+        self.board = board
+        self.rows = rows
+        self.cols = cols
+        self.offsets = offsets
+        self.material = material
+        self.extras = extras
+
+def _mouse_bites(ref, x0, x1, y, horizontal=True):
+    """NPTH footprint with a row of holes from x0 to x1 at y (or transposed)."""
+    count = int((x1 - x0) / MOUSE_BITE_PITCH) + 1
+    start = -(count - 1) * MOUSE_BITE_PITCH / 2
+    cx = (x0 + x1) / 2
+    pads = []
+    for i in range(count):
+        u = start + i * MOUSE_BITE_PITCH
+        px, py = (u, 0) if horizontal else (0, u)
+        pads.append(Pad("", "", px, py, "circle", MOUSE_BITE_DRILL, MOUSE_BITE_DRILL,
+                        "np_thru_hole", '"*.Cu" "*.Mask"', MOUSE_BITE_DRILL))
+    fx, fy = (cx, y) if horizontal else (y, cx)
+    return pcb_footprint(ref, "panel:MouseBites", fx, fy, value="MouseBites", pads=pads)
+
+def build_panel(ctx, rows, cols, board=None):
+    """Lay out a rows x cols panel around one placed board."""
+    if rows < 1 or cols < 1:
+        raise ValueError("panel needs at least one row and one column")
+    if board is None:
+        board = build_board(ctx)
+    w, h, g, rail = board.width, board.height, PANEL_GAP, PANEL_RAIL
+    px, py = board.origin_x, board.origin_y
+    pw = cols * w + (cols - 1) * g
+    ph = rows * h + (rows + 1) * g + 2 * rail
+
+    offsets = []
+    material = [(px, py, px + pw, py + rail), (px, py + ph - rail, px + pw, py + ph)]
+    for r in range(rows):
+        for c in range(cols):
+            bx, by = px + c * (w + g), py + rail + g + r * (h + g)
+            offsets.append((bx - board.origin_x, by - board.origin_y))
+            material.append((bx, by, bx + w, by + h))
+
+    extras = []
+    tab_ref = (f"MB{i}" for i in range(1, 1_000_000))
+    # Tabs across the slots above every row and below the last one
+    nx = max(1, round(w / TAB_SPACING))
+    for c in range(cols):
+        bx = px + c * (w + g)
+        for r in range(rows + 1):
+            gy0 = py + rail + r * (h + g)
+            for i in range(nx):
+                x = bx + (i + 0.5) * w / nx
+                x0, x1 = x - TAB_WIDTH / 2, x + TAB_WIDTH / 2
+                material.append((x0, gy0, x1, gy0 + g))
+                extras.append(_mouse_bites(next(tab_ref), x0, x1, gy0 - MOUSE_BITE_OFFSET))
+                extras.append(_mouse_bites(next(tab_ref), x0, x1, gy0 + g + MOUSE_BITE_OFFSET))
+    # Tabs across the slots between columns
+    ny = max(1, round(h / TAB_SPACING))
+    for c in range(cols - 1):
+        gx0 = px + (c + 1) * w + c * g
+        for r in range(rows):
+            by = py + rail + g + r * (h + g)
+            for i in range(ny):
+                y = by + (i + 0.5) * h / ny
+                y0, y1 = y - TAB_WIDTH / 2, y + TAB_WIDTH / 2
+                material.append((gx0, y0, gx0 + g, y1))
+                extras.append(_mouse_bites(next(tab_ref), y0, y1, gx0 - MOUSE_BITE_OFFSET, horizontal=False))
+                extras.append(_mouse_bites(next(tab_ref), y0, y1, gx0 + g + MOUSE_BITE_OFFSET, horizontal=False))
+
+    # Three fiducials on the rails, asymmetric so the panel's orientation is unambiguous
+    for n, (fx, fy) in enumerate(((px + FIDUCIAL_INSET, py + rail / 2),
+                                  (px + pw - FIDUCIAL_INSET, py + rail / 2),
+                                  (px + FIDUCIAL_INSET, py + ph - rail / 2)), 1):
+        pad = Pad("1", "", 0, 0, "circle", FIDUCIAL_PAD, FIDUCIAL_PAD, "smd", '"F.Cu" "F.Mask"',
+                  mask_margin=FIDUCIAL_MASK_MARGIN)
+        extras.append(pcb_footprint(f"FID{n}", "Fiducial:Fiducial_1mm_Mask2mm", fx, fy,
+                                    value="Fiducial", pads=[pad]))
+
+    return Panel(board, rows, cols, offsets, material, extras)
+
+def rect_union_contours(rects):
+    """Outline loops of a union of axis-aligned rectangles.
+
+    The rectangles' edges cut the plane into a grid of cells; boundary
+    sides between filled and empty cells are chained into loops (filled
+    side on the right, Y down) and collinear runs merged. Returns lists of
+    (x, y) corners: the outer outline and one loop per enclosed slot.
+    """
+    xs = sorted({v for x0, _, x1, _ in rects for v in (x0, x1)})
+    ys = sorted({v for _, y0, _, y1 in rects for v in (y0, y1)})
+    xi = {x: i for i, x in enumerate(xs)}
+    yi = {y: j for j, y in enumerate(ys)}
+    filled = set()
+    for x0, y0, x1, y1 in rects:
+        for i in range(xi[x0], xi[x1]):
+            for j in range(yi[y0], yi[y1]):
+                filled.add((i, j))
+
+    outgoing = {}
+    for i, j in filled:
+        if (i, j - 1) not in filled:
+            outgoing.setdefault((i, j), []).append((i + 1, j))
+        if (i + 1, j) not in filled:
+            outgoing.setdefault((i + 1, j), []).append((i + 1, j + 1))
+        if (i, j + 1) not in filled:
+            outgoing.setdefault((i + 1, j + 1), []).append((i, j + 1))
+        if (i - 1, j) not in filled:
+            outgoing.setdefault((i, j + 1), []).append((i, j))
+
+    loops = []
+    while outgoing:
+        start = next(iter(outgoing))
+        loop = [start]
+        prev, cur = start, outgoing[start].pop()
+        if not outgoing[start]:
+            del outgoing[start]
+        while cur != start:
+            loop.append(cur)
+            options = outgoing[cur]
+            if len(options) > 1:
+                # Where two cells touch at a corner, turn right to keep loops apart
+                dx, dy = cur[0] - prev[0], cur[1] - prev[1]
+                right = (cur[0] - dy, cur[1] + dx)
+                nxt = right if right in options else options[0]
+                options.remove(nxt)
+            else:
+                nxt = options.pop()
+            if not options:
+                del outgoing[cur]
+            prev, cur = cur, nxt
+        # Keep corners only
+        corners = [p for k, p in enumerate(loop)
+                   if (loop[k - 1][0] != loop[(k + 1) % len(loop)][0]
+                       and loop[k - 1][1] != loop[(k + 1) % len(loop)][1])]
+        loops.append([(xs[i], ys[j]) for i, j in corners])
+    return loops
+
+def generate_panel_pcb(ctx, rows, cols, board=None):
+    """Generate a .kicad_pcb holding a rows x cols panel of the board.
+
+    The board is placed once; every instance renders the same footprints
+    shifted to its place, with nets renamed Board_<k>-<net> and references
+    <ref>_<k>. The zone fill also clears the mouse bites along the
+    instance's edges, so it is computed once per distinct set of bites
+    (an edge column or an inner one). ctx.nets is replaced by the panel's
+    net table.
+    """
+    panel = build_panel(ctx, rows, cols, board)
+    board = panel.board
+    n = len(panel.offsets)
+    ctx.nets = NetManager(ctx.channels, [instance_prefix(k) for k in range(n)])
+    bites = [(pad.drill, x, y) for fp, pad, x, y in PadTable(panel.extras).rows()
+             if fp.lib == "panel:MouseBites"]
+    x0, y0 = board.origin_x, board.origin_y
+    x1, y1 = x0 + board.width, y0 + board.height
+    fills = {}
+
+    items = []
+    for loop in rect_union_contours(panel.material):
+        pts = " ".join(f"(xy {x:.3f} {y:.3f})" for x, y in loop)
+        items.append(f"""  (gr_poly (pts {pts})
+    (stroke (width 0.15) (type default)) (fill none) (layer "Edge.Cuts") (uuid "{ctx.uuid()}"))""")
+    for k, (dx, dy) in enumerate(panel.offsets):
+        prefix = instance_prefix(k)
+        # Bites within a hole's reach of this instance, in board coordinates
+        holes = tuple(sorted((d, round(x - dx, 4), round(y - dy, 4)) for d, x, y in bites
+                             if x0 - d <= x - dx <= x1 + d and y0 - d <= y - dy <= y1 + d))
+        if holes not in fills:
+            fills[holes] = zone_fill(board, holes=holes)
+        items.extend(render_footprint(ctx, fp, dx, dy, prefix, instance_ref(fp.ref, k))
+                     for fp in board.footprints)
+        items.append(render_gnd_zone(ctx, board.origin_x, board.origin_y, board.width, board.height,
+                                     fills[holes], dx, dy, prefix))
+    items.extend(render_footprint(ctx, fp) for fp in panel.extras)
+    return pcb_document(ctx, "\n".join(items))
+
 # ---------------------------------------------------------------------------
 # Project file
 # ---------------------------------------------------------------------------
 
-def generate_project():
+def generate_project(ctx=None):
     """Generate the .kicad_pro JSON file."""
+    project = ctx.project if ctx is not None else "led-driver-board"
     proj = {
         "board": {
             "3dviewports": [],
@@ -1230,7 +1917,7 @@ def generate_project():
         "cvpcb": {"equivalence_files": []},
         "libraries": {"pinned_footprint_libs": [], "pinned_symbol_libs": []},
         "meta": {
-            "filename": "led-driver-board.kicad_pro",
+            "filename": f"{project}.kicad_pro",
             "version": 1,
         },
         "net_settings": {
@@ -1309,32 +1996,178 @@ def generate_project():
     }
     return json.dumps(proj, indent=2) + "\n"
 
+# ---------------------------------------------------------------------------
+# Variant build matrix
+# ---------------------------------------------------------------------------
+
+def load_variants(path):
+    """Read a variant matrix from TOML or JSON.
+
+    The file holds an optional ``defaults`` table and a ``variants`` list;
+    each variant needs a ``name`` and may set ``channels`` (a count or a
+    list of channel tables), ``mosfet``, ``connector`` and ``board``
+    ([width, height] in mm).
+    """
+    path = Path(path)
+    if path.suffix == ".toml":
+        import tomllib
+        with path.open("rb") as f:
+            data = tomllib.load(f)
+    else:
+        data = json.loads(path.read_text())
+
+    defaults = data.get("defaults", {})
+    variants = []
+    for entry in data.get("variants", []):
+        v = {**defaults, **entry}
+        if "name" not in v:
+            raise ValueError(f"{path}: variant without a name: {entry}")
+        variants.append(v)
+    names = [v["name"] for v in variants]
+    if len(set(names)) != len(names):
+        raise ValueError(f"{path}: duplicate variant names")
+    return variants
+
+def variant_context(variant, seed=None):
+    """Build the DesignContext for one variant table."""
+    channels = variant.get("channels", len(CHANNELS))
+    if isinstance(channels, int):
+        channels = make_channels(channels)
+    board = variant.get("board")
+    return DesignContext(
+        channels=channels,
+        mosfet=variant.get("mosfet", "AO3400A"),
+        connector=variant.get("connector", "JST_XH"),
+        board_size=tuple(board) if board else None,
+        project=variant["name"],
+        seed=seed,
+    )
+
+def write_design(ctx, out_dir):
+    """Write the .kicad_pro/.kicad_sch/.kicad_pcb trio for a context."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for ext, text in (("kicad_pro", generate_project(ctx)),
+                      ("kicad_sch", generate_schematic(ctx)),
+                      ("kicad_pcb", generate_pcb(ctx))):
+        path = out_dir / f"{ctx.project}.{ext}"
+        path.write_text(text)
+        paths.append(path)
+    return paths
+
+# lib_symbols blocks rendered by the parent, keyed by MOSFET pinout
+_shared_lib_symbols = {}
+# Per-worker footprint library, opened once from the shared cache
+_worker_fp_lib = None
+
+def _init_variant_worker(lib_symbols, fp_lib_dir=None):
+    global _worker_fp_lib
+    _shared_lib_symbols.update(lib_symbols)
+    if fp_lib_dir:
+        _worker_fp_lib = FootprintLibrary(fp_lib_dir)
+
+def _build_variant(variant, out_root):
+    start = time.perf_counter()
+    ctx = variant_context(variant)
+    ctx.lib_symbols = _shared_lib_symbols.get(MOSFET_PARTS[ctx.mosfet]["pinout"])
+    ctx.fp_lib = _worker_fp_lib
+    write_design(ctx, Path(out_root) / ctx.project)
+    if _worker_fp_lib is not None:
+        _worker_fp_lib.save()
+    return variant["name"], len(ctx.channels), time.perf_counter() - start
+
+def build_variants(variants, out_root, jobs=None, fp_lib_dir=None):
+    """Generate every variant into its own directory through a process pool.
+
+    Returns (name, channel count, seconds) per variant, in input order.
+    """
+    # Validate up front so a bad entry fails before any worker starts,
+    # placement clearance included, with the pads the workers will use
+    fp_lib = FootprintLibrary(fp_lib_dir) if fp_lib_dir else None
+    for v in variants:
+        try:
+            ctx = variant_context(v)
+            ctx.fp_lib = fp_lib
+            build_board(ctx)
+        except ValueError as e:
+            raise ValueError(f"variant {v['name']}: {e}") from None
+    if fp_lib is not None:
+        fp_lib.save()
+    pinouts = {MOSFET_PARTS[v.get("mosfet", "AO3400A")]["pinout"] for v in variants}
+    lib_symbols = {p: lib_symbols_block(p) for p in pinouts}
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_variant_worker,
+                             initargs=(lib_symbols, fp_lib_dir)) as pool:
+        futures = [pool.submit(_build_variant, v, str(out_root)) for v in variants]
+        return [f.result() for f in futures]
+
 # ---------------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------------
 
 def main():
+    parser = argparse.ArgumentParser(description="Generate KiCad project files for the LED driver board")
+    parser.add_argument("--variants", type=str, default=None,
+                        help="Variant matrix (.toml or .json); builds every variant instead of the default board")
+    parser.add_argument("--out-dir", type=str, default=None,
+                        help="Output root for --variants / --panel (default: hardware/variants, hardware/panel)")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes for --variants (default: CPU count)")
+    parser.add_argument("--fp-lib", type=str, default=os.environ.get("KICAD8_FOOTPRINT_DIR"),
+                        help="KiCad footprint library directory for exact pad geometry "
+                             "(default: $KICAD8_FOOTPRINT_DIR, else inline pad tables)")
+    parser.add_argument("--panel", type=str, default=None, metavar="RxC",
+                        help="Write an R x C production panel of the board (e.g. 4x6) instead")
+    args = parser.parse_args()
+
+    if args.panel:
+        try:
+            rows, cols = (int(v) for v in args.panel.lower().split("x"))
+        except ValueError:
+            parser.error(f"--panel expects RxC, e.g. 4x6, not {args.panel!r}")
+        out_dir = Path(args.out_dir) if args.out_dir else HARDWARE_DIR / "panel"
+        out_dir.mkdir(parents=True, exist_ok=True)
+        ctx = DesignContext(fp_lib=FootprintLibrary(args.fp_lib) if args.fp_lib else None)
+        start = time.perf_counter()
+        path = out_dir / f"{ctx.project}-panel-{rows}x{cols}.kicad_pcb"
+        path.write_text(generate_panel_pcb(ctx, rows, cols))
+        print(f"  {path} ({rows * cols} boards, {time.perf_counter() - start:.2f} s)")
+        if ctx.fp_lib is not None:
+            ctx.fp_lib.save()
+        return
+
+    if args.variants:
+        out_root = Path(args.out_dir) if args.out_dir else HARDWARE_DIR / "variants"
+        variants = load_variants(args.variants)
+        print(f"Building {len(variants)} variants into {out_root}...")
+        start = time.perf_counter()
+        for name, channels, seconds in build_variants(variants, out_root, args.jobs, args.fp_lib):
+            print(f"  {name:<32} {channels:>4} ch  {seconds * 1000:8.1f} ms")
+        print(f"Done in {time.perf_counter() - start:.2f} s.")
+        return
+
     HARDWARE_DIR.mkdir(parents=True, exist_ok=True)
+    ctx = DesignContext(fp_lib=FootprintLibrary(args.fp_lib) if args.fp_lib else None)
 
     print("Generating KiCad project files...")
 
     # Project file
     pro_path = HARDWARE_DIR / "led-driver-board.kicad_pro"
-    pro_path.write_text(generate_project())
+    pro_path.write_text(generate_project(ctx))
     print(f"  {pro_path}")
 
     # Schematic
     sch_path = HARDWARE_DIR / "led-driver-board.kicad_sch"
-    sch_path.write_text(generate_schematic())
+    sch_path.write_text(generate_schematic(ctx))
     print(f"  {sch_path}")
 
     # PCB
     pcb_path = HARDWARE_DIR / "led-driver-board.kicad_pcb"
-    pcb_path.write_text(generate_pcb())
+    pcb_path.write_text(generate_pcb(ctx))
     print(f"  {pcb_path}")
+    if ctx.fp_lib is not None:
+        ctx.fp_lib.save()
 
     print("Done. Open led-driver-board.kicad_pro in KiCad 8.")
 
-
 if __name__ == "__main__":
     main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""KiCad footprint library reader with a persistent pad-geometry cache.
+
+generate_kicad.py can take exact pad geometry from a local copy of the
+KiCad footprint library (the directory of <Nickname>.pretty folders that
+KICAD8_FOOTPRINT_DIR points to) instead of its inline pad tables. Each
+.kicad_mod file is parsed once; the pads are kept in a pickled cache keyed
+by "Nickname:Name" and revalidated against the file's mtime and size, so
+later runs only unpickle and warm lookups are a dict hit.
+
+Usage:
+  python3 scripts/kicad_fplib.py /usr/share/kicad/footprints            # index the whole library
+  python3 scripts/kicad_fplib.py /usr/share/kicad/footprints Package_TO_SOT_SMD:SOT-23
+
+No external dependencies — uses only Python stdlib.
+"""
+
+import argparse
+import os
+import pickle
+import re
+import time
+from pathlib import Path
+
+CACHE_VERSION = 2
+DEFAULT_CACHE = (Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+                 / "led-driver-board" / "footprints.pickle")
+
+# ---------------------------------------------------------------------------
+# S-expression parsing
+# ---------------------------------------------------------------------------
+
+_TOKEN = re.compile(r'\(|\)|"(?:[^"\\]|\\.)*"|[^\s()"]+')
+
+def parse_sexpr(text):
+    """Parse KiCad S-expression text into nested lists of strings.
+
+    Quoted strings are unquoted, so ("1" and 1) read the same; returns the
+    list of top-level expressions.
+    """
+    stack = [[]]
+    for tok in _TOKEN.findall(text):
+        if tok == "(":
+            stack.append([])
+        elif tok == ")":
+            done = stack.pop()
+            stack[-1].append(done)
+        elif tok[0] == '"':
+            stack[-1].append(tok[1:-1].replace('\\"', '"').replace("\\\\", "\\"))
+        else:
+            stack[-1].append(tok)
+    return stack[0]
+
+# ---------------------------------------------------------------------------
+# Footprint files
+# ---------------------------------------------------------------------------
+
+def _pad_record(item):
+    """(num, pad_type, shape, x, y, size_x, size_y, rot, drill, layers, rratio)
+
+    drill is a diameter, or (width, height) for an oval drill.
+    """
+    num, pad_type, shape = item[1], item[2], item[3]
+    x = y = rot = 0.0
+    sx = sy = 0.0
+    drill = rratio = None
+    layers = []
+    for field in item[4:]:
+        if not isinstance(field, list) or not field:
+            continue
+        key = field[0]
+        if key == "at":
+            x, y = float(field[1]), float(field[2])
+            rot = float(field[3]) if len(field) > 3 else 0.0
+        elif key == "size":
+            sx, sy = float(field[1]), float(field[2])
+        elif key == "drill":
+            # (drill 1.0), (drill oval 1.0 1.5) or (drill 1.0 (offset ...));
+            # an oval drill is kept as its (width, height)
+            sizes = [float(v) for v in field[1:] if isinstance(v, str) and v != "oval"]
+            if "oval" in field[1:2] and sizes:
+                drill = (sizes[0], sizes[1] if len(sizes) > 1 else sizes[0])
+            else:
+                drill = sizes[0] if sizes else None
+        elif key == "layers":
+            layers = field[1:]
+        elif key == "roundrect_rratio":
+            rratio = float(field[1])
+    return (num, pad_type, shape, x, y, sx, sy, rot, drill,
+            " ".join(f'"{layer}"' for layer in layers), rratio)
+
+def read_footprint(path):
+    """Pad records of one .kicad_mod file, in footprint-local coordinates."""
+    tree = parse_sexpr(Path(path).read_text(encoding="utf-8"))
+    if not tree or tree[0][0] not in ("footprint", "module"):
+        raise ValueError(f"{path}: not a KiCad footprint")
+    return [_pad_record(item) for item in tree[0][2:]
+            if isinstance(item, list) and item and item[0] == "pad"]
+
+# ---------------------------------------------------------------------------
+# Library + cache
+# ---------------------------------------------------------------------------
+
+class FootprintLibrary:
+    """Name-indexed pad geometry for a KiCad footprint library directory.
+
+    Lookups parse a footprint on first use only; the parsed pads persist in
+    the pickle at cache_path (None disables persistence). Each name is
+    checked against its file once per process.
+    """
+
+    def __init__(self, root, cache_path=DEFAULT_CACHE):
+        self.root = Path(root).resolve()
+        self.cache_path = Path(cache_path) if cache_path else None
+        self._entries = {}   # name -> (mtime_ns, size, pads)
+        self._checked = {}   # name -> pads or None, validated this process
+        self._dirty = False
+        if self.cache_path and self.cache_path.exists():
+            try:
+                with self.cache_path.open("rb") as f:
+                    data = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                data = None
+            if (isinstance(data, dict) and data.get("version") == CACHE_VERSION
+                    and data.get("root") == str(self.root)):
+                self._entries = data["entries"]
+
+    def path(self, name):
+        nickname, _, footprint = name.partition(":")
+        return self.root / f"{nickname}.pretty" / f"{footprint}.kicad_mod"
+
+    def pads(self, name):
+        """Pad records for "Nickname:Name", or None if the library lacks it."""
+        try:
+            return self._checked[name]
+        except KeyError:
+            pass
+        pads = self._load(name, self.path(name))
+        self._checked[name] = pads
+        return pads
+
+    def __contains__(self, name):
+        return self.pads(name) is not None
+
+    def _load(self, name, path):
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        entry = self._entries.get(name)
+        if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            return entry[2]
+        pads = read_footprint(path)
+        self._entries[name] = (st.st_mtime_ns, st.st_size, pads)
+        self._dirty = True
+        return pads
+
+    def index(self):
+        """Parse every footprint under root into the cache; returns the count."""
+        count = 0
+        for pretty in sorted(self.root.glob("*.pretty")):
+            for path in sorted(pretty.glob("*.kicad_mod")):
+                name = f"{pretty.stem}:{path.stem}"
+                self._checked[name] = self._load(name, path)
+                count += 1
+        return count
+
+    def save(self):
+        """Write the cache if anything was parsed since it was loaded."""
+        if not (self._dirty and self.cache_path):
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.cache_path.with_suffix(f".{os.getpid()}.tmp")
+        with tmp.open("wb") as f:
+            pickle.dump({"version": CACHE_VERSION, "root": str(self.root), "entries": self._entries},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.cache_path)
+        self._dirty = False
+
+def main():
+    parser = argparse.ArgumentParser(description="Index a KiCad footprint library into the pad cache")
+    parser.add_argument("root", help="Directory holding <Nickname>.pretty folders")
+    parser.add_argument("names", nargs="*", help="Footprints to show (Nickname:Name); default: index all")
+    parser.add_argument("--cache", type=str, default=str(DEFAULT_CACHE), help=f"Cache file (default: {DEFAULT_CACHE})")
+    args = parser.parse_args()
+
+    lib = FootprintLibrary(args.root, args.cache)
+    if not args.names:
+        start = time.perf_counter()
+        count = lib.index()
+        lib.save()
+        print(f"Indexed {count} footprints in {time.perf_counter() - start:.2f} s → {lib.cache_path}")
+        return
+
+    for name in args.names:
+        pads = lib.pads(name)
+        if pads is None:
+            print(f"{name}: not found")
+            continue
+        print(f"{name}: {len(pads)} pads")
+        for num, pad_type, shape, x, y, sx, sy, rot, drill, layers, _ in pads:
+            if isinstance(drill, tuple):
+                drill_str = f" drill oval {drill[0]:g}x{drill[1]:g}"
+            else:
+                drill_str = f" drill {drill:g}" if drill else ""
+            print(f"  {num:>3} {pad_type:<12} {shape:<9} at ({x:g}, {y:g}, {rot:g}) size {sx:g}x{sy:g}{drill_str}  {layers}")
+    lib.save()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""Pre-paired NVS partition images for matched controller/receiver sets.
+
+Pairing normally stores the peer MAC in the "espnow" Preferences namespace
+at runtime (espnow_tx.cpp / espnow_rx.cpp):
+
+  controller   peer_mac  blob(6)  receiver STA MAC
+               paired    u8       1
+  receiver     ctrl_mac  blob(6)  controller STA MAC
+               paired    u8       1
+
+This tool writes the same keys straight into ESP-IDF NVS partition images
+(format version 2: 4096-byte pages, 32-byte entries, CRC32 on page headers,
+entries and blob data), one image per unit, so a set ships paired. Images
+are built in parallel and every image is read back with the NVS reader below
+and compared against the manifest before it is reported as good.
+
+The manifest is a CSV with a header row:
+
+  pair,controller_mac,receiver_mac
+  RC-0001,40:4C:CA:12:34:56,24:6F:28:AB:CD:EF
+
+Output is <out>/<pair>/{controller,receiver}_nvs.bin plus <out>/provision.json
+listing each image, its SHA-256 and the esptool command to flash it at the
+nvs partition offset (0x9000, 0x5000 bytes in both default partition tables).
+Flashing replaces the whole nvs partition, so do it before any other
+Preferences data is written.
+
+Usage:
+  python3 scripts/nvs_provision.py pairs.csv --out provision/
+  python3 scripts/nvs_provision.py pairs.csv --out provision/ --jobs 8
+  python3 scripts/nvs_provision.py --read provision/RC-0001/receiver_nvs.bin
+  esptool.py --chip esp32 read_flash 0x9000 0x5000 unit.bin && python3 scripts/nvs_provision.py --read unit.bin
+
+No external dependencies — uses only Python stdlib.
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import struct
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+PAGE_SIZE = 4096
+ENTRY_SIZE = 32
+ENTRIES_PER_PAGE = 126
+FIRST_ENTRY_OFFSET = 64             # 32-byte header + 32-byte entry state bitmap
+MAX_KEY_LEN = 15
+MAX_NAMESPACES = 254
+
+PAGE_ACTIVE = 0xFFFFFFFE
+PAGE_FULL = 0xFFFFFFFC
+PAGE_UNINITIALIZED = 0xFFFFFFFF
+PAGE_VERSION = 0xFE                 # version 2: multi-page blobs
+
+ENTRY_EMPTY = 0b11
+ENTRY_WRITTEN = 0b10
+ENTRY_ERASED = 0b00
+
+CHUNK_ANY = 0xFF
+
+# type -> struct format for primitive values
+INT_TYPES = {
+    0x01: "<B", 0x11: "<b", 0x02: "<H", 0x12: "<h",
+    0x04: "<I", 0x14: "<i", 0x08: "<Q", 0x18: "<q",
+}
+TYPE_U8 = 0x01
+TYPE_STR = 0x21
+TYPE_BLOB = 0x41                    # version 1 single-page blob (read only)
+TYPE_BLOB_DATA = 0x42
+TYPE_BLOB_IDX = 0x48
+
+NVS_OFFSET = 0x9000
+NVS_SIZE = 0x5000
+NAMESPACE = "espnow"
+
+CHIPS = {"controller": "esp32c6", "receiver": "esp32"}
+
+
+def crc32(data: bytes) -> int:
+    """CRC32 as ESP-IDF's esp_rom_crc32_le(0xFFFFFFFF, ...)."""
+    return zlib.crc32(data, 0xFFFFFFFF) & 0xFFFFFFFF
+
+
+def entry_crc(entry: bytes) -> int:
+    """Entry header CRC: everything except the CRC field itself."""
+    return crc32(entry[0:4] + entry[8:32])
+
+# ---------------------------------------------------------------------------
+# Writer
+# ---------------------------------------------------------------------------
+
+def _entry(ns: int, typ: int, span: int, chunk: int, key: str, data: bytes) -> bytes:
+    raw = key.encode("ascii")
+    if not 0 < len(raw) <= MAX_KEY_LEN:
+        raise ValueError(f"NVS key {key!r} must be 1..{MAX_KEY_LEN} ASCII characters")
+    e = bytearray(b"\xff" * ENTRY_SIZE)
+    e[0:4] = bytes((ns, typ, span, chunk))
+    e[8:24] = raw.ljust(16, b"\0")
+    e[24:24 + len(data)] = data
+    struct.pack_into("<I", e, 4, entry_crc(e))
+    return bytes(e)
+
+
+class NvsImage:
+    """Builds an NVS partition image one key at a time.
+
+    Items are written in order into consecutive pages; an item never
+    straddles a page, except blobs, which are split into per-page chunks
+    plus a BLOB_IDX entry as nvs_set_blob() does. The last page of the
+    partition is always left erased, because NVS needs a free page to
+    garbage-collect into.
+    """
+
+    def __init__(self, size: int = NVS_SIZE):
+        if size % PAGE_SIZE or size < 3 * PAGE_SIZE:
+            raise ValueError(f"NVS partition size {size:#x} must be a multiple of {PAGE_SIZE:#x}, at least 3 pages")
+        self.size = size
+        self.pages: list[list[bytes]] = [[]]
+        self.namespaces: dict[str, int] = {}
+
+    def _free(self) -> int:
+        return ENTRIES_PER_PAGE - len(self.pages[-1])
+
+    def _new_page(self):
+        if len(self.pages) + 1 > self.size // PAGE_SIZE - 1:
+            raise ValueError(f"NVS data does not fit in {self.size:#x} bytes")
+        self.pages.append([])
+
+    def _put(self, entries: list[bytes]):
+        if len(entries) > self._free():
+            self._new_page()
+        self.pages[-1].extend(entries)
+
+    def namespace(self, name: str) -> int:
+        if name not in self.namespaces:
+            if len(self.namespaces) >= MAX_NAMESPACES:
+                raise ValueError("too many NVS namespaces")
+            index = len(self.namespaces) + 1
+            self._put([_entry(0, TYPE_U8, 1, CHUNK_ANY, name, bytes((index,)))])
+            self.namespaces[name] = index
+        return self.namespaces[name]
+
+    def put_int(self, namespace: str, key: str, value: int, typ: int = TYPE_U8):
+        ns = self.namespace(namespace)
+        self._put([_entry(ns, typ, 1, CHUNK_ANY, key, struct.pack(INT_TYPES[typ], value))])
+
+    def put_str(self, namespace: str, key: str, value: str):
+        data = value.encode("utf-8") + b"\0"
+        ns = self.namespace(namespace)
+        span = 1 + -(-len(data) // ENTRY_SIZE)
+        if span > ENTRIES_PER_PAGE:
+            raise ValueError(f"string {key!r} does not fit in one page")
+        header = struct.pack("<HHI", len(data), 0xFFFF, crc32(data))
+        self._put([_entry(ns, TYPE_STR, span, CHUNK_ANY, key, header)] + _data_entries(data))
+
+    def put_blob(self, namespace: str, key: str, data: bytes):
+        ns = self.namespace(namespace)
+        chunk_start = 0
+        chunks = 0
+        offset = 0
+        while True:
+            if self._free() < 2:
+                self._new_page()
+            part = data[offset:offset + (self._free() - 1) * ENTRY_SIZE]
+            span = 1 + -(-len(part) // ENTRY_SIZE)
+            header = struct.pack("<HHI", len(part), 0xFFFF, crc32(part))
+            self._put([_entry(ns, TYPE_BLOB_DATA, span, chunk_start + chunks, key, header)]
+                      + _data_entries(part))
+            chunks += 1
+            offset += len(part)
+            if offset >= len(data):
+                break
+        index = struct.pack("<IBBH", len(data), chunks, chunk_start, 0xFFFF)
+        self._put([_entry(ns, TYPE_BLOB_IDX, 1, CHUNK_ANY, key, index)])
+
+    def tobytes(self) -> bytes:
+        out = bytearray(b"\xff" * self.size)
+        for seq, entries in enumerate(self.pages):
+            base = seq * PAGE_SIZE
+            state = PAGE_ACTIVE if seq == len(self.pages) - 1 else PAGE_FULL
+            header = bytearray(b"\xff" * 32)
+            struct.pack_into("<IIB", header, 0, state, seq, PAGE_VERSION)
+            struct.pack_into("<I", header, 28, crc32(bytes(header[4:28])))
+            out[base:base + 32] = header
+            bitmap = bytearray(b"\xff" * 32)
+            for i in range(len(entries)):
+                bitmap[i * 2 // 8] &= 0xFF ^ (1 << (i * 2 % 8))
+            out[base + 32:base + 64] = bitmap
+            for i, e in enumerate(entries):
+                pos = base + FIRST_ENTRY_OFFSET + i * ENTRY_SIZE
+                out[pos:pos + ENTRY_SIZE] = e
+        return bytes(out)
+
+
+def _data_entries(data: bytes) -> list[bytes]:
+    padded = data + b"\xff" * (-len(data) % ENTRY_SIZE)
+    return [padded[i:i + ENTRY_SIZE] for i in range(0, len(padded), ENTRY_SIZE)]
+
+# ---------------------------------------------------------------------------
+# Reader
+# ---------------------------------------------------------------------------
+
+class NvsError(ValueError):
+    pass
+
+
+def read_nvs(image: bytes) -> dict[str, dict[str, object]]:
+    """Parse an NVS partition image into {namespace: {key: value}}.
+
+    Checks page header, entry and data CRCs and raises NvsError on any
+    mismatch. Integers come back as int, strings as str, blobs as bytes.
+    """
+    if len(image) % PAGE_SIZE:
+        raise NvsError(f"image size {len(image):#x} is not a multiple of {PAGE_SIZE:#x}")
+    names: dict[int, str] = {}
+    values: dict[tuple[int, str], object] = {}
+    chunks: dict[tuple[int, str, int], bytes] = {}
+    indexes: dict[tuple[int, str], tuple[int, int, int]] = {}
+    pages = []
+    for base in range(0, len(image), PAGE_SIZE):
+        state, seq, version = struct.unpack_from("<IIB", image, base)
+        if state == PAGE_UNINITIALIZED:
+            continue
+        if state not in (PAGE_ACTIVE, PAGE_FULL, 0xFFFFFFF8):  # 0xF8: FREEING
+            raise NvsError(f"page at {base:#x}: bad state {state:#010x}")
+        (stored,) = struct.unpack_from("<I", image, base + 28)
+        if stored != crc32(image[base + 4:base + 28]):
+            raise NvsError(f"page at {base:#x}: header CRC mismatch")
+        if version != PAGE_VERSION:
+            raise NvsError(f"page at {base:#x}: unsupported format version {version:#04x}")
+        pages.append((seq, base))
+
+    for seq, base in sorted(pages):
+        bitmap = image[base + 32:base + 64]
+        i = 0
+        while i < ENTRIES_PER_PAGE:
+            entry_state = (bitmap[i * 2 // 8] >> (i * 2 % 8)) & 0b11
+            pos = base + FIRST_ENTRY_OFFSET + i * ENTRY_SIZE
+            e = image[pos:pos + ENTRY_SIZE]
+            if entry_state != ENTRY_WRITTEN:
+                i += 1
+                continue
+            ns, typ, span, chunk = e[0:4]
+            if not 1 <= span <= ENTRIES_PER_PAGE - i:
+                raise NvsError(f"page {seq} entry {i}: bad span {span}")
+            (stored,) = struct.unpack_from("<I", e, 4)
+            if stored != entry_crc(e):
+                raise NvsError(f"page {seq} entry {i}: CRC mismatch")
+            key = e[8:24].split(b"\0", 1)[0].decode("ascii", "replace")
+            payload = e[24:32]
+            if typ in INT_TYPES:
+                (value,) = struct.unpack_from(INT_TYPES[typ], payload)
+                if ns == 0:
+                    names[value] = key
+                else:
+                    values[(ns, key)] = value
+            elif typ in (TYPE_STR, TYPE_BLOB, TYPE_BLOB_DATA):
+                size, _, data_crc = struct.unpack("<HHI", payload)
+                data = image[pos + ENTRY_SIZE:pos + ENTRY_SIZE + size]
+                if size > (span - 1) * ENTRY_SIZE or crc32(data) != data_crc:
+                    raise NvsError(f"page {seq} entry {i} ({key}): data CRC mismatch")
+                if typ == TYPE_STR:
+                    values[(ns, key)] = data.rstrip(b"\0").decode("utf-8", "replace")
+                elif typ == TYPE_BLOB:
+                    values[(ns, key)] = data
+                else:
+                    chunks[(ns, key, chunk)] = data
+            elif typ == TYPE_BLOB_IDX:
+                indexes[(ns, key)] = struct.unpack_from("<IBB", payload)
+            else:
+                raise NvsError(f"page {seq} entry {i} ({key}): unknown type {typ:#04x}")
+            i += span
+
+    for (ns, key), (size, count, start) in indexes.items():
+        try:
+            data = b"".join(chunks[(ns, key, start + c)] for c in range(count))
+        except KeyError:
+            raise NvsError(f"blob {key!r}: missing chunk") from None
+        if len(data) != size:
+            raise NvsError(f"blob {key!r}: {len(data)} bytes, index says {size}")
+        values[(ns, key)] = data
+
+    out: dict[str, dict[str, object]] = {}
+    for (ns, key), value in values.items():
+        if ns not in names:
+            raise NvsError(f"key {key!r} in unknown namespace index {ns}")
+        out.setdefault(names[ns], {})[key] = value
+    return out
+
+# ---------------------------------------------------------------------------
+# Provisioning
+# ---------------------------------------------------------------------------
+
+def parse_mac(text: str) -> bytes:
+    parts = text.strip().replace("-", ":").split(":")
+    if len(parts) != 6:
+        raise ValueError(f"bad MAC {text!r}")
+    mac = bytes(int(p, 16) for p in parts)
+    if mac[0] & 1 or mac == bytes(6) or mac == b"\xff" * 6:
+        raise ValueError(f"MAC {text!r} is not a unicast station address")
+    return mac
+
+
+def format_mac(mac: bytes) -> str:
+    return ":".join(f"{b:02X}" for b in mac)
+
+
+def unit_keys(role: str, peer: bytes) -> dict[str, object]:
+    """Preferences the firmware writes on pairing, for one unit."""
+    return {"peer_mac" if role == "controller" else "ctrl_mac": peer, "paired": 1}
+
+
+def build_image(role: str, peer: bytes, size: int) -> bytes:
+    image = NvsImage(size)
+    for key, value in unit_keys(role, peer).items():
+        if isinstance(value, bytes):
+            image.put_blob(NAMESPACE, key, value)
+        else:
+            image.put_int(NAMESPACE, key, value)   # putBool() stores a u8
+    return image.tobytes()
+
+
+def load_manifest(path: Path) -> list[tuple[str, bytes, bytes]]:
+    pairs = []
+    seen: dict[bytes, str] = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for line, row in enumerate(csv.DictReader(f), start=2):
+            try:
+                pair = row["pair"].strip()
+                ctrl = parse_mac(row["controller_mac"])
+                rx = parse_mac(row["receiver_mac"])
+            except (KeyError, AttributeError):
+                sys.exit(f"{path}:{line}: need pair, controller_mac and receiver_mac columns")
+            except ValueError as exc:
+                sys.exit(f"{path}:{line}: {exc}")
+            if not pair or "/" in pair or "\\" in pair or pair.startswith("."):
+                sys.exit(f"{path}:{line}: bad pair id {pair!r}")
+            for mac in (ctrl, rx):
+                if mac in seen:
+                    sys.exit(f"{path}:{line}: {format_mac(mac)} already used by {seen[mac]}")
+                seen[mac] = pair
+            pairs.append((pair, ctrl, rx))
+    if len({p for p, _, _ in pairs}) != len(pairs):
+        sys.exit(f"{path}: duplicate pair ids")
+    return pairs
+
+
+def provision_pair(job: tuple[str, bytes, bytes, str, int, int]) -> list[dict]:
+    """Write and verify both images of one pair; returns their records."""
+    pair, ctrl, rx, out_dir, offset, size = job
+    records = []
+    for role, own, peer in (("controller", ctrl, rx), ("receiver", rx, ctrl)):
+        path = Path(out_dir) / pair / f"{role}_nvs.bin"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = build_image(role, peer, size)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        written = path.read_bytes()
+        expected = {NAMESPACE: unit_keys(role, peer)}
+        if read_nvs(written) != expected:
+            raise NvsError(f"{path}: read-back does not match the manifest")
+        records.append({
+            "pair": pair,
+            "role": role,
+            "mac": format_mac(own),
+            "peer": format_mac(peer),
+            "image": str(path),
+            "sha256": hashlib.sha256(written).hexdigest(),
+            "flash": f"esptool.py --chip {CHIPS[role]} write_flash {offset:#x} {path}",
+        })
+    return records
+
+
+def print_image(path: Path):
+    try:
+        contents = read_nvs(path.read_bytes())
+    except NvsError as exc:
+        sys.exit(f"{path}: {exc}")
+    for namespace, keys in sorted(contents.items()):
+        print(f"[{namespace}]")
+        for key, value in sorted(keys.items()):
+            if isinstance(value, bytes):
+                shown = format_mac(value) if len(value) == 6 else value.hex()
+                print(f"  {key:<16} blob({len(value)})  {shown}")
+            else:
+                print(f"  {key:<16} {value!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate pre-paired NVS partition images")
+    parser.add_argument("manifest", nargs="?", type=Path, help="CSV of pair,controller_mac,receiver_mac")
+    parser.add_argument("--out", type=Path, default=Path("provision"), help="Output directory (default: provision/)")
+    parser.add_argument("--offset", type=lambda s: int(s, 0), default=NVS_OFFSET,
+                        help=f"nvs partition offset for the flash commands (default: {NVS_OFFSET:#x})")
+    parser.add_argument("--size", type=lambda s: int(s, 0), default=NVS_SIZE,
+                        help=f"nvs partition size (default: {NVS_SIZE:#x})")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--read", type=Path, metavar="IMAGE", help="Decode and check an NVS image instead")
+    args = parser.parse_args()
+
+    if args.read:
+        print_image(args.read)
+        return
+    if args.manifest is None:
+        parser.error("a manifest is required (or use --read IMAGE)")
+
+    pairs = load_manifest(args.manifest)
+    try:
+        NvsImage(args.size)
+    except ValueError as exc:
+        sys.exit(str(exc))
+    jobs = [(pair, ctrl, rx, str(args.out), args.offset, args.size) for pair, ctrl, rx in pairs]
+    try:
+        if len(jobs) > 1 and args.jobs != 1:
+            with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+                results = list(pool.map(provision_pair, jobs, chunksize=max(1, len(jobs) // 64)))
+        else:
+            results = [provision_pair(job) for job in jobs]
+    except NvsError as exc:
+        sys.exit(f"verification failed: {exc}")
+
+    records = [r for pair in results for r in pair]
+    args.out.mkdir(parents=True, exist_ok=True)
+    with open(args.out / "provision.json", "w", encoding="utf-8") as f:
+        json.dump({"offset": args.offset, "size": args.size, "namespace": NAMESPACE, "images": records}, f, indent=2)
+        f.write("\n")
+    print(f"{len(records)} images for {len(pairs)} pairs written and verified in {args.out}/")
+
+
+if __name__ == "__main__":
+    main()
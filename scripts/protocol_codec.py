@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""Python codecs for the ESP-NOW wire protocol, derived from protocol.h.
+
+Parses lib/protocol/protocol.h (defines, enums, packed structs and the
+ProtoMessage union) so host tools never re-declare the message layouts:
+
+  - one precompiled struct.Struct per message, decoding straight out of
+    any buffer (bytes, bytearray, memoryview, mmap) with unpack_from
+  - a NumPy structured dtype per message, laid over fixed-size
+    ProtoMessage records for bulk decoding of captures, dispatched on
+    msg_type
+
+    from protocol_codec import load_protocol
+    proto = load_protocol()
+    msg = proto.decode(payload)              # -> LightCommand(version=1, msg_type=1, ...)
+    data = proto.encode("LightAck", seq_num=7, light_state=3)
+    by_type = proto.decode_records(capture)  # -> {"Heartbeat": ndarray, ...}
+
+Usage:
+  python3 scripts/protocol_codec.py                     # print message layouts
+  python3 scripts/protocol_codec.py --decode cap.bin    # summarize a capture of 32-byte records
+  python3 scripts/protocol_codec.py --bench 2000000     # time bulk decoding
+
+Dependencies: NumPy for the structured dtypes and bulk decoding only;
+single-message encode/decode uses only Python stdlib.
+"""
+
+import argparse
+import re
+import struct
+import time
+from collections import namedtuple
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+PROTOCOL_H = REPO_ROOT / "lib" / "protocol" / "protocol.h"
+
+# C scalar type -> struct format character
+C_TYPES = {
+    "uint8_t": "B", "int8_t": "b", "uint16_t": "H", "int16_t": "h",
+    "uint32_t": "I", "int32_t": "i", "uint64_t": "Q", "int64_t": "q",
+    "bool": "?", "char": "c", "float": "f", "double": "d",
+}
+
+# struct format character -> NumPy type (little-endian, as on the ESP32)
+NP_TYPES = {
+    "B": "u1", "b": "i1", "H": "<u2", "h": "<i2", "I": "<u4", "i": "<i4",
+    "Q": "<u8", "q": "<i8", "?": "?", "c": "S1", "f": "<f4", "d": "<f8",
+}
+
+# ---------------------------------------------------------------------------
+# Header parsing
+# ---------------------------------------------------------------------------
+
+_COMMENT = re.compile(r"//[^\n]*|/\*.*?\*/", re.S)
+_DEFINE = re.compile(r"^\s*#define\s+(\w+)\s+(.+?)\s*$", re.M)
+_ENUM = re.compile(r"enum\s+(\w+)\s*(?::\s*(\w+))?\s*\{(.*?)\}\s*;", re.S)
+_AGGREGATE = re.compile(r"\b(struct|union)\s+(__attribute__\s*\(\(\s*packed\s*\)\)\s*)?(\w+)\s*\{(.*?)\}\s*;", re.S)
+_MEMBER = re.compile(r"^(\w+)\s+(\w+)\s*(?:\[\s*(\w+)\s*\])?$")
+_INT_EXPR = re.compile(r"^[0-9a-fA-FxX\s|&^~<>()+\-*/]+$")
+
+
+def _eval_int(expr, env):
+    """Evaluate a C integer constant expression over known names, or None."""
+    expr = re.sub(r"\b(\w+)\b", lambda m: str(env.get(m.group(1), m.group(1))), expr)
+    expr = re.sub(r"\b(0[xX][0-9a-fA-F]+|\d+)[uUlL]+\b", r"\1", expr)
+    if not _INT_EXPR.match(expr):
+        return None
+    try:
+        value = eval(expr, {"__builtins__": {}})  # only digits and operators get here
+    except (SyntaxError, TypeError, ZeroDivisionError):
+        return None
+    return value if isinstance(value, int) else None
+
+
+class Field:
+    """One flattened scalar or array member at a fixed byte offset."""
+
+    __slots__ = ("name", "fmt", "count", "offset")
+
+    def __init__(self, name, fmt, count, offset):
+        self.name, self.fmt, self.count, self.offset = name, fmt, count, offset
+
+    @property
+    def size(self):
+        return struct.calcsize("<" + self.fmt) * self.count
+
+    @property
+    def struct_fmt(self):
+        # Byte arrays (MACs) decode as bytes; other arrays as repeated scalars
+        if self.count == 1:
+            return self.fmt
+        return f"{self.count}s" if self.fmt in ("B", "c") else f"{self.count}{self.fmt}"
+
+    @property
+    def np_type(self):
+        return NP_TYPES[self.fmt] if self.count == 1 else (NP_TYPES[self.fmt], (self.count,))
+
+
+def parse_header(text):
+    """(defines, enums, aggregates) of a protocol header.
+
+    defines: {name: int} for integer-valued #defines.
+    enums: {enum: (underlying type, {member: value})}; members are also
+    added to defines.
+    aggregates: {name: (kind, size, [Field])}, nested structs flattened.
+    """
+    text = _COMMENT.sub("", text)
+    defines = {}
+    for name, expr in _DEFINE.findall(text):
+        value = _eval_int(expr, defines)
+        if value is not None:
+            defines[name] = value
+
+    enums = {}
+    for name, base, body in _ENUM.findall(text):
+        members, value = {}, -1
+        for item in filter(None, (s.strip() for s in body.split(","))):
+            key, _, expr = item.partition("=")
+            value = _eval_int(expr, defines) if expr.strip() else value + 1
+            if value is None:
+                raise ValueError(f"enum {name}: cannot evaluate {item!r}")
+            members[key.strip()] = defines[key.strip()] = value
+        enums[name] = (base or "int32_t", members)
+
+    aggregates = {}
+    for kind, packed, name, body in _AGGREGATE.findall(text):
+        if not packed:
+            raise ValueError(f"{kind} {name} is not packed; its layout would be target-dependent")
+        fields, offsets = [], []
+        for decl in filter(None, (s.strip() for s in body.split(";"))):
+            m = _MEMBER.match(" ".join(decl.split()))
+            if not m:
+                raise ValueError(f"{kind} {name}: cannot parse member {decl!r}")
+            ctype, member, dim = m.groups()
+            count = _eval_int(dim, defines) if dim else 1
+            if ctype in enums:
+                ctype = enums[ctype][0]
+            offset = 0 if kind == "union" else sum(offsets)
+            if ctype in C_TYPES:
+                field = Field(member, C_TYPES[ctype], count, offset)
+                fields.append(field)
+                offsets.append(field.size)
+            elif ctype in aggregates and count == 1:
+                sub_kind, sub_size, sub_fields = aggregates[ctype]
+                if kind == "struct":
+                    fields.extend(Field(f.name, f.fmt, f.count, offset + f.offset) for f in sub_fields)
+                offsets.append(sub_size)
+            else:
+                raise ValueError(f"{kind} {name}: unknown type {ctype!r}")
+        size = max(offsets, default=0) if kind == "union" else sum(offsets)
+        names = [f.name for f in fields]
+        if len(set(names)) != len(names):
+            raise ValueError(f"{kind} {name}: flattened member names collide")
+        aggregates[name] = (kind, size, fields)
+    return defines, enums, aggregates
+
+# ---------------------------------------------------------------------------
+# Codecs
+# ---------------------------------------------------------------------------
+
+def _msg_constant(name):
+    """LightCommand -> MSG_LIGHT_COMMAND"""
+    return "MSG_" + re.sub(r"(?<!^)(?=[A-Z])", "_", name).upper()
+
+
+class MessageCodec:
+    """Encoder/decoder for one message struct."""
+
+    def __init__(self, name, msg_type, fields, size, defaults, record_size):
+        self.name = name
+        self.msg_type = msg_type
+        self.fields = fields
+        self.size = size
+        self.struct = struct.Struct("<" + "".join(f.struct_fmt for f in fields))
+        self.tuple = namedtuple(name, [f.name for f in fields])
+        self._defaults = {f.name: (bytes(f.count) if f.struct_fmt.endswith("s")
+                                   else 0 if f.count == 1 else (0,) * f.count) for f in fields}
+        self._defaults.update(defaults)
+        self._defaults["msg_type"] = msg_type
+        self.dtype = self.record_dtype = None
+        if np is not None:
+            spec = {"names": [f.name for f in fields], "formats": [f.np_type for f in fields],
+                    "offsets": [f.offset for f in fields]}
+            self.dtype = np.dtype({**spec, "itemsize": size})
+            self.record_dtype = np.dtype({**spec, "itemsize": record_size})
+
+    def decode(self, buf, offset=0):
+        """Decode one message from buf at offset without slicing the buffer."""
+        return self.tuple._make(self.struct.unpack_from(buf, offset))
+
+    def _values(self, fields):
+        unknown = fields.keys() - self._defaults.keys()
+        if unknown:
+            raise TypeError(f"{self.name} has no field(s) {', '.join(sorted(unknown))}")
+        values = []
+        for f in self.fields:
+            value = fields.get(f.name, self._defaults[f.name])
+            if f.count > 1 and not f.struct_fmt.endswith("s"):
+                values.extend(value)
+            else:
+                values.append(value)
+        return values
+
+    def encode(self, **fields):
+        """Packed message bytes; version and msg_type default to this message's."""
+        return self.struct.pack(*self._values(fields))
+
+    def pack_into(self, buf, offset=0, **fields):
+        self.struct.pack_into(buf, offset, *self._values(fields))
+
+    def __repr__(self):
+        return f"<MessageCodec {self.name} type=0x{self.msg_type:02X} size={self.size}>"
+
+
+class Protocol:
+    """All message codecs of a protocol header, keyed by name and msg_type."""
+
+    def __init__(self, text, header="MsgHeader", record="ProtoMessage"):
+        self.defines, self.enums, aggregates = parse_header(text)
+        kind, header_size, header_fields = aggregates[header]
+        offsets = {f.name: f.offset for f in header_fields}
+        self.type_offset = offsets["msg_type"]
+        self.record_size = aggregates[record][1] if record in aggregates else None
+        defaults = {"version": self.defines["PROTOCOL_VERSION"]} if "PROTOCOL_VERSION" in self.defines else {}
+
+        self.messages = {}
+        self.by_type = {}
+        header_names = [f.name for f in header_fields]
+        for name, (kind, size, fields) in aggregates.items():
+            if kind != "struct" or name == header or [f.name for f in fields[:len(header_names)]] != header_names:
+                continue
+            const = _msg_constant(name)
+            if const not in self.defines:
+                raise ValueError(f"{name}: no {const} message type")
+            if self.record_size is not None and size > self.record_size:
+                raise ValueError(f"{name}: {size} bytes does not fit a {record}")
+            codec = MessageCodec(name, self.defines[const], fields, size, defaults,
+                                 self.record_size or size)
+            self.messages[name] = self.by_type[codec.msg_type] = codec
+        self.header = struct.Struct("<" + "".join(f.struct_fmt for f in header_fields))
+
+    def __getitem__(self, name):
+        return self.messages[name]
+
+    def decode(self, buf, offset=0):
+        """Decode one message, dispatched on its msg_type byte.
+
+        Raises ValueError for unknown types or buffers shorter than the
+        message (mirroring the firmware's length checks).
+        """
+        msg_type = buf[offset + self.type_offset]
+        codec = self.by_type.get(msg_type)
+        if codec is None:
+            raise ValueError(f"unknown msg_type 0x{msg_type:02X}")
+        if len(buf) - offset < codec.size:
+            raise ValueError(f"{codec.name}: need {codec.size} bytes, got {len(buf) - offset}")
+        return codec.decode(buf, offset)
+
+    def encode(self, name, **fields):
+        return self.messages[name].encode(**fields)
+
+    def encode_record(self, name, **fields):
+        """One zero-padded ProtoMessage record holding the message."""
+        out = bytearray(self.record_size)
+        self.messages[name].pack_into(out, 0, **fields)
+        return bytes(out)
+
+    def decode_records(self, buf):
+        """Bulk-decode a buffer of ProtoMessage records.
+
+        Returns {message name: structured array} (plus "unknown": raw
+        records of unrecognised types, if any); each array is a copy in
+        capture order whose dtype spans the full record. A trailing
+        partial record is ignored.
+        """
+        if np is None:
+            raise RuntimeError("bulk decoding needs NumPy (pip install numpy)")
+        if self.record_size is None:
+            raise RuntimeError("protocol header has no record union")
+        count = len(buf) // self.record_size
+        raw = np.frombuffer(buf, dtype=np.uint8, count=count * self.record_size).reshape(count, self.record_size)
+        types = raw[:, self.type_offset]
+        present = np.bincount(types, minlength=256)
+        out = {}
+        known = np.zeros(256, dtype=bool)
+        for msg_type, codec in self.by_type.items():
+            known[msg_type] = True
+            if present[msg_type]:
+                records = np.frombuffer(buf, dtype=codec.record_dtype, count=count)
+                out[codec.name] = records[types == msg_type]
+        if present[~known].any():
+            out["unknown"] = raw[~known[types]]
+        return out
+
+
+def load_protocol(path=PROTOCOL_H):
+    return Protocol(Path(path).read_text(encoding="utf-8"))
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _print_layouts(proto):
+    print(f"record size {proto.record_size} bytes, msg_type at offset {proto.type_offset}")
+    for codec in sorted(proto.messages.values(), key=lambda c: c.msg_type):
+        print(f"0x{codec.msg_type:02X} {codec.name:<14} {codec.size:>3} bytes  <{codec.struct.format[1:]}")
+        for f in codec.fields:
+            dim = f"[{f.count}]" if f.count > 1 else ""
+            print(f"       +{f.offset:<3} {f.name}{dim}")
+
+
+def _synthetic_records(proto, count, seed=0):
+    """count random-but-valid records cycling through every message type."""
+    rng = np.random.default_rng(seed)
+    raw = rng.integers(0, 256, size=(count, proto.record_size), dtype=np.uint8)
+    types = np.array(sorted(proto.by_type), dtype=np.uint8)
+    raw[:, proto.type_offset] = types[np.arange(count) % len(types)]
+    return raw.tobytes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and decode ESP-NOW protocol messages")
+    parser.add_argument("--header", type=str, default=str(PROTOCOL_H), help="Protocol header (default: lib/protocol/protocol.h)")
+    parser.add_argument("--decode", type=str, default=None, help="Summarize a capture of ProtoMessage records")
+    parser.add_argument("--bench", type=int, default=None, metavar="N", help="Time bulk decoding of N synthetic records")
+    args = parser.parse_args()
+
+    proto = load_protocol(args.header)
+    if args.decode:
+        data = Path(args.decode).read_bytes()
+        by_type = proto.decode_records(data)
+        print(f"{len(data) // proto.record_size} records")
+        for name, records in by_type.items():
+            print(f"  {name:<14} {len(records):>10}")
+        return
+    if args.bench:
+        data = _synthetic_records(proto, args.bench)
+        start = time.perf_counter()
+        by_type = proto.decode_records(data)
+        elapsed = time.perf_counter() - start
+        print(f"{args.bench} records ({len(data) / 1e6:.1f} MB) into {len(by_type)} types "
+              f"in {elapsed * 1000:.1f} ms → {args.bench / elapsed / 1e6:.1f} M records/s")
+        return
+    _print_layouts(proto)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""Loss, retry, duplicate and reorder accounting from 16-bit seq_nums.
+
+Every message stream is tracked separately, keyed by sender MAC and kind:
+
+  cmd   controller -> receiver LightCommand and PairRequest (one counter,
+        ++seq_num per new command; retries resend the same seq)
+  ack   receiver -> controller LightAck, echoing the command's seq
+  hb    receiver -> controller Heartbeat, the receiver's own counter
+
+and each message is classified against a sliding window: the highest seq
+so far (wraparound-aware, compared as a signed 16-bit distance) plus a
+--window-bit bitmap of which seqs below it have been seen:
+
+  new        the next seq
+  gap        ahead by more than one; the skipped seqs are counted lost
+  retry      the highest seq again on a cmd stream (controller resend)
+  duplicate  a seq already seen (the highest again on ack/hb streams)
+  late       behind the highest and not seen yet: reordered, so it is
+             taken back out of the lost count (unless it is from before
+             the stream's first seq or a restart, which no gap counted)
+  restart    too far from the window, or behind it after a pause longer
+             than REORDER_S: a reboot, so the stream starts over
+
+Ack-stream losses are commands that never got an ACK (lost command, or
+every ACK lost); cmd-stream losses are commands the capture point never
+saw. State per stream is a handful of integers; no per-message history is
+kept.
+
+Usage:
+  python3 scripts/seq_tracker.py --capture session.espcap
+  python3 scripts/seq_tracker.py --capture session.espcap --annotate classes.csv --rows all
+  python3 scripts/seq_tracker.py --listen 127.0.0.1:47300 --interval 5 &
+  python3 scripts/espnow_emu.py --vehicles 1000 --loss 0.05 --tap 127.0.0.1:47300
+  python3 scripts/seq_tracker.py --bench 2000        # injected loss/dup/reorder, checked
+
+No external dependencies — uses only Python stdlib.
+"""
+
+import argparse
+import asyncio
+import csv
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from fleet_telemetry import listen, mac_str, write_snapshot
+from protocol_codec import load_protocol
+
+PROTO = load_protocol()
+D = PROTO.defines
+VERSION = D["PROTOCOL_VERSION"]
+# Seq steps beyond this are taken as a restart, not lost messages
+SEQ_WINDOW = 1024
+# A seq at or behind the highest arriving this long after it is a restart;
+# retries come every ACK_TIMEOUT_MS and reordering is far quicker
+REORDER_S = 4 * D["ACK_TIMEOUT_MS"] / 1000
+
+LIGHT_COMMAND, PAIR_REQUEST, LIGHT_ACK, HEARTBEAT = (
+    PROTO[name] for name in ("LightCommand", "PairRequest", "LightAck", "Heartbeat"))
+STREAM_OF = {
+    LIGHT_COMMAND.msg_type: "cmd", PAIR_REQUEST.msg_type: "cmd",
+    LIGHT_ACK.msg_type: "ack", HEARTBEAT.msg_type: "hb",
+}
+RETRANSMITTED = {"cmd"}
+
+CLASSES = ("new", "gap", "retry", "duplicate", "late", "restart")
+
+# ---------------------------------------------------------------------------
+# Window
+# ---------------------------------------------------------------------------
+
+class SeqWindow:
+    """Highest seq, seen-bitmap below it and per-class counters for one stream."""
+
+    __slots__ = ("retransmits", "bits", "highest", "seen", "span", "last_t", "lost", "advanced",
+                 "new", "gap", "retry", "duplicate", "late", "restart")
+
+    def __init__(self, retransmits=False, bits=64):
+        self.retransmits = retransmits
+        self.bits = bits
+        self.highest = None
+        self.seen = 0          # bit i: seq (highest - i) seen
+        self.span = 0          # seqs advanced since the start, capped at bits: gaps counted only these
+        self.last_t = 0.0
+        self.lost = 0
+        self.advanced = 0      # seqs the stream has moved through, i.e. messages sent
+        self.new = self.gap = self.retry = self.duplicate = self.late = self.restart = 0
+
+    def classify(self, seq, t):
+        if self.highest is None:
+            return self._start(seq, t, "new")
+        d = ((seq - self.highest + 0x8000) & 0xFFFF) - 0x8000
+        if d > SEQ_WINDOW or -d > SEQ_WINDOW or (d <= 0 and t - self.last_t > REORDER_S):
+            return self._start(seq, t, "restart")
+        if d > 0:
+            self.seen = ((self.seen << d) | 1) & ((1 << self.bits) - 1) if d < self.bits else 1
+            self.highest = seq
+            self.last_t = t
+            self.advanced += d
+            self.span = min(self.span + d, self.bits)
+            if d == 1:
+                self.new += 1
+                return "new"
+            self.lost += d - 1
+            self.gap += 1
+            return "gap"
+        if d == 0:
+            self.last_t = t
+            if self.retransmits:
+                self.retry += 1
+                return "retry"
+            self.duplicate += 1
+            return "duplicate"
+        back = -d
+        if back < self.bits and self.seen >> back & 1:
+            self.duplicate += 1
+            return "duplicate"
+        if back < self.bits:
+            self.seen |= 1 << back
+            if back < self.span:
+                self.lost -= 1
+        # Behind the bitmap we cannot tell; it is late, and stays counted lost
+        self.late += 1
+        return "late"
+
+    def _start(self, seq, t, cls):
+        self.highest = seq
+        self.seen = 1
+        self.span = 0
+        self.last_t = t
+        self.advanced += 1
+        if cls == "restart":
+            self.restart += 1
+        else:
+            self.new += 1
+        return cls
+
+    def counts(self):
+        return {name: getattr(self, name) for name in CLASSES}
+
+    def stats(self):
+        sent = self.advanced
+        return {
+            **self.counts(),
+            "lost": self.lost,
+            "loss_rate": round(self.lost / sent, 5) if sent else None,
+            "retry_rate": round(self.retry / sent, 5) if sent and self.retransmits else None,
+        }
+
+# ---------------------------------------------------------------------------
+# Tracker
+# ---------------------------------------------------------------------------
+
+class SeqTracker:
+    """One SeqWindow per (sender MAC, stream), fed one frame at a time."""
+
+    def __init__(self, bits=64, annotate=None):
+        self.bits = bits
+        self.annotate = annotate
+        self.streams = {}
+        self.frames = 0
+        self.other = 0
+
+    def observe(self, t, mac, stream, seq):
+        key = (bytes(mac), stream)
+        w = self.streams.get(key)
+        if w is None:
+            w = self.streams[key] = SeqWindow(stream in RETRANSMITTED, self.bits)
+        cls = w.classify(seq, t)
+        if self.annotate is not None:
+            self.annotate((f"{t:.6f}", mac_str(mac), stream, seq, cls))
+        return cls
+
+    def feed(self, t, src, payload, dst=None):
+        """Classify one frame on its msg_type; others are only counted."""
+        self.frames += 1
+        if len(payload) < 4 or payload[0] != VERSION or payload[1] not in STREAM_OF:
+            self.other += 1
+            return None
+        return self.observe(t, src, STREAM_OF[payload[1]], payload[2] | payload[3] << 8)
+
+    # -- snapshots ----------------------------------------------------------
+
+    def snapshot(self, now=None, rows="anomalies"):
+        """Per-stream-kind totals plus per-stream rows ("all", "anomalies" or "none").
+
+        Anomalies are streams with losses, duplicates, late messages or
+        restarts.
+        """
+        now = time.time() if now is None else now
+        totals = {}
+        for (_, stream), w in self.streams.items():
+            t = totals.setdefault(stream, {"streams": 0, "sent": 0, "lost": 0, **dict.fromkeys(CLASSES, 0)})
+            t["streams"] += 1
+            t["sent"] += w.advanced
+            t["lost"] += w.lost
+            for name in CLASSES:
+                t[name] += getattr(w, name)
+        for stream, t in totals.items():
+            t["loss_rate"] = round(t["lost"] / t["sent"], 5) if t["sent"] else None
+            if stream in RETRANSMITTED:
+                t["retry_rate"] = round(t["retry"] / t["sent"], 5) if t["sent"] else None
+        out = {"time": now, "frames": self.frames, "other": self.other, "streams": totals}
+        if rows == "all":
+            picked = self.streams.items()
+        elif rows == "anomalies":
+            picked = [(k, w) for k, w in self.streams.items() if w.lost or w.duplicate or w.late or w.restart]
+        else:
+            picked = ()
+        out["rows"] = [{"mac": mac_str(mac), "stream": stream, **w.stats()} for (mac, stream), w in picked]
+        return out
+
+# ---------------------------------------------------------------------------
+# Sources
+# ---------------------------------------------------------------------------
+
+def ingest_capture(tracker, path):
+    """Feed every frame of a capture file, both directions."""
+    from capture import Capture, PAYLOAD_SIZE, RECORD
+    with Capture(path) as cap:
+        feed = tracker.feed
+        for t_us, _direction, length, mac, payload in RECORD.iter_unpack(cap.raw()):
+            feed(t_us / 1e6, mac, payload[:length] if length < PAYLOAD_SIZE else payload)
+        return cap[len(cap) - 1].t_us / 1e6 if len(cap) else None
+
+def bench(streams, messages=500, seed=1):
+    """Heartbeat-like streams with injected drops, duplicates, swaps and a reboot.
+
+    Swaps include a stream's first two messages and the reboot's first two,
+    where the late seq is from before the start and was never counted lost.
+
+    The classes are checked exactly against what was injected.
+    """
+    rng = random.Random(seed)
+    tracker = SeqTracker()
+    expect = dict.fromkeys(CLASSES, 0)
+    expect_lost = 0
+    frames = []
+    for s in range(streams):
+        mac = bytes((0x24, 0, 0, 0)) + s.to_bytes(2, "big")
+        seq = rng.randrange(0x10000)        # exercises wraparound
+        t = 0.0
+        order = []
+        dropped = 0                          # only visible once a later seq arrives
+        for k in range(messages):
+            t += 0.1
+            # a restart is only recognisable if 1 (or 2, when they swap) is not just
+            # ahead of the old seq
+            if (k == messages // 2 and s % 50 == 0
+                    and not any(0 < (r - seq) & 0xFFFF <= SEQ_WINDOW for r in (1, 2))):
+                t += 2 * REORDER_S           # reboot: counter back to 1 after a pause
+                seq = 1
+                order.append((t, seq, "restart"))
+                dropped = 0
+                continue
+            seq = (seq + 1) & 0xFFFF
+            roll = rng.random()
+            if roll < 0.02:
+                dropped += 1
+                continue
+            if order:                        # drops before the first message are invisible
+                expect_lost += dropped
+            dropped = 0
+            order.append((t, seq, None))
+            if roll < 0.04:
+                order.append((t + 0.001, seq, "duplicate"))
+        # swap some neighbours: the later seq arrives first (a gap), then the early one (late);
+        # half the time the first two, or the reboot's, where the late one was never lost
+        i = 0
+        while i < len(order) - 2:
+            a, b = order[i], order[i + 1]
+            first = i == 0 or a[2] == "restart"
+            if (rng.random() < (0.5 if first else 0.02) and a[2] in (None, "restart") and b[2] is None
+                    and (i == 0 or order[i - 1][2] != "restart") and (b[1] - a[1]) & 0xFFFF == 1):
+                order[i], order[i + 1] = (a[0], b[1], a[2]), (b[0], a[1], "late")
+                i += 3
+            else:
+                i += 1
+        frames.extend((t, mac, seq, cls) for t, seq, cls in order)
+    frames.sort(key=lambda f: f[0])
+    observe = tracker.observe
+    start = time.perf_counter()
+    got = dict.fromkeys(CLASSES, 0)
+    wrong = 0
+    for t, mac, seq, cls in frames:
+        result = observe(t, mac, "hb", seq)
+        got[result] += 1
+        if cls is not None:
+            expect[cls] += 1
+            wrong += result != cls
+    elapsed = time.perf_counter() - start
+    lost = sum(w.lost for w in tracker.streams.values())
+    print(f"{len(frames):,} messages on {streams:,} streams in {elapsed:.2f} s "
+          f"→ {len(frames) / elapsed / 1e3:,.0f} k messages/s")
+    print("classified " + ", ".join(f"{name} {got[name]:,}" for name in CLASSES))
+    print(f"injected   duplicate {expect['duplicate']:,}, late {expect['late']:,}, "
+          f"restart {expect['restart']:,}, lost {expect_lost:,}; tracker lost {lost:,}")
+    ok = (not wrong and lost == expect_lost
+          and all(got[name] == expect[name] for name in ("duplicate", "late", "restart")))
+    print("OK" if ok else f"MISMATCH ({wrong} injected messages misclassified)")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify seq_nums as new/retry/duplicate/late/gap")
+    parser.add_argument("--capture", type=str, nargs="*", default=[], help="Capture files to ingest")
+    parser.add_argument("--listen", type=str, default=None, metavar="HOST:PORT",
+                        help="Receive frames mirrored by espnow_emu.py --tap")
+    parser.add_argument("--annotate", type=str, default=None, help="Write one CSV row per classified message")
+    parser.add_argument("--window", type=int, default=64, help="Seen-bitmap width in seqs (default: 64)")
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between snapshots when listening")
+    parser.add_argument("--snapshot", type=str, default=None, help="Write snapshots to this file (default: stdout)")
+    parser.add_argument("--rows", choices=("all", "anomalies", "none"), default="anomalies",
+                        help="Per-stream rows in snapshots (default: anomalies)")
+    parser.add_argument("--bench", type=int, default=None, metavar="N", help="Check and time N synthetic streams")
+    args = parser.parse_args()
+
+    if args.bench:
+        sys.exit(0 if bench(args.bench) else 1)
+    if not args.capture and not args.listen:
+        parser.error("give --capture files and/or --listen")
+    if not 1 <= args.window <= SEQ_WINDOW:
+        parser.error(f"--window must be 1..{SEQ_WINDOW}")
+
+    out = open(args.annotate, "w", newline="") if args.annotate else None
+    writer = None
+    if out:
+        writer = csv.writer(out)
+        writer.writerow(("t", "mac", "stream", "seq", "class"))
+    tracker = SeqTracker(args.window, writer.writerow if writer else None)
+    try:
+        end = None
+        for path in args.capture:
+            end = ingest_capture(tracker, path)
+        if args.listen:
+            host, _, port = args.listen.rpartition(":")
+            try:
+                asyncio.run(listen(tracker, (host or "127.0.0.1", int(port)), args.interval, args.snapshot, args.rows))
+            except KeyboardInterrupt:
+                pass
+    finally:
+        if out:
+            out.close()
+    write_snapshot(tracker.snapshot(now=None if args.listen else end, rows=args.rows), args.snapshot)
+
+if __name__ == "__main__":
+    main()
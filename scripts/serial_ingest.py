@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""Streaming ingester for the controller and receiver serial logs.
+
+Tails any number of serial ports (115200 8N1, as in platformio.ini) and
+log files, e.g. saved `pio device monitor` sessions, at the same time.
+It turns each line the firmware prints into a typed event with a host
+timestamp and keeps rolling per-device aggregates:
+
+  boots / reboots       "RC Light Controller - TX|RX" banners; ROM "rst:" lines
+                        record the reset reason
+  time to ready         boot banner -> "Setup complete"
+  failsafes             "Failsafe: no commands received, lights off"
+  pairing               pairing mode, requests, "Paired with...", loaded peers
+  init failures         ESP-NOW, GFX, LVGL buffer, add-peer failures
+  crashes               "Guru Meditation Error" panics
+  reconnects            port unplugged and back, or log file rotated
+
+Memory is bounded: partial lines are capped at MAX_LINE bytes and every
+per-device history is a fixed-length deque. Lines prefixed with a
+`pio device monitor --filter time` timestamp use it instead of the time
+of receipt.
+
+Usage:
+  python3 scripts/serial_ingest.py /dev/ttyUSB0 /dev/ttyACM0
+  python3 scripts/serial_ingest.py logs/*.log --from-start --no-follow --json
+  pio device monitor | python3 scripts/serial_ingest.py - --events
+
+No external dependencies — uses only Python stdlib (termios for serial ports).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter, deque, namedtuple
+
+MAX_LINE = 4096
+HISTORY = 256
+POLL_S = 0.2
+REOPEN_S = 1.0
+BAUD = 115200
+
+Event = namedtuple("Event", "t source kind detail")
+
+# ---------------------------------------------------------------------------
+# Line classification
+# ---------------------------------------------------------------------------
+
+# Fixed lines printed by the firmware -> (kind, detail)
+EXACT = {
+    "RC Light Controller - TX": ("boot", "controller"),
+    "RC Light Controller - RX": ("boot", "receiver"),
+    "Setup complete": ("ready", None),
+    "Paired and ready": ("paired_ready", None),
+    "Not paired - hold BOOT button during startup to pair": ("unpaired", None),
+    "BOOT button held - entering pairing mode": ("pairing_mode", "boot button"),
+    "Entering pairing mode...": ("pairing_mode", None),
+    "Pairing request sent (broadcast)": ("pair_request", None),
+    "Failsafe: no commands received, lights off": ("failsafe", None),
+    "ESP-NOW init failed": ("init_failure", "espnow"),
+    "GFX init failed!": ("init_failure", "gfx"),
+    "LVGL buffer alloc failed!": ("init_failure", "lvgl"),
+    "Failed to add peer": ("init_failure", "add_peer"),
+}
+
+_MAC = r"([0-9A-F]{2}(?::[0-9A-F]{2}){5})"
+PATTERNS = [
+    (re.compile(r"Paired with(?: controller)?: " + _MAC), "paired"),
+    (re.compile(r"Loaded (?:peer|controller): " + _MAC), "peer_loaded"),
+    (re.compile(r"AXS5106L ID: ([0-9A-F ]+)"), "touch_id"),
+    (re.compile(r"rst:(0x[0-9a-f]+ \(\w+\))"), "reset"),
+    (re.compile(r"Guru Meditation Error: (.*)"), "crash"),
+]
+
+# `pio device monitor --filter time` prefix
+_TIME_PREFIX = re.compile(r"^(\d{2}):(\d{2}):(\d{2})\.(\d{3}) > ")
+
+def _prefixed_time(match, now):
+    """Host time of an HH:MM:SS.mmm prefix, taken as the latest such time <= now."""
+    h, m, s, ms = (int(g) for g in match.groups())
+    local = time.localtime(now)
+    t = time.mktime(local[:3] + (h, m, s) + local[6:]) + ms / 1000
+    return t - 86400 if t > now + 1 else t
+
+def classify(line):
+    """(kind, detail) for one log line, or None for free text."""
+    hit = EXACT.get(line)
+    if hit:
+        return hit
+    for pattern, kind in PATTERNS:
+        m = pattern.search(line)
+        if m:
+            return kind, m.group(1)
+    return None
+
+# ---------------------------------------------------------------------------
+# Aggregates
+# ---------------------------------------------------------------------------
+
+class Device:
+    """Rolling state of one serial source."""
+
+    def __init__(self, source):
+        self.source = source
+        self.role = None
+        self.peer = None
+        self.counts = Counter()
+        self.boot_time = None
+        self.ready_times = deque(maxlen=HISTORY)
+        self.failsafe_times = deque(maxlen=HISTORY)
+        self.recent = deque(maxlen=HISTORY)
+        self.last_seen = None
+        self.lines = 0
+
+    def update(self, ev):
+        self.counts[ev.kind] += 1
+        self.recent.append(ev)
+        if ev.kind == "boot":
+            if self.boot_time is not None:
+                self.counts["reboot"] += 1
+            self.role = ev.detail
+            self.boot_time = ev.t
+        elif ev.kind == "ready" and self.boot_time is not None:
+            self.ready_times.append(ev.t - self.boot_time)
+        elif ev.kind == "failsafe":
+            self.failsafe_times.append(ev.t)
+        elif ev.kind in ("paired", "peer_loaded"):
+            self.peer = ev.detail
+
+    def snapshot(self, now, window=3600):
+        ready = sorted(self.ready_times)
+        return {
+            "source": self.source,
+            "role": self.role,
+            "peer": self.peer,
+            "lines": self.lines,
+            "last_seen_s_ago": None if self.last_seen is None else round(now - self.last_seen, 1),
+            "boots": self.counts["boot"],
+            "reboots": self.counts["reboot"],
+            "reconnects": self.counts["reconnect"],
+            "failsafes": self.counts["failsafe"],
+            "failsafes_last_window": sum(1 for t in self.failsafe_times if now - t <= window),
+            "init_failures": self.counts["init_failure"],
+            "crashes": self.counts["crash"],
+            "pairings": self.counts["paired"],
+            "time_to_ready_s": {
+                "last": round(self.ready_times[-1], 3) if ready else None,
+                "median": round(ready[len(ready) // 2], 3) if ready else None,
+                "max": round(ready[-1], 3) if ready else None,
+            },
+        }
+
+class Ingester:
+    """Turns lines into events and keeps per-source aggregates."""
+
+    def __init__(self, on_event=None):
+        self.devices = {}
+        self.on_event = on_event
+        self.events = 0
+
+    def device(self, source):
+        dev = self.devices.get(source)
+        if dev is None:
+            dev = self.devices[source] = Device(source)
+        return dev
+
+    def feed(self, source, line, t=None):
+        now = time.time() if t is None else t
+        m = _TIME_PREFIX.match(line)
+        if m:
+            now = _prefixed_time(m, now)
+            line = line[m.end():]
+        dev = self.device(source)
+        dev.lines += 1
+        dev.last_seen = now
+        hit = classify(line.strip())
+        if hit is not None:
+            self.emit(Event(now, source, *hit))
+
+    def emit(self, ev):
+        self.events += 1
+        self.device(ev.source).update(ev)
+        if self.on_event:
+            self.on_event(ev)
+
+    def snapshot(self, window=3600):
+        now = time.time()
+        return [dev.snapshot(now, window) for dev in self.devices.values()]
+
+# ---------------------------------------------------------------------------
+# Sources
+# ---------------------------------------------------------------------------
+
+class LineSplitter:
+    """Incremental bytes -> lines, with the partial line capped at MAX_LINE."""
+
+    def __init__(self):
+        self._buf = b""
+
+    def feed(self, data):
+        data = self._buf + data
+        *lines, self._buf = data.split(b"\n")
+        if len(self._buf) > MAX_LINE:
+            lines.append(self._buf[:MAX_LINE])
+            self._buf = b""
+        return [line.rstrip(b"\r").decode("utf-8", "replace") for line in lines]
+
+def _is_tty_device(path):
+    return path.startswith("/dev/")
+
+def _open_serial(path):
+    import termios
+    fd = os.open(path, os.O_RDONLY | os.O_NOCTTY | os.O_NONBLOCK)
+    attrs = termios.tcgetattr(fd)
+    speed = getattr(termios, f"B{BAUD}")
+    attrs[0] = 0                                            # iflag: raw
+    attrs[1] = 0                                            # oflag
+    attrs[2] = termios.CS8 | termios.CREAD | termios.CLOCAL  # cflag: 8N1
+    attrs[3] = 0                                            # lflag: no echo/canonical
+    attrs[4] = attrs[5] = speed
+    termios.tcsetattr(fd, termios.TCSANOW, attrs)
+    return fd
+
+async def tail_serial(path, ingester, stop):
+    """Read a serial port, reopening it whenever it disappears."""
+    loop = asyncio.get_running_loop()
+    opened_before = False
+    while not stop.is_set():
+        try:
+            fd = _open_serial(path)
+        except OSError:
+            await asyncio.sleep(REOPEN_S)
+            continue
+        if opened_before:
+            ingester.emit(Event(time.time(), path, "reconnect", "port"))
+        opened_before = True
+        splitter = LineSplitter()
+        readable = asyncio.Event()
+        loop.add_reader(fd, readable.set)
+        try:
+            while not stop.is_set():
+                await readable.wait()
+                readable.clear()
+                try:
+                    data = os.read(fd, 65536)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    break
+                if not data:
+                    break
+                now = time.time()
+                for line in splitter.feed(data):
+                    ingester.feed(path, line, now)
+        finally:
+            loop.remove_reader(fd)
+            os.close(fd)
+
+async def tail_file(path, ingester, stop, from_start=False, follow=True):
+    """Follow a growing log file across truncation and rotation."""
+    fh = inode = None
+    splitter = LineSplitter()
+    while not stop.is_set():
+        if fh is None:
+            try:
+                fh = open(path, "rb")
+            except OSError:
+                if not follow:
+                    return
+                # Whatever shows up later is all new
+                from_start = True
+                await asyncio.sleep(REOPEN_S)
+                continue
+            st = os.fstat(fh.fileno())
+            if inode is not None:
+                ingester.emit(Event(time.time(), path, "reconnect", "rotated"))
+            elif not from_start:
+                fh.seek(st.st_size)
+            inode = st.st_ino
+        data = fh.read(65536)
+        if data:
+            now = time.time()
+            for line in splitter.feed(data):
+                ingester.feed(path, line, now)
+            await asyncio.sleep(0)
+            continue
+        if not follow:
+            break
+        await asyncio.sleep(POLL_S)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if st.st_ino != inode or st.st_size < fh.tell():
+            fh.close()
+            fh = None
+            splitter = LineSplitter()
+    if fh is not None:
+        fh.close()
+
+async def tail_stdin(ingester, stop):
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=MAX_LINE)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    splitter = LineSplitter()
+    while not stop.is_set():
+        data = await reader.read(65536)
+        if not data:
+            break
+        now = time.time()
+        for line in splitter.feed(data):
+            ingester.feed("stdin", line, now)
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _print_table(snapshots):
+    print(f"{'source':<28} {'role':<10} {'boots':>5} {'rboot':>5} {'recon':>5} {'fsafe':>5} "
+          f"{'fail':>4} {'crash':>5} {'ready s':>8}  peer")
+    for s in snapshots:
+        ready = s["time_to_ready_s"]["last"]
+        print(f"{s['source'][-28:]:<28} {s['role'] or '-':<10} {s['boots']:>5} {s['reboots']:>5} "
+              f"{s['reconnects']:>5} {s['failsafes']:>5} {s['init_failures']:>4} {s['crashes']:>5} "
+              f"{'-' if ready is None else f'{ready:.2f}':>8}  {s['peer'] or '-'}")
+
+async def run(args):
+    def print_event(ev):
+        stamp = time.strftime("%H:%M:%S", time.localtime(ev.t)) + f".{int(ev.t * 1000) % 1000:03d}"
+        print(f"{stamp} {ev.source} {ev.kind}{'' if ev.detail is None else ' ' + ev.detail}", flush=True)
+
+    ingester = Ingester(print_event if args.events else None)
+    stop = asyncio.Event()
+    tasks = []
+    for src in args.sources:
+        if src == "-":
+            tasks.append(tail_stdin(ingester, stop))
+        elif _is_tty_device(src):
+            tasks.append(tail_serial(src, ingester, stop))
+        else:
+            tasks.append(tail_file(src, ingester, stop, args.from_start, not args.no_follow))
+    tasks = [asyncio.create_task(t) for t in tasks]
+
+    async def report():
+        while True:
+            await asyncio.sleep(args.interval)
+            if not args.events:
+                _print_table(ingester.snapshot(args.window))
+                print()
+
+    reporter = asyncio.create_task(report()) if args.interval and not args.json else None
+    try:
+        await asyncio.gather(*tasks)
+    except asyncio.CancelledError:
+        pass
+    finally:
+        stop.set()
+        if reporter:
+            reporter.cancel()
+    snapshots = ingester.snapshot(args.window)
+    if args.json:
+        print(json.dumps(snapshots, indent=2))
+    elif not args.events:
+        _print_table(snapshots)
+
+def main():
+    parser = argparse.ArgumentParser(description="Tail firmware serial logs and aggregate events")
+    parser.add_argument("sources", nargs="+", help="Serial ports (/dev/...), log files, or - for stdin")
+    parser.add_argument("--from-start", action="store_true", help="Read log files from the beginning")
+    parser.add_argument("--no-follow", action="store_true", help="Stop at the end of log files")
+    parser.add_argument("--events", action="store_true", help="Print each event as it arrives")
+    parser.add_argument("--interval", type=float, default=10.0, help="Seconds between summaries (default: 10, 0 = off)")
+    parser.add_argument("--window", type=float, default=3600.0, help="Rolling failsafe window in s (default: 3600)")
+    parser.add_argument("--json", action="store_true", help="Print the final summary as JSON")
+    args = parser.parse_args()
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
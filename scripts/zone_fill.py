@@ -0,0 +1,492 @@
+"""Copper zone fill geometry for generate_kicad.py.
+
+Computes the filled area of a copper zone: the zone outline minus the
+clearance shapes around pads of other nets, with thermal-relief spokes
+to pads of the zone's own net. Every shape is approximated by convex
+polygons and the difference is evaluated with a vertical slab
+decomposition; a uniform grid index finds the crossing edges that split
+slabs. The result is one polygon per copper island, with holes joined
+to the outline by zero-width bridges, the "fractured" form KiCad stores
+in (filled_polygon ...).
+
+No external dependencies — uses only Python stdlib.
+"""
+
+import math
+from bisect import bisect_right
+
+# Maximum deviation of a polygonized arc from the true arc, mm (KiCad default)
+MAX_ERROR = 0.005
+
+# Input coordinates are snapped to this grid so shared vertices compare equal
+SNAP = 1e-6
+
+# ---------------------------------------------------------------------------
+# Shape construction
+# ---------------------------------------------------------------------------
+
+def _snap(v):
+    return round(v / SNAP) * SNAP
+
+def arc_segments(radius, max_error=MAX_ERROR):
+    """Segments per full circle so chords stay within max_error of the arc."""
+    if radius <= max_error:
+        return 8
+    return max(8, math.ceil(math.pi / math.acos(1 - max_error / radius)))
+
+def _place(points, cx, cy, rot):
+    """Rotate local points by a KiCad angle (CCW, Y down) and translate."""
+    a = math.radians(rot)
+    c, s = math.cos(a), math.sin(a)
+    return [(_snap(cx + x * c + y * s), _snap(cy - x * s + y * c)) for x, y in points]
+
+def circle_polygon(cx, cy, r, max_error=MAX_ERROR):
+    """Regular polygon that fully contains the circle."""
+    n = arc_segments(r, max_error)
+    rr = r / math.cos(math.pi / n)
+    return _place([(rr * math.cos(2 * math.pi * i / n), rr * math.sin(2 * math.pi * i / n))
+                   for i in range(n)], cx, cy, 0)
+
+def rounded_rect_polygon(cx, cy, sx, sy, rot=0, radius=0.0, max_error=MAX_ERROR):
+    """Rectangle of size sx x sy grown by `radius` with round corners (convex)."""
+    hx, hy = sx / 2, sy / 2
+    if radius <= 0:
+        return _place([(hx, hy), (-hx, hy), (-hx, -hy), (hx, -hy)], cx, cy, rot)
+    n = max(2, arc_segments(radius, max_error) // 4)
+    rr = radius / math.cos(math.pi / (4 * n))
+    pts = []
+    for qx, qy, start in ((hx, hy, 0), (-hx, hy, 90), (-hx, -hy, 180), (hx, -hy, 270)):
+        # First and last points lie on the true arc so straight sides stay exact
+        for i in range(n + 1):
+            a = math.radians(start + 90 * i / n)
+            r = radius if i in (0, n) else rr
+            pts.append((qx + r * math.cos(a), qy + r * math.sin(a)))
+    return _place(pts, cx, cy, rot)
+
+def pad_clearance_polygon(shape, cx, cy, sx, sy, rot, clearance, max_error=MAX_ERROR):
+    """Pad copper grown by `clearance`: the keep-out for foreign copper."""
+    if shape == "circle":
+        return circle_polygon(cx, cy, max(sx, sy) / 2 + clearance, max_error)
+    if shape == "oval":
+        r = min(sx, sy) / 2
+        return rounded_rect_polygon(cx, cy, sx - 2 * r, sy - 2 * r, rot, r + clearance, max_error)
+    return rounded_rect_polygon(cx, cy, sx, sy, rot, clearance, max_error)
+
+def thermal_relief_polygons(shape, cx, cy, sx, sy, rot, gap, spoke_width, max_error=MAX_ERROR):
+    """Keep-out pieces around a same-net pad: its gap ring minus four spokes.
+
+    Round pads get spokes at 45 degrees, all other shapes along their axes,
+    as KiCad does by default. Every piece is convex.
+    """
+    hw = spoke_width / 2
+    if shape == "circle":
+        r_in = max(sx, sy) / 2
+        n = arc_segments(r_in + gap, max_error)
+        r_out = (r_in + gap) / math.cos(math.pi / n)
+        d_in = math.asin(min(1.0, hw / r_in))
+        d_out = math.asin(min(1.0, hw / r_out))
+        steps = max(1, n // 4)
+        pieces = []
+        for k in range(4):
+            a0 = math.radians(45 + 90 * k)
+            a1 = a0 + math.pi / 2
+            inner = [(r_in * math.cos(a), r_in * math.sin(a)) for a in
+                     (a0 + d_in + (a1 - a0 - 2 * d_in) * i / steps for i in range(steps + 1))]
+            outer = [(r_out * math.cos(a), r_out * math.sin(a)) for a in
+                     (a0 + d_out + (a1 - a0 - 2 * d_out) * i / steps for i in range(steps + 1))]
+            for i in range(steps):
+                pieces.append(_place([inner[i], outer[i], outer[i + 1], inner[i + 1]], cx, cy, 0))
+        return pieces
+
+    hx, hy = sx / 2, sy / 2
+    pieces = []
+    # Side strips, each split in two by the spoke crossing its middle
+    for lo, hi, x0, x1, vertical in ((-hy, hy, hx, hx + gap, True), (-hy, hy, -hx - gap, -hx, True),
+                                     (-hx, hx, hy, hy + gap, False), (-hx, hx, -hy - gap, -hy, False)):
+        for a, b in ((lo, -hw), (hw, hi)):
+            if b <= a:
+                continue
+            if vertical:
+                pts = [(x0, a), (x1, a), (x1, b), (x0, b)]
+            else:
+                pts = [(a, x0), (b, x0), (b, x1), (a, x1)]
+            pieces.append(_place(pts, cx, cy, rot))
+    # Quarter-circle corners
+    n = max(2, arc_segments(gap, max_error) // 4)
+    rr = gap / math.cos(math.pi / (4 * n))
+    for qx, qy, start in ((hx, hy, 0), (-hx, hy, 90), (-hx, -hy, 180), (hx, -hy, 270)):
+        pts = [(qx, qy)]
+        for i in range(n + 1):
+            a = math.radians(start + 90 * i / n)
+            r = gap if i in (0, n) else rr
+            pts.append((qx + r * math.cos(a), qy + r * math.sin(a)))
+        pieces.append(_place(pts, cx, cy, rot))
+    return pieces
+
+# ---------------------------------------------------------------------------
+# Spatial index
+# ---------------------------------------------------------------------------
+
+class GridIndex:
+    """Uniform grid hash of bounding boxes.
+
+    Items whose boxes share a cell are candidate neighbours; everything
+    else is never compared, which keeps edge-crossing search near linear.
+    """
+
+    def __init__(self, cell):
+        self.cell = cell
+        self.cells = {}
+
+    def _span(self, lo, hi):
+        return range(math.floor(lo / self.cell), math.floor(hi / self.cell) + 1)
+
+    def insert(self, item, x0, y0, x1, y1):
+        for i in self._span(x0, x1):
+            for j in self._span(y0, y1):
+                self.cells.setdefault((i, j), []).append(item)
+
+    def groups(self):
+        """Lists of items that share a cell."""
+        return (items for items in self.cells.values() if len(items) > 1)
+
+# ---------------------------------------------------------------------------
+# Polygon difference
+# ---------------------------------------------------------------------------
+
+def _crossing_xs(edges, cell):
+    """X coordinates where edges of different polygons cross."""
+    index = GridIndex(cell)
+    for i, (xa, ya, xb, yb, _) in enumerate(edges):
+        index.insert(i, xa, min(ya, yb), xb, max(ya, yb))
+    xs = set()
+    seen = set()
+    for items in index.groups():
+        for a in range(len(items)):
+            i = items[a]
+            ax0, ay0, ax1, ay1, ak = edges[i]
+            for b in range(a + 1, len(items)):
+                j = items[b]
+                bx0, by0, bx1, by1, bk = edges[j]
+                if ak == bk or bx0 >= ax1 or ax0 >= bx1 or (i, j) in seen:
+                    continue
+                seen.add((i, j))
+                dax, day = ax1 - ax0, ay1 - ay0
+                dbx, dby = bx1 - bx0, by1 - by0
+                den = dax * dby - day * dbx
+                if den == 0:
+                    continue
+                t = ((bx0 - ax0) * dby - (by0 - ay0) * dbx) / den
+                u = ((bx0 - ax0) * day - (by0 - ay0) * dax) / den
+                if 0 < t < 1 and 0 < u < 1:
+                    xs.add(ax0 + t * dax)
+    return xs
+
+def _side_gaps(mine, other):
+    """Parts of each interval in `mine` not covered by intervals in `other`.
+
+    Both lists are (lo, hi, trap) sorted by lo and internally disjoint.
+    Comparisons are exact so shared endpoints line up when chaining.
+    """
+    out = []
+    j = 0
+    for lo, hi, tid in mine:
+        while j < len(other) and other[j][1] <= lo:
+            j += 1
+        cur = lo
+        k = j
+        while k < len(other) and other[k][0] < hi:
+            if other[k][0] > cur:
+                out.append((cur, other[k][0], tid))
+            cur = max(cur, other[k][1])
+            k += 1
+        if cur < hi:
+            out.append((cur, hi, tid))
+    return out
+
+class _UnionFind:
+    def __init__(self):
+        self.parent = []
+
+    def add(self):
+        self.parent.append(len(self.parent))
+        return len(self.parent) - 1
+
+    def find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[rb] = ra
+
+def _trace_loops(segments):
+    """Chain directed segments (p, q, comp) into closed loops.
+
+    Where two loops touch at a point, the sharpest left turn is taken so
+    each loop keeps its own region on the left.
+    """
+    outgoing = {}
+    for i, (p, _, _) in enumerate(segments):
+        outgoing.setdefault(p, []).append(i)
+    used = [False] * len(segments)
+    loops = []
+    for start in range(len(segments)):
+        if used[start]:
+            continue
+        loop = []
+        i = start
+        while True:
+            used[i] = True
+            p, q, comp = segments[i]
+            loop.append(p)
+            if q == segments[start][0]:
+                break
+            cands = [j for j in outgoing.get(q, ()) if not used[j]]
+            if not cands:
+                break
+            if len(cands) > 1:
+                dx, dy = q[0] - p[0], q[1] - p[1]
+
+                def turn(j):
+                    ex, ey = segments[j][1][0] - q[0], segments[j][1][1] - q[1]
+                    return math.atan2(dx * ey - dy * ex, dx * ex + dy * ey)
+                cands.sort(key=turn, reverse=True)
+            i = cands[0]
+        loops.append((loop, segments[start][2]))
+    return loops
+
+def _simplify(loop):
+    """Drop repeated and collinear vertices."""
+    pts = []
+    for p in loop:
+        if not pts or p != pts[-1]:
+            pts.append(p)
+    if len(pts) > 1 and pts[0] == pts[-1]:
+        pts.pop()
+    changed = True
+    while changed and len(pts) > 3:
+        changed = False
+        out = []
+        n = len(pts)
+        for i in range(n):
+            a, b, c = out[-1] if out else pts[i - 1], pts[i], pts[(i + 1) % n]
+            cross = (b[0] - a[0]) * (c[1] - b[1]) - (b[1] - a[1]) * (c[0] - b[0])
+            if abs(cross) <= 1e-12:
+                changed = True
+                continue
+            out.append(b)
+        pts = out
+    return pts
+
+def _area(loop):
+    return sum(loop[i - 1][0] * loop[i][1] - loop[i][0] * loop[i - 1][1]
+               for i in range(len(loop))) / 2
+
+def _fracture(outline, holes, bucket=0.5):
+    """Join holes into the outline with zero-width horizontal bridges.
+
+    Holes are taken left to right; a ray cast leftwards from each hole's
+    leftmost vertex finds the nearest edge of the outline built so far.
+    Edges are kept in a linked list and bucketed by Y, so each insertion
+    and query only touches nearby edges.
+    """
+    xs, ys, nxt = [], [], []
+    buckets = {}
+
+    def add_node(p):
+        xs.append(p[0])
+        ys.append(p[1])
+        nxt.append(-1)
+        return len(xs) - 1
+
+    def index_edge(a):
+        b = nxt[a]
+        lo, hi = sorted((ys[a], ys[b]))
+        for k in range(math.floor(lo / bucket), math.floor(hi / bucket) + 1):
+            buckets.setdefault(k, []).append(a)
+
+    def link_loop(loop):
+        ids = [add_node(p) for p in loop]
+        for i, a in enumerate(ids):
+            nxt[a] = ids[(i + 1) % len(ids)]
+        return ids
+
+    head = link_loop(outline)[0]
+    for a in range(len(xs)):
+        index_edge(a)
+
+    for hole in sorted(holes, key=lambda h: min(h)):
+        k = min(range(len(hole)), key=lambda i: hole[i])
+        px, py = hole[k]
+        best, best_x = None, -math.inf
+        for a in buckets.get(math.floor(py / bucket), ()):
+            b = nxt[a]
+            y0, y1 = ys[a], ys[b]
+            if y0 == y1 or not (min(y0, y1) <= py <= max(y0, y1)):
+                continue
+            x = xs[a] + (xs[b] - xs[a]) * (py - y0) / (y1 - y0)
+            if best_x < x <= px:
+                best, best_x = a, x
+        if best is None:
+            # Cannot happen for holes inside the outline; keep it unbridged
+            continue
+        b = nxt[best]
+        ring = link_loop(hole[k:] + hole[:k] + [hole[k]])
+        q_in = add_node((best_x, py))
+        q_out = add_node((best_x, py))
+        nxt[best] = q_in
+        nxt[q_in] = ring[0]
+        nxt[ring[-1]] = q_out
+        nxt[q_out] = b
+        for a in ring[:-1] + [q_out]:
+            index_edge(a)
+
+    out = []
+    a = head
+    while True:
+        out.append((xs[a], ys[a]))
+        a = nxt[a]
+        if a == head:
+            break
+    return out
+
+def subtract(outer, obstacles, keep_points=None, cell=1.0):
+    """Area inside `outer` and outside every obstacle, as fractured polygons.
+
+    outer:       simple polygon, list of (x, y)
+    obstacles:   simple polygons (convex pieces are fastest)
+    keep_points: if given, only islands containing one of these points
+                 are returned (KiCad's "remove isolated islands")
+    cell:        grid index cell size; about the size of one obstacle
+    """
+    polys = [[(_snap(x), _snap(y)) for x, y in outer]] + obstacles
+    edges = []
+    xs = set()
+    for k, poly in enumerate(polys):
+        n = len(poly)
+        for i in range(n):
+            (x0, y0), (x1, y1) = poly[i], poly[(i + 1) % n]
+            xs.add(x0)
+            if x0 < x1:
+                edges.append((x0, y0, x1, y1, k))
+            elif x1 < x0:
+                edges.append((x1, y1, x0, y0, k))
+
+    vertex_xs = sorted(xs)
+    for x in _crossing_xs(edges, cell):
+        i = bisect_right(vertex_xs, x)
+        if (i == 0 or x - vertex_xs[i - 1] > 1e-9) and (i == len(vertex_xs) or vertex_xs[i] - x > 1e-9):
+            xs.add(x)
+    xs = sorted(xs)
+    edges.sort()
+
+    uf = _UnionFind()
+    slabs = []          # per slab: list of (y0, t0, y1, t1, trap id)
+    segments = []       # (p, q, trap id), fill on the left
+    active = []
+    ei = 0
+    prev_right = []
+    for s in range(len(xs) - 1):
+        x0, x1 = xs[s], xs[s + 1]
+        while ei < len(edges) and edges[ei][0] <= x0:
+            active.append(edges[ei])
+            ei += 1
+        active = [e for e in active if e[2] >= x1]
+
+        rows = []
+        for xa, ya, xb, yb, k in active:
+            d = xb - xa
+            y0 = ya if x0 == xa else ya + (yb - ya) * (x0 - xa) / d
+            y1 = yb if x1 == xb else ya + (yb - ya) * (x1 - xa) / d
+            rows.append((y0 + y1, y0, y1, k))
+        rows.sort()
+
+        traps = []
+        inside_outer = False
+        covered = set()
+        for i in range(len(rows) - 1):
+            k = rows[i][3]
+            if k == 0:
+                inside_outer = not inside_outer
+            elif k in covered:
+                covered.remove(k)
+            else:
+                covered.add(k)
+            if inside_outer and not covered:
+                _, y0, y1, _ = rows[i]
+                _, t0, t1, _ = rows[i + 1]
+                if t0 - y0 + t1 - y1 > 0:
+                    tid = uf.add()
+                    traps.append((y0, t0, y1, t1, tid))
+                    segments.append(((x0, y0), (x1, y1), tid))
+                    segments.append(((x1, t1), (x0, t0), tid))
+        slabs.append(traps)
+
+        left = [(y0, t0, tid) for y0, t0, _, _, tid in traps]
+        # Join with the previous slab where the shared sides overlap
+        j = 0
+        for lo, hi, tid in prev_right:
+            while j < len(left) and left[j][1] <= lo:
+                j += 1
+            k = j
+            while k < len(left) and left[k][0] < hi:
+                if min(hi, left[k][1]) > max(lo, left[k][0]):
+                    uf.union(tid, left[k][2])
+                k += 1
+        for lo, hi, tid in _side_gaps(prev_right, left):
+            segments.append(((x0, lo), (x0, hi), tid))
+        for lo, hi, tid in _side_gaps(left, prev_right):
+            segments.append(((x0, hi), (x0, lo), tid))
+        prev_right = [(y1, t1, tid) for _, _, y1, t1, tid in traps]
+    for lo, hi, tid in prev_right:
+        segments.append(((xs[-1], lo), (xs[-1], hi), tid))
+
+    keep = None
+    if keep_points is not None:
+        keep = set()
+        for px, py in keep_points:
+            s = bisect_right(xs, px) - 1
+            if not 0 <= s < len(slabs):
+                continue
+            f = (px - xs[s]) / (xs[s + 1] - xs[s])
+            for y0, t0, y1, t1, tid in slabs[s]:
+                if y0 + (y1 - y0) * f <= py <= t0 + (t1 - t0) * f:
+                    keep.add(uf.find(tid))
+                    break
+
+    comps = {}
+    for loop, tid in _trace_loops(segments):
+        comp = uf.find(tid)
+        if keep is not None and comp not in keep:
+            continue
+        pts = _simplify(loop)
+        if len(pts) < 3:
+            continue
+        outers, holes = comps.setdefault(comp, ([], []))
+        (outers if _area(pts) > 0 else holes).append(pts)
+
+    result = []
+    for outers, holes in comps.values():
+        if len(outers) == 1:
+            result.append(_fracture(outers[0], holes))
+            continue
+        # Several outlines in one island only arise from point contacts;
+        # give each its own holes
+        for outline in outers:
+            mine = [h for h in holes if _point_in(h[0], outline)]
+            result.append(_fracture(outline, mine))
+    return result
+
+def _point_in(p, poly):
+    x, y = p
+    inside = False
+    for i in range(len(poly)):
+        (x0, y0), (x1, y1) = poly[i - 1], poly[i]
+        if (y0 > y) != (y1 > y) and x < x0 + (x1 - x0) * (y - y0) / (y1 - y0):
+            inside = not inside
+    return inside